@@ -4,24 +4,41 @@ Handles Phase 1: Script → Video generation
 Handles Phase 4: Interactive conversation with voice input
 Handles Phase 5: Streaming conversation with progressive video chunks
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, AsyncIterator
 import logging
 import os
 import uuid
 import time
 from datetime import datetime
-import shutil
 import json
 import asyncio
 
+import numpy as np
+
 from config import settings, get_settings
 from pipelines.phase1_script import Phase1Pipeline
 from pipelines.conversation_pipeline import ConversationPipeline
-from pipelines.streaming_conversation import StreamingConversationPipeline# Configure logging
+from pipelines.streaming_conversation import StreamingConversationPipeline
+from models.asr_batcher import asr_batcher_stats
+from models.asr_pool import asr_pool_stats, get_asr_pool, stop_asr_pool
+from models.llm import LLMError, LLMTimeout, llm_stats, local_llm_stats
+from models.llm_router import llm_router_stats
+from models.streaming_asr import StreamingRecognizer
+from utils import fragments
+from utils.media_frames import pack_media_frame
+from utils.artifacts import get_artifact_registry
+from utils.audio import ASR_SAMPLE_RATE, decode_audio_bytes
+from utils.janitor import ArtifactJanitor, JanitorRoot
+from utils.response_cache import response_cache_stats
+from utils.session_store import get_session_store, valid_session_id
+from utils.stage_executor import StageBusy, get_stage_executor, shutdown_stage_executors, stage_stats
+from utils.video_serving import video_file_response
+
+# Configure logging
 logging.basicConfig(
     level=getattr(logging, settings.log_level.upper()),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -49,22 +66,132 @@ phase1_pipeline: Optional[Phase1Pipeline] = None
 conversation_pipeline: Optional[ConversationPipeline] = None
 streaming_pipeline: Optional[StreamingConversationPipeline] = None
 
+# Deletes old uploads/outputs in the background (GPU service outputs are
+# cleaned up by the GPU service, which owns that volume)
+janitor: Optional[ArtifactJanitor] = None
+
 # Global SSE sequence counter for debugging event ordering
+# (shared by the SSE and WebSocket conversation endpoints)
 sse_sequence_counter = 0
 sse_sequence_lock = asyncio.Lock()
 
 
+async def next_event_seq() -> int:
+    """Next global event sequence number"""
+    global sse_sequence_counter
+    async with sse_sequence_lock:
+        sse_sequence_counter += 1
+        return sse_sequence_counter
+
+
+async def read_upload_audio(audio: UploadFile):
+    """
+    Decode an uploaded recording to 16kHz mono float32 in memory.
+    
+    Raises:
+        HTTPException: 400 if the upload isn't decodable audio
+    """
+    data = await audio.read()
+    try:
+        return await get_stage_executor("io").run(decode_audio_bytes, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid audio upload: {e}")
+
+
+@app.exception_handler(StageBusy)
+async def stage_busy_handler(request: Request, exc: StageBusy):
+    """A stage's queue is full: shed load rather than queue behind it"""
+    logger.warning(f"[PERF] Rejected {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(LLMError)
+async def llm_error_handler(request: Request, exc: LLMError):
+    """The LLM failed or missed its deadline: say so instead of answering with filler"""
+    status_code = 504 if isinstance(exc, LLMTimeout) else 502
+    logger.error(f"[PERF] LLM failed for {request.url.path}: {exc}")
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)})
+
+
+def check_session_id(session_id: Optional[str]) -> Optional[str]:
+    """Validate a client-supplied session id (None = no server-side session)"""
+    if session_id and not valid_session_id(session_id):
+        raise HTTPException(status_code=400, detail="Invalid session_id (1-128 of A-Z a-z 0-9 _ . : -)")
+    return session_id or None
+
+
+async def prepare_stream_event(event_type: str, event_data: dict, transport: str = "SSE") -> bool:
+    """
+    Add seq, server timestamp and media URLs to a streaming pipeline event.
+    
+    Returns:
+        False if the event must not be sent (video chunk that wasn't published)
+    """
+    event_seq = await next_event_seq()
+    event_data["seq"] = event_seq
+    event_data["server_timestamp"] = time.time()
+    
+    # Add video URL for video chunks
+    if event_type == "video_chunk":
+        chunk_index = event_data.get("chunk_index", "?")
+        chunk_time = event_data.get("chunk_time", 0)
+        video_path = event_data.get("video_path")
+        logger.info(f"[{transport}] seq={event_seq} Chunk {chunk_index} ready to send (generated in {chunk_time:.2f}s)")
+        
+        if video_path:
+            # The pipeline registers a chunk once it's published; no filesystem
+            # checks here
+            record = get_artifact_registry().get(event_data.get("artifact_id"))
+            if record is None:
+                logger.error(f"[PERF] Chunk {chunk_index} video not published: {video_path}")
+                return False
+            
+            event_data["video_url"] = f"/api/v1/videos/{record.artifact_id}"
+            logger.info(f"[{transport}] seq={event_seq} Chunk {chunk_index} sending: {record.artifact_id} (size={record.size_bytes})")
+    
+    # Fragment URLs for MSE playback (fragments appear while the chunk renders)
+    if event_type == "video_fragments":
+        base_url = f"/api/v1/fragments/{event_data['fragment_id']}"
+        event_data["init_url"] = f"{base_url}/{fragments.INIT_NAME}"
+        event_data["playlist_url"] = f"{base_url}/{fragments.PLAYLIST_NAME}"
+        event_data["segment_url_template"] = f"{base_url}/{fragments.SEGMENT_TEMPLATE}"
+    
+    return True
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize models on startup"""
-    global phase1_pipeline, conversation_pipeline, streaming_pipeline
+    global phase1_pipeline, conversation_pipeline, streaming_pipeline, janitor
     logger.info(f"Starting Realtime Avatar Runtime in {settings.mode} mode on {settings.device}")
     logger.info(f"Video resolution: {settings.video_resolution}, FPS: {settings.video_fps}")
     
     # Create output directories
     os.makedirs(settings.output_dir, exist_ok=True)
     os.makedirs("outputs/conversations", exist_ok=True)
-    os.makedirs("/tmp/audio_uploads", exist_ok=True)
+    
+    # Start artifact cleanup
+    janitor = ArtifactJanitor(
+        "runtime",
+        [
+            JanitorRoot(settings.output_dir),
+            JanitorRoot("outputs/conversations"),
+        ],
+        max_bytes=settings.artifact_max_bytes,
+        max_age_s=settings.artifact_max_age_s,
+        min_age_s=settings.artifact_min_age_s,
+        interval_s=settings.janitor_interval_s,
+        on_delete=lambda path: get_artifact_registry().remove(os.path.basename(path)),
+    )
+    janitor.start()
+    
+    # Start the CPU ASR worker pool, if configured (blocks until models load)
+    if settings.asr_pool_processes > 0:
+        try:
+            await asyncio.to_thread(get_asr_pool)
+        except Exception as e:
+            logger.error(f"Failed to start ASR worker pool: {e}")
+            raise
     
     # Initialize Phase 1 pipeline (lazy load - will initialize on first request)
     try:
@@ -111,6 +238,10 @@ async def startup_event():
 async def shutdown_event():
     """Clean up resources on shutdown"""
     logger.info("Shutting down Realtime Avatar Runtime")
+    if janitor:
+        await janitor.stop()
+    stop_asr_pool()
+    shutdown_stage_executors()
 
 
 # Request/Response models
@@ -157,6 +288,7 @@ class TranscribeResponse(BaseModel):
     language: str
     duration: float
     transcribe_time: float
+    timings: Dict[str, float] = {}  # decode_ms / vad_ms / asr_ms
 
 
 class ChatRequest(BaseModel):
@@ -164,12 +296,14 @@ class ChatRequest(BaseModel):
     message: str
     conversation_history: Optional[List[Dict[str, str]]] = None
     max_tokens: int = 150
+    session_id: Optional[str] = None  # Server-side history instead of conversation_history
 
 
 class ChatResponse(BaseModel):
     """Response model for LLM chat"""
     response: str
     llm_time: float
+    session_id: Optional[str] = None
 
 
 class ConversationResponse(BaseModel):
@@ -207,6 +341,23 @@ async def health_check():
     )
 
 
+@app.get("/metrics")
+async def metrics():
+    """Artifact storage (janitor and artifact registry), stage executor, ASR and LLM metrics"""
+    return {
+        "janitor": janitor.stats() if janitor else None,
+        "artifacts": get_artifact_registry().stats(),
+        "stages": stage_stats(),
+        "asr_batching": asr_batcher_stats(),
+        "asr_pool": asr_pool_stats(),
+        "llm": llm_stats(),
+        "local_llm": local_llm_stats(),
+        "llm_routing": llm_router_stats(),
+        "response_cache": response_cache_stats(),
+        "sessions": get_session_store().stats(),
+    }
+
+
 @app.post("/api/v1/generate", response_model=GenerationResponse)
 async def generate_video(request: ScriptRequest, background_tasks: BackgroundTasks):
     """
@@ -251,7 +402,7 @@ async def generate_video(request: ScriptRequest, background_tasks: BackgroundTas
             job_id=job_id,
             status="completed",
             message="Video generated successfully",
-            video_url=f"/api/v1/videos/{os.path.basename(result['video_path'])}",
+            video_url=f"/api/v1/videos/{result['artifact_id']}",
             metadata={
                 "duration_ms": duration_ms,
                 "tts_ms": result.get("tts_duration_ms", 0),
@@ -268,89 +419,89 @@ async def generate_video(request: ScriptRequest, background_tasks: BackgroundTas
 
 @app.get("/api/v1/videos/{filename}")
 @app.head("/api/v1/videos/{filename}")
-async def get_video(filename: str):
-    """Serve generated video file with CORS headers and detailed timing logs"""
+async def get_video(filename: str, request: Request):
+    """
+    Serve generated video file with CORS headers.
+    
+    Supports Range (single and multi-range, 206), ETag/Last-Modified
+    revalidation (304) and HEAD; bodies go out via sendfile when the server
+    supports it, otherwise from an mmap of the file.
+    """
     request_start = time.time()
-    logger.info(f"[VIDEO] === REQUEST START === {filename} at t={request_start:.3f}")
-    
-    # Check GPU service output directory first (for hybrid mode)
-    gpu_output_path = os.path.join("/tmp/gpu-service-output", filename)
-    if os.path.exists(gpu_output_path):
-        video_path = gpu_output_path
-        logger.info(f"[VIDEO] Found in GPU output: {gpu_output_path}")
-    else:
-        # Fallback to regular output directory
+    registry = get_artifact_registry()
+    
+    # Artifacts registered by the pipelines: one dict lookup, no stat
+    record = registry.get(filename)
+    if record is None:
+        # Not produced by this process (e.g. before a restart): probe the
+        # GPU service output directory (hybrid mode), then the regular one
+        gpu_output_path = os.path.join("/tmp/gpu-service-output", filename)
         video_path = os.path.join(settings.output_dir, filename)
-        if not os.path.exists(video_path):
+        for candidate in (gpu_output_path, video_path):
+            if os.path.isfile(candidate):
+                record = registry.register(candidate)
+                break
+        else:
             logger.error(f"[VIDEO] File not found: {filename} (checked GPU output and {settings.output_dir})")
             raise HTTPException(status_code=404, detail="Video not found")
-        logger.info(f"[VIDEO] Found in output dir: {video_path}")
-    
-    # Get file metadata
-    file_stat = os.stat(video_path)
-    file_size = file_stat.st_size
-    file_mtime = file_stat.st_mtime
-    file_age = request_start - file_mtime
-    
-    logger.info(f"[VIDEO] File metadata: size={file_size} bytes, age={file_age:.3f}s, mtime={file_mtime:.3f}")
-    logger.info(f"[VIDEO] Time to file check: {(time.time() - request_start)*1000:.1f}ms")
-    
-    # Async generator to stream file in chunks (doesn't block event loop!)
-    async def file_stream():
-        chunk_size = 65536  # 64KB chunks
-        bytes_sent = 0
-        first_chunk_time = None
-        chunk_count = 0
-        
-        # Use asyncio.to_thread to avoid blocking on file I/O
-        def read_chunk(f, size):
-            return f.read(size)
-        
-        stream_start = time.time()
-        logger.info(f"[VIDEO] Starting file stream at t={stream_start:.3f}")
-        
-        with open(video_path, "rb") as f:
-            while True:
-                chunk_read_start = time.time()
-                chunk = await asyncio.to_thread(read_chunk, f, chunk_size)
-                if not chunk:
-                    break
-                
-                chunk_count += 1
-                bytes_sent += len(chunk)
-                
-                # Log first chunk (TTFB)
-                if first_chunk_time is None:
-                    first_chunk_time = time.time()
-                    ttfb = (first_chunk_time - request_start) * 1000
-                    logger.info(f"[VIDEO] TTFB (first chunk): {ttfb:.1f}ms, chunk_size={len(chunk)}")
-                
-                yield chunk
-        
-        elapsed = time.time() - request_start
-        throughput_mbps = (bytes_sent * 8 / 1024 / 1024) / elapsed if elapsed > 0 else 0
-        logger.info(f"[VIDEO] === COMPLETE === {filename}: {bytes_sent}/{file_size} bytes in {elapsed:.3f}s ({throughput_mbps:.1f} Mbps, {chunk_count} chunks)")
     
-    return StreamingResponse(
-        file_stream(),
+    response = video_file_response(
+        record.path,
+        request.headers,
+        method=request.method,
         media_type="video/mp4",
-        headers={
-            "Accept-Ranges": "bytes",
-            "Cache-Control": "no-cache",
-            "Content-Length": str(file_size),
-        }
+        extra_headers={
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Expose-Headers": "Content-Range, Content-Length, ETag",
+            "Cache-Control": "no-cache",  # Revalidate (cheap 304 via ETag)
+        },
+        size=record.size_bytes,
+        mtime_ns=record.mtime_ns,
+        sha256=record.sha256,
+        on_missing=lambda: registry.remove(filename),
+    )
+    if janitor:
+        janitor.touch(record.path)
+    logger.info(
+        f"[VIDEO] {request.method} {filename} -> {response.status_code} "
+        f"(range={request.headers.get('range', '-')}, length={response.headers.get('content-length', '0')}) "
+        f"in {(time.time() - request_start) * 1000:.1f}ms"
     )
+    return response
+
+
+@app.get("/api/v1/fragments/{fragment_id}/{name}")
+async def get_fragment(fragment_id: str, name: str):
+    """
+    Serve one fMP4 fragment of a chunk that may still be rendering.
     
-    return StreamingResponse(
-        file_stream(),
-        media_type="video/mp4",
+    init.mp4 comes first, then seg_00000.m4s, seg_00001.m4s, ... in order. A
+    fragment that isn't written yet is waited for (inotify, no polling); a
+    segment past the end of the chunk returns 404 once its playlist is final.
+    """
+    request_start = time.time()
+    try:
+        path = await fragments.wait_for_fragment(
+            fragment_id, name, timeout=settings.fragment_wait_timeout
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid fragment name")
+    
+    if path is None:
+        raise HTTPException(status_code=404, detail="Fragment not available")
+    
+    wait_ms = (time.time() - request_start) * 1000
+    logger.info(f"[FRAGMENT] {fragment_id}/{name} served after {wait_ms:.1f}ms wait")
+    
+    return FileResponse(
+        path,
+        media_type=fragments.media_type(name),
         headers={
-            "Content-Length": str(file_size),
             "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
-            "Access-Control-Allow-Headers": "*",
-            "Accept-Ranges": "bytes",
-            "Cache-Control": "no-cache"
+            # Fragments are immutable once renamed into place; the playlist is not
+            "Cache-Control": "no-cache" if name == fragments.PLAYLIST_NAME else "public, max-age=3600, immutable",
         }
     )
 
@@ -388,29 +539,29 @@ async def transcribe_audio(audio: UploadFile = File(...), language: str = "en"):
     if not conversation_pipeline:
         raise HTTPException(status_code=503, detail="Conversation pipeline not initialized")
     
-    # Save uploaded audio to temp file
-    temp_path = f"/tmp/audio_uploads/{uuid.uuid4().hex}.wav"
+    # Decode upload in memory (no temp file)
+    decode_start = time.perf_counter()
+    audio_array = await read_upload_audio(audio)
+    decode_ms = (time.perf_counter() - decode_start) * 1000
+    
     try:
-        with open(temp_path, "wb") as f:
-            shutil.copyfileobj(audio.file, f)
-        
-        # Transcribe
-        result = conversation_pipeline.transcribe(temp_path, language=language)
+        # Transcribe (batched with concurrent requests, off the event loop)
+        result = await conversation_pipeline.transcribe_async(audio_array, language=language)
+        timings = dict(result["metadata"].get("timings", {}), decode_ms=decode_ms)
         
         return TranscribeResponse(
             text=result["text"],
             language=result["language"],
-            duration=result["duration"],
+            duration=result["metadata"].get("duration", len(audio_array) / ASR_SAMPLE_RATE),
             transcribe_time=result["transcribe_time"],
+            timings=timings,
         )
         
+    except StageBusy:
+        raise
     except Exception as e:
         logger.error(f"Transcription failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
-    finally:
-        # Clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
 
 @app.post("/api/v1/chat", response_model=ChatResponse)
@@ -421,19 +572,24 @@ async def chat(request: ChatRequest):
     """
     if not conversation_pipeline:
         raise HTTPException(status_code=503, detail="Conversation pipeline not initialized")
+    session_id = check_session_id(request.session_id)
     
     try:
-        result = conversation_pipeline.generate_response(
+        result = await conversation_pipeline.generate_response(
             user_message=request.message,
             conversation_history=request.conversation_history,
             max_tokens=request.max_tokens,
+            session_id=session_id,
         )
         
         return ChatResponse(
             response=result["response"],
             llm_time=result["llm_time"],
+            session_id=session_id,
         )
         
+    except (StageBusy, LLMError):
+        raise
     except Exception as e:
         logger.error(f"Chat failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
@@ -444,6 +600,7 @@ async def process_conversation(
     audio: UploadFile = File(...),
     language: str = "en",
     conversation_history: Optional[str] = None,  # JSON string of history
+    session_id: Optional[str] = Form(default=None),  # Server-side history instead
 ):
     """
     Full conversation pipeline: Audio → ASR → LLM → TTS → Video.
@@ -451,15 +608,13 @@ async def process_conversation(
     """
     if not conversation_pipeline:
         raise HTTPException(status_code=503, detail="Conversation pipeline not initialized")
+    session_id = check_session_id(session_id)
     
-    # Save uploaded audio
+    # Decode uploaded audio in memory
     job_id = f"conversation_{uuid.uuid4().hex[:8]}"
-    temp_path = f"/tmp/audio_uploads/{job_id}.wav"
+    audio_array = await read_upload_audio(audio)
     
     try:
-        with open(temp_path, "wb") as f:
-            shutil.copyfileobj(audio.file, f)
-        
         # Parse conversation history if provided
         history = None
         if conversation_history:
@@ -471,10 +626,11 @@ async def process_conversation(
         
         # Process full conversation
         result = await conversation_pipeline.process_conversation(
-            audio_path=temp_path,
+            audio_array=audio_array,
             conversation_history=history,
             output_name=job_id,
             language=language,
+            session_id=session_id,
         )
         
         # Get video URL
@@ -492,16 +648,15 @@ async def process_conversation(
                 "llm_time": result["llm_response"]["llm_time"],
                 "generation_time": result["avatar_video"]["total_generation_time"],
                 "language": language,
+                "session_id": session_id,
             },
         )
         
+    except (StageBusy, LLMError):
+        raise
     except Exception as e:
         logger.error(f"[{job_id}] Conversation processing failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Conversation failed: {str(e)}")
-    finally:
-        # Clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
 
 @app.post("/api/v1/conversation/stream")
@@ -509,6 +664,7 @@ async def process_conversation_stream(
     audio: UploadFile = File(...),
     language: str = Form(default="en"),
     conversation_history: Optional[str] = Form(default=None),
+    session_id: Optional[str] = Form(default=None),
 ):
     """
     Streaming conversation pipeline: Audio → ASR → LLM → TTS + Video chunks.
@@ -520,15 +676,11 @@ async def process_conversation_stream(
     
     if not streaming_pipeline:
         raise HTTPException(status_code=503, detail="Streaming pipeline not initialized")
+    session_id = check_session_id(session_id)
     
-    # Save uploaded audio BEFORE creating generator
+    # Decode uploaded audio BEFORE creating generator (bad uploads get a 400)
     job_id = f"stream_{uuid.uuid4().hex[:8]}"
-    temp_path = f"/tmp/audio_uploads/{job_id}.wav"
-    os.makedirs("/tmp/audio_uploads", exist_ok=True)
-    
-    # Save audio synchronously before yielding
-    with open(temp_path, "wb") as f:
-        shutil.copyfileobj(audio.file, f)
+    audio_array = await read_upload_audio(audio)
     
     # Parse conversation history if provided
     history = None
@@ -540,54 +692,23 @@ async def process_conversation_stream(
     
     async def event_generator():
         """Generate SSE events for each chunk"""
-        global sse_sequence_counter
         try:
             # Process conversation with streaming
             async for event in streaming_pipeline.process_conversation_streaming(
-                audio_path=temp_path,
+                audio_array=audio_array,
                 conversation_history=history,
                 job_id=job_id,
                 language=language,
+                session_id=session_id,
             ):
                 # Format as SSE event
                 event_type = event["type"]
                 event_data = event["data"]
                 
-                # Add sequence number for debugging event ordering
-                async with sse_sequence_lock:
-                    sse_sequence_counter += 1
-                    event_seq = sse_sequence_counter
-                event_data["seq"] = event_seq
-                event_data["server_timestamp"] = time.time()
-                
-                # Add video URL for video chunks
-                if event_type == "video_chunk":
-                    chunk_index = event_data.get("chunk_index", "?")
-                    chunk_time = event_data.get("chunk_time", 0)
-                    video_path = event_data.get("video_path")
-                    logger.info(f"[SSE] seq={event_seq} Chunk {chunk_index} ready to send (generated in {chunk_time:.2f}s)")
-                    
-                    if video_path:
-                        # Quick file existence check (max 1s wait)
-                        # GPU service may need a moment to flush file to disk
-                        wait_start = time.time()
-                        max_wait = 1.0
-                        while not os.path.exists(video_path) and (time.time() - wait_start) < max_wait:
-                            await asyncio.sleep(0.05)
-                        
-                        if not os.path.exists(video_path):
-                            logger.error(f"[PERF] Chunk {chunk_index} file not found after {max_wait}s: {video_path}")
-                            continue
-                        
-                        wait_time = time.time() - wait_start
-                        if wait_time > 0.1:
-                            logger.warning(f"[PERF] Chunk {chunk_index} file check took {wait_time:.2f}s")
-                        
-                        video_filename = os.path.basename(video_path)
-                        event_data["video_url"] = f"/api/v1/videos/{video_filename}"
-                        file_size = os.path.getsize(video_path)
-                        file_age = time.time() - os.path.getmtime(video_path)
-                        logger.info(f"[SSE] seq={event_seq} Chunk {chunk_index} sending: {video_filename} (size={file_size}, age={file_age:.3f}s)")
+                # Add sequence number, timestamp and media URLs
+                if not await prepare_stream_event(event_type, event_data):
+                    continue
+                event_seq = event_data["seq"]
                 
                 # Send SSE event with explicit flush
                 send_time = time.time()
@@ -612,10 +733,6 @@ async def process_conversation_stream(
             }
             yield f"event: error\n"
             yield f"data: {json.dumps(error_event)}\n\n"
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
     
     return StreamingResponse(
         event_generator(),
@@ -628,6 +745,279 @@ async def process_conversation_stream(
     )
 
 
+@app.websocket("/ws/conversation")
+async def conversation_websocket(websocket: WebSocket):
+    """
+    Streaming conversation over a single WebSocket.
+
+    Same pipeline, events and seq numbers as /api/v1/conversation/stream, but
+    audio goes up and video comes down on one connection, so chunks don't
+    queue behind the browser's per-host HTTP/1.1 connection limit.
+
+    Client → server (per turn):
+        {"type": "start", "language": "en", "session_id": "..."}
+            (session_id keeps the history server-side; "conversation_history": [...]
+            is still accepted instead)
+        binary frames with the recorded audio file (WAV, WebM/Opus, ...), in order
+        {"type": "end"}
+
+    Server → client:
+        text frames: {"type": <event type>, "data": {...}} (SSE event schema)
+        binary frames: media in utils.media_frames layout, tagged with the seq
+            of the event they belong to - the chunk's MP4 after its video_chunk
+            event, or init.mp4 + segments after a video_fragments event (the
+            video_chunk event then follows the chunk's last segment)
+
+    Several turns can run on one connection; send the next "start" after
+    "complete" or "error".
+    """
+    await websocket.accept()
+    client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "?"
+    logger.info(f"[WS] Conversation socket opened ({client})")
+
+    # Fragment streaming runs alongside the event loop; one sender at a time
+    send_lock = asyncio.Lock()
+
+    async def send_event(event_type: str, event_data: dict):
+        async with send_lock:
+            await websocket.send_text(json.dumps({"type": event_type, "data": event_data}))
+
+    async def send_media(header: dict, path: str):
+        payload = await get_stage_executor("io").run(_read_file_bytes, path)
+        async with send_lock:
+            await websocket.send_bytes(pack_media_frame(header, payload))
+        return len(payload)
+
+    async def send_fragments(event_data: dict):
+        """Send init.mp4 then each segment as soon as it's written"""
+        fragment_id = event_data["fragment_id"]
+        header = {
+            "kind": "fragment",
+            "seq": event_data["seq"],
+            "fragment_id": fragment_id,
+            "chunk_index": event_data.get("chunk_index"),
+        }
+        names = [fragments.INIT_NAME]
+        index = 0
+        while True:
+            name = names.pop(0) if names else fragments.segment_name(index)
+            path = await fragments.wait_for_fragment(
+                fragment_id, name, timeout=settings.fragment_wait_timeout
+            )
+            if path is None:
+                if name == fragments.INIT_NAME:
+                    logger.warning(f"[WS] Fragment stream {fragment_id} never started")
+                return
+            await send_media(
+                dict(header, name=name, content_type=fragments.media_type(name)),
+                path,
+            )
+            if name != fragments.INIT_NAME:
+                index += 1
+
+    async def run_turn(start: dict):
+        job_id = f"ws_{uuid.uuid4().hex[:8]}"
+        fragment_tasks: Dict[str, asyncio.Task] = {}
+
+        try:
+            # Collect audio frames until "end" (in memory)
+            audio_bytes = bytearray()
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes") is not None:
+                    audio_bytes += message["bytes"]
+                    continue
+                control = json.loads(message.get("text") or "{}")
+                if control.get("type") == "end":
+                    break
+                raise ValueError(f"Unexpected message during audio upload: {control.get('type')}")
+
+            if not audio_bytes:
+                raise ValueError("No audio received")
+            audio_array = await get_stage_executor("io").run(decode_audio_bytes, bytes(audio_bytes))
+            logger.info(f"[WS] [{job_id}] Received {len(audio_bytes)} bytes of audio ({len(audio_array) / ASR_SAMPLE_RATE:.2f}s)")
+
+            history = start.get("conversation_history")
+            if history is not None and not isinstance(history, list):
+                logger.warning("Invalid conversation history, ignoring")
+                history = None
+            session_id = start.get("session_id") or None
+            if session_id is not None and not valid_session_id(str(session_id)):
+                raise ValueError("Invalid session_id (1-128 of A-Z a-z 0-9 _ . : -)")
+
+            async for event in streaming_pipeline.process_conversation_streaming(
+                audio_array=audio_array,
+                conversation_history=history,
+                job_id=job_id,
+                language=start.get("language", "en"),
+                session_id=session_id,
+            ):
+                event_type = event["type"]
+                event_data = event["data"]
+
+                if not await prepare_stream_event(event_type, event_data, transport="WS"):
+                    continue
+
+                if event_type == "video_chunk":
+                    fragment_task = fragment_tasks.pop(event_data.get("fragment_id"), None)
+                    if fragment_task is not None:
+                        # Chunk already streamed as fragments; finish them first
+                        await fragment_task
+                        await send_event(event_type, event_data)
+                    else:
+                        await send_event(event_type, event_data)
+                        if event_data.get("video_url"):
+                            size = await send_media(
+                                {
+                                    "kind": "video_chunk",
+                                    "seq": event_data["seq"],
+                                    "chunk_index": event_data.get("chunk_index"),
+                                    "name": os.path.basename(event_data["video_path"]),
+                                    "content_type": "video/mp4",
+                                },
+                                event_data["video_path"],
+                            )
+                            logger.info(f"[WS] seq={event_data['seq']} Chunk {event_data.get('chunk_index')} sent inline ({size} bytes)")
+                    continue
+
+                if event_type == "complete" and fragment_tasks:
+                    await asyncio.gather(*fragment_tasks.values())
+                    fragment_tasks.clear()
+
+                await send_event(event_type, event_data)
+
+                if event_type == "video_fragments":
+                    fragment_tasks[event_data["fragment_id"]] = asyncio.create_task(send_fragments(event_data))
+
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            logger.error(f"[{job_id}] WebSocket conversation failed: {e}", exc_info=True)
+            await send_event("error", {"error": str(e), "job_id": job_id, "seq": await next_event_seq()})
+        finally:
+            for task in fragment_tasks.values():
+                task.cancel()
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                message = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                message = {}
+            if message.get("type") != "start":
+                # Stray audio frames after an error land here too; ignore them quietly
+                if message:
+                    await send_event("error", {"error": f"Expected 'start', got {message.get('type')!r}", "seq": await next_event_seq()})
+                continue
+            if not streaming_pipeline:
+                await send_event("error", {"error": "Streaming pipeline not initialized", "seq": await next_event_seq()})
+                continue
+            await run_turn(message)
+    except WebSocketDisconnect:
+        logger.info(f"[WS] Conversation socket closed ({client})")
+
+
+@app.websocket("/ws/asr")
+async def asr_websocket(websocket: WebSocket):
+    """
+    Streaming speech recognition: transcripts while the user is still talking.
+
+    Client → server (per session):
+        {"type": "start", "language": "en", "encoding": "pcm_s16le"}
+        binary frames of raw 16kHz mono PCM, 20-100ms each
+            (encoding "pcm_s16le", the default, or "pcm_f32le")
+        {"type": "end"}
+
+    Server → client, text frames {"type": ..., "data": {...}}:
+        ready, speech_start, partial (may change), final (one per closed
+        speech segment, with the transcript so far), complete (after "end"),
+        error
+
+    Several sessions can run on one connection; send the next "start" after
+    "complete" or "error". /api/v1/transcribe stays the path for whole files.
+    """
+    await websocket.accept()
+    client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "?"
+    logger.info(f"[WS] ASR socket opened ({client})")
+
+    async def send_event(event_type: str, event_data: dict):
+        await websocket.send_text(json.dumps({"type": event_type, "data": event_data}))
+
+    async def pcm_frames(dtype) -> AsyncIterator:
+        """Yield float32 samples per binary frame until "end" """
+        scale = 32768.0 if dtype == "<i2" else 1.0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                samples = np.frombuffer(message["bytes"], dtype=dtype)
+                yield samples.astype(np.float32) / scale
+                continue
+            control = json.loads(message.get("text") or "{}")
+            if control.get("type") == "end":
+                return
+            raise ValueError(f"Unexpected message during audio stream: {control.get('type')}")
+
+    async def run_session(start: dict):
+        asr_model = streaming_pipeline.asr_model if streaming_pipeline else conversation_pipeline.asr_model
+        encodings = {"pcm_s16le": "<i2", "pcm_f32le": "<f4"}
+        encoding = start.get("encoding", "pcm_s16le")
+        if encoding not in encodings:
+            raise ValueError(f"Unsupported encoding {encoding!r} (use {' or '.join(encodings)})")
+        sample_rate = int(start.get("sample_rate", ASR_SAMPLE_RATE))
+        if sample_rate != ASR_SAMPLE_RATE:
+            raise ValueError(f"Unsupported sample rate {sample_rate} (send {ASR_SAMPLE_RATE}Hz mono)")
+
+        # Sessions share the loaded ONNX VAD; each only carries its own state
+        recognizer = StreamingRecognizer(
+            asr_model,
+            language=start.get("language"),
+            min_silence_ms=settings.streaming_asr_min_silence_ms,
+            partial_interval_ms=settings.streaming_asr_partial_interval_ms,
+        )
+        await send_event("ready", {"sample_rate": ASR_SAMPLE_RATE, "encoding": encoding})
+        async for event in recognizer.stream(pcm_frames(encodings[encoding])):
+            await send_event(event["type"], event["data"])
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                message = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                message = {}
+            if message.get("type") != "start":
+                # Stray audio frames after an error land here too; ignore them quietly
+                if message:
+                    await send_event("error", {"error": f"Expected 'start', got {message.get('type')!r}"})
+                continue
+            if not (streaming_pipeline or conversation_pipeline):
+                await send_event("error", {"error": "ASR not initialized"})
+                continue
+            try:
+                await run_session(message)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"[WS] ASR session failed: {e}", exc_info=True)
+                await send_event("error", {"error": str(e)})
+    except WebSocketDisconnect:
+        logger.info(f"[WS] ASR socket closed ({client})")
+
+
+def _read_file_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,95 @@
+"""
+Benchmark for cross-request ASR batching.
+
+N concurrent clients (1, 4, 16) each send utterances back to back through
+models.asr_batcher.ASRBatcher on faster-whisper, CPU int8:
+- per-request: max_batch_size=1, i.e. one WhisperModel.transcribe per
+  request on the single ASR worker (the behaviour without batching)
+- batched: max_batch_size=8, max_wait_ms=10 (the defaults)
+
+and reports p50/p95 request latency and throughput for each.
+
+Usage: python benchmark_asr_batching.py [audio_file] [requests_per_client] [model_size]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.asr import ASRModel
+from models.asr_batcher import ASRBatcher
+from utils.audio import ASR_SAMPLE_RATE, decode_audio_bytes
+
+DEFAULT_AUDIO = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "assets", "voice", "reference_samples", "bruce_en_sample.wav"
+)
+CLIENTS = (1, 4, 16)
+UTTERANCE_S = 4.0  # A typical spoken turn
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_clients(batcher: ASRBatcher, utterances: List, clients: int, requests: int) -> dict:
+    latencies: List[float] = []
+
+    async def client(index: int):
+        for i in range(requests):
+            audio = utterances[(index + i) % len(utterances)]
+            start = time.perf_counter()
+            await batcher.transcribe(audio, language="en", vad_filter=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "requests_per_s": len(latencies) / elapsed,
+        "audio_s_per_s": len(latencies) * UTTERANCE_S / elapsed,
+    }
+
+
+async def main():
+    audio_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_AUDIO
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    model_size = sys.argv[3] if len(sys.argv) > 3 else "base"
+
+    with open(audio_path, "rb") as f:
+        audio = decode_audio_bytes(f.read())
+    # Cut the recording into utterance-sized clips
+    step = int(UTTERANCE_S * ASR_SAMPLE_RATE)
+    utterances = [audio[i:i + step] for i in range(0, max(1, len(audio) - step + 1), step)] or [audio]
+
+    asr = ASRModel(device="cpu", compute_type="int8")
+    asr.initialize(model_size=model_size, use_vad=False)
+    asr.transcribe_array(utterances[0], language="en", vad_filter=False)  # Warm up
+
+    print("=" * 78)
+    print(f"ASR BATCHING BENCHMARK (faster-whisper {model_size}, CPU int8, "
+          f"{UTTERANCE_S:.0f}s utterances, {requests} per client)")
+    print("=" * 78)
+    print(f"{'clients':>8} {'mode':<12} {'p50 ms':>10} {'p95 ms':>10} {'req/s':>8} {'audio s/s':>10} {'avg batch':>10}")
+    for clients in CLIENTS:
+        for mode, max_batch in (("per-request", 1), ("batched", 8)):
+            batcher = ASRBatcher(asr, max_batch_size=max_batch, max_wait_ms=10)
+            result = await run_clients(batcher, utterances, clients, requests)
+            if mode == "batched" and clients > 1:
+                # Otherwise the "batched" row just repeats per-request decoding
+                assert batcher.stats()["avg_batch_size"] > 1, "concurrent clients never formed a batch"
+            print(f"{clients:>8} {mode:<12} {result['p50_ms']:>10.0f} {result['p95_ms']:>10.0f} "
+                  f"{result['requests_per_s']:>8.2f} {result['audio_s_per_s']:>10.1f} "
+                  f"{batcher.stats()['avg_batch_size']:>10.1f}")
+        print("-" * 78)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark for the CPU ASR worker pool.
+
+For a core count C, tries every processes x cpu_threads split with
+processes * threads = C (1xC, 2xC/2, ..., Cx1), each worker pinned to its
+own cores, and measures:
+- single-request latency (one client: how fast one utterance comes back)
+- saturated throughput and p50/p95 latency (2 clients per process)
+
+then prints the split with the best throughput and the one with the best
+single-request latency. Set ASR_POOL_PROCESSES / ASR_POOL_CPU_THREADS from
+the result.
+
+Usage: python benchmark_asr_pool.py [cores] [audio_file] [requests_per_client] [model_size]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.asr_pool import ASRWorkerPool, available_cores
+from utils.audio import ASR_SAMPLE_RATE, decode_audio_bytes
+
+DEFAULT_AUDIO = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "assets", "voice", "reference_samples", "bruce_en_sample.wav"
+)
+UTTERANCE_S = 4.0  # A typical spoken turn
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_clients(pool: ASRWorkerPool, utterances: List, clients: int, requests: int) -> dict:
+    latencies: List[float] = []
+
+    async def client(index: int):
+        for i in range(requests):
+            start = time.perf_counter()
+            await pool.transcribe(utterances[(index + i) % len(utterances)], language="en", vad_filter=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "requests_per_s": len(latencies) / elapsed,
+    }
+
+
+async def main():
+    cores = available_cores()
+    core_count = int(sys.argv[1]) if len(sys.argv) > 1 else len(cores)
+    audio_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_AUDIO
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+    model_size = sys.argv[4] if len(sys.argv) > 4 else "base"
+    if core_count > len(cores):
+        print(f"Only {len(cores)} cores available")
+        core_count = len(cores)
+
+    with open(audio_path, "rb") as f:
+        audio = decode_audio_bytes(f.read())
+    step = int(UTTERANCE_S * ASR_SAMPLE_RATE)
+    utterances = [audio[i:i + step] for i in range(0, max(1, len(audio) - step + 1), step)] or [audio]
+
+    # Restrict the pool's core planning to the first core_count cores
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores[:core_count])
+
+    splits = [(p, core_count // p) for p in range(1, core_count + 1) if core_count % p == 0]
+
+    print("=" * 84)
+    print(f"ASR WORKER POOL BENCHMARK (faster-whisper {model_size}, CPU int8, {core_count} cores, "
+          f"{UTTERANCE_S:.0f}s utterances)")
+    print("=" * 84)
+    print(f"{'procs x threads':<16} {'1-client ms':>12} {'clients':>8} {'p50 ms':>10} {'p95 ms':>10} {'req/s':>8} {'load s':>8}")
+
+    results = []
+    for processes, threads in splits:
+        load_start = time.time()
+        pool = ASRWorkerPool(processes=processes, cpu_threads=threads, model_size=model_size, compute_type="int8")
+        pool.start()
+        load_time = time.time() - load_start
+        try:
+            await run_clients(pool, utterances, processes, 1)  # Warm up every worker
+            single = await run_clients(pool, utterances, 1, requests)
+            clients = 2 * processes
+            saturated = await run_clients(pool, utterances, clients, requests)
+        finally:
+            pool.stop()
+
+        results.append((processes, threads, single, saturated))
+        print(f"{f'{processes} x {threads}':<16} {single['p50_ms']:>12.0f} {clients:>8} "
+              f"{saturated['p50_ms']:>10.0f} {saturated['p95_ms']:>10.0f} {saturated['requests_per_s']:>8.2f} {load_time:>8.1f}")
+
+    print("-" * 84)
+    best_throughput = max(results, key=lambda r: r[3]["requests_per_s"])
+    best_latency = min(results, key=lambda r: r[2]["p50_ms"])
+    print(f"Best throughput:     {best_throughput[0]} processes x {best_throughput[1]} threads "
+          f"({best_throughput[3]['requests_per_s']:.2f} req/s)")
+    print(f"Best single latency: {best_latency[0]} processes x {best_latency[1]} threads "
+          f"({best_latency[2]['p50_ms']:.0f}ms)")
+    print(f"-> ASR_POOL_PROCESSES={best_throughput[0]} ASR_POOL_CPU_THREADS={best_throughput[1]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark for continuous batching of the local LLM.
+
+N concurrent clients (1, 2, 4, 8) each stream replies back to back through
+LocalLLMEngine.stream_response on CPU:
+- per-request: no batcher, every request generates on its own LLM stage
+  worker (the behaviour without batching)
+- batched: models.llm_batcher.LLMBatcher, new requests joining the running
+  decode batch between steps
+
+and reports generated tokens/s across all clients and p50/p95
+time-to-first-token for each.
+
+Usage: python benchmark_llm_batching.py [model_name] [requests_per_client] [max_tokens]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.llm import LocalLLMEngine
+from models.llm_batcher import LLMBatcher
+
+CLIENTS = (1, 2, 4, 8)
+PROMPTS = [
+    "What's a good name for a golden retriever?",
+    "Explain why the sky is blue.",
+    "Give me a quick tip for learning Spanish.",
+    "What should I cook for dinner tonight?",
+    "How do I keep a houseplant alive?",
+    "Tell me a fun fact about octopuses.",
+    "What's the best way to start running?",
+    "Why do cats purr?",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_clients(engine: LocalLLMEngine, clients: int, requests: int, max_tokens: int) -> dict:
+    ttfts: List[float] = []
+    tokens = 0
+
+    async def client(index: int):
+        nonlocal tokens
+        for i in range(requests):
+            prompt = PROMPTS[(index + i) % len(PROMPTS)]
+            start = time.perf_counter()
+            fragments = []
+            async for fragment in engine.stream_response(prompt, max_tokens=max_tokens, temperature=0.0):
+                if not fragments:
+                    ttfts.append((time.perf_counter() - start) * 1000)
+                fragments.append(fragment)
+            tokens += len(engine.tokenizer.encode("".join(fragments)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "ttft_p50_ms": statistics.median(ttfts),
+        "ttft_p95_ms": percentile(ttfts, 0.95),
+        "tokens_per_s": tokens / elapsed,
+    }
+
+
+async def main():
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "Qwen/Qwen2.5-0.5B-Instruct"
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    max_tokens = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    print("=" * 84)
+    print(f"LOCAL LLM BATCHING BENCHMARK ({model_name}, CPU, greedy, {max_tokens} tokens/request)")
+    print("=" * 84)
+
+    load_start = time.time()
+    # Prefix cache off: measure batching alone
+    engine = LocalLLMEngine(model_name=model_name, device="cpu", prefix_cache_entries=0, timeout_s=600.0)
+    engine.initialize()
+    print(f"Model loaded in {time.time() - load_start:.1f}s")
+    await run_clients(engine, 1, 1, 4)  # Warm up
+
+    print(f"{'clients':>8} | {'per-request tok/s':>18} {'TTFT p50':>9} {'TTFT p95':>9} | "
+          f"{'batched tok/s':>14} {'TTFT p50':>9} {'TTFT p95':>9}")
+    batcher = LLMBatcher(engine, max_batch_size=max(CLIENTS))
+    for clients in CLIENTS:
+        engine.batcher = None
+        single = await run_clients(engine, clients, requests, max_tokens)
+        engine.batcher = batcher
+        batched = await run_clients(engine, clients, requests, max_tokens)
+        print(f"{clients:>8} | {single['tokens_per_s']:>18.1f} {single['ttft_p50_ms']:>7.0f}ms {single['ttft_p95_ms']:>7.0f}ms | "
+              f"{batched['tokens_per_s']:>14.1f} {batched['ttft_p50_ms']:>7.0f}ms {batched['ttft_p95_ms']:>7.0f}ms")
+
+    print("-" * 84)
+    stats = batcher.stats()
+    print(f"Batcher: {stats['steps_total']} decode steps, avg batch {stats['avg_batch_size']:.2f}, "
+          f"batch sizes {stats['batch_sizes']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,152 @@
+"""
+Micro-benchmark for SentenceSegmenter.
+
+Compares, per reply:
+- legacy: the previous regex splitter (abbreviation replace loop + re.split),
+  which can only run on the complete text
+- legacy (streamed): re-running the legacy splitter on the growing text after
+  every token, which is what incremental use of it would cost
+- segmenter: SentenceSegmenter on the complete text
+- segmenter (streamed): push() per token + pop(), as the streaming LLM path does
+
+Usage: python benchmark_segmenter.py [iterations]
+"""
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.text_segmenter import SentenceSegmenter
+
+
+REPLIES = {
+    "en": (
+        "Hello! I'm Bruce's digital avatar, and I'm happy to help. Mr. Smith asked about "
+        "Washington D.C. yesterday, so I looked it up. It's the capital of the U.S., "
+        "home to many museums, monuments, and government buildings. Would you like some "
+        "tips for visiting? I'd suggest spring, when the cherry blossoms are out."
+    ),
+    "zh": (
+        "你好！我是布鲁斯的数字化身，很高兴为你服务。昨天史密斯先生问我关于北京的事情，"
+        "所以我查了一下。北京是中国的首都，有很多博物馆、古迹和政府机构。你想要一些旅游建议吗？"
+        "我建议你春天或者秋天去，那时候天气最舒服。"
+    ),
+    "es": (
+        "¡Hola! Soy el avatar digital de Bruce y con gusto te ayudo. La Sra. García preguntó "
+        "ayer por Madrid, así que lo busqué. Es la capital de España, con muchos museos, "
+        "monumentos y edificios históricos. ¿Quieres algunos consejos para visitarla? "
+        "Te recomiendo la primavera o el otoño, cuando el clima es más agradable."
+    ),
+}
+
+
+def legacy_split(text: str) -> List[str]:
+    """Previous splitter (ASCII punctuation only), kept here as the baseline"""
+    abbreviations = {
+        'D.C.': 'DC_TEMP', 'Mr.': 'MR_TEMP', 'Mrs.': 'MRS_TEMP', 'Ms.': 'MS_TEMP',
+        'Dr.': 'DR_TEMP', 'Jr.': 'JR_TEMP', 'Sr.': 'SR_TEMP', 'U.S.': 'US_TEMP',
+        'U.K.': 'UK_TEMP', 'etc.': 'ETC_TEMP', 'vs.': 'VS_TEMP', 'e.g.': 'EG_TEMP',
+        'i.e.': 'IE_TEMP',
+    }
+    protected_text = text
+    replacements = {}
+    for abbr, temp in abbreviations.items():
+        if abbr in protected_text:
+            protected_text = protected_text.replace(abbr, temp)
+            replacements[temp] = abbr
+
+    sentences = re.split(r'([.!?;]+(?:\s+|$))', protected_text)
+    chunks = []
+    for i in range(0, len(sentences) - 1, 2):
+        sentence = sentences[i].strip()
+        punctuation = sentences[i + 1].strip()
+        if sentence:
+            chunk = sentence + punctuation
+            for temp, abbr in replacements.items():
+                chunk = chunk.replace(temp, abbr)
+            chunks.append(chunk)
+    if len(sentences) % 2 == 1 and sentences[-1].strip():
+        remaining = sentences[-1].strip()
+        for temp, abbr in replacements.items():
+            remaining = remaining.replace(temp, abbr)
+        chunks.append(remaining)
+    return [c for c in chunks if len(c.split()) >= 3]
+
+
+def tokens(text: str, size: int = 4) -> List[str]:
+    """Approximate an LLM token stream"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def run_legacy(text: str, language: str) -> List[str]:
+    return legacy_split(text)
+
+
+def run_legacy_streamed(text: str, language: str) -> List[str]:
+    seen = ""
+    chunks: List[str] = []
+    for token in tokens(text):
+        seen += token
+        chunks = legacy_split(seen)
+    return chunks
+
+
+def run_segmenter(text: str, language: str) -> List[str]:
+    return SentenceSegmenter(language=language).segment(text)
+
+
+def run_segmenter_streamed(text: str, language: str) -> List[str]:
+    segmenter = SentenceSegmenter(language=language)
+    chunks: List[str] = []
+    for token in tokens(text):
+        segmenter.push(token)
+        chunks.extend(segmenter.pop())
+    chunks.extend(segmenter.flush())
+    return chunks
+
+
+def bench(fn: Callable[[str, str], List[str]], text: str, language: str, iterations: int) -> Dict:
+    """Time fn over iterations; returns microseconds per reply and chunk count"""
+    chunks = fn(text, language)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(text, language)
+    elapsed = time.perf_counter() - start
+    return {
+        "us_per_reply": elapsed / iterations * 1e6,
+        "num_chunks": len(chunks),
+        "max_chunk_chars": max((len(c) for c in chunks), default=0),
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    variants = [
+        ("legacy", run_legacy),
+        ("legacy (streamed)", run_legacy_streamed),
+        ("segmenter", run_segmenter),
+        ("segmenter (streamed)", run_segmenter_streamed),
+    ]
+
+    print(f"\n{'='*80}")
+    print(f"📊 SENTENCE SEGMENTER BENCHMARK ({iterations} iterations)")
+    print(f"{'='*80}")
+    print(f"{'Lang':<6}{'Variant':<24}{'µs/reply':>12}{'Chunks':>10}{'Max chars':>12}")
+    print("-" * 64)
+
+    for language, text in REPLIES.items():
+        for name, fn in variants:
+            result = bench(fn, text, language, iterations)
+            print(
+                f"{language:<6}{name:<24}{result['us_per_reply']:>12.1f}"
+                f"{result['num_chunks']:>10}{result['max_chunk_chars']:>12}"
+            )
+        print("-" * 64)
+
+
+if __name__ == "__main__":
+    main()
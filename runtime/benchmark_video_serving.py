@@ -0,0 +1,146 @@
+"""
+Benchmark for /api/v1/videos serving.
+
+Starts a uvicorn server in a subprocess with two routes over the same chunk:
+- legacy: the previous StreamingResponse generator (64KB reads, one
+  asyncio.to_thread hop per read)
+- range: utils.video_serving.video_file_response (sendfile when the server
+  offers zero-copy, otherwise mmap slices)
+
+and measures, per variant, throughput for full downloads and the server's CPU
+time per request (utime+stime from /proc, so Linux only). It also shows what
+the old path cannot do: a 64KB Range request and an If-None-Match revalidation.
+
+Usage: python benchmark_video_serving.py [requests] [file_size_mb]
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+
+def build_app(video_path: str):
+    """Server side: both implementations over the same file"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+    from utils.video_serving import video_file_response
+
+    app = FastAPI()
+
+    @app.get("/legacy")
+    async def legacy():
+        file_size = os.path.getsize(video_path)
+
+        async def file_stream():
+            def read_chunk(f, size):
+                return f.read(size)
+
+            with open(video_path, "rb") as f:
+                while True:
+                    chunk = await asyncio.to_thread(read_chunk, f, 65536)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return StreamingResponse(
+            file_stream(),
+            media_type="video/mp4",
+            headers={"Accept-Ranges": "bytes", "Cache-Control": "no-cache", "Content-Length": str(file_size)},
+        )
+
+    @app.get("/range")
+    async def range_(request: Request):
+        return video_file_response(video_path, request.headers, method=request.method)
+
+    return app
+
+
+def serve(video_path: str, port: int):
+    import uvicorn
+    uvicorn.run(build_app(video_path), host="127.0.0.1", port=port, log_level="warning")
+
+
+def server_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_full(client: httpx.Client, url: str, pid: int, requests: int) -> dict:
+    cpu_start = server_cpu_seconds(pid)
+    start = time.perf_counter()
+    total_bytes = 0
+    for _ in range(requests):
+        response = client.get(url)
+        response.raise_for_status()
+        total_bytes += len(response.content)
+    elapsed = time.perf_counter() - start
+    cpu = server_cpu_seconds(pid) - cpu_start
+    return {
+        "mbps": total_bytes * 8 / 1e6 / elapsed,
+        "ms_per_request": elapsed / requests * 1000,
+        "cpu_ms_per_request": cpu / requests * 1000,
+    }
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    size_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0  # ~a 3s chunk is 0.3-2MB
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+        f.write(os.urandom(int(size_mb * 1024 * 1024)))
+        video_path = f.name
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", video_path, str(port)])
+    try:
+        base = f"http://127.0.0.1:{port}"
+        with httpx.Client(timeout=30) as client:
+            for _ in range(100):
+                try:
+                    client.get(f"{base}/range", headers={"Range": "bytes=0-0"})
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+
+            print("=" * 72)
+            print(f"VIDEO SERVING BENCHMARK ({requests} requests, {size_mb:.1f}MB file)")
+            print("=" * 72)
+            print(f"{'variant':<10} {'Mbps':>10} {'ms/req':>10} {'server CPU ms/req':>20}")
+            for name in ("legacy", "range"):
+                bench_full(client, f"{base}/{name}", server.pid, 3)  # Warm up
+                result = bench_full(client, f"{base}/{name}", server.pid, requests)
+                print(f"{name:<10} {result['mbps']:>10.0f} {result['ms_per_request']:>10.2f} {result['cpu_ms_per_request']:>20.2f}")
+
+            print("-" * 72)
+            ranged = client.get(f"{base}/range", headers={"Range": "bytes=0-65535"})
+            print(f"Range 0-65535:   {ranged.status_code}, {len(ranged.content)} bytes "
+                  f"(legacy always sends {os.path.getsize(video_path)})")
+            etag = ranged.headers["etag"]
+            revalidate = client.get(f"{base}/range", headers={"If-None-Match": etag})
+            print(f"If-None-Match:   {revalidate.status_code}, {len(revalidate.content)} bytes")
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(video_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -40,6 +40,9 @@ class Settings(BaseSettings):
     model_cache_dir: str = "/root/.cache"
     xtts_model_path: str = "/root/.cache/tts_models"
     liveportrait_model_path: str = "/root/.cache/liveportrait"
+    # Persisted XTTS speaker latents (voice profiles), so restarts are warm
+    voice_profile_dir: str = os.getenv("VOICE_PROFILE_DIR", "/root/.cache/voice_profiles")
+    voice_profile_cache_size: int = int(os.getenv("VOICE_PROFILE_CACHE_SIZE", "16"))
     
     # Model settings
     xtts_language: Literal["en", "es", "fr", "de", "it", "pt", "pl", "tr", "ru", "nl", "cs", "ar", "zh-cn", "ja", "hu", "ko"] = "en"
@@ -48,18 +51,116 @@ class Settings(BaseSettings):
     # GPU Service settings (for hybrid deployment)
     gpu_service_url: str = os.getenv("GPU_SERVICE_URL", "http://host.docker.internal:8001")
     use_external_gpu_service: bool = os.getenv("USE_EXTERNAL_GPU_SERVICE", "true").lower() == "true"
+    # Use /pipeline/generate for one-shot TTS → avatar (waveform stays in GPU service memory)
+    use_combined_gpu_pipeline: bool = os.getenv("USE_COMBINED_GPU_PIPELINE", "true").lower() == "true"
     
     # Gemini LLM settings (replaces local Qwen)
     use_gemini_llm: bool = os.getenv("USE_GEMINI_LLM", "true").lower() == "true"
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
     gemini_project: str = os.getenv("GEMINI_PROJECT", "realtime-avatar-bg")
     gemini_location: str = os.getenv("GEMINI_LOCATION", "us-central1")
+    # Deadlines per Gemini call: the whole reply, and a stream's first fragment
+    gemini_timeout_s: float = float(os.getenv("GEMINI_TIMEOUT_S", "15"))
+    gemini_first_token_timeout_s: float = float(os.getenv("GEMINI_FIRST_TOKEN_TIMEOUT_S", "5"))
+    
+    # Local LLM (used when Gemini is off or unavailable)
+    local_llm_model: str = os.getenv("LOCAL_LLM_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+    # Recent prompts whose KV cache is kept, so a conversation's next turn
+    # only prefills its new tokens (0 = off)
+    local_llm_prefix_cache_entries: int = int(os.getenv("LOCAL_LLM_PREFIX_CACHE_ENTRIES", "8"))
+    local_llm_timeout_s: float = float(os.getenv("LOCAL_LLM_TIMEOUT_S", "60"))
+    # Continuous batching: concurrent requests decode together, new ones joining
+    # the running batch between steps (off = one generation per LLM stage worker)
+    local_llm_batching: bool = os.getenv("LOCAL_LLM_BATCHING", "true").lower() == "true"
+    local_llm_max_batch_size: int = int(os.getenv("LOCAL_LLM_MAX_BATCH_SIZE", "8"))
+    local_llm_queue_size: int = int(os.getenv("LOCAL_LLM_QUEUE_SIZE", "32"))
+    
+    # LLM routing: providers in order of preference, e.g. "gemini,local" to
+    # hedge Gemini with the local model (empty = gemini or local per USE_GEMINI_LLM)
+    llm_providers: str = os.getenv("LLM_PROVIDERS", "")
+    # Start the next provider if the first hasn't answered (or started streaming) by then
+    llm_hedge_delay_s: float = float(os.getenv("LLM_HEDGE_DELAY_S", "1.5"))
+    # Circuit breaker: this many consecutive failed or slow calls skip a
+    # provider for llm_breaker_reset_s
+    llm_slow_call_s: float = float(os.getenv("LLM_SLOW_CALL_S", "5"))
+    llm_breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+    llm_breaker_reset_s: float = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+    # Response cache for repeated prompts ("hi", "who are you"): "memory" (per
+    # process), "sqlite" (a file shared by every worker on the host) or "off"
+    response_cache_backend: Literal["memory", "sqlite", "off"] = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    response_cache_path: str = os.getenv("RESPONSE_CACHE_PATH", "/tmp/realtime-avatar-cache/responses.sqlite3")
+    response_cache_max_entries: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "4096"))
+    response_cache_ttl_s: float = float(os.getenv("RESPONSE_CACHE_TTL_S", "86400"))
+    # Last N history messages in the key (0 = the same prompt hits regardless of history)
+    response_cache_history_messages: int = int(os.getenv("RESPONSE_CACHE_HISTORY_MESSAGES", "2"))
+    # Replies kept per key for sampled (temperature > 0) calls, served at random
+    # once all are stored (0 = only greedy calls are cached)
+    response_cache_sampled_variants: int = int(os.getenv("RESPONSE_CACHE_SAMPLED_VARIANTS", "3"))
     
     # TTS Backend settings (fish_speech or xtts)
     # Fish Speech: ~5-8x faster, good multilingual, zero-shot cloning
     # XTTS: Original backend, slower but proven stable
     tts_backend: Literal["fish_speech", "xtts"] = os.getenv("TTS_BACKEND", "fish_speech")
     
+    # Streaming pipeline settings
+    # Number of chunks whose TTS may run ahead of the chunk currently being rendered.
+    # 0 disables lookahead (strict TTS → avatar per chunk).
+    tts_lookahead_chunks: int = int(os.getenv("TTS_LOOKAHEAD_CHUNKS", "1"))
+    # Stream LLM tokens and start chunk 0 as soon as its first sentence closes
+    llm_streaming: bool = os.getenv("LLM_STREAMING", "true").lower() == "true"
+    # Also render each chunk as fMP4 fragments (init + ~1s segments) and announce them
+    # with a video_fragments event before rendering, for MSE players
+    fragmented_video: bool = os.getenv("FRAGMENTED_VIDEO", "false").lower() == "true"
+    # How long the fragment endpoint waits for a fragment that isn't written yet
+    fragment_wait_timeout: float = float(os.getenv("FRAGMENT_WAIT_TIMEOUT", "15.0"))
+    
+    # Stage executors: worker threads and wait-queue size per blocking stage.
+    # Calls past the queue size are rejected (503) instead of piling up.
+    # ASR shares one Whisper model, so extra workers mostly add CPU contention.
+    asr_workers: int = int(os.getenv("ASR_WORKERS", "1"))
+    asr_queue_size: int = int(os.getenv("ASR_QUEUE_SIZE", "8"))
+    # Cross-request ASR batching: concurrent transcriptions wait up to
+    # asr_max_wait_ms for others and run as one Whisper batch
+    asr_batching: bool = os.getenv("ASR_BATCHING", "true").lower() == "true"
+    asr_max_batch_size: int = int(os.getenv("ASR_MAX_BATCH_SIZE", "8"))
+    asr_max_wait_ms: float = float(os.getenv("ASR_MAX_WAIT_MS", "10"))
+    # CPU ASR worker pool: N processes, each with its own Whisper model pinned to
+    # its own cores (0 = Whisper runs in the runtime process).
+    # benchmark_asr_pool.py finds the best processes x threads split for a machine.
+    asr_pool_processes: int = int(os.getenv("ASR_POOL_PROCESSES", "0"))
+    asr_pool_cpu_threads: int = int(os.getenv("ASR_POOL_CPU_THREADS", "0"))  # 0 = cores / processes
+    asr_pool_num_workers: int = int(os.getenv("ASR_POOL_NUM_WORKERS", "1"))
+    asr_pool_model_size: str = os.getenv("ASR_POOL_MODEL_SIZE", "base")
+    asr_pool_compute_type: str = os.getenv("ASR_POOL_COMPUTE_TYPE", "int8")
+    asr_pool_pin_cores: bool = os.getenv("ASR_POOL_PIN_CORES", "true").lower() == "true"
+    # Pool requests a worker hasn't answered by then fail (hung or crashed worker)
+    asr_pool_request_timeout_s: float = float(os.getenv("ASR_POOL_REQUEST_TIMEOUT_S", "60"))
+    # Local LLM calls (Gemini is async and runs on the event loop)
+    llm_workers: int = int(os.getenv("LLM_WORKERS", "8"))
+    llm_queue_size: int = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+    # Silero VAD for streaming ASR sessions (~1ms per 100ms of audio)
+    vad_workers: int = int(os.getenv("VAD_WORKERS", "2"))
+    vad_queue_size: int = int(os.getenv("VAD_QUEUE_SIZE", "64"))
+    # Audio decode, reading media files for the WebSocket
+    io_workers: int = int(os.getenv("IO_WORKERS", "4"))
+    io_queue_size: int = int(os.getenv("IO_QUEUE_SIZE", "64"))
+    
+    # Streaming ASR (/ws/asr): a pause this long ends a speech segment and
+    # triggers its final transcript; partials of the open segment at most this often
+    streaming_asr_min_silence_ms: int = int(os.getenv("STREAMING_ASR_MIN_SILENCE_MS", "400"))
+    streaming_asr_partial_interval_ms: int = int(os.getenv("STREAMING_ASR_PARTIAL_INTERVAL_MS", "1000"))
+    
+    # Conversation sessions (session_id instead of resending conversation_history):
+    # context is capped at session_context_tokens, older turns summarized into
+    # up to session_summary_tokens of it. Idle sessions expire after session_ttl_s;
+    # past session_store_max_bytes the least recently used are written to
+    # session_spill_dir (if set) or dropped.
+    session_ttl_s: float = float(os.getenv("SESSION_TTL_S", "1800"))
+    session_store_max_bytes: int = int(os.getenv("SESSION_STORE_MAX_BYTES", str(64 * 1024 ** 2)))
+    session_spill_dir: str = os.getenv("SESSION_SPILL_DIR", "")
+    session_context_tokens: int = int(os.getenv("SESSION_CONTEXT_TOKENS", "1024"))
+    session_summary_tokens: int = int(os.getenv("SESSION_SUMMARY_TOKENS", "256"))
+    
     # Performance settings (adjust based on mode)
     @property
     def video_resolution(self) -> tuple[int, int]:
@@ -80,9 +181,25 @@ class Settings(BaseSettings):
         """Maximum audio duration in seconds"""
         return 30
     
+    @property
+    def llm_provider_order(self) -> list[str]:
+        """LLM providers to route over, in order of preference"""
+        if self.llm_providers.strip():
+            return [name.strip() for name in self.llm_providers.split(",") if name.strip()]
+        return ["gemini"] if self.use_gemini_llm else ["local"]
+    
     # Output settings
     output_dir: str = "/tmp/realtime-avatar-output"
     
+    # Artifact cleanup (janitor): generated files are deleted once unused for
+    # artifact_max_age_s, or least recently used first past artifact_max_bytes.
+    # Files used within artifact_min_age_s are kept. (Stream chunks live on the GPU
+    # service, which holds each job's outputs: ARTIFACT_JOB_HOLD_S there.)
+    artifact_max_bytes: int = int(os.getenv("ARTIFACT_MAX_BYTES", str(2 * 1024 ** 3)))
+    artifact_max_age_s: float = float(os.getenv("ARTIFACT_MAX_AGE_S", "3600"))
+    artifact_min_age_s: float = float(os.getenv("ARTIFACT_MIN_AGE_S", "120"))
+    janitor_interval_s: float = float(os.getenv("JANITOR_INTERVAL_S", "60"))
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
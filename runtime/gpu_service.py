@@ -6,6 +6,7 @@ Runs ML inference tasks on GPU (MPS locally, CUDA remotely)
 Supports:
 - TTS (Fish Speech or XTTS-v2, configurable via TTS_BACKEND env var)
 - Video Generation (SadTalker, LivePortrait, Ditto)
+- Combined TTS → avatar in one call (/pipeline/generate), waveform kept in memory
 - Lip Sync - future
 - Any GPU-accelerated ML task
 
@@ -25,10 +26,16 @@ import sys
 os.environ['PYTORCH_ENABLE_MPS_FALLBACK'] = '1'
 
 import torch
+import asyncio
+import contextlib
 import logging
+import re
+import threading
+import uuid
 from pathlib import Path
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from collections import OrderedDict
 from typing import Optional, Literal
 import uvicorn
 
@@ -50,6 +57,9 @@ else:
     from models.tts import XTTSModel as TTSModel
     logger_msg = "Using XTTS TTS backend (stable, proven)"
 
+from utils.artifacts import partial_path, publish_artifact, scratch_dir
+from utils.janitor import ArtifactJanitor, JanitorRoot
+
 # Conditionally import avatar models based on backend config
 AVATAR_BACKEND = os.getenv("AVATAR_BACKEND", "auto")  # auto, sadtalker, liveportrait, ditto
 
@@ -88,6 +98,70 @@ avatar_model = None  # SadTalker or LivePortrait
 avatar_backend_name = None  # Track which backend is loaded
 # lipsync_model = None  # Future
 
+# Models run in worker threads so the event loop stays free and TTS for one chunk
+# can overlap avatar rendering of another. Each model is still used by one request
+# at a time (neither XTTS nor Ditto is safe for concurrent calls).
+tts_lock = asyncio.Lock()
+avatar_lock = asyncio.Lock()
+
+# Recent TTS waveforms keyed by published WAV path, so /avatar/generate can hand the
+# array to the avatar model instead of re-reading (and re-resampling) the file.
+WAVEFORM_CACHE_SIZE = int(os.getenv("WAVEFORM_CACHE_SIZE", "8"))
+waveform_cache: "OrderedDict[str, tuple]" = OrderedDict()
+# Used from the event loop and from the janitor's sweep thread (on_delete)
+waveform_cache_lock = threading.Lock()
+
+OUTPUT_DIR = Path("/tmp/gpu-service-output")
+FRAGMENTS_DIR = OUTPUT_DIR / "fragments"
+FRAGMENT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+# Artifact cleanup. Outputs are read by the runtime after the response, so
+# anything used within ARTIFACT_MIN_AGE_S is kept regardless of the budget.
+janitor = ArtifactJanitor(
+    "gpu-service",
+    [
+        # tts_*.wav, pipeline_tts_*.wav, avatar_*.mp4, partial files, sadtalker_tmp_* dirs
+        JanitorRoot(str(OUTPUT_DIR), exclude=("fragments", "sadtalker_sources")),
+        # One directory per fragmented chunk
+        JanitorRoot(str(FRAGMENTS_DIR)),
+        # Temp files from workers/Ditto/StyleTTS2: age limit only (some are still in use)
+        JanitorRoot(scratch_dir(), count_toward_budget=False),
+    ],
+    max_bytes=int(os.getenv("ARTIFACT_MAX_BYTES", str(10 * 1024 ** 3))),
+    max_age_s=float(os.getenv("ARTIFACT_MAX_AGE_S", "3600")),
+    min_age_s=float(os.getenv("ARTIFACT_MIN_AGE_S", "300")),
+    interval_s=float(os.getenv("JANITOR_INTERVAL_S", "60")),
+    on_delete=lambda path: forget_waveform(path),
+)
+
+
+# A job's outputs (named <job_id>_...) are kept this long after its latest
+# request, so chunks of a stream still being played aren't reclaimed
+JOB_HOLD_S = float(os.getenv("ARTIFACT_JOB_HOLD_S", "900"))
+
+
+def job_output_name(job_id: Optional[str], name: str) -> str:
+    """
+    Output filename for a request: prefixed with the caller's job id, if any,
+    which is then held out of cleanup for JOB_HOLD_S.
+    """
+    if not job_id:
+        return name
+    if not FRAGMENT_ID_RE.match(job_id):
+        raise ValueError(f"Invalid job_id: {job_id}")
+    janitor.hold(job_id, JOB_HOLD_S)
+    return f"{job_id}_{name}"
+
+
+@contextlib.asynccontextmanager
+async def pinned_path(path: str):
+    """Keep a file out of artifact cleanup while a request uses it"""
+    janitor.pin(path)
+    try:
+        yield
+    finally:
+        janitor.unpin(path)
+
 
 def detect_device() -> str:
     """Auto-detect best available device"""
@@ -103,6 +177,8 @@ class TTSRequest(BaseModel):
     text: str
     language: str = "en"
     speaker_wav: Optional[str] = None
+    voice_id: Optional[str] = None  # Registered voice profile (instead of speaker_wav)
+    job_id: Optional[str] = None  # Caller's job: names the output and holds it (see job_output_name)
 
 
 class TTSResponse(BaseModel):
@@ -110,6 +186,8 @@ class TTSResponse(BaseModel):
     audio_path: Optional[str] = None
     duration_s: Optional[float] = None
     generation_time_ms: Optional[float] = None
+    size_bytes: Optional[int] = None  # Final size of the published file
+    sha256: Optional[str] = None
     error: Optional[str] = None
 
 
@@ -119,15 +197,115 @@ class VideoRequest(BaseModel):
     reference_image: str
     mode: Literal["sadtalker", "liveportrait", "auto"] = "auto"
     enhancer: Optional[str] = None  # 'gfpgan' or None
+    # Also write fMP4 fragments to OUTPUT_DIR/fragments/<fragment_id>/ while rendering
+    fragment_id: Optional[str] = None
+    job_id: Optional[str] = None  # Caller's job: names the output and holds it (see job_output_name)
 
 
 class VideoResponse(BaseModel):
     success: bool
     video_path: Optional[str] = None
     backend: Optional[str] = None  # Which backend was used
+    fragment_id: Optional[str] = None  # Set if fragments were written
+    size_bytes: Optional[int] = None  # Final size of the published file
+    sha256: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PipelineRequest(BaseModel):
+    text: str
+    language: str = "en"
+    speaker_wav: Optional[str] = None
+    voice_id: Optional[str] = None  # Registered voice profile (instead of speaker_wav)
+    reference_image: str
+    enhancer: Optional[str] = None
+    job_id: Optional[str] = None  # Caller's job: names the outputs and holds them (see job_output_name)
+
+
+class PipelineResponse(BaseModel):
+    success: bool
+    audio_path: Optional[str] = None
+    video_path: Optional[str] = None
+    backend: Optional[str] = None
+    duration_s: Optional[float] = None
+    tts_time_ms: Optional[float] = None
+    avatar_time_ms: Optional[float] = None
+    size_bytes: Optional[int] = None  # Final size of the published video
+    sha256: Optional[str] = None
+    error: Optional[str] = None
+
+
+class VoiceRegisterRequest(BaseModel):
+    speaker_wav: str
+    voice_id: Optional[str] = None  # Defaults to the file name
+
+
+class VoiceRegisterResponse(BaseModel):
+    success: bool
+    voice_id: Optional[str] = None
+    content_hash: Optional[str] = None
+    registration_time_ms: Optional[float] = None
     error: Optional[str] = None
 
 
+def remember_waveform(audio_path: str, wav, sample_rate: int):
+    """Keep a synthesized waveform for the avatar request that follows"""
+    with waveform_cache_lock:
+        waveform_cache[audio_path] = (wav, sample_rate)
+        waveform_cache.move_to_end(audio_path)
+        while len(waveform_cache) > WAVEFORM_CACHE_SIZE:
+            waveform_cache.popitem(last=False)
+
+
+def take_waveform(audio_path: str) -> Optional[tuple]:
+    """Pop the cached (waveform, sample_rate) for an audio path, if any"""
+    with waveform_cache_lock:
+        return waveform_cache.pop(audio_path, None)
+
+
+def forget_waveform(audio_path: str):
+    """Drop a cached waveform whose file was deleted (janitor thread)"""
+    with waveform_cache_lock:
+        waveform_cache.pop(audio_path, None)
+
+
+def write_waveform(wav, sample_rate: int, audio_path: str) -> dict:
+    """Write a waveform as WAV (for muxing/debugging) and publish it atomically"""
+    import soundfile as sf
+    
+    tmp_path = partial_path(audio_path)
+    sf.write(tmp_path, wav, sample_rate)
+    return publish_artifact(tmp_path, audio_path)
+
+
+def avatar_fragment_kwargs(fragment_id: Optional[str]) -> dict:
+    """
+    Extra generate_video() kwargs to write fMP4 fragments, if requested and supported.
+    
+    The fragment directory is created before rendering starts so the runtime can
+    watch it as soon as it announces the fragment_id to the client.
+    """
+    if not fragment_id:
+        return {}
+    if not FRAGMENT_ID_RE.match(fragment_id):
+        raise ValueError(f"Invalid fragment_id: {fragment_id}")
+    if not getattr(avatar_model, "accepts_fragments", False):
+        logger.warning(f"Backend {avatar_backend_name} can't write fragments; ignoring fragment_id")
+        return {}
+    fragment_dir = FRAGMENTS_DIR / fragment_id
+    fragment_dir.mkdir(parents=True, exist_ok=True)
+    return {"fragment_dir": str(fragment_dir)}
+
+
+def avatar_audio_kwargs(audio_path: str) -> dict:
+    """Extra generate_video() kwargs to pass a cached waveform, if the backend takes one"""
+    cached = take_waveform(audio_path)
+    if cached is None or not getattr(avatar_model, "accepts_audio_array", False):
+        return {}
+    wav, sample_rate = cached
+    return {"audio_array": wav, "audio_sample_rate": sample_rate}
+
+
 def select_avatar_backend(device: str, preference: str = "auto") -> str:
     """
     Select optimal avatar backend based on device and preference
@@ -156,6 +334,8 @@ async def startup():
     """Initialize models with GPU acceleration"""
     global tts_model, avatar_model, avatar_backend_name
     
+    janitor.start()
+    
     device = detect_device()
     logger.info(f"🚀 GPU Service starting on device: {device}")
     
@@ -233,10 +413,25 @@ async def health():
             "avatar": avatar_model.is_ready() if avatar_model else False,
             "avatar_backend": avatar_backend_name,
             "lipsync": False
+        },
+        "caches": {
+            "avatar_registration": avatar_model.registration_cache.stats() if hasattr(avatar_model, "registration_cache") else None,
+            "voice_profiles": tts_model.voice_profiles.stats() if getattr(tts_model, "voice_profiles", None) else None
         }
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Artifact storage and cache metrics"""
+    return {
+        "janitor": janitor.stats(),
+        "waveform_cache": {"entries": len(waveform_cache), "max_entries": WAVEFORM_CACHE_SIZE},
+        "avatar_registration": avatar_model.registration_cache.stats() if hasattr(avatar_model, "registration_cache") else None,
+        "voice_profiles": tts_model.voice_profiles.stats() if getattr(tts_model, "voice_profiles", None) else None
+    }
+
+
 @app.post("/tts/generate", response_model=TTSResponse)
 async def generate_tts(request: TTSRequest):
     """Generate audio from text using TTS"""
@@ -250,19 +445,38 @@ async def generate_tts(request: TTSRequest):
         logger.info(f"TTS request: '{request.text[:50]}...' (language: {request.language})")
         
         # Generate output path in shared directory
-        output_dir = Path("/tmp/gpu-service-output")
-        output_dir.mkdir(exist_ok=True, parents=True)
+        OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
         
-        timestamp = int(time.time() * 1000)
-        audio_path = output_dir / f"tts_{timestamp}.wav"
+        # Unique per request: requests run concurrently, and the waveform cache is keyed by path
+        audio_path = OUTPUT_DIR / job_output_name(request.job_id, f"tts_{uuid.uuid4().hex}.wav")
         
-        # Generate audio using TTS model
-        output_path, _, audio_duration = tts_model.synthesize(
-            text=request.text,
-            language=request.language,
-            speaker_wav=request.speaker_wav,
-            output_path=str(audio_path)
-        )
+        # Generate audio using TTS model (off the event loop).
+        # Written under a temp name and renamed into place once complete.
+        if request.voice_id and not hasattr(tts_model, "voice_profiles"):
+            raise ValueError(f"voice_id is not supported by the {tts_backend_name} backend")
+        
+        if hasattr(tts_model, "synthesize_array"):
+            async with tts_lock:
+                wav, sample_rate, _ = await asyncio.to_thread(
+                    tts_model.synthesize_array,
+                    text=request.text,
+                    language=request.language,
+                    speaker_wav=request.speaker_wav,
+                    voice_id=request.voice_id
+                )
+            artifact = await asyncio.to_thread(write_waveform, wav, sample_rate, str(audio_path))
+            remember_waveform(artifact["path"], wav, sample_rate)
+            audio_duration = len(wav) / sample_rate
+        else:
+            async with tts_lock:
+                output_path, _, audio_duration = await asyncio.to_thread(
+                    tts_model.synthesize,
+                    text=request.text,
+                    language=request.language,
+                    speaker_wav=request.speaker_wav,
+                    output_path=partial_path(str(audio_path))
+                )
+            artifact = await asyncio.to_thread(publish_artifact, str(output_path), str(audio_path))
         
         generation_time = (time.time() - start_time) * 1000  # ms
         
@@ -270,9 +484,11 @@ async def generate_tts(request: TTSRequest):
         
         return TTSResponse(
             success=True,
-            audio_path=str(output_path),
+            audio_path=artifact["path"],
             duration_s=audio_duration,
-            generation_time_ms=generation_time
+            generation_time_ms=generation_time,
+            size_bytes=artifact["size_bytes"],
+            sha256=artifact["sha256"]
         )
         
     except Exception as e:
@@ -280,6 +496,48 @@ async def generate_tts(request: TTSRequest):
         return TTSResponse(success=False, error=str(e))
 
 
+@app.post("/voices/register", response_model=VoiceRegisterResponse)
+async def register_voice(request: VoiceRegisterRequest):
+    """Compute and persist speaker latents for a reference audio file under a voice_id"""
+    if not tts_model or not tts_model.is_ready():
+        raise HTTPException(status_code=503, detail="TTS model not ready")
+    if not hasattr(tts_model, "register_voice"):
+        raise HTTPException(status_code=501, detail=f"Voice profiles not supported by the {tts_backend_name} backend")
+    
+    import time
+    start_time = time.time()
+    
+    try:
+        async with tts_lock:
+            profile = await asyncio.to_thread(
+                tts_model.register_voice,
+                request.speaker_wav,
+                voice_id=request.voice_id
+            )
+        registration_time = (time.time() - start_time) * 1000
+        
+        logger.info(f"✅ Voice '{profile['voice_id']}' registered in {registration_time:.0f}ms")
+        
+        return VoiceRegisterResponse(
+            success=True,
+            voice_id=profile["voice_id"],
+            content_hash=profile["content_hash"],
+            registration_time_ms=registration_time
+        )
+        
+    except Exception as e:
+        logger.error(f"Voice registration failed: {e}", exc_info=True)
+        return VoiceRegisterResponse(success=False, error=str(e))
+
+
+@app.get("/voices")
+async def list_voices():
+    """List registered voice profiles"""
+    if not getattr(tts_model, "voice_profiles", None):
+        return {"voices": []}
+    return {"voices": tts_model.voice_profiles.list_profiles()}
+
+
 @app.post("/avatar/generate", response_model=VideoResponse)
 async def generate_avatar(request: VideoRequest):
     """Generate talking head video from audio + reference image"""
@@ -290,27 +548,39 @@ async def generate_avatar(request: VideoRequest):
         logger.info(f"Avatar request: audio={request.audio_path}, image={request.reference_image}, backend={avatar_backend_name}")
         
         # Generate output path
-        output_dir = Path("/tmp/gpu-service-output")
-        output_dir.mkdir(exist_ok=True, parents=True)
+        OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
         
-        import time
-        timestamp = int(time.time() * 1000)
-        output_path = output_dir / f"avatar_{avatar_backend_name}_{timestamp}.mp4"
+        output_path = OUTPUT_DIR / job_output_name(request.job_id, f"avatar_{avatar_backend_name}_{uuid.uuid4().hex}.mp4")
         
-        # Generate video using selected backend (SadTalker or LivePortrait)
-        video_path, generation_time = avatar_model.generate_video(
-            audio_path=request.audio_path,
-            reference_image_path=request.reference_image,
-            output_path=str(output_path),
-            enhancer=request.enhancer
-        )
+        # Reuse the waveform if it came from /tts/generate on this service
+        audio_kwargs = avatar_audio_kwargs(request.audio_path)
+        fragment_kwargs = avatar_fragment_kwargs(request.fragment_id)
         
-        logger.info(f"✅ Avatar video generated in {generation_time:.0f}ms using {avatar_backend_name}")
+        # Generate video using selected backend (off the event loop).
+        # Written under a temp name and renamed into place once complete, so the
+        # response itself is the readiness signal for the runtime.
+        # The input audio may be older than the janitor's grace period by now
+        async with pinned_path(request.audio_path), avatar_lock:
+            video_path, generation_time = await asyncio.to_thread(
+                avatar_model.generate_video,
+                audio_path=request.audio_path,
+                reference_image_path=request.reference_image,
+                output_path=partial_path(str(output_path)),
+                enhancer=request.enhancer,
+                **audio_kwargs,
+                **fragment_kwargs
+            )
+        artifact = await asyncio.to_thread(publish_artifact, video_path, str(output_path))
+        
+        logger.info(f"✅ Avatar video generated in {generation_time:.0f}ms using {avatar_backend_name} ({artifact['size_bytes']} bytes)")
         
         return VideoResponse(
             success=True,
-            video_path=video_path,
-            backend=avatar_backend_name
+            video_path=artifact["path"],
+            backend=avatar_backend_name,
+            fragment_id=request.fragment_id if fragment_kwargs else None,
+            size_bytes=artifact["size_bytes"],
+            sha256=artifact["sha256"]
         )
         
     except Exception as e:
@@ -318,6 +588,100 @@ async def generate_avatar(request: VideoRequest):
         return VideoResponse(success=False, error=str(e))
 
 
+@app.post("/pipeline/generate", response_model=PipelineResponse)
+async def generate_pipeline(request: PipelineRequest):
+    """
+    Text → speech → talking head video in one call.
+    
+    The TTS waveform stays in memory and goes straight to the avatar model
+    (resampled once for its audio encoder). The WAV is still written, but only
+    for muxing the audio track and for debugging.
+    """
+    if not tts_model or not tts_model.is_ready():
+        raise HTTPException(status_code=503, detail="TTS model not ready")
+    if not avatar_model or not avatar_model.is_ready():
+        raise HTTPException(status_code=503, detail="Avatar model not ready")
+    
+    import time
+    start_time = time.time()
+    
+    try:
+        logger.info(f"Pipeline request: '{request.text[:50]}...' (language: {request.language}, backend={avatar_backend_name})")
+        
+        OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
+        # Unique per request (requests run concurrently)
+        name = uuid.uuid4().hex
+        audio_path = OUTPUT_DIR / job_output_name(request.job_id, f"pipeline_tts_{name}.wav")
+        output_path = OUTPUT_DIR / job_output_name(request.job_id, f"avatar_{avatar_backend_name}_{name}.mp4")
+        
+        # Step 1: TTS, kept in memory
+        tts_start = time.time()
+        if request.voice_id and not hasattr(tts_model, "voice_profiles"):
+            raise ValueError(f"voice_id is not supported by the {tts_backend_name} backend")
+        
+        if hasattr(tts_model, "synthesize_array"):
+            async with tts_lock:
+                wav, sample_rate, _ = await asyncio.to_thread(
+                    tts_model.synthesize_array,
+                    text=request.text,
+                    language=request.language,
+                    speaker_wav=request.speaker_wav,
+                    voice_id=request.voice_id
+                )
+            audio_artifact = await asyncio.to_thread(write_waveform, wav, sample_rate, str(audio_path))
+            audio_kwargs = {}
+            if getattr(avatar_model, "accepts_audio_array", False):
+                audio_kwargs = {"audio_array": wav, "audio_sample_rate": sample_rate}
+            audio_duration = len(wav) / sample_rate
+        else:
+            # Backend without in-memory output (e.g. Fish Speech): go through the file
+            async with tts_lock:
+                tts_output, _, audio_duration = await asyncio.to_thread(
+                    tts_model.synthesize,
+                    text=request.text,
+                    language=request.language,
+                    speaker_wav=request.speaker_wav,
+                    output_path=partial_path(str(audio_path))
+                )
+            audio_artifact = await asyncio.to_thread(publish_artifact, str(tts_output), str(audio_path))
+            audio_kwargs = {}
+        tts_time_ms = (time.time() - tts_start) * 1000
+        logger.info(f"[PERF] Pipeline TTS: {tts_time_ms:.0f}ms for {audio_duration:.2f}s audio (in_memory={bool(audio_kwargs)})")
+        
+        # Step 2: Avatar video from the same waveform
+        avatar_start = time.time()
+        async with avatar_lock:
+            video_path, _ = await asyncio.to_thread(
+                avatar_model.generate_video,
+                audio_path=audio_artifact["path"],
+                reference_image_path=request.reference_image,
+                output_path=partial_path(str(output_path)),
+                enhancer=request.enhancer,
+                **audio_kwargs
+            )
+        artifact = await asyncio.to_thread(publish_artifact, video_path, str(output_path))
+        avatar_time_ms = (time.time() - avatar_start) * 1000
+        
+        total_time_ms = (time.time() - start_time) * 1000
+        logger.info(f"✅ Pipeline complete in {total_time_ms:.0f}ms (tts={tts_time_ms:.0f}ms, avatar={avatar_time_ms:.0f}ms)")
+        
+        return PipelineResponse(
+            success=True,
+            audio_path=audio_artifact["path"],
+            video_path=artifact["path"],
+            backend=avatar_backend_name,
+            duration_s=audio_duration,
+            tts_time_ms=tts_time_ms,
+            avatar_time_ms=avatar_time_ms,
+            size_bytes=artifact["size_bytes"],
+            sha256=artifact["sha256"]
+        )
+        
+    except Exception as e:
+        logger.error(f"Pipeline generation failed: {e}", exc_info=True)
+        return PipelineResponse(success=False, error=str(e))
+
+
 @app.get("/")
 async def root():
     """Service info"""
@@ -329,7 +693,10 @@ async def root():
         "endpoints": {
             "health": "/health",
             "tts": "/tts/generate",
-            "avatar": "/avatar/generate"
+            "avatar": "/avatar/generate",
+            "pipeline": "/pipeline/generate",
+            "voices": "/voices",
+            "register_voice": "/voices/register"
         }
     }
 
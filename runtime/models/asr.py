@@ -9,13 +9,17 @@ import logging
 import os
 import time
 from pathlib import Path
-from typing import Optional, List, Tuple, Iterator
-import tempfile
+from typing import Optional, List, Tuple, Iterator, Union
 
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Anti-hallucination thresholds, shared by _transcribe and transcribe_batch
+NO_SPEECH_THRESHOLD = 0.6  # Filter low-confidence segments
+LOG_PROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4  # Catch repetitive text
+
 
 class ASRModel:
     """
@@ -42,11 +46,14 @@ class ASRModel:
         self._initialized = False
         self.model = None
         self.vad_model = None
+        self.vad_threshold = 0.5
         
     def initialize(self, 
                    model_size: str = "base",
                    use_vad: bool = True,
-                   vad_threshold: float = 0.5):
+                   vad_threshold: float = 0.5,
+                   cpu_threads: int = 0,
+                   num_workers: int = 1):
         """
         Initialize Faster-Whisper model and optional VAD.
         
@@ -59,6 +66,8 @@ class ASRModel:
                        - large-v3: best quality (~3GB, newest)
             use_vad: Enable Voice Activity Detection for filtering
             vad_threshold: VAD sensitivity (0-1, lower = more sensitive)
+            cpu_threads: CTranslate2 threads per transcription on CPU (0 = default)
+            num_workers: Transcriptions the model can run at once from different threads
         """
         if self._initialized:
             return
@@ -74,6 +83,8 @@ class ASRModel:
                 model_size,
                 device=self.device,
                 compute_type=self.compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers,
                 download_root="./checkpoints/faster-whisper"
             )
             
@@ -90,30 +101,36 @@ class ASRModel:
             raise
     
     def _initialize_vad(self, threshold: float = 0.5):
-        """Initialize Silero VAD for voice activity detection"""
-        try:
-            import torch
-            
-            logger.info("Loading Silero VAD model...")
-            self.vad_model, utils = torch.hub.load(
-                repo_or_dir='snakers4/silero-vad',
-                model='silero_vad',
-                force_reload=False,
-                onnx=False
-            )
-            
-            (self.get_speech_timestamps,
-             self.save_audio,
-             self.read_audio,
-             self.VADIterator,
-             self.collect_chunks) = utils
-            
-            self.vad_threshold = threshold
-            logger.info("VAD initialized")
-            
-        except Exception as e:
-            logger.warning(f"VAD initialization failed: {e}. Continuing without VAD.")
-            self.vad_model = None
+        """
+        Initialize Silero VAD (bundled ONNX model, see utils.vad).
+        
+        Raises if the model can't be loaded: use_vad=False is the way to run
+        without VAD, not a model that silently fails on every request.
+        """
+        from utils.vad import get_vad
+        
+        self.vad_model = get_vad()
+        self.vad_threshold = threshold
+        logger.info("VAD initialized")
+    
+    def create_vad_iterator(self, threshold: Optional[float] = None, min_silence_ms: int = 400, speech_pad_ms: int = 100):
+        """
+        Streaming endpointer for one session. The ONNX session is shared;
+        each iterator carries its own recurrent state.
+        
+        Returns:
+            utils.vad.VADIterator, or None if VAD isn't available
+        """
+        if self.vad_model is None:
+            return None
+        from utils.vad import VADIterator
+        return VADIterator(
+            self.vad_model,
+            threshold=threshold if threshold is not None else self.vad_threshold,
+            sampling_rate=16000,
+            min_silence_duration_ms=min_silence_ms,
+            speech_pad_ms=speech_pad_ms
+        )
     
     def is_ready(self) -> bool:
         """Check if model is initialized"""
@@ -147,31 +164,125 @@ class ASRModel:
         if not self._initialized:
             raise RuntimeError("Model not initialized. Call initialize() first.")
         
+        from faster_whisper.audio import decode_audio
+        
+        # Decode once; VAD and Whisper both work on the samples from here
+        decode_start = time.perf_counter()
+        audio = decode_audio(audio_path, sampling_rate=16000)
+        decode_ms = (time.perf_counter() - decode_start) * 1000
+        
+        transcription, metadata = self.transcribe_array(
+            audio,
+            language=language,
+            task=task,
+            beam_size=beam_size,
+            best_of=best_of,
+            temperature=temperature,
+            vad_filter=vad_filter
+        )
+        metadata["timings"]["decode_ms"] = decode_ms
+        return transcription, metadata
+    
+    def transcribe_array(
+        self,
+        audio: np.ndarray,
+        language: Optional[str] = None,
+        task: str = "transcribe",
+        beam_size: int = 5,
+        best_of: int = 5,
+        temperature: float = 0.0,
+        vad_filter: bool = True
+    ) -> Tuple[str, dict]:
+        """
+        Transcribe audio already in memory (no temp files).
+        
+        Args:
+            audio: 16kHz mono float32 samples (see utils.audio.decode_audio_bytes)
+            language: Source language code (None = auto-detect)
+            task: "transcribe" or "translate" (to English)
+            beam_size: Beam search size (1-10, higher = more accurate but slower)
+            best_of: Number of candidates (1-10)
+            temperature: Sampling temperature (0.0 = greedy, >0 = sampling)
+            vad_filter: Apply VAD filtering if available
+            
+        Returns:
+            Tuple of (transcription text, metadata dict)
+        """
+        if not self._initialized:
+            raise RuntimeError("Model not initialized. Call initialize() first.")
+        
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        
+        # One VAD pass: Whisper decodes only the speech regions it finds
+        # (clip_timestamps) instead of running its own VAD over the audio again
+        clips: Union[str, List[float]] = "0"
+        vad_ms = 0.0
+        if vad_filter and self.vad_model is not None:
+            vad_start = time.perf_counter()
+            clips = self._speech_clips(audio)
+            vad_ms = (time.perf_counter() - vad_start) * 1000
+        
+        transcription, metadata = self._transcribe(
+            audio,
+            language=language,
+            task=task,
+            beam_size=beam_size,
+            best_of=best_of,
+            temperature=temperature,
+            clip_timestamps=clips
+        )
+        metadata["timings"] = {"decode_ms": 0.0, "vad_ms": vad_ms, "asr_ms": metadata["transcription_time"] * 1000}
+        logger.info(
+            f"[PERF] ASR {len(audio) / 16000:.1f}s audio: vad {vad_ms:.0f}ms, "
+            f"asr {metadata['timings']['asr_ms']:.0f}ms ({len(clips) // 2 if isinstance(clips, list) else 1} clips)"
+        )
+        return transcription, metadata
+    
+    def _speech_clips(self, audio: np.ndarray) -> Union[str, List[float]]:
+        """Speech regions as clip_timestamps, or "0" (whole clip) if VAD finds none"""
+        from utils.vad import clip_timestamps
+        
+        timestamps = self.vad_model.get_speech_timestamps(audio, threshold=self.vad_threshold)
+        if not timestamps:
+            logger.warning("No speech detected by VAD")
+            return "0"
+        logger.debug(f"VAD: {len(timestamps)} speech segments")
+        return clip_timestamps(timestamps)
+    
+    def _transcribe(
+        self,
+        audio: np.ndarray,
+        language: Optional[str],
+        task: str,
+        beam_size: int,
+        best_of: int,
+        temperature: float,
+        clip_timestamps: Union[str, List[float]] = "0"
+    ) -> Tuple[str, dict]:
+        """Run Whisper on 16kHz samples (only within clip_timestamps, in seconds)"""
         start_time = time.time()
         
         # Log language parameter for debugging
         logger.info(f"ASR transcribe called: language={language}, task={task}")
         
         try:
-            # Apply VAD if enabled
-            if vad_filter and self.vad_model is not None:
-                audio_path = self._apply_vad(audio_path)
-            
             # Transcribe with anti-hallucination settings
             # - condition_on_previous_text=False prevents repetition loops
             # - no_speech_threshold helps filter silence
             # - compression_ratio_threshold catches repetitive hallucinations
             segments, info = self.model.transcribe(
-                audio_path,
+                audio,
                 language=language,
                 task=task,
                 beam_size=beam_size,
                 best_of=best_of,
                 temperature=temperature,
-                vad_filter=vad_filter and self.vad_model is not None,
+                vad_filter=False,  # VAD already ran (see transcribe_array)
+                clip_timestamps=clip_timestamps,
                 condition_on_previous_text=False,  # Prevents repetition hallucinations
-                no_speech_threshold=0.6,  # Filter low-confidence segments
-                compression_ratio_threshold=2.4,  # Catch repetitive text
+                no_speech_threshold=NO_SPEECH_THRESHOLD,
+                log_prob_threshold=LOG_PROB_THRESHOLD,
+                compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
             )
             
             # Log detected language vs requested
@@ -213,39 +324,224 @@ class ASRModel:
             logger.error(f"Transcription failed: {e}")
             raise
     
-    def _apply_vad(self, audio_path: str) -> str:
-        """Apply VAD filtering to remove silence"""
-        try:
-            import torch
-            
-            # Read audio
-            wav = self.read_audio(audio_path, sampling_rate=16000)
+    def transcribe_batch(
+        self,
+        audios: List[np.ndarray],
+        languages: List[Optional[str]],
+        task: str = "transcribe",
+        beam_size: int = 5,
+        vad_filter: bool = True
+    ) -> List[Tuple[str, dict]]:
+        """
+        Transcribe several independent clips in one encoder/decoder pass.
+        
+        Each clip must fit Whisper's 30s window. Clips are encoded as one
+        batch and decoded with one CTranslate2 generate() call, each with its
+        own prompt, so clips in different languages share the batch. Clips
+        without a language are detected from the same encoder output.
+        
+        The decode is the one _transcribe() runs for a clip's first window:
+        same features, prompt, suppressed tokens and thresholds, and the same
+        segment split and no-speech rule, so a clip gets the transcript
+        transcribe_array() would give it. A clip whose decode would make
+        _transcribe() fall back or read a second window (too repetitive, too
+        improbable, or an unfinished last segment) is re-run through
+        transcribe_array() on its own.
+        
+        Args:
+            audios: 16kHz mono float32 clips, up to 30s each
+            languages: Source language per clip (None = auto-detect)
+            task: "transcribe" or "translate" (to English)
+            beam_size: Beam search size, shared by the batch
+            vad_filter: Silence each clip outside its speech regions first, if VAD is available
+        
+        Returns:
+            (transcription text, metadata dict) per clip, in input order
+        """
+        if not self._initialized:
+            raise RuntimeError("Model not initialized. Call initialize() first.")
+        
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import get_compression_ratio, get_ctranslate2_storage
+        
+        start_time = time.time()
+        extractor = self.model.feature_extractor
+        whisper = self.model.model
+        
+        clips = []
+        vad_ms = []
+        for audio in audios:
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+            vad_start = time.perf_counter()
+            if vad_filter and self.vad_model is not None:
+                audio = self._mask_non_speech(audio)
+            vad_ms.append((time.perf_counter() - vad_start) * 1000)
+            if len(audio) > extractor.n_samples:
+                raise ValueError(f"Clip is {len(audio) / 16000:.1f}s; batched transcription takes up to 30s")
+            clips.append(audio)
+        
+        asr_start = time.perf_counter()
+        # Each clip's first window as WhisperModel.transcribe() frames it: the
+        # language-detection window (mel of the clip plus 30s of padding) when
+        # the language is unknown, since that encoder output is reused for
+        # decoding; otherwise the clip's frames, zero-padded to 30s
+        windows = []
+        segment_frames = []
+        for audio, language in zip(clips, languages):
+            features = extractor(audio)
+            content_frames = min(features.shape[-1] - extractor.nb_max_frames, extractor.nb_max_frames)
+            if language is None and whisper.is_multilingual:
+                windows.append(features[:, :extractor.nb_max_frames])
+            else:
+                windows.append(pad_or_trim(features[:, :content_frames], extractor.nb_max_frames))
+            segment_frames.append(content_frames)
+        # Straight to CTranslate2: WhisperModel.encode() adds a batch axis of
+        # its own, which turns a (B, 80, 3000) batch into a rejected 4-D input.
+        # Same multi-GPU rule as encode(): keep the output on the CPU when the
+        # decoder might run on another device
+        to_cpu = whisper.device == "cuda" and len(whisper.device_index) > 1
+        encoder_output = whisper.encode(get_ctranslate2_storage(np.stack(windows)), to_cpu=to_cpu)
+        
+        requested = list(languages)
+        languages = list(languages)
+        language_probs = [1.0] * len(clips)
+        if not whisper.is_multilingual:
+            languages = ["en"] * len(clips)
+        elif any(language is None for language in languages):
+            detected = whisper.detect_language(encoder_output)
+            for i, candidates in enumerate(detected):
+                if languages[i] is None:
+                    token, prob = candidates[0]
+                    languages[i] = token[2:-2]  # "<|en|>" -> "en"
+                    language_probs[i] = prob
+        
+        tokenizers = {}
+        prompts = []
+        for language in languages:
+            if language not in tokenizers:
+                tokenizers[language] = Tokenizer(
+                    self.model.hf_tokenizer, whisper.is_multilingual, task=task, language=language
+                )
+            prompts.append(self.model.get_prompt(tokenizers[language], [], without_timestamps=False))
+        
+        results = whisper.generate(
+            encoder_output,
+            prompts,
+            beam_size=beam_size,
+            max_length=self.model.max_length,
+            return_scores=True,
+            return_no_speech_prob=True,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+            max_initial_timestamp_index=int(round(1.0 / self.model.time_precision)),
+        )
+        
+        elapsed = time.time() - start_time
+        asr_ms = (time.perf_counter() - asr_start) * 1000
+        outputs = []
+        for i, result in enumerate(results):
+            tokenizer = tokenizers[languages[i]]
+            tokens = result.sequences_ids[0]
+            avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+            segments = self._split_segments(tokens, tokenizer, segment_frames[i])
             
-            # Get speech timestamps
-            speech_timestamps = self.get_speech_timestamps(
-                wav,
-                self.vad_model,
-                threshold=self.vad_threshold,
-                sampling_rate=16000
+            # faster-whisper's rules: silence is skipped; otherwise a
+            # repetitive or improbable decode, or one that stops short of the
+            # clip's end, would be retried or continued by _transcribe()
+            silence = result.no_speech_prob > NO_SPEECH_THRESHOLD and not avg_logprob > LOG_PROB_THRESHOLD
+            fallback = (
+                get_compression_ratio(tokenizer.decode(tokens).strip()) > COMPRESSION_RATIO_THRESHOLD
+                or avg_logprob < LOG_PROB_THRESHOLD
             )
+            if silence:
+                segments = []
+            elif fallback or segments is None:
+                logger.debug(f"Batched decode of clip {i} differs from a single decode; re-running it alone")
+                text, metadata = self.transcribe_array(
+                    audios[i], language=requested[i], task=task, beam_size=beam_size, vad_filter=vad_filter
+                )
+                metadata["batch_size"] = len(clips)
+                outputs.append((text, metadata))
+                continue
             
-            if not speech_timestamps:
-                logger.warning("No speech detected by VAD")
-                return audio_path
-            
-            # Collect speech chunks
-            speech_audio = self.collect_chunks(speech_timestamps, wav)
-            
-            # Save filtered audio
-            output_path = tempfile.mktemp(suffix=".wav")
-            self.save_audio(output_path, speech_audio, sampling_rate=16000)
-            
-            logger.debug(f"VAD filtered: {len(speech_timestamps)} speech segments")
-            return output_path
-            
-        except Exception as e:
-            logger.warning(f"VAD filtering failed: {e}. Using original audio.")
-            return audio_path
+            for segment in segments:
+                segment["confidence"] = avg_logprob
+            text = " ".join(segment["text"] for segment in segments).strip()
+            outputs.append((text, {
+                "language": languages[i],
+                "language_probability": language_probs[i],
+                "duration": len(clips[i]) / 16000,
+                "transcription_time": elapsed,
+                "batch_size": len(clips),
+                "timings": {"decode_ms": 0.0, "vad_ms": vad_ms[i], "asr_ms": asr_ms},
+                "segments": segments,
+            }))
+        
+        logger.info(f"Transcribed batch of {len(clips)} in {elapsed:.2f}s")
+        return outputs
+    
+    def _split_segments(self, tokens: List[int], tokenizer, segment_frames: int) -> Optional[List[dict]]:
+        """
+        Split a timestamped decode of one window into segments the way
+        faster-whisper does, or None if it ends on an unfinished segment that
+        _transcribe() would continue in a second window.
+        """
+        timestamp_begin = tokenizer.timestamp_begin
+        precision = self.model.time_precision
+        single_timestamp_ending = len(tokens) >= 2 and tokens[-2] < timestamp_begin <= tokens[-1]
+        consecutive = [
+            i for i in range(1, len(tokens))
+            if tokens[i] >= timestamp_begin and tokens[i - 1] >= timestamp_begin
+        ]
+        
+        spans = []
+        if consecutive:
+            if not single_timestamp_ending:
+                last_timestamp = tokens[consecutive[-1] - 1] - timestamp_begin
+                if last_timestamp * self.model.input_stride < segment_frames:
+                    return None
+            slices = consecutive + ([len(tokens)] if single_timestamp_ending else [])
+            last_slice = 0
+            for current_slice in slices:
+                sliced = tokens[last_slice:current_slice]
+                spans.append((
+                    (sliced[0] - timestamp_begin) * precision,
+                    (sliced[-1] - timestamp_begin) * precision,
+                    sliced,
+                ))
+                last_slice = current_slice
+        else:
+            end = segment_frames * self.model.feature_extractor.time_per_frame
+            timestamps = [token for token in tokens if token >= timestamp_begin]
+            if timestamps and timestamps[-1] != timestamp_begin:
+                end = (timestamps[-1] - timestamp_begin) * precision
+            spans.append((0.0, end, tokens))
+        
+        segments = []
+        for start, end, sliced in spans:
+            text = tokenizer.decode(sliced)
+            if start == end or not text.strip():
+                continue
+            segments.append({"start": start, "end": end, "text": text})
+        return segments
+    
+    def _mask_non_speech(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Zero the samples outside the speech regions _speech_clips() would give
+        Whisper, keeping the clip's timeline: the batched counterpart of
+        clip_timestamps, which a batched decode can't take per clip. Separate
+        utterances stay apart instead of being stitched together.
+        """
+        clips = self._speech_clips(audio)
+        if not isinstance(clips, list):
+            return audio
+        
+        masked = np.zeros_like(audio)
+        for start_s, end_s in zip(clips[::2], clips[1::2]):
+            start, end = int(start_s * 16000), int(end_s * 16000)
+            masked[start:end] = audio[start:end]
+        return masked
     
     def detect_language(self, audio_path: str) -> Tuple[str, float]:
         """
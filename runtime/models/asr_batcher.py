@@ -0,0 +1,248 @@
+"""
+Cross-request ASR batching
+Concurrent transcription requests (several users finishing a sentence at
+once) are collected for a few ms and run through Whisper as one batch, then
+each caller gets its own result back
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from models.asr import ASRModel
+from models.asr_pool import ASRWorkerPool, get_asr_pool
+from utils.audio import ASR_SAMPLE_RATE
+from utils.stage_executor import get_stage_executor
+
+logger = logging.getLogger(__name__)
+
+# Whisper's window; longer clips take the per-request path
+MAX_BATCH_CLIP_S = 30.0
+
+
+@dataclass
+class _Request:
+    audio: np.ndarray
+    language: Optional[str]
+    task: str
+    beam_size: int
+    vad_filter: bool
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def batch_key(self) -> Tuple[str, int, bool]:
+        # Language is a per-clip prompt token; everything else is shared by a batch
+        return (self.task, self.beam_size, self.vad_filter)
+
+
+class ASRBatcher:
+    """
+    Collects transcription requests for up to max_wait_ms (or until
+    max_batch_size are waiting) and runs them with ASRModel.transcribe_batch
+    on the ASR stage. While all ASR workers are busy, requests keep joining
+    the next batch instead of queueing one by one behind the current one.
+
+    A request that arrives to an idle model waits at most max_wait_ms extra.
+    Clips over 30s, and batches of one, go through transcribe_array as before.
+    With a worker pool, each batch goes to the least-loaded worker process.
+
+    Usage:
+        batcher = get_asr_batcher(asr_model)
+        text, metadata = await batcher.transcribe(audio, language="en")
+    """
+
+    def __init__(
+        self,
+        asr_model: ASRModel,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_concurrent_batches: int = 1,
+        pool: Optional[ASRWorkerPool] = None,
+    ):
+        """
+        Initialize batcher.
+
+        Args:
+            asr_model: Initialized ASR model
+            max_batch_size: Most clips decoded together
+            max_wait_ms: Longest a request waits for others to join its batch
+            max_concurrent_batches: Batches in flight at once (the ASR stage's workers)
+            pool: Run batches on this worker pool instead of the in-process model
+        """
+        self.asr_model = asr_model
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self._slots = asyncio.Semaphore(max_concurrent_batches)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+        self.batches_total = 0
+        self.requests_total = 0
+        self.batch_sizes: Counter = Counter()
+
+    async def transcribe(
+        self,
+        audio: np.ndarray,
+        language: Optional[str] = None,
+        task: str = "transcribe",
+        beam_size: int = 5,
+        vad_filter: bool = True,
+    ) -> Tuple[str, dict]:
+        """
+        Transcribe 16kHz mono float32 audio, batched with concurrent callers.
+
+        Returns:
+            Tuple of (transcription text, metadata dict), as transcribe_array
+        """
+        if len(audio) > MAX_BATCH_CLIP_S * ASR_SAMPLE_RATE:
+            if self.pool is not None:
+                return await self.pool.transcribe(audio, language, task, beam_size, vad_filter)
+            return await get_stage_executor("asr").run(
+                self.asr_model.transcribe_array,
+                audio, language=language, task=task, beam_size=beam_size, vad_filter=vad_filter,
+            )
+
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._collect())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Request(audio, language, task, beam_size, vad_filter, future))
+        return await future
+
+    async def _collect(self):
+        """
+        Form batches: the first request opens a window that closes when the
+        batch is full or max_wait_ms passes. If every ASR worker is still busy
+        then, keep topping the batch up until one frees.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[Tuple, List[_Request]] = {}
+            for request in batch:
+                groups.setdefault(request.batch_key, []).append(request)
+            while groups:
+                key = next(iter(groups))
+                group = groups.pop(key)
+                await self._slots.acquire()
+                while len(group) < self.max_batch_size and not self._queue.empty():
+                    request = self._queue.get_nowait()
+                    if request.batch_key == key:
+                        group.append(request)
+                    else:
+                        groups.setdefault(request.batch_key, []).append(request)
+                task = asyncio.create_task(self._run(group))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _run(self, group: List[_Request]):
+        try:
+            await self._run_batch([request for request in group if not request.future.cancelled()])
+        finally:
+            self._slots.release()
+
+    async def _run_batch(self, group: List[_Request]):
+        if not group:
+            return
+        self.batches_total += 1
+        self.requests_total += len(group)
+        self.batch_sizes[len(group)] += 1
+        first = group[0]
+        waited_ms = (time.perf_counter() - min(r.enqueued_at for r in group)) * 1000
+
+        try:
+            if self.pool is not None:
+                results = await self.pool.transcribe_batch(
+                    [r.audio for r in group],
+                    [r.language for r in group],
+                    task=first.task,
+                    beam_size=first.beam_size,
+                    vad_filter=first.vad_filter,
+                )
+            elif len(group) == 1:
+                results = [await get_stage_executor("asr").run(
+                    self.asr_model.transcribe_array,
+                    first.audio, language=first.language, task=first.task,
+                    beam_size=first.beam_size, vad_filter=first.vad_filter,
+                )]
+            else:
+                results = await get_stage_executor("asr").run(
+                    self.asr_model.transcribe_batch,
+                    [r.audio for r in group],
+                    [r.language for r in group],
+                    task=first.task,
+                    beam_size=first.beam_size,
+                    vad_filter=first.vad_filter,
+                )
+        except Exception as e:
+            for request in group:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        if len(group) > 1:
+            logger.info(f"[PERF] ASR batch of {len(group)} (oldest waited {waited_ms:.0f}ms to batch)")
+        for request, result in zip(group, results):
+            if not request.future.done():
+                request.future.set_result(result)
+
+    def stats(self) -> dict:
+        """Metrics: batches formed and their sizes"""
+        return {
+            "batches_total": self.batches_total,
+            "requests_total": self.requests_total,
+            "avg_batch_size": self.requests_total / self.batches_total if self.batches_total else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000,
+        }
+
+
+# One batcher per loaded Whisper model
+_batchers: Dict[int, ASRBatcher] = {}
+
+
+def get_asr_batcher(asr_model: ASRModel) -> ASRBatcher:
+    """
+    Get or create the batcher for an ASR model (sizes from settings).
+
+    Every in-memory transcription goes through here: with ASR_BATCHING off
+    batches are just one request with no wait, and with an ASR worker pool
+    (ASR_POOL_PROCESSES) batches run in the pool instead of asr_model.
+    """
+    batcher = _batchers.get(id(asr_model))
+    if batcher is None:
+        from config import settings
+        pool = get_asr_pool()
+        batcher = ASRBatcher(
+            asr_model,
+            max_batch_size=settings.asr_max_batch_size if settings.asr_batching else 1,
+            max_wait_ms=settings.asr_max_wait_ms if settings.asr_batching else 0.0,
+            max_concurrent_batches=pool.capacity if pool is not None else settings.asr_workers,
+            pool=pool,
+        )
+        _batchers[id(asr_model)] = batcher
+    return batcher
+
+
+def asr_batcher_stats() -> List[dict]:
+    """Stats for every batcher created so far"""
+    return [batcher.stats() for batcher in _batchers.values()]
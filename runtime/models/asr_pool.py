@@ -0,0 +1,466 @@
+"""
+ASR worker pool
+Faster-Whisper in N worker processes, each with its own CTranslate2 model,
+thread count and CPU cores, so transcriptions run in parallel instead of
+queueing behind the one model in the runtime process
+
+Audio goes to workers through shared memory (only a name and clip lengths
+are pickled) and each request goes to the least-loaded worker.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> List[int]:
+    """CPU cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_core_groups(processes: int, cpu_threads: int, cores: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """
+    Give each worker its own contiguous block of cpu_threads cores
+    (wrapping around if processes x threads exceeds the cores available).
+    """
+    cores = list(cores) if cores is not None else available_cores()
+    return [
+        [cores[(i * cpu_threads + j) % len(cores)] for j in range(cpu_threads)]
+        for i in range(processes)
+    ]
+
+
+def _worker_main(
+    worker_id: int,
+    cores: List[int],
+    model_size: str,
+    compute_type: str,
+    cpu_threads: int,
+    num_workers: int,
+    requests: mp.Queue,
+    results: mp.Queue,
+):
+    """Worker process: load a model, then serve requests on num_workers threads"""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    from models.asr import ASRModel
+
+    asr = ASRModel(device="cpu", compute_type=compute_type)
+    asr.initialize(model_size=model_size, cpu_threads=cpu_threads, num_workers=num_workers)
+    results.put((worker_id, None, True, os.getpid()))
+
+    def serve():
+        while True:
+            item = requests.get()
+            if item is None:
+                return
+            request_id, shm_name, lengths, languages, task, beam_size, vad_filter = item
+            try:
+                shm = shared_memory.SharedMemory(name=shm_name)
+                try:
+                    samples = np.ndarray((sum(lengths),), dtype=np.float32, buffer=shm.buf)
+                    offsets = np.cumsum([0] + list(lengths))
+                    clips = [samples[offsets[i]:offsets[i + 1]].copy() for i in range(len(lengths))]
+                    del samples
+                finally:
+                    shm.close()
+
+                if len(clips) == 1:
+                    output = [asr.transcribe_array(
+                        clips[0], language=languages[0], task=task,
+                        beam_size=beam_size, best_of=beam_size, vad_filter=vad_filter,
+                    )]
+                else:
+                    output = asr.transcribe_batch(
+                        clips, languages, task=task, beam_size=beam_size, vad_filter=vad_filter
+                    )
+                results.put((worker_id, request_id, True, output))
+            except Exception as e:
+                results.put((worker_id, request_id, False, f"{type(e).__name__}: {e}"))
+
+    threads = [threading.Thread(target=serve, daemon=True) for _ in range(num_workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@dataclass
+class _Worker:
+    worker_id: int
+    cores: List[int]
+    requests: mp.Queue
+    process: Optional[mp.Process] = None
+    pid: Optional[int] = None
+    ready: threading.Event = field(default_factory=threading.Event)
+    in_flight: int = 0
+    completed: int = 0
+    failed: int = 0
+    restarts: int = 0
+    spawned_at: float = 0.0
+
+
+@dataclass
+class _Pending:
+    future: Future
+    worker: _Worker
+    shm: shared_memory.SharedMemory
+    submitted_at: float
+
+
+class ASRWorkerPool:
+    """
+    N Faster-Whisper worker processes on CPU.
+
+    Each worker is pinned to its own cpu_threads cores and runs up to
+    num_workers transcriptions at once. Requests go to the worker with the
+    fewest in flight; a worker that dies is restarted and its in-flight
+    requests fail.
+
+    Usage:
+        pool = ASRWorkerPool(processes=4, cpu_threads=2)
+        pool.start()
+        text, metadata = await pool.transcribe(audio, language="en")
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        model_size: str = "base",
+        compute_type: str = "int8",
+        pin_cores: bool = True,
+        request_timeout_s: float = 60.0,
+    ):
+        """
+        Initialize pool (processes start in start()).
+
+        Args:
+            processes: Worker processes, each with its own model
+            cpu_threads: CTranslate2 threads per worker (0 = cores / processes)
+            num_workers: Concurrent transcriptions per worker
+            model_size: Whisper model size
+            compute_type: CTranslate2 precision ("int8" is fastest on CPU)
+            pin_cores: Pin each worker to its own block of cores (Linux)
+            request_timeout_s: Fail requests a worker hasn't answered by then
+        """
+        cores = available_cores()
+        self.processes = processes
+        self.cpu_threads = cpu_threads or max(1, len(cores) // processes)
+        self.num_workers = num_workers
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.request_timeout_s = request_timeout_s
+
+        groups = plan_core_groups(processes, self.cpu_threads, cores) if pin_cores else [[] for _ in range(processes)]
+        if pin_cores and processes * self.cpu_threads > len(cores):
+            logger.warning(
+                f"[ASR] {processes} workers x {self.cpu_threads} threads > {len(cores)} cores; workers will share cores"
+            )
+
+        self._ctx = mp.get_context("spawn")
+        self._results: mp.Queue = self._ctx.Queue()
+        self._workers = [_Worker(i, groups[i], self._ctx.Queue()) for i in range(processes)]
+        self._pending: Dict[int, _Pending] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._reader: Optional[threading.Thread] = None
+        self._stopping = False
+        self._started = False
+        self._latency_ms: List[float] = []
+
+    @property
+    def capacity(self) -> int:
+        """Transcriptions the pool runs at once"""
+        return self.processes * self.num_workers
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, timeout: float = 600.0):
+        """Spawn the workers and wait until every model is loaded"""
+        start = time.time()
+        for worker in self._workers:
+            self._spawn(worker)
+        self._reader = threading.Thread(target=self._read_results, name="asr-pool-results", daemon=True)
+        self._reader.start()
+        for worker in self._workers:
+            while not worker.ready.wait(1.0):
+                if worker.process.exitcode is not None:
+                    self.stop()
+                    raise RuntimeError(f"ASR worker {worker.worker_id} exited with {worker.process.exitcode} while loading")
+                if time.time() - start > timeout:
+                    self.stop()
+                    raise TimeoutError(f"ASR worker {worker.worker_id} didn't load its model in {timeout:.0f}s")
+        self._started = True
+        logger.info(
+            f"[ASR] Worker pool ready in {time.time() - start:.1f}s: {self.processes} processes x "
+            f"{self.cpu_threads} threads, {self.num_workers} concurrent each ({self.model_size}, {self.compute_type})"
+        )
+
+    def _spawn(self, worker: _Worker):
+        worker.ready.clear()
+        worker.spawned_at = time.monotonic()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                worker.worker_id, worker.cores, self.model_size, self.compute_type,
+                self.cpu_threads, self.num_workers, worker.requests, self._results,
+            ),
+            name=f"asr-worker-{worker.worker_id}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the workers; requests still in flight fail"""
+        self._stopping = True
+        for worker in self._workers:
+            for _ in range(self.num_workers):
+                worker.requests.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        with self._lock:
+            pending = list(self._pending.items())
+            self._pending.clear()
+        for _, entry in pending:
+            self._finish(entry, False, "ASR worker pool stopped")
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def submit(
+        self,
+        clips: List[np.ndarray],
+        languages: List[Optional[str]],
+        task: str = "transcribe",
+        beam_size: int = 5,
+        vad_filter: bool = True,
+    ) -> Future:
+        """
+        Send clips to the least-loaded worker (one clip = transcribe_array,
+        several = one transcribe_batch).
+
+        Returns:
+            Future resolving to a list of (text, metadata), one per clip
+        """
+        clips = [np.ascontiguousarray(clip, dtype=np.float32) for clip in clips]
+        lengths = [len(clip) for clip in clips]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(lengths) * 4))
+        samples = np.ndarray((sum(lengths),), dtype=np.float32, buffer=shm.buf)
+        offset = 0
+        for clip in clips:
+            samples[offset:offset + len(clip)] = clip
+            offset += len(clip)
+        del samples
+
+        future: Future = Future()
+        with self._lock:
+            worker = min(
+                (w for w in self._workers if w.ready.is_set()),
+                key=lambda w: (w.in_flight, w.worker_id),
+                default=None,
+            ) or min(self._workers, key=lambda w: (w.in_flight, w.worker_id))
+            request_id = next(self._ids)
+            worker.in_flight += 1
+            self._pending[request_id] = _Pending(future, worker, shm, time.perf_counter())
+        worker.requests.put((request_id, shm.name, lengths, list(languages), task, beam_size, vad_filter))
+        return future
+
+    async def transcribe_batch(
+        self,
+        clips: List[np.ndarray],
+        languages: List[Optional[str]],
+        task: str = "transcribe",
+        beam_size: int = 5,
+        vad_filter: bool = True,
+    ) -> List[Tuple[str, dict]]:
+        """Transcribe clips on one worker (see submit)"""
+        return await asyncio.wrap_future(self.submit(clips, languages, task, beam_size, vad_filter))
+
+    async def transcribe(
+        self,
+        audio: np.ndarray,
+        language: Optional[str] = None,
+        task: str = "transcribe",
+        beam_size: int = 5,
+        vad_filter: bool = True,
+    ) -> Tuple[str, dict]:
+        """Transcribe 16kHz mono float32 audio on the least-loaded worker"""
+        results = await self.transcribe_batch([audio], [language], task, beam_size, vad_filter)
+        return results[0]
+
+    # ------------------------------------------------------------------
+    # Results (reader thread)
+    # ------------------------------------------------------------------
+
+    def _read_results(self):
+        last_check = time.monotonic()
+        while not self._stopping:
+            try:
+                # Liveness and deadlines are checked on a timer, not only when
+                # the queue goes idle (it never does while other workers answer)
+                if time.monotonic() - last_check >= 1.0:
+                    last_check = time.monotonic()
+                    self._check_workers()
+                    self._expire_requests()
+                try:
+                    worker_id, request_id, ok, payload = self._results.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                except (EOFError, OSError):
+                    return
+
+                worker = self._workers[worker_id]
+                if request_id is None:
+                    worker.pid = payload
+                    worker.ready.set()
+                    continue
+                with self._lock:
+                    entry = self._pending.pop(request_id, None)
+                if entry is not None:
+                    self._finish(entry, ok, payload)
+            except Exception as e:
+                # One bad message must not stop result delivery for everyone
+                logger.error(f"[ASR] Worker pool result reader error: {e}", exc_info=True)
+
+    def _finish(self, entry: _Pending, ok: bool, payload, error_type: type = RuntimeError):
+        entry.shm.close()
+        try:
+            entry.shm.unlink()
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            entry.worker.in_flight -= 1
+            if ok:
+                entry.worker.completed += 1
+                self._latency_ms.append((time.perf_counter() - entry.submitted_at) * 1000)
+                del self._latency_ms[:-512]
+            else:
+                entry.worker.failed += 1
+        # The caller may cancel the future at any moment (client gone)
+        try:
+            if ok:
+                entry.future.set_result(payload)
+            else:
+                entry.future.set_exception(error_type(f"ASR worker {entry.worker.worker_id} failed: {payload}"))
+        except InvalidStateError:
+            pass
+
+    def _check_workers(self):
+        """Restart workers that died (also while loading); fail what they had in flight"""
+        for worker in self._workers:
+            if self._stopping or not self._started or worker.process is None or worker.process.is_alive():
+                continue
+            # Stop routing requests to it, and fail what it had, right away
+            worker.ready.clear()
+            with self._lock:
+                lost = [(rid, e) for rid, e in self._pending.items() if e.worker is worker]
+                for rid, _ in lost:
+                    del self._pending[rid]
+            for _, entry in lost:
+                self._finish(entry, False, "worker process died")
+            if time.monotonic() - worker.spawned_at < 5.0:
+                continue  # Crashed straight after (re)spawning: back off before the next try
+            logger.error(f"[ASR] Worker {worker.worker_id} (pid {worker.pid}) exited with {worker.process.exitcode}; restarting")
+            worker.restarts += 1
+            self._spawn(worker)
+
+    def _expire_requests(self):
+        """Fail requests past request_timeout_s (a hung or overloaded worker)"""
+        now = time.perf_counter()
+        with self._lock:
+            expired = [
+                (rid, e) for rid, e in self._pending.items()
+                if now - e.submitted_at > self.request_timeout_s
+            ]
+            for rid, _ in expired:
+                del self._pending[rid]
+        for _, entry in expired:
+            logger.error(f"[ASR] Request to worker {entry.worker.worker_id} timed out after {self.request_timeout_s:.0f}s")
+            self._finish(entry, False, f"no result in {self.request_timeout_s:.0f}s", TimeoutError)
+
+    def stats(self) -> dict:
+        """Metrics: per-worker load and pool latency"""
+        with self._lock:
+            latencies = sorted(self._latency_ms)
+            return {
+                "processes": self.processes,
+                "cpu_threads": self.cpu_threads,
+                "num_workers": self.num_workers,
+                "in_flight": sum(w.in_flight for w in self._workers),
+                "latency_ms_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+                "latency_ms_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+                "workers": [
+                    {
+                        "worker_id": w.worker_id,
+                        "pid": w.pid,
+                        "cores": w.cores,
+                        "ready": w.ready.is_set(),
+                        "in_flight": w.in_flight,
+                        "completed": w.completed,
+                        "failed": w.failed,
+                        "restarts": w.restarts,
+                    }
+                    for w in self._workers
+                ],
+            }
+
+
+# Global pool (None when ASR runs in the runtime process)
+_asr_pool: Optional[ASRWorkerPool] = None
+
+
+def get_asr_pool() -> Optional[ASRWorkerPool]:
+    """Get the ASR worker pool, starting it on first call if ASR_POOL_PROCESSES > 0"""
+    global _asr_pool
+    if _asr_pool is None:
+        from config import settings
+        if settings.asr_pool_processes <= 0:
+            return None
+        pool = ASRWorkerPool(
+            processes=settings.asr_pool_processes,
+            cpu_threads=settings.asr_pool_cpu_threads,
+            num_workers=settings.asr_pool_num_workers,
+            model_size=settings.asr_pool_model_size,
+            compute_type=settings.asr_pool_compute_type,
+            pin_cores=settings.asr_pool_pin_cores,
+            request_timeout_s=settings.asr_pool_request_timeout_s,
+        )
+        pool.start()
+        _asr_pool = pool
+    return _asr_pool
+
+
+def asr_pool_stats() -> Optional[dict]:
+    """Stats for the global pool, if it's running"""
+    return _asr_pool.stats() if _asr_pool is not None else None
+
+
+def stop_asr_pool():
+    """Stop the global pool (on app shutdown)"""
+    global _asr_pool
+    if _asr_pool is not None:
+        _asr_pool.stop()
+        _asr_pool = None
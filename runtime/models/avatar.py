@@ -54,8 +54,10 @@ class LivePortraitModel:
         audio_path: str,
         reference_image_path: str,
         output_path: Optional[str] = None,
-        enhancer: Optional[str] = None
-    ) -> tuple[str, float]:
+        enhancer: Optional[str] = None,
+        fragment_id: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> tuple[str, float, dict]:
         """
         Generate animated talking-head video from audio and reference image.
         
@@ -64,9 +66,12 @@ class LivePortraitModel:
             reference_image_path: Path to reference image
             output_path: Output video file path
             enhancer: Face enhancer to use ('gfpgan' or None)
+            fragment_id: Also write fMP4 fragments under this id while rendering
+            job_id: Job the video belongs to (names it and holds it on the GPU service)
             
         Returns:
-            Tuple of (output_path, duration_ms)
+            Tuple of (output_path, duration_ms, artifact) where artifact holds
+            the published 'size_bytes', 'sha256' and 'fragment_id'
         """
         if not self.is_ready():
             self.initialize()
@@ -85,22 +90,60 @@ class LivePortraitModel:
             logger.info(f"Animating avatar: audio={audio_path}, image={reference_image_path}")
             
             # Call GPU service to generate video
-            video_path, _ = await self.client.generate_video(
+            video_path, _, artifact = await self.client.generate_video(
                 audio_path=audio_path,
                 reference_image_path=reference_image_path,
                 output_path=output_path,
-                enhancer=enhancer
+                enhancer=enhancer,
+                fragment_id=fragment_id,
+                job_id=job_id
             )
             
             duration_ms = (time.time() - start_time) * 1000
             logger.info(f"Avatar animation completed in {duration_ms:.0f}ms")
             
-            return video_path, duration_ms
+            return video_path, duration_ms, artifact
             
         except Exception as e:
             logger.error(f"Avatar animation failed: {e}", exc_info=True)
             raise
     
+    async def speak(
+        self,
+        text: str,
+        reference_image_path: str,
+        language: str = "en",
+        speaker_wav: Optional[str] = None,
+        enhancer: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> dict:
+        """
+        Synthesize speech and animate the avatar in a single GPU service call.
+        
+        Args:
+            text: Text to speak
+            reference_image_path: Path to reference image
+            language: Language code (en, zh-cn, es)
+            speaker_wav: Path to reference speaker audio (None = default sample)
+            enhancer: Face enhancer to use ('gfpgan' or None)
+            job_id: Job the outputs belong to (names them and holds them on the GPU service)
+            
+        Returns:
+            Dict with audio_path, video_path, duration_s, tts_time_ms,
+            avatar_time_ms, size_bytes and sha256
+        """
+        if not self.is_ready():
+            self.initialize()
+        
+        return await self.client.generate_from_text(
+            text=text,
+            reference_image_path=reference_image_path,
+            language=language,
+            speaker_wav=speaker_wav,
+            enhancer=enhancer,
+            job_id=job_id
+        )
+    
     def cleanup(self):
         """Cleanup client resources"""
         if self.client:
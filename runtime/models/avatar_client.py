@@ -58,19 +58,30 @@ class AvatarClient:
         audio_path: str,
         reference_image_path: str,
         output_path: Optional[str] = None,
-        enhancer: Optional[str] = None
-    ) -> tuple[str, float]:
+        enhancer: Optional[str] = None,
+        fragment_id: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> tuple[str, float, dict]:
         """
         Generate talking head video from audio and reference image.
         
+        The GPU service publishes the video atomically before responding, so the
+        returned path is complete once this returns.
+        
         Args:
             audio_path: Path to audio file (WAV)
             reference_image_path: Path to reference face image
             output_path: Output video file path (optional)
             enhancer: Face enhancer to use ('gfpgan' or None)
+            fragment_id: Also have the GPU service write fMP4 fragments under
+                this id while rendering (see /api/v1/fragments)
+            job_id: Job the output belongs to; the GPU service names the file after it
+                and keeps the job's outputs out of cleanup while it's in use
             
         Returns:
-            Tuple of (video_path, generation_time_ms)
+            Tuple of (video_path, generation_time_ms, artifact) where artifact
+            holds the published 'size_bytes', 'sha256' and 'fragment_id'
+            (None if the backend did not write fragments)
         """
         if not self.is_ready():
             self.initialize()
@@ -95,7 +106,9 @@ class AvatarClient:
                 "audio_path": audio_path,
                 "reference_image": reference_image_path,
                 "mode": "sadtalker",
-                "enhancer": enhancer
+                "enhancer": enhancer,
+                "fragment_id": fragment_id,
+                "job_id": job_id
             }
             
             response = await self._client.post(
@@ -117,11 +130,17 @@ class AvatarClient:
             output_path = remote_video_path
             logger.info(f"Using video path from GPU service: {output_path}")
             
+            artifact = {
+                "size_bytes": result.get("size_bytes"),
+                "sha256": result.get("sha256"),
+                "fragment_id": result.get("fragment_id"),
+            }
+            
             total_time_ms = (time.time() - start_time) * 1000
             
-            logger.info(f"Avatar video generated in {total_time_ms:.0f}ms")
+            logger.info(f"Avatar video generated in {total_time_ms:.0f}ms ({artifact['size_bytes']} bytes)")
             
-            return output_path, total_time_ms
+            return output_path, total_time_ms, artifact
             
         except httpx.HTTPError as e:
             logger.error(f"GPU service request failed: {e}")
@@ -130,6 +149,77 @@ class AvatarClient:
             logger.error(f"Avatar generation failed: {e}", exc_info=True)
             raise
     
+    async def generate_from_text(
+        self,
+        text: str,
+        reference_image_path: str,
+        language: str = "en",
+        speaker_wav: Optional[str] = None,
+        enhancer: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> dict:
+        """
+        Generate speech and talking head video in one GPU service call.
+        
+        Uses /pipeline/generate, which passes the TTS waveform to the avatar
+        model in memory instead of round-tripping through a WAV file.
+        
+        Args:
+            text: Text to speak
+            reference_image_path: Path to reference face image
+            language: Language code (en, zh-cn, es)
+            speaker_wav: Path to reference speaker audio (None = default sample)
+            enhancer: Face enhancer to use ('gfpgan' or None)
+            job_id: Job the output belongs to; the GPU service names the file after it
+                and keeps the job's outputs out of cleanup while it's in use
+            
+        Returns:
+            GPU service response (audio_path, video_path, duration_s,
+            tts_time_ms, avatar_time_ms, size_bytes, sha256)
+        """
+        if not self.is_ready():
+            self.initialize()
+        
+        start_time = time.time()
+        
+        try:
+            logger.info(f"Requesting combined TTS+avatar: lang={language}, text_len={len(text)}, image={reference_image_path}")
+            
+            payload = {
+                "text": text,
+                "language": language,
+                "speaker_wav": speaker_wav,
+                "reference_image": reference_image_path,
+                "enhancer": enhancer,
+                "job_id": job_id
+            }
+            
+            response = await self._client.post(
+                f"{self.service_url}/pipeline/generate",
+                json=payload,
+            )
+            response.raise_for_status()
+            
+            result = response.json()
+            
+            if not result.get("success"):
+                raise RuntimeError(f"Pipeline generation failed: {result.get('error')}")
+            
+            total_time_ms = (time.time() - start_time) * 1000
+            logger.info(
+                f"Combined TTS+avatar in {total_time_ms:.0f}ms "
+                f"(tts={result.get('tts_time_ms', 0):.0f}ms, avatar={result.get('avatar_time_ms', 0):.0f}ms)"
+            )
+            
+            return result
+            
+        except httpx.HTTPError as e:
+            logger.error(f"GPU service request failed: {e}")
+            raise RuntimeError(f"Failed to communicate with GPU service") from e
+        except Exception as e:
+            logger.error(f"Combined generation failed: {e}", exc_info=True)
+            raise
+    
     async def cleanup(self):
         """Cleanup async client"""
         await self._client.aclose()
@@ -10,10 +10,22 @@ from pathlib import Path
 from typing import Optional, Tuple
 import tempfile
 
+import numpy as np
 import torch
 
+from utils.artifacts import scratch_dir
+from utils.audio import resample_audio_poly
+from utils.registration_cache import RegistrationCache
+from utils.ffmpeg_writer import FFmpegPipeWriter, FragmentedMP4Writer
+
 logger = logging.getLogger(__name__)
 
+# Pipe frames into one ffmpeg process while rendering (set to false for the old
+# write-then-re-encode path)
+STREAM_ENCODE = os.getenv("DITTO_STREAM_ENCODE", "true").lower() == "true"
+# Target fMP4 fragment duration when fragments are requested
+FRAGMENT_SECONDS = float(os.getenv("FRAGMENT_SECONDS", "1.0"))
+
 
 class DittoModel:
     """
@@ -21,12 +33,19 @@ class DittoModel:
     Uses StreamSDK from ditto-talkinghead for video generation.
     """
     
+    # generate_video() can take the TTS waveform directly (no WAV re-read)
+    accepts_audio_array = True
+    # generate_video() can also write fMP4 fragments while rendering
+    accepts_fragments = True
+    
     def __init__(self, device: str = "cuda"):
         self.device = device
         self._initialized = False
         self.sdk = None
         self.data_root = None
         self.cfg_pkl = None
+        # Prepared source state per (reference image, crop params)
+        self.registration_cache = RegistrationCache("ditto")
         
     def initialize(self, data_root: Optional[str] = None, cfg_pkl: Optional[str] = None, use_tensorrt: bool = True):
         """
@@ -92,6 +111,7 @@ class DittoModel:
             print(f"[DITTO DEBUG] About to call StreamSDK(cfg_pkl={cfg_pkl}, data_root={data_root})", flush=True)
             self.sdk = StreamSDK(cfg_pkl, data_root)
             print(f"[DITTO DEBUG] StreamSDK initialized successfully", flush=True)
+            self._wrap_avatar_registrar()
             
             self._initialized = True
             elapsed = time.time() - start_time
@@ -101,6 +121,88 @@ class DittoModel:
             logger.error(f"Failed to initialize Ditto: {e}")
             raise
     
+    def _wrap_avatar_registrar(self):
+        """
+        Route StreamSDK.setup()'s avatar registration through the cache.
+        
+        setup() runs face detection, cropping and source feature extraction
+        for the reference image on every call; with the same image each chunk,
+        that work is identical, so repeat chunks reuse the registered source.
+        """
+        registrar = getattr(self.sdk, "avatar_registrar", None)
+        if registrar is None:
+            logger.warning("StreamSDK has no avatar_registrar; registration cache disabled")
+            return
+        
+        def cached_registrar(source_path, **kwargs):
+            source_info = self.registration_cache.get_or_create(
+                source_path,
+                lambda: registrar(source_path, **kwargs),
+                **kwargs
+            )
+            # setup() reassigns keys (e.g. smoothed x_s_info_lst); keep the cached dict intact
+            return dict(source_info)
+        
+        self.sdk.avatar_registrar = cached_registrar
+    
+    def _attach_pipe_writer(
+        self,
+        output_path: str,
+        audio_path: str,
+        fragment_dir: Optional[str] = None
+    ) -> FFmpegPipeWriter:
+        """Replace the writer StreamSDK.setup() created with an ffmpeg pipe"""
+        sdk_writer = getattr(self.sdk, "writer", None)
+        if sdk_writer is not None:
+            # Nothing has been written yet; drop the temp file it opened
+            try:
+                sdk_writer.close()
+            except Exception as e:
+                logger.debug(f"Closing SDK writer failed: {e}")
+        tmp_video = getattr(self.sdk, "tmp_output_path", None)
+        if tmp_video and os.path.exists(tmp_video):
+            os.remove(tmp_video)
+        
+        if fragment_dir:
+            writer = FragmentedMP4Writer(
+                output_path,
+                fragment_dir=fragment_dir,
+                segment_seconds=FRAGMENT_SECONDS,
+                audio_path=audio_path,
+                input_fps=25,
+                output_fps=18
+            )
+        else:
+            writer = FFmpegPipeWriter(output_path, audio_path=audio_path, input_fps=25, output_fps=18)
+        self.sdk.writer = writer
+        return writer
+    
+    def _mux_two_pass(self, tmp_video: str, audio_path: str, output_path: str) -> float:
+        """Re-encode the SDK's temp video and add the audio track; returns seconds taken"""
+        encoding_start = time.time()
+        cmd = (
+            f'ffmpeg -loglevel error -y '
+            f'-i "{tmp_video}" -i "{audio_path}" '
+            f'-map 0:v -map 1:a '
+            f'-c:v libx264 '              # Re-encode video for optimization
+            f'-preset veryfast '          # Fast encoding
+            f'-profile:v baseline '       # Max browser compatibility
+            f'-level 3.0 '                # Lower level for better streaming
+            f'-crf 28 '                   # Balanced quality/size
+            f'-r 18 '                     # 18 FPS (down from 25)
+            f'-movflags +faststart '      # Progressive download - CRITICAL!
+            f'-c:a aac '                  # AAC audio
+            f'-ar 24000 '                 # 24kHz sample rate
+            f'-ac 1 '                     # Mono audio
+            f'-b:a 64k '                  # 64kbps audio bitrate
+            f'"{output_path}"'
+        )
+        logger.info(f"[PERF] FFmpeg command: {cmd}")
+        os.system(cmd)
+        encoding_time = time.time() - encoding_start
+        logger.info(f"[PERF] FFmpeg encoding: {encoding_time:.2f}s")
+        return encoding_time
+    
     def is_ready(self) -> bool:
         """Check if model is initialized"""
         return self._initialized and self.sdk is not None
@@ -114,19 +216,27 @@ class DittoModel:
         crop_scale: float = 2.3,
         crop_vx_ratio: float = 0,
         crop_vy_ratio: float = -0.125,
+        audio_array: Optional[np.ndarray] = None,
+        audio_sample_rate: Optional[int] = None,
+        fragment_dir: Optional[str] = None,
         **kwargs
     ) -> Tuple[str, float]:
         """
         Generate animated talking-head video from audio and reference image.
         
         Args:
-            audio_path: Path to input audio file (WAV format)
+            audio_path: Path to input audio file (WAV format); used for muxing,
+                and as the model input when audio_array is not given
             reference_image_path: Path to reference portrait image
             output_path: Path to save output video (default: temp file)
             enhancer: Ignored for Ditto (kept for API compatibility)
             crop_scale: Crop scale factor for face detection (default: 2.3)
             crop_vx_ratio: Horizontal crop offset (default: 0)
             crop_vy_ratio: Vertical crop offset (default: -0.125)
+            audio_array: In-memory waveform of audio_path (e.g. straight from TTS)
+            audio_sample_rate: Sample rate of audio_array
+            fragment_dir: Also write fMP4 fragments (init.mp4, seg_*.m4s,
+                index.m3u8) here as frames are rendered
             **kwargs: Additional parameters for StreamSDK
             
         Returns:
@@ -140,9 +250,10 @@ class DittoModel:
         
         # Create temp output if not specified
         if output_path is None:
-            fd, output_path = tempfile.mkstemp(suffix=".mp4")
+            fd, output_path = tempfile.mkstemp(suffix=".mp4", dir=scratch_dir())
             os.close(fd)
         
+        writer = None
         try:
             logger.info(f"Generating video from audio: {audio_path}")
             logger.info(f"Reference image: {reference_image_path}")
@@ -153,12 +264,20 @@ class DittoModel:
                 'crop_vx_ratio': crop_vx_ratio,
                 'crop_vy_ratio': crop_vy_ratio
             }
+            setup_start = time.time()
             self.sdk.setup(reference_image_path, output_path, **setup_kwargs)
+            logger.info(f"[PERF] Ditto setup: {time.time() - setup_start:.3f}s")
             
-            # Load audio and calculate number of frames
-            import librosa
+            # Load audio (16kHz for HuBERT) and calculate number of frames
             import math
-            audio, sr = librosa.core.load(audio_path, sr=16000)
+            audio_load_start = time.time()
+            if audio_array is not None:
+                # Waveform handed over in memory: one polyphase resample, no disk read
+                audio = resample_audio_poly(audio_array, audio_sample_rate, 16000)
+            else:
+                import librosa
+                audio, sr = librosa.core.load(audio_path, sr=16000)
+            logger.info(f"[PERF] Ditto audio load: {time.time() - audio_load_start:.3f}s (in_memory={audio_array is not None})")
             num_frames = math.ceil(len(audio) / 16000 * 25)
             
             # Setup number of frames
@@ -167,38 +286,34 @@ class DittoModel:
             ctrl_info = kwargs.get('ctrl_info', {})
             self.sdk.setup_Nd(N_d=num_frames, fade_in=fade_in, fade_out=fade_out, ctrl_info=ctrl_info)
             
+            # Encode while rendering: swap the SDK's temp-file writer for an
+            # ffmpeg pipe that muxes the audio in the same pass
+            if fragment_dir and not STREAM_ENCODE:
+                logger.warning("Fragmented output needs DITTO_STREAM_ENCODE; writing progressive MP4 only")
+            writer = self._attach_pipe_writer(output_path, audio_path, fragment_dir) if STREAM_ENCODE else None
+            
             # Process audio (offline mode)
             video_gen_start = time.time()
             aud_feat = self.sdk.wav2feat.wav2feat(audio)
             self.sdk.audio2motion_queue.put(aud_feat)
             self.sdk.close()
-            video_gen_time = time.time() - video_gen_start
-            logger.info(f"[PERF] Ditto video generation: {video_gen_time:.2f}s")
-            
-            # Add audio track to video with streaming optimizations
-            tmp_video = self.sdk.tmp_output_path
-            encoding_start = time.time()
-            cmd = (
-                f'ffmpeg -loglevel error -y '
-                f'-i "{tmp_video}" -i "{audio_path}" '
-                f'-map 0:v -map 1:a '
-                f'-c:v libx264 '              # Re-encode video for optimization
-                f'-preset veryfast '          # Fast encoding
-                f'-profile:v baseline '       # Max browser compatibility
-                f'-level 3.0 '                # Lower level for better streaming
-                f'-crf 28 '                   # Balanced quality/size
-                f'-r 18 '                     # 18 FPS (down from 25)
-                f'-movflags +faststart '      # Progressive download - CRITICAL!
-                f'-c:a aac '                  # AAC audio
-                f'-ar 24000 '                 # 24kHz sample rate
-                f'-ac 1 '                     # Mono audio
-                f'-b:a 64k '                  # 64kbps audio bitrate
-                f'"{output_path}"'
-            )
-            logger.info(f"[PERF] FFmpeg command: {cmd}")
-            os.system(cmd)
-            encoding_time = time.time() - encoding_start
-            logger.info(f"[PERF] FFmpeg encoding: {encoding_time:.2f}s")
+            
+            if writer is not None:
+                # Render ends at the last frame; whatever ffmpeg still had to do
+                # after that is the (non-overlapped) encode tail
+                video_gen_time = (writer.last_frame_at or time.time()) - video_gen_start
+                encoding_time = writer.encode_tail_s
+                logger.info(f"[PERF] Ditto video generation: {video_gen_time:.2f}s ({writer.frame_count} frames)")
+                logger.info(
+                    f"[PERF] FFmpeg encoding: {encoding_time:.2f}s after last frame "
+                    f"(overlapped with render, blocked on pipe {writer.write_blocked_s:.2f}s)"
+                )
+            else:
+                video_gen_time = time.time() - video_gen_start
+                logger.info(f"[PERF] Ditto video generation: {video_gen_time:.2f}s")
+                encoding_time = self._mux_two_pass(self.sdk.tmp_output_path, audio_path, output_path)
+                if os.path.exists(self.sdk.tmp_output_path):
+                    os.remove(self.sdk.tmp_output_path)
             
             elapsed = time.time() - start_time
             elapsed_ms = elapsed * 1000  # Convert to milliseconds for consistency
@@ -214,6 +329,8 @@ class DittoModel:
             
         except Exception as e:
             logger.error(f"Ditto generation failed: {e}")
+            if writer is not None:
+                writer.abort()
             if output_path and os.path.exists(output_path):
                 os.remove(output_path)
             raise
@@ -223,6 +340,7 @@ class DittoModel:
         if self.sdk:
             logger.info("Unloading Ditto model")
             # Ditto doesn't have explicit unload, just delete references
+            self.registration_cache.clear()
             del self.sdk
             self.sdk = None
             
@@ -14,6 +14,8 @@ import numpy as np
 from pathlib import Path
 from typing import Optional, Tuple
 
+from utils.registration_cache import RegistrationCache
+
 logger = logging.getLogger(__name__)
 
 # LivePortrait will be cloned at runtime/LivePortrait
@@ -29,6 +31,8 @@ class LivePortraitModel:
     def __init__(self):
         self.device = "cuda"  # LivePortrait works best on CUDA
         self.pipeline = None
+        # Decoded source image per reference image
+        self.registration_cache = RegistrationCache("liveportrait")
         self._ready = False
         
     def initialize(self):
@@ -76,6 +80,25 @@ class LivePortraitModel:
         """Check if model is initialized"""
         return self._ready and self.pipeline is not None
     
+    def prepare_source(self, reference_image_path: str) -> np.ndarray:
+        """
+        Load (or reuse) the decoded source image.
+        
+        Only the decode is cached: pipeline.execute takes the image and
+        computes the source keypoints itself on every call.
+        
+        Args:
+            reference_image_path: Path to reference face image
+            
+        Returns:
+            RGB source image
+        """
+        def prepare() -> np.ndarray:
+            from src.utils.image import load_image_rgb
+            return load_image_rgb(reference_image_path)
+        
+        return self.registration_cache.get_or_create(reference_image_path, prepare)
+    
     def generate_video(
         self,
         audio_path: str,
@@ -114,9 +137,8 @@ class LivePortraitModel:
             from src.utils.audio import extract_audio_features
             audio_features = extract_audio_features(audio_path, fps=fps)
             
-            # Load and preprocess source image
-            from src.utils.image import load_image_rgb
-            source_image = load_image_rgb(reference_image_path)
+            # Load source image (decoded once per reference image)
+            source_image = self.prepare_source(reference_image_path)
             
             # Run LivePortrait pipeline
             output_video = self.pipeline.execute(
@@ -143,6 +165,7 @@ class LivePortraitModel:
     def cleanup(self):
         """Cleanup model resources"""
         if self.pipeline:
+            self.registration_cache.clear()
             del self.pipeline
             if self.device == "cuda":
                 torch.cuda.empty_cache()
@@ -1,207 +1,548 @@
 """
 LLM (Large Language Model) wrapper
 Using Qwen-2.5 for conversational responses
+
+LocalLLMEngine streams tokens from its own decode loop and keeps the
+past key/values of recent prompts: a conversation's next turn extends the
+previous prompt, so only the new tokens (the last reply's tail and the new
+user message) are prefilled. Same async interface as models.llm_gemini.
 """
+import asyncio
+import itertools
 import logging
-from typing import Optional, List, Dict
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils.stage_executor import StageBusy, get_stage_executor
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SYSTEM_PROMPT = """You are Bruce, a helpful and friendly AI assistant.
+Be concise - respond naturally without padding or filler.
+Elaborate only when the question genuinely requires more detail.
+Be warm, engaging, and conversational."""
+
+
+class LLMError(Exception):
+    """An LLM call failed (callers decide what the user sees)"""
+
+
+class LLMTimeout(LLMError):
+    """An LLM call missed its deadline"""
+
+
+class _ModelMetrics:
+    """Call counts and recent latencies for one model"""
+
+    def __init__(self, window: int = 512):
+        self.calls_total = 0
+        self.errors_total = 0
+        self.timeouts_total = 0
+        self.prompt_tokens_total = 0
+        self.cached_prompt_tokens_total = 0
+        self.latency_ms: Deque[float] = deque(maxlen=window)
+        self.first_token_ms: Deque[float] = deque(maxlen=window)
+
+    def stats(self) -> dict:
+        return {
+            "calls_total": self.calls_total,
+            "errors_total": self.errors_total,
+            "timeouts_total": self.timeouts_total,
+            "prompt_tokens_total": self.prompt_tokens_total,
+            "cached_prompt_tokens_total": self.cached_prompt_tokens_total,
+            "latency_ms": _summarize(self.latency_ms),
+            "first_token_ms": _summarize(self.first_token_ms),
+        }
+
+
+def _summarize(samples: Deque[float]) -> dict:
+    """avg/p50/p95/max over the recent window"""
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "avg": sum(ordered) / n,
+        "p50": ordered[n // 2],
+        "p95": ordered[min(n - 1, int(n * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+# Latency metrics per model name (Gemini and local models alike)
+_metrics: Dict[str, _ModelMetrics] = {}
+_metrics_lock = threading.Lock()
+
 
-class LLMModel:
+def model_metrics(model_name: str) -> _ModelMetrics:
+    """Metrics for a model name (shared by every client of that model)"""
+    with _metrics_lock:
+        if model_name not in _metrics:
+            _metrics[model_name] = _ModelMetrics()
+        return _metrics[model_name]
+
+
+def llm_stats() -> Dict[str, dict]:
+    """Metrics for every LLM called so far"""
+    with _metrics_lock:
+        return {name: metrics.stats() for name, metrics in _metrics.items()}
+
+
+def _new_cache():
+    try:
+        from transformers import DynamicCache
+        return DynamicCache()
+    except ImportError:
+        return None  # Older transformers: the model builds a tuple cache
+
+
+def _to_legacy(cache) -> Tuple:
+    """A KV cache as a tuple of per-layer (keys, values), [batch, heads, positions, dim]"""
+    return cache.to_legacy_cache() if hasattr(cache, "to_legacy_cache") else cache
+
+
+def _from_legacy(legacy: Tuple):
+    """Per-layer (keys, values) back into the cache type the model expects"""
+    try:
+        from transformers import DynamicCache
+        return DynamicCache.from_legacy_cache(legacy)
+    except ImportError:
+        return legacy
+
+
+def _copy_prefix(cache, length: int):
+    """A copy of the first `length` positions of a KV cache"""
+    return _from_legacy(tuple(
+        (keys[:, :, :length, :].clone(), values[:, :, :length, :].clone())
+        for keys, values in _to_legacy(cache)
+    ))
+
+
+def _common_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PrefixCache:
     """
-    LLM wrapper for generating conversational responses.
-    Uses Qwen-2.5 (7B locally, 14B-INT4 on GPU).
-    
-    Note: This is a stub for Phase 2/3 implementation.
+    Past key/values of recent prompts (prompt + reply tokens fed so far),
+    keyed by their token ids. A new prompt takes the entry sharing its
+    longest prefix: the whole entry when the prompt extends it (the next
+    turn of that conversation), else a copy of the shared part (e.g. just
+    the system prompt) so the entry stays intact for its own conversation.
     """
-    
-    def __init__(self, model_name: str = "Qwen/Qwen2.5-7B-Instruct"):
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[Tuple[int, ...], Any]]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, ids: Sequence[int]) -> Tuple[Any, int]:
+        """
+        Returns:
+            (cache, n): a cache holding ids[:n] (n < len(ids), so there's
+            always at least one token left to prefill)
+        """
+        with self._lock:
+            best_key, best_n = None, 0
+            for key, (entry_ids, _) in self._entries.items():
+                n = _common_prefix(entry_ids, ids)
+                if n > best_n:
+                    best_key, best_n = key, n
+            if best_key is None:
+                self.misses += 1
+                return _new_cache(), 0
+
+            self.hits += 1
+            entry_ids, cache = self._entries[best_key]
+            n = min(best_n, len(ids) - 1)
+            if n == len(entry_ids):
+                # This conversation's previous turn: extend it in place
+                del self._entries[best_key]
+                return cache, n
+            return _copy_prefix(cache, n), n
+
+    def put(self, ids: Sequence[int], cache):
+        if self.max_entries <= 0 or cache is None:
+            return
+        with self._lock:
+            self._entries[next(self._ids)] = (tuple(ids), cache)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class LocalLLMEngine:
+    """
+    Local LLM (Qwen-2.5 via transformers) for conversational responses.
+
+    Same interface as models.llm_gemini.GeminiClient: async
+    generate_response / stream_response with conversation_history and a
+    deadline. Generation runs on the LLM stage, or joins the running decode
+    batch when a batcher is attached (see models.llm_batcher); fragments are
+    handed back to the event loop as they decode.
+
+    Usage:
+        engine = get_llm_model()
+        async for fragment in engine.stream_response("Hi", conversation_history=history):
+            ...
+    """
+
+    def __init__(
+        self,
+        model_name: str = "Qwen/Qwen2.5-7B-Instruct",
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        device: Optional[str] = None,
+        prefix_cache_entries: int = 8,
+        timeout_s: float = 60.0
+    ):
         """
         Initialize LLM.
-        
+
         Args:
             model_name: HuggingFace model name
+            system_prompt: System instructions for every conversation
+            device: "cpu", "cuda", ... (None = device_map="auto")
+            prefix_cache_entries: Prompts whose KV cache is kept for reuse (0 = off)
+            timeout_s: Default deadline for a whole call
         """
         self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.device = device
+        self.timeout_s = timeout_s
         self.model = None
         self.tokenizer = None
+        self.eos_token_ids: set = set()
+        self.prefix_cache = PrefixCache(prefix_cache_entries)
+        self.batcher = None  # models.llm_batcher.LLMBatcher, set by get_llm_model
+        self._metrics = model_metrics(model_name)
         self._initialized = False
-        
+        self._init_lock = threading.Lock()
+
     def initialize(self):
         """Load Qwen model"""
-        if self._initialized:
-            return
-            
-        logger.info(f"Loading LLM: {self.model_name}...")
-        
-        try:
-            from transformers import AutoModelForCausalLM, AutoTokenizer
-            import torch
-            
-            # Load tokenizer
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                self.model_name,
-                trust_remote_code=True
-            )
-            
-            # Load model (quantized for efficiency)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_name,
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                device_map="auto",
-                trust_remote_code=True
-            )
-            
-            self._initialized = True
-            logger.info(f"LLM loaded: {self.model_name}")
-            
-        except Exception as e:
-            logger.error(f"Failed to load LLM: {e}")
-            raise
-    
+        with self._init_lock:
+            if self._initialized:
+                return
+
+            logger.info(f"Loading LLM: {self.model_name}...")
+
+            try:
+                from transformers import AutoModelForCausalLM, AutoTokenizer
+                import torch
+
+                # Load tokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(
+                    self.model_name,
+                    trust_remote_code=True
+                )
+
+                # Load model (fp16 on GPU, fp32 on CPU)
+                use_cuda = torch.cuda.is_available() and self.device != "cpu"
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    self.model_name,
+                    torch_dtype=torch.float16 if use_cuda else torch.float32,
+                    device_map=self.device or "auto",
+                    trust_remote_code=True
+                )
+                self.model.eval()
+
+                eos = self.model.generation_config.eos_token_id
+                self.eos_token_ids = set(eos if isinstance(eos, list) else [eos])
+                self.eos_token_ids.add(self.tokenizer.eos_token_id)
+                self.eos_token_ids.discard(None)
+
+                self._initialized = True
+                logger.info(f"LLM loaded: {self.model_name}")
+
+            except Exception as e:
+                logger.error(f"Failed to load LLM: {e}")
+                raise
+
     def is_ready(self) -> bool:
         """Check if model is initialized"""
         return self._initialized and self.model is not None
-    
-    def generate_response(
+
+    def _build_messages(
         self,
         prompt: str,
-        system_prompt: Optional[str] = None,
-        max_tokens: int = 256,
+        conversation_history: Optional[List[Dict[str, str]]]
+    ) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": self.system_prompt}]
+        for message in conversation_history or []:
+            if message.get("role") in ("user", "assistant") and message.get("content"):
+                messages.append({"role": message["role"], "content": message["content"]})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _sample(self, logits, temperature: float, top_p: float = 0.95) -> int:
+        import torch
+
+        if temperature <= 0:
+            return int(torch.argmax(logits))
+        probs = torch.softmax(logits.float() / temperature, dim=-1)
+        sorted_probs, order = torch.sort(probs, descending=True)
+        # Nucleus: keep the smallest set of tokens reaching top_p
+        sorted_probs[torch.cumsum(sorted_probs, dim=-1) - sorted_probs > top_p] = 0
+        choice = torch.multinomial(sorted_probs / sorted_probs.sum(), 1)
+        return int(order[choice])
+
+    def generate_tokens(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 150,
         temperature: float = 0.7,
-        language: str = "en"
-    ) -> str:
+        stop: Optional[threading.Event] = None,
+        timing: Optional[Dict[str, float]] = None
+    ) -> Iterator[str]:
         """
-        Generate conversational response.
-        
+        Blocking decode loop: prefill what the prefix cache doesn't already
+        hold, then yield text fragments one token at a time.
+
         Args:
-            prompt: User input
-            system_prompt: System instructions
-            max_tokens: Maximum response length
-            temperature: Sampling temperature
-            language: Response language hint
-            
-        Returns:
-            Generated response text
+            messages: Chat messages (system, history, user)
+            max_tokens: Maximum new tokens
+            temperature: Sampling temperature (0 = greedy)
+            stop: Set to end generation early (caller gone or deadline passed)
+            timing: Filled with prompt_tokens, cached_tokens and prefill_ms
+
+        Yields:
+            Text fragments in generation order
         """
+        import torch
+
         if not self.is_ready():
             self.initialize()
-        
+
+        ids = self.tokenizer.apply_chat_template(messages, tokenize=True, add_generation_prompt=True)
+        cache, cached = self.prefix_cache.take(ids)
+        fed = list(ids[:cached])
+        pending = list(ids[cached:])
+        generated: List[int] = []
+        emitted = ""
+        consistent = True
+        if timing is not None:
+            timing.update(prompt_tokens=len(ids), cached_tokens=cached)
+
+        start = time.perf_counter()
         try:
-            # Format messages
-            messages = []
-            
-            if system_prompt:
-                messages.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
-            
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
-            
-            # Apply chat template
-            text = self.tokenizer.apply_chat_template(
-                messages,
-                tokenize=False,
-                add_generation_prompt=True
-            )
-            
-            # Tokenize
-            inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device)
-            
-            # Generate
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=max_tokens,
-                temperature=temperature,
-                do_sample=True,
-                top_p=0.95
+            with torch.no_grad():
+                for step in range(max_tokens):
+                    consistent = False
+                    output = self.model(
+                        input_ids=torch.tensor([pending], device=self.model.device),
+                        past_key_values=cache,
+                        use_cache=True
+                    )
+                    cache = output.past_key_values
+                    fed.extend(pending)
+                    consistent = True
+                    if step == 0 and timing is not None:
+                        timing["prefill_ms"] = (time.perf_counter() - start) * 1000
+
+                    token = self._sample(output.logits[0, -1], temperature)
+                    if token in self.eos_token_ids:
+                        break
+                    generated.append(token)
+
+                    # Decode the whole reply so far: multi-token characters come out whole
+                    text = self.tokenizer.decode(generated, skip_special_tokens=True)
+                    if len(text) > len(emitted) and not text.endswith("\ufffd"):
+                        yield text[len(emitted):]
+                        emitted = text
+                    if stop is not None and stop.is_set():
+                        break
+                    pending = [token]
+        finally:
+            # Keep the cache for the conversation's next turn (unless a forward
+            # pass failed part way and left it half updated)
+            if consistent:
+                self.prefix_cache.put(fed, cache)
+            logger.info(
+                f"[PERF] LLM {len(generated)} tokens in {time.perf_counter() - start:.2f}s "
+                f"(prompt {len(ids)}, {cached} from cache)"
             )
-            
-            # Decode
-            response = self.tokenizer.decode(
-                outputs[0][len(inputs[0]):],
-                skip_special_tokens=True
+
+    async def stream_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+        language: str = "en",
+        timeout: Optional[float] = None,
+        first_token_timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response as text fragments while the model decodes.
+
+        Args:
+            prompt: User input text
+            conversation_history: Optional list of {"role": "user"|"assistant", "content": str}
+            max_tokens: Maximum tokens in response
+            temperature: Sampling temperature (0.0 = greedy)
+            language: Target response language (the system prompt and the
+                user's own language steer this; kept for interface parity)
+            timeout: Deadline for the whole stream (default: timeout_s)
+            first_token_timeout: Deadline for the first fragment (default: timeout)
+
+        Yields:
+            Text fragments in generation order
+
+        Raises:
+            LLMTimeout: A deadline passed (generation is stopped)
+            LLMError: Generation failed
+        """
+        loop = asyncio.get_running_loop()
+        stage = get_stage_executor("llm")
+        if not self.is_ready():
+            await stage.run(self.initialize)
+
+        timeout = timeout if timeout is not None else self.timeout_s
+        first_token_timeout = min(timeout, first_token_timeout if first_token_timeout is not None else timeout)
+        messages = self._build_messages(prompt, conversation_history)
+        fragments: asyncio.Queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+        timing: Dict[str, float] = {}
+
+        def emit(fragment: str):
+            loop.call_soon_threadsafe(fragments.put_nowait, fragment)
+
+        def pump():
+            for fragment in self.generate_tokens(messages, max_tokens, temperature, stop, timing):
+                emit(fragment)
+
+        self._metrics.calls_total += 1
+        start = loop.time()
+        emitted = False
+        def finished(task: asyncio.Future):
+            if not task.cancelled():
+                task.exception()  # Retrieved here too, in case the consumer left early
+            fragments.put_nowait(done)
+
+        if self.batcher is not None:
+            task = asyncio.wrap_future(
+                self.batcher.submit(messages, max_tokens, temperature, stop, timing, emit)
             )
-            
-            return response.strip()
-            
-        except Exception as e:
-            logger.error(f"Response generation failed: {e}")
+        else:
+            task = asyncio.ensure_future(stage.run(pump))
+        task.add_done_callback(finished)
+        try:
+            while True:
+                remaining = start + (timeout if emitted else first_token_timeout) - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                fragment = await asyncio.wait_for(fragments.get(), remaining)
+                if fragment is done:
+                    break
+                if not emitted:
+                    emitted = True
+                    self._metrics.first_token_ms.append((loop.time() - start) * 1000)
+                yield fragment
+            await task  # Raises if generation failed
+        except asyncio.TimeoutError:
+            self._metrics.timeouts_total += 1
+            logger.error(f"LLM ({self.model_name}) timed out after {loop.time() - start:.1f}s")
+            raise LLMTimeout(f"{self.model_name} missed its deadline")
+        except StageBusy:
             raise
-    
-    def generate_with_history(
+        except Exception as e:
+            self._metrics.errors_total += 1
+            logger.error(f"LLM generation failed: {e}")
+            raise LLMError(f"{self.model_name} generation failed: {e}") from e
+        finally:
+            stop.set()
+
+        self._metrics.latency_ms.append((loop.time() - start) * 1000)
+        self._metrics.prompt_tokens_total += int(timing.get("prompt_tokens", 0))
+        self._metrics.cached_prompt_tokens_total += int(timing.get("cached_tokens", 0))
+
+    async def generate_response(
         self,
-        messages: List[Dict[str, str]],
-        max_tokens: int = 256,
-        temperature: float = 0.7
+        prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+        language: str = "en",
+        timeout: Optional[float] = None
     ) -> str:
         """
-        Generate response with conversation history.
-        
-        Args:
-            messages: List of message dicts with 'role' and 'content'
-            max_tokens: Maximum response length
-            temperature: Sampling temperature
-            
+        Generate a full response (see stream_response).
+
         Returns:
             Generated response text
         """
-        if not self.is_ready():
-            self.initialize()
-        
-        try:
-            # Apply chat template
-            text = self.tokenizer.apply_chat_template(
-                messages,
-                tokenize=False,
-                add_generation_prompt=True
-            )
-            
-            # Tokenize
-            inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device)
-            
-            # Generate
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=max_tokens,
-                temperature=temperature,
-                do_sample=True,
-                top_p=0.95
-            )
-            
-            # Decode
-            response = self.tokenizer.decode(
-                outputs[0][len(inputs[0]):],
-                skip_special_tokens=True
+        fragments = [
+            fragment async for fragment in self.stream_response(
+                prompt, conversation_history, max_tokens, temperature, language, timeout
             )
-            
-            return response.strip()
-            
-        except Exception as e:
-            logger.error(f"Response generation with history failed: {e}")
-            raise
-    
+        ]
+        response = "".join(fragments).strip()
+        if not response:
+            raise LLMError(f"{self.model_name} generated no text")
+        return response
+
+    def stats(self) -> dict:
+        """Metrics for this model, with prefix cache hits"""
+        stats = dict(self._metrics.stats(), prefix_cache=self.prefix_cache.stats())
+        if self.batcher is not None:
+            stats["batching"] = self.batcher.stats()
+        return stats
+
     def cleanup(self):
         """Cleanup model resources"""
         if self.model:
             del self.model
             del self.tokenizer
+            self.model = None
+            self.tokenizer = None
+            self.prefix_cache = PrefixCache(self.prefix_cache.max_entries)
             self._initialized = False
             logger.info("LLM cleaned up")
 
 
 # Global instance
-_llm_model: Optional[LLMModel] = None
+_llm_model: Optional[LocalLLMEngine] = None
 
 
-def get_llm_model() -> LLMModel:
-    """Get or create global LLM instance"""
+def get_llm_model() -> LocalLLMEngine:
+    """Get or create global LLM instance (from settings; shared by the pipelines)"""
     global _llm_model
     if _llm_model is None:
-        _llm_model = LLMModel()
+        from config import settings
+        _llm_model = LocalLLMEngine(
+            model_name=settings.local_llm_model,
+            prefix_cache_entries=settings.local_llm_prefix_cache_entries,
+            timeout_s=settings.local_llm_timeout_s
+        )
+        if settings.local_llm_batching:
+            from models.llm_batcher import LLMBatcher
+            _llm_model.batcher = LLMBatcher(
+                _llm_model,
+                max_batch_size=settings.local_llm_max_batch_size,
+                max_queue=settings.local_llm_queue_size,
+            )
     return _llm_model
+
+
+def local_llm_stats() -> Optional[dict]:
+    """Stats for the global local LLM (prefix cache, batching), if it's been created"""
+    return _llm_model.stats() if _llm_model is not None else None
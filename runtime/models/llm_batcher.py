@@ -0,0 +1,345 @@
+"""
+Continuous batching for the local LLM
+Concurrent conversations decode together: one forward pass per step
+produces the next token of every active request, and new requests join the
+running batch between steps instead of waiting for it to finish
+
+Each request is prefilled on its own (reusing the engine's prefix cache),
+then its KV cache is left-padded into the batch's. Finished and cancelled
+requests leave the batch at the next step; their caches go back to the
+prefix cache for the conversation's next turn.
+"""
+import itertools
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from models.llm import LocalLLMEngine, _from_legacy, _to_legacy
+from utils.stage_executor import StageBusy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Request:
+    request_id: int
+    messages: List[Dict[str, str]]
+    max_tokens: int
+    temperature: float
+    stop: threading.Event
+    timing: Dict[str, float]
+    emit: Callable[[str], None]
+    future: Future
+    submitted_at: float = field(default_factory=time.perf_counter)
+    fed: List[int] = field(default_factory=list)  # Tokens in the KV cache
+    generated: List[int] = field(default_factory=list)
+    next_token: int = 0  # Sampled, not yet fed
+    emitted: str = ""
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+
+class LLMBatcher:
+    """
+    Iteration-level (continuous) batching in front of a LocalLLMEngine.
+
+    A scheduler thread loops: admit waiting requests (prefill each, merge
+    its cache into the batch), run one decode step for the whole batch,
+    hand each request its new fragment, drop the ones that are done. Each
+    request keeps its own max_tokens, temperature and stop event, so
+    cancelling one (caller gone, deadline passed) never stalls the others.
+
+    Usage:
+        engine.batcher = LLMBatcher(engine, max_batch_size=8)
+        future = engine.batcher.submit(messages, 150, 0.7, stop, timing, emit)
+    """
+
+    def __init__(self, engine: LocalLLMEngine, max_batch_size: int = 8, max_queue: int = 32):
+        """
+        Initialize batcher (the scheduler thread starts on first submit).
+
+        Args:
+            engine: Local LLM engine (its model, tokenizer and prefix cache)
+            max_batch_size: Most requests decoding together
+            max_queue: Most requests waiting for a batch slot; more are rejected (503)
+        """
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self._waiting: Deque[_Request] = deque()
+        self._rows: List[_Request] = []
+        self._cache: Optional[Tuple] = None  # Batch KV cache, per-layer (keys, values)
+        self._pads: List[int] = []  # Left padding per row
+        self._cond = threading.Condition()
+        self._ids = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+        self.requests_total = 0
+        self.cancelled_total = 0
+        self.rejected_total = 0
+        self.steps_total = 0
+        self.tokens_total = 0
+        self.batch_sizes: Counter = Counter()
+
+    def submit(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        stop: threading.Event,
+        timing: Dict[str, float],
+        emit: Callable[[str], None],
+    ) -> Future:
+        """
+        Queue a request for the running batch.
+
+        Args:
+            messages: Chat messages (system, history, user)
+            max_tokens: Maximum new tokens for this request
+            temperature: Sampling temperature (0 = greedy)
+            stop: Set to cancel (the request leaves the batch at the next step)
+            timing: Filled with prompt_tokens, cached_tokens and prefill_ms
+            emit: Called on the scheduler thread with each text fragment
+
+        Returns:
+            Future resolving (to None) when the request is done
+
+        Raises:
+            StageBusy: max_queue requests are already waiting
+        """
+        future: Future = Future()
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                self.rejected_total += 1
+                raise StageBusy("llm batch", self.max_queue)
+            self._waiting.append(_Request(
+                next(self._ids), messages, max_tokens, temperature, stop, timing, emit, future
+            ))
+            self.requests_total += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="llm-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    # ------------------------------------------------------------------
+    # Scheduler (own thread)
+    # ------------------------------------------------------------------
+
+    def _loop(self):
+        while True:
+            try:
+                self._iterate()
+            except Exception as e:
+                # Keep scheduling: a dead thread would hang every later request
+                logger.error(f"LLM batcher error: {e}", exc_info=True)
+                self._fail(self._rows, e)
+                self._rows, self._pads, self._cache = [], [], None
+
+    def _iterate(self):
+        """Admit waiting requests, then run one decode step"""
+        import torch
+
+        with self._cond:
+            while not self._waiting and not self._rows:
+                self._cond.wait()
+            admit = []
+            while self._waiting and len(self._rows) + len(admit) < self.max_batch_size:
+                admit.append(self._waiting.popleft())
+
+        with torch.no_grad():
+            for request in admit:
+                if request.stop.is_set():
+                    self._finish(request, cancelled=True)
+                    continue
+                try:
+                    self._prefill(request)
+                except Exception as e:
+                    logger.error(f"LLM prefill failed: {e}")
+                    self._fail([request], e)
+            if not self._rows:
+                return
+            try:
+                self._step()
+            except Exception as e:
+                # The batch cache is in an unknown state: fail everything in it
+                logger.error(f"LLM decode step failed ({len(self._rows)} requests): {e}")
+                self._fail(self._rows, e)
+                self._rows, self._pads, self._cache = [], [], None
+
+    @staticmethod
+    def _fail(requests: List[_Request], error: Exception):
+        for request in requests:
+            # The caller may already have cancelled it (deadline, disconnect)
+            try:
+                if not request.future.done():
+                    request.future.set_exception(error)
+            except InvalidStateError:
+                pass
+
+    def _prefill(self, request: _Request):
+        """Prefill one request on its own, take its first token, merge it into the batch"""
+        import torch
+
+        engine = self.engine
+        ids = engine.tokenizer.apply_chat_template(request.messages, tokenize=True, add_generation_prompt=True)
+        cache, cached = engine.prefix_cache.take(ids)
+        request.prompt_tokens, request.cached_tokens = len(ids), cached
+        request.timing.update(prompt_tokens=len(ids), cached_tokens=cached)
+
+        start = time.perf_counter()
+        output = engine.model(
+            input_ids=torch.tensor([list(ids[cached:])], device=engine.model.device),
+            past_key_values=cache,
+            use_cache=True
+        )
+        request.timing["prefill_ms"] = (time.perf_counter() - start) * 1000
+        request.fed = list(ids)
+        row_cache = _to_legacy(output.past_key_values)
+
+        if not self._accept(request, output.logits[0, -1]):
+            engine.prefix_cache.put(request.fed, _from_legacy(row_cache))
+            self._finish(request)
+            return
+
+        # Left-pad the shorter of (batch, row) so both end at the same position
+        if self._cache is None:
+            self._cache, self._pads = row_cache, [0]
+        else:
+            batch_len, row_len = self._cache[0][0].shape[2], row_cache[0][0].shape[2]
+            length = max(batch_len, row_len)
+            self._pads = [pad + length - batch_len for pad in self._pads] + [length - row_len]
+            self._cache = tuple(
+                (
+                    torch.cat([_left_pad(keys, length), _left_pad(row_keys, length)]),
+                    torch.cat([_left_pad(values, length), _left_pad(row_values, length)]),
+                )
+                for (keys, values), (row_keys, row_values) in zip(self._cache, row_cache)
+            )
+        self._rows.append(request)
+
+    def _step(self):
+        """One decode step: feed every row its last sampled token"""
+        import torch
+
+        model = self.engine.model
+        rows, pads = self._rows, self._pads
+        length = self._cache[0][0].shape[2]
+        self.steps_total += 1
+        self.batch_sizes[len(rows)] += 1
+
+        attention_mask = torch.ones((len(rows), length + 1), dtype=torch.long, device=model.device)
+        for i, pad in enumerate(pads):
+            attention_mask[i, :pad] = 0
+        output = model(
+            input_ids=torch.tensor([[r.next_token] for r in rows], device=model.device),
+            attention_mask=attention_mask,
+            position_ids=torch.tensor([[length - pad] for pad in pads], device=model.device),
+            past_key_values=_from_legacy(self._cache),
+            use_cache=True
+        )
+        self._cache = _to_legacy(output.past_key_values)
+
+        keep = []
+        for i, request in enumerate(rows):
+            request.fed.append(request.next_token)
+            if request.stop.is_set():
+                self._release(i, cancelled=True)
+            elif self._accept(request, output.logits[i, -1]):
+                keep.append(i)
+            else:
+                self._release(i)
+        if len(keep) < len(rows):
+            self._keep_rows(keep)
+
+    def _accept(self, request: _Request, logits) -> bool:
+        """Sample a request's next token and emit its text; False when it's done"""
+        engine = self.engine
+        token = engine._sample(logits, request.temperature)
+        if token in engine.eos_token_ids:
+            return False
+        request.generated.append(token)
+        request.next_token = token
+        self.tokens_total += 1
+
+        # Decode the whole reply so far: multi-token characters come out whole
+        text = engine.tokenizer.decode(request.generated, skip_special_tokens=True)
+        if len(text) > len(request.emitted) and not text.endswith("\ufffd"):
+            request.emit(text[len(request.emitted):])
+            request.emitted = text
+        return len(request.generated) < request.max_tokens and not request.stop.is_set()
+
+    def _release(self, i: int, cancelled: bool = False):
+        """A row is done: its cache (without padding) goes back to the prefix cache"""
+        request, pad = self._rows[i], self._pads[i]
+        row_cache = tuple(
+            (keys[i:i + 1, :, pad:, :].clone(), values[i:i + 1, :, pad:, :].clone())
+            for keys, values in self._cache
+        )
+        self.engine.prefix_cache.put(request.fed, _from_legacy(row_cache))
+        self._finish(request, cancelled)
+
+    def _keep_rows(self, keep: List[int]):
+        """Drop finished rows from the batch, and any padding every row now shares"""
+        import torch
+
+        self._rows = [self._rows[i] for i in keep]
+        self._pads = [self._pads[i] for i in keep]
+        if not keep:
+            self._cache = None
+            return
+        trim = min(self._pads)
+        index = torch.tensor(keep, device=self._cache[0][0].device)
+        self._cache = tuple(
+            (keys.index_select(0, index)[:, :, trim:, :], values.index_select(0, index)[:, :, trim:, :])
+            for keys, values in self._cache
+        )
+        self._pads = [pad - trim for pad in self._pads]
+
+    def _finish(self, request: _Request, cancelled: bool = False):
+        if cancelled:
+            self.cancelled_total += 1
+        logger.info(
+            f"[PERF] LLM {len(request.generated)} tokens in {time.perf_counter() - request.submitted_at:.2f}s "
+            f"(prompt {request.prompt_tokens}, {request.cached_tokens} from cache, "
+            f"batch of {len(self._rows)}{', cancelled' if cancelled else ''})"
+        )
+        try:
+            if not request.future.done():
+                request.future.set_result(None)
+        except InvalidStateError:
+            pass  # Cancelled in between
+
+    def stats(self) -> dict:
+        """Metrics: decode steps, batch sizes, queue"""
+        with self._cond:
+            return {
+                "active": len(self._rows),
+                "waiting": len(self._waiting),
+                "requests_total": self.requests_total,
+                "cancelled_total": self.cancelled_total,
+                "rejected_total": self.rejected_total,
+                "steps_total": self.steps_total,
+                "tokens_total": self.tokens_total,
+                "avg_batch_size": (
+                    sum(size * n for size, n in self.batch_sizes.items()) / self.steps_total
+                    if self.steps_total else 0.0
+                ),
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+            }
+
+
+def _left_pad(tensor: Any, length: int):
+    """Zero-pad a [batch, heads, positions, dim] tensor on the left to `length` positions"""
+    import torch
+
+    missing = length - tensor.shape[2]
+    if missing == 0:
+        return tensor
+    padding = tensor.new_zeros((tensor.shape[0], tensor.shape[1], missing, tensor.shape[3]))
+    return torch.cat([padding, tensor], dim=2)
@@ -1,12 +1,20 @@
 """
 Gemini LLM Client for Conversational Responses
 Uses Google Cloud Vertex AI Gemini 2.0 Flash API
+
+Async throughout (generate_content_async on one shared model, so every call
+reuses its gRPC channel), with a deadline on each call. Context comes from
+the caller's conversation history: there's no shared chat session, so
+sessions never see each other's turns or wait on each other.
 """
+import asyncio
 import logging
-from typing import Optional, List, Dict
-import google.generativeai as genai
-from vertexai.preview.generative_models import GenerativeModel, ChatSession
+import time
+from typing import Optional, List, Dict, AsyncIterator
 import vertexai
+from vertexai.preview.generative_models import Content, GenerativeModel, Part
+
+from models.llm import DEFAULT_SYSTEM_PROMPT, LLMError, LLMTimeout, model_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -56,17 +64,43 @@ def get_language_prefix(language: str, user_text: str) -> str:
     return prefixes.get(language, "")
 
 
+class GeminiError(LLMError):
+    """A Gemini call failed (callers decide what the user sees)"""
+
+
+class GeminiTimeout(GeminiError, LLMTimeout):
+    """A Gemini call missed its deadline"""
+
+
+def _chunk_text(response) -> str:
+    """Text of a response (chunk); "" if it has none (e.g. the final stop chunk)"""
+    try:
+        return response.text
+    except (ValueError, IndexError, AttributeError):
+        return ""
+
+
 class GeminiClient:
     """
-    Gemini API client for generating conversational responses.
-    Drop-in replacement for local LLMModel using Vertex AI.
+    Async Gemini API client for generating conversational responses.
+    Drop-in replacement for the local LocalLLMEngine using Vertex AI.
+
+    Stateless between calls, so one client serves every session concurrently.
+
+    Usage:
+        client = get_gemini_client()
+        text = await client.generate_response("Hi", conversation_history=history)
+        async for fragment in client.stream_response("Hi"):
+            ...
     """
     
     def __init__(
         self,
         model_name: str = "gemini-2.0-flash-exp",
         project_id: str = "realtime-avatar-bg",
-        location: str = "us-central1"
+        location: str = "us-central1",
+        timeout_s: float = 15.0,
+        first_token_timeout_s: float = 5.0
     ):
         """
         Initialize Gemini client.
@@ -75,19 +109,20 @@ class GeminiClient:
             model_name: Gemini model name (gemini-2.0-flash-exp, gemini-1.5-flash, etc.)
             project_id: GCP project ID
             location: GCP region for Vertex AI
+            timeout_s: Default deadline for a whole call (or stream)
+            first_token_timeout_s: Default deadline for a stream's first chunk
         """
         self.model_name = model_name
         self.project_id = project_id
         self.location = location
+        self.timeout_s = timeout_s
+        self.first_token_timeout_s = first_token_timeout_s
         self.model = None
-        self.chat_session: Optional[ChatSession] = None
         self._initialized = False
+        self._metrics = model_metrics(model_name)
         
-        # System prompt for concise conversational responses
-        self.system_instruction = """You are Bruce, a helpful and friendly AI assistant.
-Be concise - respond naturally without padding or filler.
-Elaborate only when the question genuinely requires more detail.
-Be warm, engaging, and conversational."""
+        # Same persona as the local model (and the response cache's keys)
+        self.system_instruction = DEFAULT_SYSTEM_PROMPT
         
     def initialize(self):
         """Initialize Vertex AI and Gemini model"""
@@ -100,7 +135,8 @@ Be warm, engaging, and conversational."""
             # Initialize Vertex AI
             vertexai.init(project=self.project_id, location=self.location)
             
-            # Create generative model with system instruction
+            # One model for every call: it creates its async API client (and
+            # gRPC channel) on first use and reuses it from then on
             self.model = GenerativeModel(
                 self.model_name,
                 system_instruction=[self.system_instruction]
@@ -117,136 +153,223 @@ Be warm, engaging, and conversational."""
         """Check if client is initialized"""
         return self._initialized
     
-    def generate_response(
+    def _build_contents(
         self,
         prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        language: str
+    ) -> List[Content]:
+        """
+        The session's history as Gemini turns, then the prompt.
+        
+        Gemini wants turns alternating user/model starting with the user, so
+        consecutive messages from one side are merged and leading assistant
+        messages dropped.
+        """
+        turns: List[List] = []
+        for message in conversation_history or []:
+            role = {"user": "user", "assistant": "model", "model": "model"}.get(message.get("role"))
+            text = (message.get("content") or "").strip()
+            if role is None or not text or (not turns and role == "model"):
+                continue
+            if turns and turns[-1][0] == role:
+                turns[-1][1].append(text)
+            else:
+                turns.append([role, [text]])
+        
+        lang_prefix = get_language_prefix(language, prompt)
+        full_prompt = f"{lang_prefix} {prompt}".strip() if lang_prefix else prompt
+        if turns and turns[-1][0] == "user":
+            turns[-1][1].append(full_prompt)
+        else:
+            turns.append(["user", [full_prompt]])
+        
+        return [
+            Content(role=role, parts=[Part.from_text("\n".join(texts))])
+            for role, texts in turns
+        ]
+    
+    @staticmethod
+    def _generation_config(max_tokens: int, temperature: float) -> dict:
+        return {
+            "max_output_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": 0.95,
+        }
+    
+    async def generate_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
         max_tokens: int = 150,
         temperature: float = 0.7,
-        language: str = "en"
+        language: str = "en",
+        timeout: Optional[float] = None
     ) -> str:
         """
-        Generate a single response to a prompt.
+        Generate a response to a prompt, in the context of the session's history.
         
         Args:
             prompt: User input text
+            conversation_history: Optional list of {"role": "user"|"assistant", "content": str}
             max_tokens: Maximum tokens in response
             temperature: Sampling temperature (0.0-1.0)
             language: Target response language (en, zh, es)
+            timeout: Deadline in seconds (default: timeout_s)
             
         Returns:
             Generated response text
+            
+        Raises:
+            GeminiTimeout: No response within the deadline
+            GeminiError: The call failed or returned no text
         """
         if not self.is_ready():
             self.initialize()
         
+        timeout = timeout if timeout is not None else self.timeout_s
+        contents = self._build_contents(prompt, conversation_history, language)
+        logger.info(
+            f"Generating Gemini response for: '{prompt[:50]}...' "
+            f"(lang={language}, {len(contents) - 1} history turns)"
+        )
+        
+        self._metrics.calls_total += 1
+        start = time.perf_counter()
         try:
-            # Add language instruction prefix
-            lang_prefix = get_language_prefix(language, prompt)
-            full_prompt = f"{lang_prefix} {prompt}".strip() if lang_prefix else prompt
-            
-            logger.info(f"Generating Gemini response for: '{prompt[:50]}...' (lang={language})")
-            
-            # Configure generation parameters
-            generation_config = {
-                "max_output_tokens": max_tokens,
-                "temperature": temperature,
-                "top_p": 0.95,
-            }
-            
-            # Generate response
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=generation_config
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    contents,
+                    generation_config=self._generation_config(max_tokens, temperature)
+                ),
+                timeout
             )
-            
-            response_text = response.text.strip()
-            logger.info(f"Gemini response generated: {len(response_text)} chars")
-            
-            return response_text
-            
+        except asyncio.TimeoutError:
+            self._metrics.timeouts_total += 1
+            logger.error(f"Gemini ({self.model_name}) timed out after {timeout:.1f}s")
+            raise GeminiTimeout(f"{self.model_name} didn't respond within {timeout:.1f}s")
         except Exception as e:
+            self._metrics.errors_total += 1
             logger.error(f"Gemini generation failed: {e}")
-            # Fallback response
-            return f"I heard you say: {prompt}"
+            raise GeminiError(f"{self.model_name} call failed: {e}") from e
+        
+        response_text = _chunk_text(response).strip()
+        if not response_text:
+            self._metrics.errors_total += 1
+            raise GeminiError(f"{self.model_name} returned no text (blocked or empty response)")
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._metrics.latency_ms.append(elapsed_ms)
+        logger.info(f"[PERF] Gemini response: {len(response_text)} chars in {elapsed_ms:.0f}ms")
+        return response_text
     
-    def generate_with_history(
+    async def stream_response(
         self,
         prompt: str,
-        conversation_history: List[Dict[str, str]],
+        conversation_history: Optional[List[Dict[str, str]]] = None,
         max_tokens: int = 150,
         temperature: float = 0.7,
-        language: str = "en"
-    ) -> str:
+        language: str = "en",
+        timeout: Optional[float] = None,
+        first_token_timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
         """
-        Generate response with conversation history context.
+        Stream a response as text fragments while Gemini generates it, so
+        callers can act on the first sentence before the reply is complete.
         
         Args:
-            prompt: Current user input
-            conversation_history: List of {"role": "user"|"assistant", "content": str}
+            prompt: User input text
+            conversation_history: Optional list of {"role": "user"|"assistant", "content": str}
             max_tokens: Maximum tokens in response
-            temperature: Sampling temperature
+            temperature: Sampling temperature (0.0-1.0)
             language: Target response language (en, zh, es)
+            timeout: Deadline for the whole stream (default: timeout_s)
+            first_token_timeout: Deadline for the first fragment (default: first_token_timeout_s)
             
-        Returns:
-            Generated response text
+        Yields:
+            Text fragments in generation order
+            
+        Raises:
+            GeminiTimeout: A deadline passed (fragments already yielded stand)
+            GeminiError: The call failed
         """
         if not self.is_ready():
             self.initialize()
         
+        timeout = timeout if timeout is not None else self.timeout_s
+        first_token_timeout = min(
+            timeout, first_token_timeout if first_token_timeout is not None else self.first_token_timeout_s
+        )
+        contents = self._build_contents(prompt, conversation_history, language)
+        logger.info(
+            f"Streaming Gemini response for: '{prompt[:50]}...' "
+            f"(lang={language}, {len(contents) - 1} history turns)"
+        )
+        
+        self._metrics.calls_total += 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        first_deadline = start + first_token_timeout
+        emitted = False
+        responses = None
         try:
-            logger.info(f"Generating Gemini response with history ({len(conversation_history)} turns) (lang={language})")
-            
-            # Add language instruction prefix
-            lang_prefix = get_language_prefix(language, prompt)
-            
-            # Start or continue chat session
-            if self.chat_session is None:
-                self.chat_session = self.model.start_chat()
-            
-            # Build conversation history if this is a new session
-            if len(conversation_history) > 0:
-                # Gemini tracks history automatically in chat sessions
-                # For now, just include the most recent context in the prompt
-                recent_context = conversation_history[-2:] if len(conversation_history) >= 2 else conversation_history
-                context_text = "\n".join([
-                    f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
-                    for msg in recent_context
-                ])
-                full_prompt = f"{lang_prefix} Previous context:\n{context_text}\n\nUser: {prompt}".strip()
-            else:
-                full_prompt = f"{lang_prefix} {prompt}".strip() if lang_prefix else prompt
-            
-            # Configure generation
-            generation_config = {
-                "max_output_tokens": max_tokens,
-                "temperature": temperature,
-                "top_p": 0.95,
-            }
-            
-            # Send message to chat
-            response = self.chat_session.send_message(
-                full_prompt,
-                generation_config=generation_config
+            responses = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    contents,
+                    generation_config=self._generation_config(max_tokens, temperature),
+                    stream=True
+                ),
+                first_token_timeout
             )
-            
-            response_text = response.text.strip()
-            logger.info(f"Gemini response generated: {len(response_text)} chars")
-            
-            return response_text
-            
+            chunks = responses.__aiter__()
+            while True:
+                remaining = (deadline if emitted else first_deadline) - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    response = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                text = _chunk_text(response)
+                if not text:
+                    continue
+                if not emitted:
+                    emitted = True
+                    self._metrics.first_token_ms.append((loop.time() - start) * 1000)
+                yield text
+        except asyncio.TimeoutError:
+            self._metrics.timeouts_total += 1
+            stage = "whole stream" if emitted else "first fragment"
+            logger.error(f"Gemini ({self.model_name}) stream timed out waiting for the {stage}")
+            raise GeminiTimeout(f"{self.model_name} stream missed its {stage} deadline")
+        except GeminiError:
+            raise
         except Exception as e:
-            logger.error(f"Gemini generation with history failed: {e}")
-            # Fallback
-            return f"I heard you say: {prompt}"
+            self._metrics.errors_total += 1
+            logger.error(f"Gemini streaming failed: {e}")
+            raise GeminiError(f"{self.model_name} stream failed: {e}") from e
+        finally:
+            # Consumer gone or deadline hit: close the RPC rather than leave it running
+            aclose = getattr(responses, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+        
+        if not emitted:
+            self._metrics.errors_total += 1
+            raise GeminiError(f"{self.model_name} returned no text (blocked or empty response)")
+        self._metrics.latency_ms.append((loop.time() - start) * 1000)
     
-    def reset_chat(self):
-        """Reset the chat session"""
-        self.chat_session = None
-        logger.info("Gemini chat session reset")
+    def stats(self) -> dict:
+        """Metrics for this client's model"""
+        return self._metrics.stats()
     
     def cleanup(self):
         """Cleanup resources"""
-        self.chat_session = None
+        self.model = None
         self._initialized = False
         logger.info("Gemini client cleaned up")
 
@@ -256,8 +379,15 @@ _gemini_client: Optional[GeminiClient] = None
 
 
 def get_gemini_client() -> GeminiClient:
-    """Get or create global Gemini client instance"""
+    """Get or create global Gemini client instance (from settings; shared by the pipelines)"""
     global _gemini_client
     if _gemini_client is None:
-        _gemini_client = GeminiClient()
+        from config import settings
+        _gemini_client = GeminiClient(
+            model_name=settings.gemini_model,
+            project_id=settings.gemini_project,
+            location=settings.gemini_location,
+            timeout_s=settings.gemini_timeout_s,
+            first_token_timeout_s=settings.gemini_first_token_timeout_s
+        )
     return _gemini_client
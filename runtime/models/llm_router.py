@@ -0,0 +1,466 @@
+"""
+LLM routing
+One interface over the configured LLM providers (Gemini, local Qwen): a
+call goes to the first healthy provider and, if it hasn't answered (or
+started streaming) within the hedge delay, is raced against the next one.
+The first to answer wins and the other is cancelled
+
+Each provider has a circuit breaker: after repeated failed or slow calls it
+is skipped for a cool-down, then given one trial call. Latency histograms
+per provider are in stats(). Repeated prompts are answered from the
+response cache (utils.response_cache) without calling any provider.
+"""
+import asyncio
+import bisect
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from models.llm import LLMError
+from utils.response_cache import ResponseCache, get_response_cache
+from utils.stage_executor import StageBusy
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds (ms); the last bucket is everything above
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Counts per latency bucket (Prometheus-style upper bounds)"""
+
+    def __init__(self, bounds_ms: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def record(self, ms: float):
+        self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def stats(self) -> dict:
+        labels = [f"le_{bound:g}" for bound in self.bounds_ms] + ["inf"]
+        return {
+            "count": self.total,
+            "avg_ms": self.sum_ms / self.total if self.total else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failed or slow calls;
+    open -> half-open after reset_after_s (one trial call); half-open ->
+    closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_after_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after_s = reset_after_s
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_total = 0
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        """Whether a call may go to this provider now"""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after_s:
+            self.state = "half_open"
+        if self.state == "half_open":
+            return not self._trial_running
+        return self.state == "closed"
+
+    def started(self):
+        """A call went out (in half-open state, that's the trial)"""
+        if self.state == "half_open":
+            self._trial_running = True
+
+    def abandoned(self):
+        """A call was cancelled before it told us anything"""
+        self._trial_running = False
+
+    def record(self, ok: bool):
+        self._trial_running = False
+        if ok:
+            self.state = "closed"
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened_total += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class _Provider:
+    """One LLM client with its breaker and metrics"""
+
+    def __init__(self, name: str, client: Any, breaker: CircuitBreaker):
+        self.name = name
+        self.client = client
+        self.breaker = breaker
+        self.latency = LatencyHistogram()
+        self.first_token = LatencyHistogram()
+        self.calls_total = 0
+        self.wins_total = 0
+        self.errors_total = 0
+        self.slow_total = 0
+        self.cancelled_total = 0
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opened_total": self.breaker.opened_total,
+            "calls_total": self.calls_total,
+            "wins_total": self.wins_total,
+            "errors_total": self.errors_total,
+            "slow_total": self.slow_total,
+            "cancelled_total": self.cancelled_total,
+            "latency_ms": self.latency.stats(),
+            "first_token_ms": self.first_token.stats(),
+        }
+
+
+class LLMRouter:
+    """
+    Hedged, circuit-broken routing over LLM clients that share the
+    generate_response / stream_response interface (GeminiClient,
+    LocalLLMEngine). With one provider it's a pass-through with metrics.
+
+    Usage:
+        router = get_llm_router()
+        reply = await router.generate_response("Hi", conversation_history=history)
+        async for fragment in router.stream_response("Hi", conversation_history=history):
+            ...
+    """
+
+    def __init__(
+        self,
+        providers: List[Tuple[str, Any]],
+        hedge_delay_s: float = 1.5,
+        slow_call_s: float = 5.0,
+        failure_threshold: int = 3,
+        reset_after_s: float = 30.0,
+        cache: Optional[ResponseCache] = None,
+    ):
+        """
+        Initialize router.
+
+        Args:
+            providers: (name, client) in order of preference
+            hedge_delay_s: Start the next provider if there's no answer (or
+                first fragment) by then (0 = no hedging, fall over on failure only)
+            slow_call_s: Calls (or first fragments) slower than this count as
+                failures for the circuit breaker
+            failure_threshold: Consecutive failed/slow calls that open a breaker
+            reset_after_s: How long an open breaker skips its provider
+            cache: Serve repeated prompts from this cache (see utils.response_cache)
+        """
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = [
+            _Provider(name, client, CircuitBreaker(failure_threshold, reset_after_s))
+            for name, client in providers
+        ]
+        self.hedge_delay_s = hedge_delay_s
+        self.slow_call_s = slow_call_s
+        self.cache = cache
+        self.hedges_total = 0
+
+    @property
+    def provider_names(self) -> List[str]:
+        return [p.name for p in self.providers]
+
+    def _candidates(self) -> List[_Provider]:
+        """Providers whose breaker allows a call, in order (all of them if none does)"""
+        allowed = [p for p in self.providers if p.breaker.allow()]
+        if not allowed:
+            logger.warning("[LLM] Every provider's circuit breaker is open; trying them anyway")
+            return list(self.providers)
+        return allowed
+
+    def _record(self, provider: _Provider, ok: bool, elapsed_s: float):
+        slow = ok and elapsed_s > self.slow_call_s
+        if not ok:
+            provider.errors_total += 1
+        if slow:
+            provider.slow_total += 1
+        provider.breaker.record(ok and not slow)
+
+    async def _race(
+        self, start_call, discard=None
+    ) -> Tuple[_Provider, Any, Dict[asyncio.Task, Tuple[_Provider, float]]]:
+        """
+        Start the first candidate; start the next one when the hedge delay
+        passes or the running ones have all failed. The first call to succeed wins.
+
+        Args:
+            start_call: provider -> awaitable of its result
+            discard: (provider, result) -> None, for a call that also succeeded
+                but lost (e.g. to close its stream)
+
+        Returns:
+            (winner, result, still-running calls: task -> (provider, start time))
+
+        Raises:
+            The last provider's error (StageBusy or LLMError) if every one failed
+        """
+        candidates = self._candidates()
+        running: Dict[asyncio.Task, Tuple[_Provider, float]] = {}
+        last_error: Optional[BaseException] = None
+
+        def start_next():
+            provider = candidates.pop(0)
+            provider.calls_total += 1
+            provider.breaker.started()
+            task = asyncio.ensure_future(start_call(provider))
+            running[task] = (provider, time.perf_counter())
+            return provider
+
+        start_next()
+        try:
+            while running:
+                hedge = candidates and self.hedge_delay_s > 0
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_delay_s if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    provider = start_next()
+                    self.hedges_total += 1
+                    logger.info(f"[LLM] Hedging with {provider.name} after {self.hedge_delay_s:.1f}s")
+                    continue
+                # Settle every finished call (several can finish in the same
+                # instant) before picking a winner, so none is left among the losers
+                winner = None
+                for task in done:
+                    provider, started = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        self._record(provider, True, time.perf_counter() - started)
+                        if winner is None:
+                            winner = (provider, task)
+                        elif discard is not None:
+                            discard(provider, task.result())
+                        continue
+                    self._record(provider, False, time.perf_counter() - started)
+                    logger.warning(f"[LLM] {provider.name} failed: {error}")
+                    last_error = error
+                if winner is not None:
+                    provider, task = winner
+                    provider.wins_total += 1
+                    return provider, task.result(), running
+                if not running and candidates:
+                    start_next()
+        except BaseException:
+            self._cancel(running)
+            raise
+        if isinstance(last_error, (StageBusy, LLMError)):
+            raise last_error
+        raise LLMError(f"Every LLM provider failed: {last_error}") from last_error
+
+    def _cancel(self, running: Dict[asyncio.Task, Tuple[_Provider, float]]):
+        """Cancel calls that lost the race (slow ones still count against their breaker)"""
+        for task, (provider, started) in running.items():
+            task.cancel()
+            provider.cancelled_total += 1
+            if time.perf_counter() - started > self.slow_call_s:
+                self._record(provider, False, time.perf_counter() - started)
+            else:
+                provider.breaker.abandoned()
+
+    async def generate_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+        language: str = "en",
+        timeout: Optional[float] = None
+    ) -> str:
+        """
+        Generate a full response from the first provider to answer.
+
+        Returns:
+            Generated response text
+
+        Raises:
+            LLMError: Every provider tried failed
+            StageBusy: The last provider tried was overloaded
+        """
+        async def call(provider: _Provider) -> str:
+            started = time.perf_counter()
+            response = await provider.client.generate_response(
+                prompt=prompt,
+                conversation_history=conversation_history,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                language=language,
+                timeout=timeout,
+            )
+            provider.latency.record((time.perf_counter() - started) * 1000)
+            return response
+
+        cache_key = self._cache_key(prompt, language, conversation_history, max_tokens, temperature)
+        if cache_key:
+            cached = await self.cache.lookup(cache_key, temperature)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        provider, response, losers = await self._race(call)
+        self._cancel(losers)
+        if cache_key:
+            await self.cache.store(cache_key, response, (time.perf_counter() - started) * 1000, temperature)
+        return response
+
+    async def stream_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+        language: str = "en",
+        timeout: Optional[float] = None,
+        first_token_timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from the first provider to produce a fragment.
+
+        Providers race up to their first fragment; after that the winner's
+        stream is followed to the end (a failure mid-stream raises, as the
+        text so far has already gone out).
+
+        Yields:
+            Text fragments in generation order
+
+        Raises:
+            LLMError: Every provider tried failed before its first fragment,
+                or the winner failed mid-stream
+        """
+        streams: Dict[str, Tuple[AsyncIterator[str], float]] = {}
+
+        async def first_fragment(provider: _Provider) -> str:
+            started = time.perf_counter()
+            stream = provider.client.stream_response(
+                prompt=prompt,
+                conversation_history=conversation_history,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                language=language,
+                timeout=timeout,
+                first_token_timeout=first_token_timeout,
+            )
+            streams[provider.name] = (stream, started)
+            try:
+                fragment = await stream.__anext__()
+            except StopAsyncIteration:
+                raise LLMError(f"{provider.name} returned no text")
+            provider.first_token.record((time.perf_counter() - started) * 1000)
+            return fragment
+
+        cache_key = self._cache_key(prompt, language, conversation_history, max_tokens, temperature)
+        if cache_key:
+            cached = await self.cache.lookup(cache_key, temperature)
+            if cached is not None:
+                yield cached
+                return
+
+        def close_stream(loser: _Provider, _fragment: str):
+            # Got its first fragment in the same instant as the winner
+            asyncio.ensure_future(streams[loser.name][0].aclose())
+
+        provider, fragment, losers = await self._race(first_fragment, discard=close_stream)
+        # Cancelling a loser closes its stream (and stops its generation)
+        self._cancel(losers)
+        stream, started = streams[provider.name]
+        fragments = []
+        try:
+            fragments.append(fragment)
+            yield fragment
+            async for fragment in stream:
+                fragments.append(fragment)
+                yield fragment
+        except LLMError:
+            self._record(provider, False, time.perf_counter() - started)
+            raise
+        finally:
+            await stream.aclose()
+        latency_ms = (time.perf_counter() - started) * 1000
+        provider.latency.record(latency_ms)
+        if cache_key:
+            await self.cache.store(cache_key, "".join(fragments).strip(), latency_ms, temperature)
+
+    def _cache_key(
+        self,
+        prompt: str,
+        language: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        max_tokens: int,
+        temperature: float,
+    ) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.key(prompt, language, conversation_history, max_tokens, temperature)
+
+    def stats(self) -> dict:
+        """Metrics: per-provider breaker state, wins, latency histograms"""
+        return {
+            "providers": {p.name: p.stats() for p in self.providers},
+            "hedge_delay_s": self.hedge_delay_s,
+            "hedges_total": self.hedges_total,
+        }
+
+
+# Global router (one per process, shared by the pipelines)
+_llm_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> Optional[LLMRouter]:
+    """
+    Get or create the global router from settings, initializing each
+    provider in LLM_PROVIDERS order (a provider that fails to load is
+    skipped). None if no provider could be loaded.
+    """
+    global _llm_router
+    if _llm_router is None:
+        from config import settings
+        providers = []
+        for name in settings.llm_provider_order:
+            try:
+                if name == "gemini":
+                    logger.info(f"Initializing Gemini LLM: {settings.gemini_model}")
+                    from models.llm_gemini import get_gemini_client
+                    client = get_gemini_client()
+                elif name == "local":
+                    logger.info(f"Loading local LLM: {settings.local_llm_model}")
+                    from models.llm import get_llm_model
+                    client = get_llm_model()
+                else:
+                    logger.warning(f"[LLM] Unknown provider '{name}' in LLM_PROVIDERS")
+                    continue
+                client.initialize()
+                providers.append((name, client))
+            except Exception as e:
+                logger.warning(f"Failed to load LLM provider {name}: {e}")
+        if not providers:
+            return None
+        _llm_router = LLMRouter(
+            providers,
+            hedge_delay_s=settings.llm_hedge_delay_s,
+            slow_call_s=settings.llm_slow_call_s,
+            failure_threshold=settings.llm_breaker_failures,
+            reset_after_s=settings.llm_breaker_reset_s,
+            cache=get_response_cache(),
+        )
+        logger.info(f"[LLM] Routing over {', '.join(_llm_router.provider_names)}")
+    return _llm_router
+
+
+def llm_router_stats() -> Optional[dict]:
+    """Stats for the global router, if it's been created"""
+    return _llm_router.stats() if _llm_router is not None else None
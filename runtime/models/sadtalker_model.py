@@ -20,6 +20,8 @@ from src.generate_batch import get_data
 from src.generate_facerender_batch import get_facerender_data
 from src.utils.init_path import init_path
 
+from utils.registration_cache import RegistrationCache, image_content_hash
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,6 +37,8 @@ class SadTalkerModel:
         self.audio_to_coeff = None
         self.animate_from_coeff = None
         self.sadtalker_paths = None
+        # 3DMM coefficients + crop per reference image, kept on disk across requests
+        self.registration_cache = RegistrationCache("sadtalker", on_evict=self._remove_source_dir)
         self._ready = False
         
     def initialize(self):
@@ -85,6 +89,57 @@ class SadTalkerModel:
         """Check if model is initialized and ready"""
         return self._ready
     
+    @staticmethod
+    def _remove_source_dir(source: dict):
+        """Delete the first_frame dir of an evicted registration"""
+        import shutil
+        shutil.rmtree(source["first_frame_dir"], ignore_errors=True)
+    
+    def extract_source(self, reference_image_path: str, cache_root: Path, pic_size: int = 256) -> dict:
+        """
+        Extract (or reuse) 3DMM coefficients and the cropped face for an image.
+        
+        Args:
+            reference_image_path: Path to reference face image
+            cache_root: Directory to keep extracted first frames in
+            pic_size: Crop size
+            
+        Returns:
+            Dict with first_coeff_path, crop_pic_path, crop_info and first_frame_dir
+        """
+        params = {"crop_or_resize": "crop", "pic_size": pic_size}
+        
+        def extract() -> dict:
+            logger.info("Extracting 3DMM from source image...")
+            key_hash = image_content_hash(reference_image_path)[:16]
+            first_frame_dir = cache_root / f"first_frame_{key_hash}_{pic_size}"
+            first_frame_dir.mkdir(exist_ok=True, parents=True)
+            
+            first_coeff_path, crop_pic_path, crop_info = self.preprocess_model.generate(
+                reference_image_path,
+                str(first_frame_dir),
+                crop_or_resize='crop',
+                source_image_flag=True,
+                pic_size=pic_size
+            )
+            
+            if first_coeff_path is None:
+                raise RuntimeError("Failed to extract face coefficients from image")
+            
+            return {
+                "first_coeff_path": first_coeff_path,
+                "crop_pic_path": crop_pic_path,
+                "crop_info": crop_info,
+                "first_frame_dir": str(first_frame_dir),
+            }
+        
+        return self.registration_cache.get_or_create(
+            reference_image_path,
+            extract,
+            validate=lambda source: os.path.exists(source["first_coeff_path"]) and os.path.exists(source["crop_pic_path"]),
+            **params
+        )
+    
     def generate_video(
         self,
         audio_path: str,
@@ -120,21 +175,16 @@ class SadTalkerModel:
             save_dir = Path(output_path).parent / f"sadtalker_tmp_{int(time.time())}"
             save_dir.mkdir(exist_ok=True, parents=True)
             
-            # Step 1: Extract 3DMM from source image
-            logger.info("Extracting 3DMM from source image...")
-            first_frame_dir = save_dir / "first_frame_dir"
-            first_frame_dir.mkdir(exist_ok=True)
-            
-            first_coeff_path, crop_pic_path, crop_info = self.preprocess_model.generate(
+            # Step 1: Extract 3DMM from source image (cached per image; kept outside
+            # save_dir, which is deleted after every request)
+            source = self.extract_source(
                 reference_image_path,
-                str(first_frame_dir),
-                crop_or_resize='crop',
-                source_image_flag=True,
+                cache_root=Path(output_path).parent / "sadtalker_sources",
                 pic_size=256
             )
-            
-            if first_coeff_path is None:
-                raise RuntimeError("Failed to extract face coefficients from image")
+            first_coeff_path = source["first_coeff_path"]
+            crop_pic_path = source["crop_pic_path"]
+            crop_info = source["crop_info"]
             
             # Step 2: Generate coefficients from audio
             logger.info("Generating motion coefficients from audio...")
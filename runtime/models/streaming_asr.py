@@ -0,0 +1,317 @@
+"""
+Streaming ASR
+Transcribes live PCM while the user is still talking: Silero's VADIterator
+finds where speech starts and stops, and Whisper runs on each closed speech
+segment as soon as it closes, so the final text is ready a few hundred ms
+after the user stops
+
+Partial transcripts of the still-open segment are emitted while speech
+continues.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.asr import ASRModel
+from models.asr_batcher import get_asr_batcher
+from utils.audio import ASR_SAMPLE_RATE as SAMPLE_RATE
+from utils.stage_executor import get_stage_executor
+
+logger = logging.getLogger(__name__)
+
+# Silero VAD takes fixed 32ms windows at 16kHz
+VAD_WINDOW_SAMPLES = 512
+# Whisper's context is 30s; force a segment boundary before that
+MAX_SEGMENT_S = 25.0
+
+
+@dataclass
+class SpeechSegment:
+    """Speech to transcribe: closed (final) or the open one so far (partial)"""
+    index: int
+    start_sample: int
+    end_sample: int
+    audio: np.ndarray
+    final: bool
+    closed_at: float
+
+
+class StreamingRecognizer:
+    """
+    One streaming ASR session.
+
+    Feed it 16kHz mono float32 frames of any length (20-100ms is typical);
+    it buffers them into VAD windows and cuts speech segments at pauses of
+    min_silence_ms. stream() drives a whole session from an async source of
+    frames and yields transcript events.
+
+    Usage:
+        recognizer = StreamingRecognizer(asr_model, language="en")
+        async for event in recognizer.stream(frames):
+            ...
+    """
+
+    def __init__(
+        self,
+        asr_model: ASRModel,
+        language: Optional[str] = None,
+        threshold: float = 0.5,
+        min_silence_ms: int = 400,
+        speech_pad_ms: int = 100,
+        partial_interval_ms: int = 1000,
+        beam_size: int = 5,
+        partial_beam_size: int = 1,
+    ):
+        """
+        Initialize recognizer.
+
+        Args:
+            asr_model: Initialized ASR model (Whisper + VAD)
+            language: Source language code (None = detect on the first segment)
+            threshold: VAD speech probability threshold
+            min_silence_ms: Pause that ends a segment (lower = faster finals,
+                more mid-sentence cuts)
+            speech_pad_ms: Audio kept either side of detected speech
+            partial_interval_ms: Minimum gap between partial transcripts (0 = no partials)
+            beam_size: Beam size for final transcripts
+            partial_beam_size: Beam size for partial transcripts
+        """
+        if not asr_model.is_ready():
+            raise RuntimeError("ASR model not initialized")
+        vad = asr_model.create_vad_iterator(threshold, min_silence_ms, speech_pad_ms)
+        if vad is None:
+            raise RuntimeError("Streaming ASR needs Silero VAD, which failed to load")
+
+        self.asr_model = asr_model
+        self.language = language
+        self.partial_interval_s = partial_interval_ms / 1000
+        self.beam_size = beam_size
+        self.partial_beam_size = partial_beam_size
+        self.speech_pad_samples = SAMPLE_RATE * speech_pad_ms // 1000
+        self.max_segment_samples = int(MAX_SEGMENT_S * SAMPLE_RATE)
+
+        self._vad = vad
+
+        # Audio not yet needed is dropped; _audio[0] is absolute sample _audio_offset
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._audio_offset = 0
+        self._processed = 0  # Samples run through VAD
+        self._speech_start: Optional[int] = None
+        self._segment_index = 0
+
+    # ------------------------------------------------------------------
+    # VAD (blocking, cheap: ~1ms per 100ms of audio)
+    # ------------------------------------------------------------------
+
+    @property
+    def in_speech(self) -> bool:
+        return self._speech_start is not None
+
+    def process_audio(self, samples: np.ndarray) -> List[Tuple[str, Any]]:
+        """
+        Add samples and run VAD over every complete window.
+
+        Args:
+            samples: 16kHz mono float32 samples
+
+        Returns:
+            ("speech_start", seconds) and ("segment", SpeechSegment) items, in order
+        """
+        self._audio = np.concatenate([self._audio, np.asarray(samples, dtype=np.float32)])
+        available = self._audio_offset + len(self._audio)
+        results: List[Tuple[str, Any]] = []
+
+        while self._processed + VAD_WINDOW_SAMPLES <= available:
+            offset = self._processed - self._audio_offset
+            window = self._audio[offset:offset + VAD_WINDOW_SAMPLES]
+            boundary = self._vad(window, return_seconds=False)
+            self._processed += VAD_WINDOW_SAMPLES
+
+            if boundary and "start" in boundary and self._speech_start is None:
+                self._speech_start = max(int(boundary["start"]), self._audio_offset)
+                results.append(("speech_start", self._speech_start / SAMPLE_RATE))
+            elif boundary and "end" in boundary and self._speech_start is not None:
+                end = min(int(boundary["end"]), available)
+                results.append(("segment", self._close_segment(end)))
+                self._speech_start = None
+            elif self._speech_start is not None and self._processed - self._speech_start >= self.max_segment_samples:
+                # Long monologue: cut here and keep going (VAD stays triggered)
+                results.append(("segment", self._close_segment(self._processed)))
+                self._speech_start = self._processed
+
+        # Keep only what a future segment can still need
+        keep_from = self._speech_start if self._speech_start is not None else self._processed - self.speech_pad_samples
+        drop = max(0, keep_from - self._audio_offset)
+        if drop:
+            self._audio = self._audio[drop:]
+            self._audio_offset += drop
+        return results
+
+    def open_segment(self) -> Optional[SpeechSegment]:
+        """The speech heard so far in the current segment (for a partial transcript)"""
+        if self._speech_start is None:
+            return None
+        return self._segment(self._speech_start, self._processed, final=False)
+
+    def flush(self) -> Optional[SpeechSegment]:
+        """End of audio: close the open segment, if any, and reset VAD"""
+        segment = None
+        if self._speech_start is not None:
+            segment = self._close_segment(self._audio_offset + len(self._audio))
+            self._speech_start = None
+        self._vad.reset_states()
+        return segment
+
+    def _close_segment(self, end: int) -> SpeechSegment:
+        segment = self._segment(self._speech_start, end, final=True)
+        self._segment_index += 1
+        return segment
+
+    def _segment(self, start: int, end: int, final: bool) -> SpeechSegment:
+        audio = self._audio[start - self._audio_offset:end - self._audio_offset].copy()
+        return SpeechSegment(self._segment_index, start, end, audio, final, time.time())
+
+    # ------------------------------------------------------------------
+    # Whisper
+    # ------------------------------------------------------------------
+
+    async def transcribe_segment(self, segment: SpeechSegment) -> Tuple[str, dict]:
+        """Run Whisper on one segment (VAD has already trimmed it)"""
+        # Segments from concurrent sessions share Whisper batches
+        return await get_asr_batcher(self.asr_model).transcribe(
+            segment.audio,
+            language=self.language,
+            beam_size=self.beam_size if segment.final else self.partial_beam_size,
+            vad_filter=False,
+        )
+
+    async def stream(self, frames: AsyncIterator[np.ndarray]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a session: VAD on frames as they arrive, Whisper on segments as
+        they close, without one waiting on the other.
+
+        Args:
+            frames: 16kHz mono float32 frames; the session ends when it's exhausted
+
+        Yields:
+            {"type": ..., "data": {...}} events:
+            - speech_start: VAD heard speech begin
+            - partial: transcript including the still-open segment (may change)
+            - final: a closed segment's text (won't change) and the transcript so far
+            - complete: the full transcript, after the last final
+        """
+        vad_stage = get_stage_executor("vad")
+        segments: asyncio.Queue = asyncio.Queue()
+        events: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        finals: List[str] = []
+        busy = {"transcribing": False}
+        session_start = time.time()
+
+        async def read_frames():
+            last_partial = 0.0
+            audio_seconds = 0.0
+            try:
+                async for samples in frames:
+                    audio_seconds += len(samples) / SAMPLE_RATE
+                    for kind, value in await vad_stage.run(self.process_audio, samples):
+                        if kind == "speech_start":
+                            await events.put({"type": "speech_start", "data": {"audio_time": value}})
+                        else:
+                            await segments.put(value)
+
+                    # Partial only when Whisper is idle, so finals never queue behind one
+                    now = time.time()
+                    if (self.partial_interval_s and self.in_speech and not busy["transcribing"]
+                            and segments.empty() and now - last_partial >= self.partial_interval_s):
+                        segment = self.open_segment()
+                        if segment is not None and len(segment.audio) >= VAD_WINDOW_SAMPLES * 8:
+                            last_partial = now
+                            await segments.put(segment)
+
+                segment = self.flush()
+                if segment is not None:
+                    await segments.put(segment)
+                logger.info(f"[ASR] Stream ended after {audio_seconds:.1f}s of audio")
+            except Exception as e:
+                await events.put(e)
+            finally:
+                await segments.put(None)
+
+        async def transcribe():
+            try:
+                while True:
+                    segment = await segments.get()
+                    if segment is None:
+                        break
+                    if not segment.final and not segments.empty():
+                        continue  # Stale partial: newer audio is already queued
+                    busy["transcribing"] = True
+                    try:
+                        text, metadata = await self.transcribe_segment(segment)
+                    finally:
+                        busy["transcribing"] = False
+                    text = text.strip()
+                    if self.language is None and segment.final and text:
+                        # Keep later segments in the language of the first one
+                        self.language = metadata.get("language")
+
+                    committed = " ".join(finals)
+                    if not segment.final:
+                        await events.put({
+                            "type": "partial",
+                            "data": {
+                                "text": " ".join(t for t in (committed, text) if t),
+                                "segment_index": segment.index,
+                                "segment_text": text,
+                            }
+                        })
+                        continue
+
+                    if text:
+                        finals.append(text)
+                    latency_ms = (time.time() - segment.closed_at) * 1000
+                    logger.info(f"[ASR] Segment {segment.index} final {latency_ms:.0f}ms after end of speech: '{text[:50]}'")
+                    await events.put({
+                        "type": "final",
+                        "data": {
+                            "text": " ".join(finals),
+                            "segment_index": segment.index,
+                            "segment_text": text,
+                            "start": segment.start_sample / SAMPLE_RATE,
+                            "end": segment.end_sample / SAMPLE_RATE,
+                            "language": metadata.get("language", self.language),
+                            "latency_ms": latency_ms,
+                        }
+                    })
+            except Exception as e:
+                await events.put(e)
+            finally:
+                await events.put(finished)
+
+        tasks = [asyncio.create_task(read_frames()), asyncio.create_task(transcribe())]
+        try:
+            while True:
+                event = await events.get()
+                if event is finished:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+            yield {
+                "type": "complete",
+                "data": {
+                    "text": " ".join(finals),
+                    "language": self.language,
+                    "num_segments": self._segment_index,
+                    "session_time": time.time() - session_start,
+                }
+            }
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -16,6 +16,8 @@ import torch
 import torchaudio
 import numpy as np
 
+from utils.artifacts import scratch_dir
+
 logger = logging.getLogger(__name__)
 
 
@@ -145,7 +147,7 @@ class StyleTTS2Model:
         try:
             # Create output path if not provided
             if output_path is None:
-                output_path = tempfile.mktemp(suffix=".wav")
+                output_path = tempfile.mktemp(suffix=".wav", dir=scratch_dir())
             
             # Load reference audio if provided
             ref_embedding = None
@@ -234,7 +236,7 @@ class StyleTTS2Model:
             List of output audio file paths
         """
         if output_dir is None:
-            output_dir = tempfile.mkdtemp()
+            output_dir = tempfile.mkdtemp(dir=scratch_dir())
         os.makedirs(output_dir, exist_ok=True)
         
         outputs = []
@@ -277,7 +279,7 @@ class StyleTTS2Model:
         
         # Save embedding
         if output_embedding_path is None:
-            output_embedding_path = tempfile.mktemp(suffix=".pt")
+            output_embedding_path = tempfile.mktemp(suffix=".pt", dir=scratch_dir())
         
         torch.save(avg_embedding, output_embedding_path)
         logger.info(f"Voice embedding saved to {output_embedding_path}")
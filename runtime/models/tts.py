@@ -4,6 +4,7 @@ Manages XTTS-v2 multilingual TTS with voice cloning
 """
 import os
 import time
+import numpy as np
 import torch
 import logging
 from typing import Optional, Tuple
@@ -22,6 +23,7 @@ torch.load = _patched_torch_load
 
 from TTS.api import TTS
 from config import settings
+from models.voice_profiles import VoiceProfileRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,7 @@ class XTTSModel:
     def __init__(self):
         self.model: Optional[TTS] = None
         self.device = settings.device
+        self.voice_profiles: Optional[VoiceProfileRegistry] = None
         self._initialized = False
         
     def initialize(self):
@@ -54,6 +57,14 @@ class XTTSModel:
             if self.device == "cuda":
                 self.model.to(self.device)
             
+            # Speaker latents are computed once per reference audio and reused
+            self.voice_profiles = VoiceProfileRegistry(
+                compute_latents=self._compute_latents,
+                cache_dir=settings.voice_profile_dir,
+                max_entries=settings.voice_profile_cache_size,
+                device=self.device
+            )
+            
             self._initialized = True
             elapsed = time.time() - start_time
             logger.info(f"XTTS-v2 model loaded in {elapsed:.2f}s")
@@ -66,24 +77,86 @@ class XTTSModel:
         """Check if model is initialized"""
         return self._initialized and self.model is not None
     
-    def synthesize(
+    def _resolve_language(self, language: str) -> str:
+        """Map language codes to XTTS language codes"""
+        lang_map = {
+            "en": "en",
+            "zh": "zh-cn",
+            "zh-cn": "zh-cn",
+            "es": "es"
+        }
+        return lang_map.get(language, "en")
+    
+    def _resolve_speaker_wav(self, speaker_wav: Optional[str], lang_code: str) -> Optional[str]:
+        """Fall back to the language-specific reference sample if none was given"""
+        if speaker_wav:
+            return speaker_wav
+        
+        # Look for language-specific reference sample
+        ref_samples_dir = settings.voice_samples_dir
+        if os.path.exists(ref_samples_dir):
+            # Try to find language-specific sample
+            possible_files = [
+                f"bruce_{lang_code.split('-')[0]}_sample.wav",
+                f"bruce_{lang_code}_sample.wav",
+                "bruce_en_sample.wav"  # Fallback to English
+            ]
+            for filename in possible_files:
+                candidate = os.path.join(ref_samples_dir, filename)
+                if os.path.exists(candidate):
+                    logger.info(f"Using reference sample: {filename}")
+                    return candidate
+        return None
+    
+    @property
+    def xtts(self):
+        """Underlying Xtts model (for latents + inference)"""
+        return self.model.synthesizer.tts_model
+    
+    def _compute_latents(self, speaker_wav: str):
+        """Compute (gpt_cond_latent, speaker_embedding) from reference audio"""
+        with torch.inference_mode():
+            return self.xtts.get_conditioning_latents(audio_path=[speaker_wav])
+    
+    def register_voice(self, speaker_wav: str, voice_id: Optional[str] = None) -> dict:
+        """
+        Register reference audio as a reusable voice profile.
+        
+        Args:
+            speaker_wav: Path to reference speaker audio
+            voice_id: Name for the voice (default: derived from the filename)
+            
+        Returns:
+            Voice profile dict (voice_id, source_path, content_hash, created_at)
+        """
+        if not self.is_ready():
+            self.initialize()
+        return self.voice_profiles.register(speaker_wav, voice_id=voice_id).to_dict()
+    
+    @property
+    def sample_rate(self) -> int:
+        """Output sample rate of the loaded model (24kHz for XTTS-v2)"""
+        synthesizer = getattr(self.model, "synthesizer", None)
+        return getattr(synthesizer, "output_sample_rate", None) or 24000
+    
+    def synthesize_array(
         self,
         text: str,
         language: str = "en",
         speaker_wav: Optional[str] = None,
-        output_path: Optional[str] = None
-    ) -> tuple[str, float]:
+        voice_id: Optional[str] = None
+    ) -> Tuple[np.ndarray, int, float]:
         """
-        Synthesize speech from text.
+        Synthesize speech from text and keep the waveform in memory.
         
         Args:
             text: Text to synthesize
             language: Language code (en, zh-cn, es, etc.)
             speaker_wav: Path to reference speaker audio (for voice cloning)
-            output_path: Output audio file path
+            voice_id: Registered voice profile (instead of speaker_wav)
             
         Returns:
-            Tuple of (output_path, duration_ms)
+            Tuple of (waveform float32, sample_rate, duration_ms)
         """
         if not self.is_ready():
             self.initialize()
@@ -91,74 +164,95 @@ class XTTSModel:
         start_time = time.time()
         
         try:
-            # Map language codes
-            lang_map = {
-                "en": "en",
-                "zh": "zh-cn",
-                "zh-cn": "zh-cn",
-                "es": "es"
-            }
-            lang_code = lang_map.get(language, "en")
-            
-            # If no speaker wav provided, try to find default reference
-            if not speaker_wav:
-                # Look for language-specific reference sample
-                ref_samples_dir = settings.voice_samples_dir
-                if os.path.exists(ref_samples_dir):
-                    # Try to find language-specific sample
-                    possible_files = [
-                        f"bruce_{lang_code.split('-')[0]}_sample.wav",
-                        f"bruce_{lang_code}_sample.wav",
-                        "bruce_en_sample.wav"  # Fallback to English
-                    ]
-                    for filename in possible_files:
-                        candidate = os.path.join(ref_samples_dir, filename)
-                        if os.path.exists(candidate):
-                            speaker_wav = candidate
-                            logger.info(f"Using reference sample: {filename}")
-                            break
+            lang_code = self._resolve_language(language)
+            if not voice_id:
+                speaker_wav = self._resolve_speaker_wav(speaker_wav, lang_code)
+                if not speaker_wav or not os.path.exists(speaker_wav):
+                    # No voice cloning - would need a speaker name
+                    raise ValueError("speaker_wav or voice_id is required for XTTS voice cloning")
             
-            # Generate output path if not provided
-            if not output_path:
-                os.makedirs(settings.output_dir, exist_ok=True)
-                output_path = os.path.join(
-                    settings.output_dir,
-                    f"tts_output_{int(time.time() * 1000)}.wav"
-                )
+            logger.info(f"Synthesizing: lang={lang_code}, text_len={len(text)}, voice_id={voice_id}, speaker_wav={speaker_wav}")
             
-            logger.info(f"Synthesizing: lang={lang_code}, text_len={len(text)}, speaker_wav={speaker_wav}")
+            # Cached speaker latents (computed once per reference audio)
+            latents_start = time.time()
+            gpt_cond_latent, speaker_embedding = self.voice_profiles.get_latents(
+                speaker_wav=speaker_wav,
+                voice_id=voice_id
+            )
+            logger.info(f"[PERF] Speaker latents: {(time.time() - latents_start) * 1000:.0f}ms")
             
-            # Synthesize with XTTS-v2
-            # When using speaker_wav for voice cloning, XTTS checks for speaker param first
-            # We must explicitly pass speaker=None when using speaker_wav
-            if speaker_wav and os.path.exists(speaker_wav):
-                self.model.tts_to_file(
-                    text=text,
-                    file_path=output_path,
-                    speaker=None,
-                    speaker_wav=speaker_wav,
-                    language=lang_code,
-                    split_sentences=True
+            # Synthesize with XTTS-v2 directly from the latents
+            with torch.inference_mode():
+                out = self.xtts.inference(
+                    text,
+                    lang_code,
+                    gpt_cond_latent,
+                    speaker_embedding,
+                    enable_text_splitting=True
                 )
-            else:
-                # No voice cloning - would need a speaker name
-                raise ValueError("speaker_wav is required for XTTS voice cloning")
             
+            wav = out["wav"]
+            if torch.is_tensor(wav):
+                wav = wav.cpu().numpy()
+            wav = np.asarray(wav, dtype=np.float32)
             duration_ms = (time.time() - start_time) * 1000
             
-            # Get actual audio duration
-            import soundfile as sf
-            audio_data, sample_rate = sf.read(output_path)
-            audio_duration_s = len(audio_data) / sample_rate
-            
-            logger.info(f"TTS completed in {duration_ms:.0f}ms, audio duration: {audio_duration_s:.2f}s")
-            
-            return output_path, duration_ms, audio_duration_s
+            return wav, self.sample_rate, duration_ms
             
         except Exception as e:
             logger.error(f"TTS synthesis failed: {e}", exc_info=True)
             raise
     
+    def synthesize(
+        self,
+        text: str,
+        language: str = "en",
+        speaker_wav: Optional[str] = None,
+        output_path: Optional[str] = None,
+        voice_id: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> tuple[str, float, float]:
+        """
+        Synthesize speech from text.
+        
+        Args:
+            text: Text to synthesize
+            language: Language code (en, zh-cn, es, etc.)
+            speaker_wav: Path to reference speaker audio (for voice cloning)
+            output_path: Output audio file path
+            voice_id: Registered voice profile (instead of speaker_wav)
+            job_id: Job the output belongs to (prefixes the default output name)
+            
+        Returns:
+            Tuple of (output_path, duration_ms, audio_duration_s)
+        """
+        start_time = time.time()
+        
+        wav, sample_rate, _ = self.synthesize_array(
+            text=text,
+            language=language,
+            speaker_wav=speaker_wav,
+            voice_id=voice_id
+        )
+        
+        # Generate output path if not provided
+        if not output_path:
+            os.makedirs(settings.output_dir, exist_ok=True)
+            output_path = os.path.join(
+                settings.output_dir,
+                f"{job_id + '_' if job_id else ''}tts_output_{int(time.time() * 1000)}.wav"
+            )
+        
+        import soundfile as sf
+        sf.write(output_path, wav, sample_rate)
+        
+        duration_ms = (time.time() - start_time) * 1000
+        audio_duration_s = len(wav) / sample_rate
+        
+        logger.info(f"TTS completed in {duration_ms:.0f}ms, audio duration: {audio_duration_s:.2f}s")
+        
+        return output_path, duration_ms, audio_duration_s
+    
     def cleanup(self):
         """Cleanup model resources"""
         if self.model:
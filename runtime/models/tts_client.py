@@ -58,7 +58,9 @@ class XTTSClient:
         text: str,
         language: str = "en",
         speaker_wav: Optional[str] = None,
-        output_path: Optional[str] = None
+        output_path: Optional[str] = None,
+        voice_id: Optional[str] = None,
+        job_id: Optional[str] = None
     ) -> tuple[str, float, float]:
         """
         Synthesize speech from text using GPU service.
@@ -68,6 +70,9 @@ class XTTSClient:
             language: Language code (en, zh-cn, es, etc.)
             speaker_wav: Path to reference speaker audio (for voice cloning)
             output_path: Output audio file path
+            voice_id: Voice profile registered on the GPU service (instead of speaker_wav)
+            job_id: Job the output belongs to; the GPU service names the file after it
+                and keeps the job's outputs out of cleanup while it's in use
             
         Returns:
             Tuple of (output_path, generation_time_ms, audio_duration_s)
@@ -88,7 +93,7 @@ class XTTSClient:
             lang_code = lang_map.get(language, "en")
             
             # If no speaker wav provided, try to find default reference
-            if not speaker_wav:
+            if not speaker_wav and not voice_id:
                 # Look for language-specific reference sample
                 ref_samples_dir = settings.voice_samples_dir
                 if os.path.exists(ref_samples_dir):
@@ -124,7 +129,9 @@ class XTTSClient:
                 "text": text,
                 "language": lang_code,
                 "speaker_wav": speaker_wav,
-                "output_path": output_path
+                "voice_id": voice_id,
+                "output_path": output_path,
+                "job_id": job_id
             }
             
             response = await self._client.post(
@@ -161,6 +168,41 @@ class XTTSClient:
             logger.error(f"TTS synthesis failed: {e}", exc_info=True)
             raise
     
+    async def register_voice(self, speaker_wav: str, voice_id: Optional[str] = None) -> str:
+        """
+        Register reference audio as a voice profile on the GPU service.
+        
+        The service computes the speaker latents once and persists them, so later
+        requests can pass voice_id instead of re-conditioning on the file.
+        
+        Args:
+            speaker_wav: Path to reference speaker audio (shared /app/assets mount)
+            voice_id: Name for the voice (default: derived from the filename)
+            
+        Returns:
+            The registered voice_id
+        """
+        if not self.is_ready():
+            self.initialize()
+        
+        try:
+            response = await self._client.post(
+                f"{self.service_url}/voices/register",
+                json={"speaker_wav": speaker_wav, "voice_id": voice_id},
+            )
+            response.raise_for_status()
+            
+            result = response.json()
+            if not result.get("success"):
+                raise RuntimeError(f"Voice registration failed: {result.get('error')}")
+            
+            logger.info(f"Registered voice '{result['voice_id']}' in {result.get('registration_time_ms', 0):.0f}ms")
+            return result["voice_id"]
+            
+        except httpx.HTTPError as e:
+            logger.error(f"GPU service request failed: {e}")
+            raise RuntimeError(f"Failed to communicate with GPU service") from e
+    
     async def cleanup(self):
         """Cleanup async client"""
         await self._client.aclose()
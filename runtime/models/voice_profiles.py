@@ -0,0 +1,258 @@
+"""
+Voice profile registry for XTTS
+Computes speaker conditioning latents once per reference audio and reuses them
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+
+from utils.artifacts import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# (gpt_cond_latent, speaker_embedding)
+Latents = Tuple[torch.Tensor, torch.Tensor]
+
+
+@dataclass
+class VoiceProfile:
+    """A registered voice: reference audio plus its conditioning latents"""
+    voice_id: str
+    source_path: str
+    content_hash: str
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return {
+            "voice_id": self.voice_id,
+            "source_path": self.source_path,
+            "content_hash": self.content_hash,
+            "created_at": self.created_at,
+        }
+
+
+class VoiceProfileRegistry:
+    """
+    Speaker-conditioning cache for XTTS.
+
+    `get_conditioning_latents` is the expensive part of voice cloning and only
+    depends on the reference audio, so latents are computed once per reference
+    file content hash, kept in an in-memory LRU and persisted to disk (restarts
+    start warm). Registered voices get a `voice_id` that clients can use
+    instead of a file path.
+    """
+
+    def __init__(
+        self,
+        compute_latents: Callable[[str], Latents],
+        cache_dir: str,
+        max_entries: int = 16,
+        device: str = "cpu",
+    ):
+        """
+        Initialize registry.
+
+        Args:
+            compute_latents: Computes (gpt_cond_latent, speaker_embedding) for an audio path
+            cache_dir: Directory for persisted latents and the voice index
+            max_entries: Latents kept in memory
+            device: Device latents are moved to when loaded from disk
+        """
+        self.compute_latents = compute_latents
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, max_entries)
+        self.device = device
+
+        self._latents: "OrderedDict[str, Latents]" = OrderedDict()
+        self._profiles: Dict[str, VoiceProfile] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    # ------------------------------------------------------------------
+    # Voice IDs
+    # ------------------------------------------------------------------
+
+    def register(self, speaker_wav: str, voice_id: Optional[str] = None) -> VoiceProfile:
+        """
+        Register a reference audio file as a named voice (computing its latents).
+
+        Args:
+            speaker_wav: Path to reference audio (WAV/MP3)
+            voice_id: Name for the voice (default: derived from the filename)
+
+        Returns:
+            The registered VoiceProfile
+        """
+        if not os.path.exists(speaker_wav):
+            raise FileNotFoundError(f"Reference audio not found: {speaker_wav}")
+
+        voice_id = voice_id or self._default_voice_id(speaker_wav)
+        content_hash = file_sha256(speaker_wav)
+        self._latents_for_hash(content_hash, speaker_wav)
+
+        profile = VoiceProfile(voice_id=voice_id, source_path=speaker_wav, content_hash=content_hash)
+        with self._lock:
+            self._profiles[voice_id] = profile
+        self._save_index()
+
+        logger.info(f"Registered voice '{voice_id}' ({os.path.basename(speaker_wav)}, {content_hash[:12]})")
+        return profile
+
+    def get_profile(self, voice_id: str) -> VoiceProfile:
+        """Look up a registered voice"""
+        with self._lock:
+            profile = self._profiles.get(voice_id)
+        if profile is None:
+            raise KeyError(f"Unknown voice_id: {voice_id}")
+        return profile
+
+    def list_profiles(self) -> List[dict]:
+        """All registered voices"""
+        with self._lock:
+            return [p.to_dict() for p in self._profiles.values()]
+
+    # ------------------------------------------------------------------
+    # Latents
+    # ------------------------------------------------------------------
+
+    def get_latents(
+        self,
+        speaker_wav: Optional[str] = None,
+        voice_id: Optional[str] = None,
+    ) -> Latents:
+        """
+        Conditioning latents for a registered voice or a reference audio path.
+
+        Args:
+            speaker_wav: Path to reference audio
+            voice_id: Registered voice (takes precedence over speaker_wav)
+
+        Returns:
+            Tuple of (gpt_cond_latent, speaker_embedding)
+        """
+        if voice_id:
+            profile = self.get_profile(voice_id)
+            return self._latents_for_hash(profile.content_hash, profile.source_path)
+
+        if not speaker_wav:
+            raise ValueError("speaker_wav or voice_id is required")
+        return self._latents_for_hash(file_sha256(speaker_wav), speaker_wav)
+
+    def stats(self) -> dict:
+        """Cache counters for monitoring"""
+        with self._lock:
+            return {
+                "voices": len(self._profiles),
+                "entries": len(self._latents),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _latents_for_hash(self, content_hash: str, source_path: str) -> Latents:
+        """Memory LRU → disk → compute"""
+        with self._lock:
+            latents = self._latents.get(content_hash)
+            if latents is not None:
+                self._latents.move_to_end(content_hash)
+                self.hits += 1
+                return latents
+
+        latents = self._load_latents(content_hash)
+        if latents is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            start = time.time()
+            latents = self.compute_latents(source_path)
+            self._save_latents(content_hash, latents)
+            with self._lock:
+                self.misses += 1
+            logger.info(
+                f"[PERF] Speaker latents computed for {os.path.basename(source_path)} "
+                f"in {(time.time() - start) * 1000:.0f}ms"
+            )
+
+        with self._lock:
+            self._latents[content_hash] = latents
+            self._latents.move_to_end(content_hash)
+            while len(self._latents) > self.max_entries:
+                self._latents.popitem(last=False)
+        return latents
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _latents_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.pt")
+
+    def _load_latents(self, content_hash: str) -> Optional[Latents]:
+        path = self._latents_path(content_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            data = torch.load(path, map_location=self.device)
+            return data["gpt_cond_latent"], data["speaker_embedding"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable latents {path}: {e}")
+            return None
+
+    def _save_latents(self, content_hash: str, latents: Latents):
+        path = self._latents_path(content_hash)
+        tmp_path = f"{path}.tmp"
+        gpt_cond_latent, speaker_embedding = latents
+        try:
+            torch.save(
+                {
+                    "gpt_cond_latent": gpt_cond_latent.detach().cpu(),
+                    "speaker_embedding": speaker_embedding.detach().cpu(),
+                },
+                tmp_path,
+            )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to persist speaker latents: {e}")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, "voices.json")
+
+    def _load_index(self):
+        path = self._index_path()
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                entries: List[Dict[str, Any]] = json.load(f)
+            for entry in entries:
+                self._profiles[entry["voice_id"]] = VoiceProfile(**entry)
+            logger.info(f"Loaded {len(self._profiles)} voice profiles from {path}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable voice index {path}: {e}")
+
+    def _save_index(self):
+        path = self._index_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.list_profiles(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _default_voice_id(speaker_wav: str) -> str:
+        """bruce_en_sample.wav -> bruce_en_sample"""
+        stem = os.path.splitext(os.path.basename(speaker_wav))[0]
+        return re.sub(r"[^A-Za-z0-9_-]+", "_", stem)
@@ -5,15 +5,18 @@ Chains Audio → ASR → LLM → TTS → Video for interactive conversations
 
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 import time
 import asyncio
 
+import numpy as np
+
 from models.asr import ASRModel
-from models.llm import LLMModel
-from models.llm_gemini import GeminiClient
+from models.asr_batcher import get_asr_batcher
+from models.llm_router import LLMRouter, get_llm_router
 from pipelines.phase1_script import Phase1Pipeline
-from config import settings
+from utils.session_store import get_session_store, session_context
+from utils.stage_executor import get_stage_executor
 
 logger = logging.getLogger(__name__)
 
@@ -54,15 +57,9 @@ class ConversationPipeline:
 
         # Models (lazy loaded)
         self.asr_model: Optional[ASRModel] = None
-        self.llm_model: Optional[LLMModel] = None
-        self.gemini_client: Optional[GeminiClient] = None
+        self.llm: Optional[LLMRouter] = None
         self.phase1_pipeline: Optional[Phase1Pipeline] = None  # For TTS + Video
 
-        # System prompt for conversational LLM
-        self.system_prompt = """You are Bruce, a helpful and friendly AI assistant. 
-Keep your responses concise (1-3 sentences) and conversational. 
-Be natural, warm, and engaging in your communication style."""
-
         logger.info(f"ConversationPipeline initialized (device={device}, tensorrt={use_tensorrt})")
 
     def initialize(self):
@@ -78,42 +75,24 @@ Be natural, warm, and engaging in your communication style."""
             self.asr_model = ASRModel(device=self.device, compute_type=compute_type)
             self.asr_model.initialize()
 
-        # Initialize LLM (Gemini API or local Qwen)
-        if settings.use_gemini_llm:
-            if self.gemini_client is None:
-                try:
-                    logger.info(f"Initializing Gemini LLM: {settings.gemini_model}")
-                    self.gemini_client = GeminiClient(
-                        model_name=settings.gemini_model,
-                        project_id=settings.gemini_project,
-                        location=settings.gemini_location
-                    )
-                    self.gemini_client.initialize()
-                except Exception as e:
-                    logger.warning(f"Failed to load Gemini, will use fallback: {e}")
-                    self.gemini_client = None
-        else:
-            # Use local Qwen model
-            if self.llm_model is None:
-                try:
-                    logger.info("Loading LLM model (Qwen-2.5-7B)...")
-                    self.llm_model = LLMModel()
-                    self.llm_model.initialize()
-                except Exception as e:
-                    logger.warning(f"Failed to load LLM, will use fallback responses: {e}")
-                    self.llm_model = None
+        # Initialize LLM (Gemini and/or local Qwen, routed per LLM_PROVIDERS;
+        # the router is shared by both pipelines)
+        if self.llm is None:
+            self.llm = get_llm_router()
+            if self.llm is None:
+                logger.warning("No LLM provider loaded, will use fallback responses")
 
         # Note: TTS and Video models are loaded on-demand by phase1_script.run_pipeline()
 
         elapsed = time.time() - start_time
         logger.info(f"All models initialized in {elapsed:.2f}s")
 
-    def transcribe(self, audio_path: str, language: str = "en") -> Dict[str, Any]:
+    def transcribe(self, audio: Union[str, np.ndarray], language: str = "en") -> Dict[str, Any]:
         """
         Transcribe audio to text using ASR.
 
         Args:
-            audio_path: Path to audio file
+            audio: Path to audio file, or 16kHz mono float32 samples (decoded upload)
             language: Language code (en, zh, es)
 
         Returns:
@@ -123,11 +102,41 @@ Be natural, warm, and engaging in your communication style."""
             raise RuntimeError("Pipeline not initialized. Call initialize() first.")
 
         start_time = time.time()
-        logger.info(f"Transcribing audio: {audio_path}")
-
-        # ASR model returns (text, language, confidence) tuple
-        transcribe_result = self.asr_model.transcribe(audio_path, language=language)
+        if isinstance(audio, np.ndarray):
+            logger.info(f"Transcribing audio: {len(audio) / 16000:.2f}s in memory")
+            transcribe_result = self.asr_model.transcribe_array(audio, language=language)
+        else:
+            logger.info(f"Transcribing audio: {audio}")
+            # ASR model returns (text, language, confidence) tuple
+            transcribe_result = self.asr_model.transcribe(audio, language=language)
         
+        return self._transcription_result(transcribe_result, language, start_time)
+
+    async def transcribe_async(self, audio: Union[str, np.ndarray], language: str = "en") -> Dict[str, Any]:
+        """
+        Transcribe off the event loop: in-memory audio goes through the ASR
+        batcher (batched with concurrent requests, or to the ASR worker pool),
+        files run on the ASR stage.
+
+        Args:
+            audio: Path to audio file, or 16kHz mono float32 samples (decoded upload)
+            language: Language code (en, zh, es)
+
+        Returns:
+            Dict with 'text', 'language', and timing info (as transcribe())
+        """
+        if self.asr_model is None:
+            raise RuntimeError("Pipeline not initialized. Call initialize() first.")
+        if not isinstance(audio, np.ndarray):
+            return await get_stage_executor("asr").run(self.transcribe, audio, language=language)
+
+        start_time = time.time()
+        logger.info(f"Transcribing audio: {len(audio) / 16000:.2f}s in memory")
+        transcribe_result = await get_asr_batcher(self.asr_model).transcribe(audio, language=language)
+        return self._transcription_result(transcribe_result, language, start_time)
+
+    def _transcription_result(self, transcribe_result: tuple, language: str, start_time: float) -> Dict[str, Any]:
+        """Normalize an ASR result tuple into the transcription dict"""
         # Handle both tuple formats: (text, language, confidence) or (text, metadata)
         if isinstance(transcribe_result, tuple):
             if len(transcribe_result) == 3:
@@ -156,29 +165,42 @@ Be natural, warm, and engaging in your communication style."""
         logger.info(f"Transcription: '{result['text'][:100]}...' ({result['transcribe_time']:.2f}s)")
         return result
 
-    def generate_response(
+    async def generate_response(
         self,
         user_message: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
         max_tokens: int = 150,
         language: str = "en",
+        session_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Generate LLM response to user message.
 
+        The LLM router picks Gemini and/or the local model (hedging the
+        primary with the secondary, skipping providers whose circuit breaker
+        is open). Failures raise (see models.llm.LLMError) rather than
+        answering with placeholder text.
+
         Args:
             user_message: User's input text
             conversation_history: Optional list of {'role': 'user'/'assistant', 'content': '...'}
             max_tokens: Maximum response length
             language: Target response language (en, zh, es)
+            session_id: Use (and extend) this session's server-side context
+                instead of conversation_history (see utils.session_store)
 
         Returns:
             Dict with 'response' text and timing info
         """
         start_time = time.time()
         
-        # Check which LLM to use (Gemini or local)
-        llm_available = self.gemini_client or self.llm_model
+        if session_id:
+            conversation_history = await get_stage_executor("io").run(
+                session_context, session_id, conversation_history
+            )
+        
+        # Any LLM provider loaded?
+        llm_available = self.llm is not None
         
         # Fallback if no LLM available
         if not llm_available:
@@ -193,39 +215,23 @@ Be natural, warm, and engaging in your communication style."""
 
         logger.info(f"Generating LLM response for: '{user_message[:100]}...'")
 
-        # Use Gemini if available, otherwise use local Qwen
-        if self.gemini_client:
-            if conversation_history:
-                response = self.gemini_client.generate_with_history(
-                    prompt=user_message,
-                    conversation_history=conversation_history,
-                    max_tokens=max_tokens,
-                    language=language,
-                )
-            else:
-                response = self.gemini_client.generate_response(
-                    prompt=user_message,
-                    max_tokens=max_tokens,
-                    language=language,
-                )
-        else:
-            # Use local LLM
-            if conversation_history:
-                response = self.llm_model.generate_with_history(
-                    messages=conversation_history,
-                    system_prompt=self.system_prompt,
-                    max_new_tokens=max_tokens,
-                )
-            else:
-                response = self.llm_model.generate_response(
-                    prompt=user_message,
-                system_prompt=self.system_prompt,
-                max_new_tokens=max_tokens,
+        # Routed to Gemini and/or local Qwen (hedged, with fall-over)
+        response = await self.llm.generate_response(
+            prompt=user_message,
+            conversation_history=conversation_history,
+            max_tokens=max_tokens,
+            language=language,
+        )
+
+        if session_id:
+            await get_stage_executor("io").run(
+                get_session_store().add_exchange, session_id, user_message, response
             )
 
         result = {
             "response": response,
             "llm_time": time.time() - start_time,
+            "session_id": session_id,
         }
 
         logger.info(f"LLM response: '{response[:100]}...' ({result['llm_time']:.2f}s)")
@@ -272,10 +278,12 @@ Be natural, warm, and engaging in your communication style."""
 
     async def process_conversation(
         self,
-        audio_path: str,
+        audio_path: Optional[str] = None,
         conversation_history: Optional[List[Dict[str, str]]] = None,
         output_name: Optional[str] = None,
         language: str = "en",
+        audio_array: Optional[np.ndarray] = None,
+        session_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Full conversation pipeline: Audio → ASR → LLM → TTS → Video.
@@ -285,6 +293,8 @@ Be natural, warm, and engaging in your communication style."""
             conversation_history: Optional conversation context
             output_name: Base name for outputs (auto-generated if None)
             language: Language code
+            audio_array: User's audio as 16kHz mono float32 (instead of audio_path)
+            session_id: Server-side conversation session (instead of conversation_history)
 
         Returns:
             Dict with all results:
@@ -297,17 +307,21 @@ Be natural, warm, and engaging in your communication style."""
             raise RuntimeError("Pipeline not initialized. Call initialize() first.")
 
         pipeline_start = time.time()
-        logger.info(f"Processing conversation from audio: {audio_path}")
+        audio = audio_array if audio_array is not None else audio_path
+        if audio is None:
+            raise ValueError("audio_path or audio_array is required")
+        logger.info(f"Processing conversation from audio: {audio_path or 'in-memory upload'}")
 
-        # Step 1: Transcribe user audio
-        transcription = self.transcribe(audio_path, language=language)
+        # Step 1: Transcribe user audio (batched ASR, off the event loop)
+        transcription = await self.transcribe_async(audio, language=language)
         user_text = transcription["text"]
 
         # Step 2: Generate LLM response
-        llm_result = self.generate_response(
+        llm_result = await self.generate_response(
             user_message=user_text,
             conversation_history=conversation_history,
             language=language,
+            session_id=session_id,
         )
         response_text = llm_result["response"]
 
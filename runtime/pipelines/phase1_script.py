@@ -11,6 +11,7 @@ from models.tts import get_xtts_model
 from models.tts_client import get_xtts_client
 from models.avatar import get_avatar_model
 from config import settings
+from utils.artifacts import get_artifact_registry
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +55,146 @@ class Phase1Pipeline:
         """Check if pipeline is ready"""
         return self._ready and self.tts_model.is_ready() and self.avatar_model.is_ready()
     
+    def _resolve_voice_sample(self, voice_sample: Optional[str]) -> Optional[str]:
+        """Resolve a voice sample filename to its path (None if missing)"""
+        if not voice_sample:
+            return None
+        voice_sample_path = os.path.join(settings.voice_samples_dir, voice_sample)
+        if not os.path.exists(voice_sample_path):
+            logger.warning(f"Voice sample not found: {voice_sample_path}")
+            return None
+        return voice_sample_path
+    
+    def _resolve_reference_image(self, reference_image: Optional[str]) -> tuple[str, str]:
+        """Resolve a reference image filename to (filename, path)"""
+        if not reference_image:
+            reference_image = settings.default_reference_image
+        
+        image_path = os.path.join(settings.images_dir, reference_image)
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Reference image not found: {image_path}")
+        return reference_image, image_path
+    
+    def _register_video(
+        self,
+        video_path: str,
+        size_bytes: Optional[int],
+        sha256: Optional[str],
+        job_id: str
+    ):
+        """Add a published video to the artifact registry so it can be served by id"""
+        return get_artifact_registry().register(
+            video_path,
+            size_bytes=size_bytes,
+            sha256=sha256,
+            job_id=job_id,
+            content_type="video/mp4"
+        )
+    
+    def _use_combined_endpoint(self) -> bool:
+        """One-shot TTS → avatar on the GPU service (no WAV round-trip)"""
+        return (
+            settings.use_external_gpu_service
+            and settings.use_combined_gpu_pipeline
+            and hasattr(self.avatar_model, "speak")
+        )
+    
+    async def synthesize_speech(
+        self,
+        text: str,
+        language: str = "en",
+        voice_sample: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> dict:
+        """
+        TTS stage: synthesize speech for a piece of text.
+        
+        Split out from generate() so callers (e.g. the streaming pipeline) can
+        run TTS for the next chunk while the avatar stage renders the current one.
+        
+        Args:
+            text: Text script to speak
+            language: Language code (en, zh-cn, es)
+            voice_sample: Voice reference filename (in assets/voice/reference_samples/)
+            job_id: Unique job identifier
+            
+        Returns:
+            Dictionary with audio_path, tts_duration_ms and audio_duration_s
+        """
+        if not self.is_ready():
+            self.initialize()
+        
+        job_id = job_id or f"job_{int(time.time() * 1000)}"
+        logger.info(f"[{job_id}] Step 1: TTS synthesis")
+        
+        voice_sample_path = self._resolve_voice_sample(voice_sample)
+        
+        audio_path, tts_duration_ms, audio_duration_s = await self.tts_model.synthesize(
+            text=text,
+            language=language,
+            speaker_wav=voice_sample_path,
+            output_path=os.path.join("/tmp/gpu-service-output", f"{job_id}_audio.wav"),
+            job_id=job_id
+        )
+        
+        logger.info(f"[{job_id}] TTS completed: {tts_duration_ms:.0f}ms, audio: {audio_duration_s:.2f}s")
+        
+        return {
+            "audio_path": audio_path,
+            "tts_duration_ms": tts_duration_ms,
+            "audio_duration_s": audio_duration_s,
+        }
+    
+    async def render_avatar(
+        self,
+        audio_path: str,
+        reference_image: Optional[str] = None,
+        job_id: Optional[str] = None,
+        enhancer: Optional[str] = None,
+        fragment_id: Optional[str] = None
+    ) -> dict:
+        """
+        Avatar stage: animate the reference image with synthesized audio.
+        
+        Args:
+            audio_path: Path to audio produced by synthesize_speech()
+            reference_image: Reference image filename (in assets/images/)
+            job_id: Unique job identifier
+            enhancer: Face enhancer to use ('gfpgan' or None)
+            fragment_id: Also write fMP4 fragments under this id while rendering
+            
+        Returns:
+            Dictionary with video_path, video_size, video_sha256, fragment_id,
+            avatar_duration_ms and reference_image
+        """
+        if not self.is_ready():
+            self.initialize()
+        
+        job_id = job_id or f"job_{int(time.time() * 1000)}"
+        logger.info(f"[{job_id}] Step 2: Avatar animation")
+        
+        reference_image, image_path = self._resolve_reference_image(reference_image)
+        
+        video_path, avatar_duration_ms, artifact = await self.avatar_model.animate(
+            audio_path=audio_path,
+            reference_image_path=image_path,
+            output_path=os.path.join("/tmp/gpu-service-output", f"{job_id}_video.mp4"),
+            enhancer=enhancer,
+            fragment_id=fragment_id,
+            job_id=job_id
+        )
+        
+        logger.info(f"[{job_id}] Avatar animation completed: {avatar_duration_ms:.0f}ms")
+        
+        return {
+            "video_path": video_path,
+            "video_size": artifact.get("size_bytes"),
+            "video_sha256": artifact.get("sha256"),
+            "fragment_id": artifact.get("fragment_id"),
+            "avatar_duration_ms": avatar_duration_ms,
+            "reference_image": reference_image,
+        }
+    
     async def generate(
         self,
         text: str,
@@ -84,65 +225,104 @@ class Phase1Pipeline:
         logger.info(f"[{job_id}] Starting Phase 1 generation")
         
         try:
-            # Step 1: Text → Speech (TTS)
-            logger.info(f"[{job_id}] Step 1: TTS synthesis")
-            
-            # Resolve voice sample path
-            voice_sample_path = None
-            if voice_sample:
-                voice_sample_path = os.path.join(settings.voice_samples_dir, voice_sample)
-                if not os.path.exists(voice_sample_path):
-                    logger.warning(f"Voice sample not found: {voice_sample_path}")
-                    voice_sample_path = None
+            if self._use_combined_endpoint():
+                return await self._generate_combined(
+                    text=text,
+                    language=language,
+                    reference_image=reference_image,
+                    voice_sample=voice_sample,
+                    job_id=job_id,
+                    enhancer=enhancer
+                )
             
-            audio_path, tts_duration_ms, audio_duration_s = await self.tts_model.synthesize(
+            # Step 1: Text → Speech (TTS)
+            speech = await self.synthesize_speech(
                 text=text,
                 language=language,
-                speaker_wav=voice_sample_path,
-                output_path=os.path.join("/tmp/gpu-service-output", f"{job_id}_audio.wav")
+                voice_sample=voice_sample,
+                job_id=job_id
             )
             
-            logger.info(f"[{job_id}] TTS completed: {tts_duration_ms:.0f}ms, audio: {audio_duration_s:.2f}s")
-            
             # Step 2: Audio + Image → Animated Video
-            logger.info(f"[{job_id}] Step 2: Avatar animation")
-            
-            # Resolve reference image path
-            if not reference_image:
-                reference_image = settings.default_reference_image
-            
-            image_path = os.path.join(settings.images_dir, reference_image)
-            if not os.path.exists(image_path):
-                raise FileNotFoundError(f"Reference image not found: {image_path}")
-            
-            video_path, avatar_duration_ms = await self.avatar_model.animate(
-                audio_path=audio_path,
-                reference_image_path=image_path,
-                output_path=os.path.join("/tmp/gpu-service-output", f"{job_id}_video.mp4"),
+            video = await self.render_avatar(
+                audio_path=speech["audio_path"],
+                reference_image=reference_image,
+                job_id=job_id,
                 enhancer=enhancer
             )
             
-            logger.info(f"[{job_id}] Avatar animation completed: {avatar_duration_ms:.0f}ms")
-            
             # Return results
-            total_duration_ms = tts_duration_ms + avatar_duration_ms
+            total_duration_ms = speech["tts_duration_ms"] + video["avatar_duration_ms"]
+            record = self._register_video(video["video_path"], video["video_size"], video["video_sha256"], job_id)
             
             return {
                 "job_id": job_id,
-                "video_path": video_path,
-                "audio_path": audio_path,
-                "tts_duration_ms": tts_duration_ms,
-                "avatar_duration_ms": avatar_duration_ms,
+                "artifact_id": record.artifact_id,
+                "video_path": video["video_path"],
+                "video_size": video["video_size"],
+                "video_sha256": video["video_sha256"],
+                "audio_path": speech["audio_path"],
+                "tts_duration_ms": speech["tts_duration_ms"],
+                "avatar_duration_ms": video["avatar_duration_ms"],
                 "total_duration_ms": total_duration_ms,
-                "audio_duration_s": audio_duration_s,
+                "audio_duration_s": speech["audio_duration_s"],
                 "language": language,
-                "reference_image": reference_image
+                "reference_image": video["reference_image"]
             }
             
         except Exception as e:
             logger.error(f"[{job_id}] Pipeline failed: {e}", exc_info=True)
             raise
     
+    async def _generate_combined(
+        self,
+        text: str,
+        language: str,
+        reference_image: Optional[str],
+        voice_sample: Optional[str],
+        job_id: str,
+        enhancer: Optional[str]
+    ) -> dict:
+        """
+        TTS and avatar in one GPU service request.
+        
+        The waveform is handed to the avatar model in memory, saving a request,
+        a WAV write/read and a resample per call. The streaming pipeline keeps
+        the split stages so it can overlap TTS with rendering.
+        """
+        logger.info(f"[{job_id}] TTS + avatar via combined GPU endpoint")
+        
+        reference_image, image_path = self._resolve_reference_image(reference_image)
+        
+        start_time = time.time()
+        result = await self.avatar_model.speak(
+            text=text,
+            reference_image_path=image_path,
+            language=language,
+            speaker_wav=self._resolve_voice_sample(voice_sample),
+            enhancer=enhancer,
+            job_id=job_id
+        )
+        total_duration_ms = (time.time() - start_time) * 1000
+        
+        logger.info(f"[{job_id}] Combined generation completed: {total_duration_ms:.0f}ms")
+        record = self._register_video(result["video_path"], result.get("size_bytes"), result.get("sha256"), job_id)
+        
+        return {
+            "job_id": job_id,
+            "artifact_id": record.artifact_id,
+            "video_path": result["video_path"],
+            "video_size": result.get("size_bytes"),
+            "video_sha256": result.get("sha256"),
+            "audio_path": result["audio_path"],
+            "tts_duration_ms": result.get("tts_time_ms", 0.0),
+            "avatar_duration_ms": result.get("avatar_time_ms", 0.0),
+            "total_duration_ms": total_duration_ms,
+            "audio_duration_s": result.get("duration_s", 0.0),
+            "language": language,
+            "reference_image": reference_image
+        }
+    
     def cleanup(self):
         """Cleanup pipeline resources"""
         self.tts_model.cleanup()
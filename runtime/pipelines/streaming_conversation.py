@@ -6,73 +6,34 @@ Generates and streams video chunks as they're produced for lower perceived laten
 import logging
 import time
 import asyncio
-import os
+import contextlib
+import uuid
 from pathlib import Path
-from typing import Optional, Dict, Any, List, AsyncGenerator
-import re
+from typing import Optional, Dict, Any, List, AsyncGenerator, AsyncIterator, Tuple, Union
+
+import numpy as np
 
 from models.asr import ASRModel
-from models.llm import LLMModel
-from models.llm_gemini import GeminiClient
+from models.asr_batcher import get_asr_batcher
+from models.llm_router import LLMRouter, get_llm_router
 from pipelines.phase1_script import Phase1Pipeline
+from utils.artifacts import get_artifact_registry, wait_for_artifact
+from utils.session_store import get_session_store, session_context
+from utils.stage_executor import get_stage_executor
+from utils.text_segmenter import SentenceSegmenter, segment_text
 from config import settings
 
 logger = logging.getLogger(__name__)
 
 
-async def ensure_video_fully_written(video_path: str, max_wait: float = 3.0) -> bool:
-    """
-    Wait for video file to be fully written with stable size and fsync.
-    
-    This prevents race conditions where the video file exists but isn't fully flushed to disk,
-    causing the video endpoint to serve partial/corrupted files.
-    
-    Args:
-        video_path: Absolute path to video file
-        max_wait: Maximum time to wait in seconds
-        
-    Returns:
-        True if file is ready, False if timeout
-    """
-    wait_start = time.time()
-    
-    # Wait for file to exist
-    while not os.path.exists(video_path):
-        if time.time() - wait_start > max_wait:
-            logger.warning(f"[FSYNC] Timeout waiting for file to exist: {video_path}")
-            return False
-        await asyncio.sleep(0.05)  # 50ms check interval
-    
-    # Wait for stable file size (check twice 100ms apart)
-    prev_size = -1
-    curr_size = os.path.getsize(video_path)
-    stable_checks = 0
-    required_stable_checks = 2  # File size must be stable for 2 checks
-    
-    while stable_checks < required_stable_checks:
-        if time.time() - wait_start > max_wait:
-            logger.warning(f"[FSYNC] Timeout waiting for stable size: {video_path} (curr_size={curr_size})")
-            return False
-        
-        await asyncio.sleep(0.1)  # 100ms between checks
-        prev_size = curr_size
-        curr_size = os.path.getsize(video_path)
-        
-        if prev_size == curr_size:
-            stable_checks += 1
-        else:
-            stable_checks = 0  # Reset if size changed
-    
-    # Force fsync to ensure file is on disk
-    try:
-        with open(video_path, 'rb') as f:
-            os.fsync(f.fileno())
-    except Exception as e:
-        logger.warning(f"[FSYNC] fsync failed for {video_path}: {e}")
-    
-    wait_time = time.time() - wait_start
-    logger.info(f"[FSYNC] File ready: {os.path.basename(video_path)} (waited {wait_time:.3f}s, size={curr_size}, stable_checks={required_stable_checks})")
-    return True
+async def _as_async_iter(chunks: Union[List[str], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """Accept either a list of chunks or an async iterator of chunks"""
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
 
 
 class StreamingConversationPipeline:
@@ -81,7 +42,7 @@ class StreamingConversationPipeline:
     
     Key improvements over standard pipeline:
     - Splits LLM response into sentence chunks
-    - Generates TTS + Avatar for each chunk in parallel
+    - Synthesizes TTS for upcoming chunks while the current chunk renders
     - Streams video chunks to client as they're ready
     - Reduces time-to-first-frame from ~30s to ~5-6s
     """
@@ -94,6 +55,9 @@ class StreamingConversationPipeline:
         device: str = "cuda",
         use_tensorrt: bool = True,
         max_parallel_chunks: int = 1,  # Must be 1: GPU service processes requests serially
+        tts_lookahead: Optional[int] = None,
+        stream_llm: Optional[bool] = None,
+        fragmented_video: Optional[bool] = None,
     ):
         """
         Initialize streaming conversation pipeline.
@@ -107,6 +71,16 @@ class StreamingConversationPipeline:
             max_parallel_chunks: Must be 1. GPU service runs single-worker uvicorn and processes
                 requests serially. L4 GPU cannot handle concurrent Ditto instances due to CUDA
                 context limitations. Parallel requests would just queue at GPU service anyway.
+            tts_lookahead: How many chunks ahead of the one being rendered may have their
+                TTS synthesized. TTS and avatar run on separate models on the GPU service,
+                so chunk N+1's audio can be produced while chunk N renders. 0 disables
+                lookahead. Defaults to settings.tts_lookahead_chunks.
+            stream_llm: Stream the LLM reply and start chunk 0 as soon as its first
+                sentence closes, instead of waiting for the full reply.
+                Defaults to settings.llm_streaming.
+            fragmented_video: Also have each chunk written as fMP4 fragments and
+                emit a video_fragments event before it renders, so an MSE player
+                can start on the first fragment. Defaults to settings.fragmented_video.
         """
         self.reference_image = reference_image
         self.reference_audio = reference_audio
@@ -115,19 +89,16 @@ class StreamingConversationPipeline:
         self.device = device
         self.use_tensorrt = use_tensorrt
         self.max_parallel_chunks = max_parallel_chunks
+        self.tts_lookahead = max(0, settings.tts_lookahead_chunks if tts_lookahead is None else tts_lookahead)
+        self.stream_llm = settings.llm_streaming if stream_llm is None else stream_llm
+        self.fragmented_video = settings.fragmented_video if fragmented_video is None else fragmented_video
 
         # Models (lazy loaded)
         self.asr_model: Optional[ASRModel] = None
-        self.llm_model: Optional[LLMModel] = None
-        self.gemini_client: Optional[GeminiClient] = None
+        self.llm: Optional[LLMRouter] = None
         self.phase1_pipeline: Optional[Phase1Pipeline] = None
 
-        # System prompt for conversational LLM
-        self.system_prompt = """You are Bruce, a helpful and friendly AI assistant. 
-Keep your responses concise (2-4 sentences) and conversational. 
-Be natural, warm, and engaging in your communication style."""
-
-        logger.info(f"StreamingConversationPipeline initialized (max_parallel={max_parallel_chunks})")
+        logger.info(f"StreamingConversationPipeline initialized (max_parallel={max_parallel_chunks}, tts_lookahead={self.tts_lookahead})")
 
     def initialize(self):
         """Load all models into memory."""
@@ -141,30 +112,12 @@ Be natural, warm, and engaging in your communication style."""
             self.asr_model = ASRModel(device=self.device, compute_type=compute_type)
             self.asr_model.initialize()
 
-        # Initialize LLM (Gemini API or local Qwen)
-        if settings.use_gemini_llm:
-            if self.gemini_client is None:
-                try:
-                    logger.info(f"Initializing Gemini LLM: {settings.gemini_model}")
-                    self.gemini_client = GeminiClient(
-                        model_name=settings.gemini_model,
-                        project_id=settings.gemini_project,
-                        location=settings.gemini_location
-                    )
-                    self.gemini_client.initialize()
-                except Exception as e:
-                    logger.warning(f"Failed to load Gemini, will use fallback: {e}")
-                    self.gemini_client = None
-        else:
-            # Use local Qwen model
-            if self.llm_model is None:
-                try:
-                    logger.info("Loading LLM model (Qwen-2.5-7B)...")
-                    self.llm_model = LLMModel()
-                    self.llm_model.initialize()
-                except Exception as e:
-                    logger.warning(f"Failed to load LLM, will use fallback: {e}")
-                    self.llm_model = None
+        # Initialize LLM (Gemini and/or local Qwen, routed per LLM_PROVIDERS;
+        # the router is shared by both pipelines)
+        if self.llm is None:
+            self.llm = get_llm_router()
+            if self.llm is None:
+                logger.warning("No LLM provider loaded, will use fallback responses")
 
         # Initialize Phase1Pipeline
         if self.phase1_pipeline is None:
@@ -174,128 +127,193 @@ Be natural, warm, and engaging in your communication style."""
         elapsed = time.time() - start_time
         logger.info(f"Streaming pipeline initialized in {elapsed:.2f}s")
 
-    def split_into_sentences(self, text: str, max_chars: int = 120) -> List[str]:
+    def split_into_sentences(self, text: str, language: str = "en") -> List[str]:
         """
-        Split text into sentence chunks for streaming.
-        Handles common abbreviations like D.C., Mr., Dr., etc.
-        Splits on periods, semicolons, and enforces max character limit.
+        Split a complete text into sentence chunks for streaming.
+        
+        Thin wrapper over SentenceSegmenter (CJK-aware, per-language
+        abbreviations and length limits), used when the reply arrives whole.
+        stream_response_chunks() pushes LLM fragments into its own
+        SentenceSegmenter and pops sentences as they close.
         
         Args:
             text: Text to split
-            max_chars: Maximum characters per chunk (default 120 for ~8-10s video)
+            language: Language code (selects punctuation/length rules)
             
         Returns:
             List of sentence strings
         """
-        # Handle common abbreviations by temporarily replacing periods
-        abbreviations = {
-            'D.C.': 'DC_TEMP',
-            'Mr.': 'MR_TEMP',
-            'Mrs.': 'MRS_TEMP',
-            'Ms.': 'MS_TEMP',
-            'Dr.': 'DR_TEMP',
-            'Jr.': 'JR_TEMP',
-            'Sr.': 'SR_TEMP',
-            'U.S.': 'US_TEMP',
-            'U.K.': 'UK_TEMP',
-            'etc.': 'ETC_TEMP',
-            'vs.': 'VS_TEMP',
-            'e.g.': 'EG_TEMP',
-            'i.e.': 'IE_TEMP',
-        }
+        chunks = segment_text(text, language=language)
+        
+        chunk_info = [f'"{c[:40]}..." ({len(c)} chars)' for c in chunks]
+        logger.info(f"Split text into {len(chunks)} chunks: {chunk_info}")
+        return chunks
+
+    async def synthesize_chunk(
+        self,
+        text_chunk: str,
+        chunk_index: int,
+        job_id: str,
+        language: str = "en",
+    ) -> Dict[str, Any]:
+        """
+        Run the TTS stage for a single chunk.
         
-        # Replace abbreviations temporarily
-        protected_text = text
-        replacements = {}
-        for abbr, temp in abbreviations.items():
-            if abbr in protected_text:
-                protected_text = protected_text.replace(abbr, temp)
-                replacements[temp] = abbr
-        
-        # Split on sentence boundaries (.!?;) followed by space or end
-        # Semicolons are included to handle poetry and complex prose
-        sentences = re.split(r'([.!?;]+(?:\s+|$))', protected_text)
-        
-        # Rejoin sentences with their punctuation
-        chunks = []
-        for i in range(0, len(sentences) - 1, 2):
-            sentence = sentences[i].strip()
-            punctuation = sentences[i + 1].strip() if i + 1 < len(sentences) else ''
-            if sentence:
-                chunk = sentence + punctuation
-                # Restore abbreviations
-                for temp, abbr in replacements.items():
-                    chunk = chunk.replace(temp, abbr)
-                chunks.append(chunk)
-        
-        # Handle any remaining text
-        if len(sentences) % 2 == 1 and sentences[-1].strip():
-            remaining = sentences[-1].strip()
-            # Restore abbreviations
-            for temp, abbr in replacements.items():
-                remaining = remaining.replace(temp, abbr)
-            chunks.append(remaining)
-        
-        # Filter out empty chunks and very short ones (< 3 words)
-        chunks = [c for c in chunks if len(c.split()) >= 3]
-        
-        # BUFFERING STRATEGY: Combine first chunks to reach ~120 chars
-        # This gives pipeline time to build buffer while first video plays
-        if len(chunks) >= 2:
-            combined_first = chunks[0]
-            chunks_combined = 1
+        Args:
+            text_chunk: Text to synthesize
+            chunk_index: Index of this chunk
+            job_id: Base job identifier
+            language: Language code
             
-            # Keep adding chunks until we reach ~120 chars
-            while chunks_combined < len(chunks) and len(combined_first) < 120:
-                next_chunk = chunks[chunks_combined]
-                if len(combined_first) + len(next_chunk) + 1 <= 125:  # +1 for space, 125 hard limit
-                    combined_first += ' ' + next_chunk
-                    chunks_combined += 1
-                else:
-                    break
+        Returns:
+            Dict from Phase1Pipeline.synthesize_speech plus 'tts_time' (seconds)
+        """
+        chunk_id = f"{job_id}_chunk{chunk_index}"
+        tts_start = time.time()
+        
+        speech = await self.phase1_pipeline.synthesize_speech(
+            text=text_chunk,
+            language=language,
+            voice_sample=self.reference_audio,
+            job_id=chunk_id,
+        )
+        speech["tts_time"] = time.time() - tts_start
+        
+        logger.info(f"[{chunk_id}] TTS stage done in {speech['tts_time']:.2f}s")
+        return speech
+
+    async def render_chunk(
+        self,
+        speech: Dict[str, Any],
+        text_chunk: str,
+        chunk_index: int,
+        job_id: str,
+        language: str = "en",
+        chunk_start: Optional[float] = None,
+        tts_wait_time: Optional[float] = None,
+        fragment_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run the avatar stage for a chunk whose audio is already synthesized.
+        
+        Args:
+            speech: Result of synthesize_chunk()
+            text_chunk: Text of this chunk
+            chunk_index: Index of this chunk
+            job_id: Base job identifier
+            language: Language code
+            chunk_start: When the pipeline started waiting for this chunk (defaults to now)
+            tts_wait_time: Seconds spent blocked on this chunk's TTS (defaults to full TTS time)
+            fragment_id: Also write fMP4 fragments under this id (see announce_fragments())
             
-            # Replace first N chunks with combined version
-            if chunks_combined > 1:
-                chunks = [combined_first] + chunks[chunks_combined:]
-                logger.info(f"BUFFERING: Combined first {chunks_combined} chunks into one ({len(combined_first)} chars)")
-        
-        # Enforce max character limit by splitting long chunks
-        # First chunk already combined above, remaining chunks use 120 char limit
-        final_chunks = []
-        for idx, chunk in enumerate(chunks):
-            # First chunk was already combined to ~120 chars, keep as-is if reasonable
-            if idx == 0 and len(chunk) <= 125:
-                final_chunks.append(chunk)
-            elif len(chunk) <= max_chars:
-                final_chunks.append(chunk)
-            else:
-                # Split long chunk at word boundaries
-                words = chunk.split()
-                current_chunk = []
-                current_length = 0
-                
-                for word in words:
-                    word_length = len(word) + 1  # +1 for space
-                    if current_length + word_length > max_chars and current_chunk:
-                        # Flush current chunk
-                        final_chunks.append(' '.join(current_chunk))
-                        current_chunk = [word]
-                        current_length = len(word)
-                    else:
-                        current_chunk.append(word)
-                        current_length += word_length
-                
-                # Add remaining words
-                if current_chunk:
-                    final_chunks.append(' '.join(current_chunk))
-        
-        # Log chunks with buffer indication
-        chunk_info = []
-        for i, c in enumerate(final_chunks):
-            label = "BUFFER" if i == 0 else "NORMAL"
-            chunk_info.append(f'[{label}] "{c[:40]}..." ({len(c)} chars)')
-        logger.info(f"Split text into {len(final_chunks)} chunks: {chunk_info}")
-        return final_chunks
+        Returns:
+            Dict with chunk results, including per-stage timings
+        """
+        chunk_start = chunk_start or time.time()
+        chunk_id = f"{job_id}_chunk{chunk_index}"
+        
+        avatar_start = time.time()
+        video = await self.phase1_pipeline.render_avatar(
+            audio_path=speech["audio_path"],
+            reference_image=self.reference_image,
+            job_id=chunk_id,
+            fragment_id=fragment_id,
+        )
+        avatar_time = time.time() - avatar_start
+        
+        # The GPU service renames the video into place before responding, so this
+        # is normally a single stat; inotify covers a lagging shared volume.
+        video_path = video.get("video_path")
+        video_ready = False
+        artifact_wait_time = 0.0
+        if video_path:
+            wait_start = time.time()
+            video_ready = await wait_for_artifact(video_path, expected_size=video.get("video_size"))
+            artifact_wait_time = time.time() - wait_start
+            
+            if not video_ready:
+                logger.warning(f"[{chunk_id}] Video not visible after {artifact_wait_time:.3f}s: {video_path}")
+        
+        # Register the published chunk so the video endpoint serves it by id
+        artifact_id = None
+        if video_ready:
+            artifact_id = get_artifact_registry().register(
+                video_path,
+                size_bytes=video.get("video_size"),
+                sha256=video.get("video_sha256"),
+                job_id=chunk_id,
+                content_type="video/mp4",
+            ).artifact_id
+        
+        tts_time = speech.get("tts_time", 0.0)
+        if tts_wait_time is None:
+            tts_wait_time = tts_time
+        chunk_time = time.time() - chunk_start
+        
+        result = {
+            "job_id": chunk_id,
+            "video_path": video_path,
+            "video_size": video.get("video_size"),
+            "video_sha256": video.get("video_sha256"),
+            "video_ready": video_ready,
+            "artifact_id": artifact_id,
+            "fragment_id": video.get("fragment_id"),
+            "audio_path": speech["audio_path"],
+            "tts_duration_ms": speech["tts_duration_ms"],
+            "avatar_duration_ms": video["avatar_duration_ms"],
+            "total_duration_ms": speech["tts_duration_ms"] + video["avatar_duration_ms"],
+            "audio_duration_s": speech["audio_duration_s"],
+            "language": language,
+            "reference_image": video["reference_image"],
+            "chunk_index": chunk_index,
+            "chunk_time": chunk_time,
+            "text_chunk": text_chunk,
+            # Per-stage timings (ms). tts_hidden_ms is TTS work overlapped with
+            # rendering of the previous chunk.
+            "stage_timings": {
+                "tts_ms": tts_time * 1000,
+                "tts_wait_ms": tts_wait_time * 1000,
+                "tts_hidden_ms": max(0.0, tts_time - tts_wait_time) * 1000,
+                "avatar_ms": avatar_time * 1000,
+                "artifact_wait_ms": artifact_wait_time * 1000,
+            },
+        }
+        
+        logger.info(
+            f"[{chunk_id}] Chunk ready in {chunk_time:.2f}s "
+            f"(tts={tts_time:.2f}s, tts_wait={tts_wait_time:.2f}s, avatar={avatar_time:.2f}s, artifact_wait={artifact_wait_time:.3f}s)"
+        )
+        return result
+
+    def announce_fragments(
+        self,
+        text_chunk: str,
+        chunk_index: int,
+        job_id: str,
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Pick a fragment id for a chunk that is about to render.
+        
+        The id is chosen here (not by the GPU service) so the client can be told
+        where to fetch fragments before rendering starts.
+        
+        Returns:
+            (fragment_id, video_fragments event), or (None, None) when
+            fragmented output is off
+        """
+        if not self.fragmented_video:
+            return None, None
+        
+        fragment_id = f"{job_id}_chunk{chunk_index}_{uuid.uuid4().hex[:8]}"
+        event = {
+            "type": "video_fragments",
+            "data": {
+                "fragment_id": fragment_id,
+                "chunk_index": chunk_index,
+                "text_chunk": text_chunk,
+            }
+        }
+        return fragment_id, event
 
     async def generate_chunk(
         self,
@@ -305,7 +323,7 @@ Be natural, warm, and engaging in your communication style."""
         language: str = "en",
     ) -> Dict[str, Any]:
         """
-        Generate a single video chunk from text.
+        Generate a single video chunk from text (TTS then avatar, no lookahead).
         
         Args:
             text_chunk: Text to generate
@@ -322,45 +340,307 @@ Be natural, warm, and engaging in your communication style."""
         logger.info(f"[{chunk_id}] Generating chunk: '{text_chunk[:50]}...'")
         
         try:
-            # Generate TTS + Avatar for this chunk
-            result = await self.phase1_pipeline.generate(
-                text=text_chunk,
+            speech = await self.synthesize_chunk(text_chunk, chunk_index, job_id, language)
+            return await self.render_chunk(
+                speech,
+                text_chunk=text_chunk,
+                chunk_index=chunk_index,
+                job_id=job_id,
                 language=language,
-                reference_image=self.reference_image,
-                voice_sample=self.reference_audio,
-                job_id=chunk_id,
+                chunk_start=chunk_start,
             )
             
-            chunk_time = time.time() - chunk_start
-            result["chunk_index"] = chunk_index
-            result["chunk_time"] = chunk_time
-            result["text_chunk"] = text_chunk
+        except Exception as e:
+            logger.error(f"[{chunk_id}] Chunk generation failed: {e}", exc_info=True)
+            raise
+
+    async def _synthesize_ahead(
+        self,
+        chunks: AsyncIterator[str],
+        job_id: str,
+        language: str,
+        ready: asyncio.Queue,
+        slots: asyncio.Semaphore,
+    ):
+        """
+        Producer for the lookahead pipeline: synthesize chunk audio in order.
+        
+        Each chunk takes a slot before its TTS starts; the renderer releases the
+        slot once the chunk's video is done, which bounds how far TTS runs ahead.
+        Failures are handed to the renderer through the queue; None marks the end.
+        """
+        i = 0
+        async for text_chunk in chunks:
+            await slots.acquire()
+            try:
+                speech = await self.synthesize_chunk(text_chunk, i, job_id, language)
+            except Exception as e:
+                logger.error(f"[{job_id}_chunk{i}] TTS stage failed: {e}", exc_info=True)
+                await ready.put((i, text_chunk, e))
+                return
+            await ready.put((i, text_chunk, speech))
+            i += 1
+        await ready.put(None)
+
+    async def generate_chunks_with_lookahead(
+        self,
+        chunks: Union[List[str], AsyncIterator[str]],
+        job_id: str,
+        language: str = "en",
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Two-stage pipeline: TTS for chunk N+1..N+lookahead runs while chunk N renders.
+        
+        Chunks are yielded in order as their video completes; with fragmented
+        output, each chunk's video_fragments event comes right before it renders.
+        
+        Args:
+            chunks: Text chunks to generate (a list, or an async iterator of chunks
+                as they become available, e.g. from the streaming LLM)
+            job_id: Base job identifier
+            language: Language code
             
-            # Ensure video file is fully written to disk before returning
-            video_path = result.get("video_path")
-            if video_path:
-                fsync_start = time.time()
-                file_ready = await ensure_video_fully_written(video_path, max_wait=3.0)
-                fsync_time = time.time() - fsync_start
+        Yields:
+            "video_fragments" (optional) and "video_chunk" events; video_chunk
+            data has the same shape as generate_chunk()
+        """
+        ready: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.tts_lookahead + 1)
+        producer = asyncio.create_task(
+            self._synthesize_ahead(_as_async_iter(chunks), job_id, language, ready, slots)
+        )
+        
+        try:
+            while True:
+                chunk_start = time.time()
+                item = await ready.get()
+                if item is None:
+                    break
                 
-                if not file_ready:
-                    logger.warning(f"[{chunk_id}] Video file sync timeout after {fsync_time:.3f}s: {video_path}")
-                else:
-                    logger.info(f"[{chunk_id}] Video file verified (fsync took {fsync_time:.3f}s)")
+                index, text_chunk, speech = item
+                tts_wait_time = time.time() - chunk_start
+                
+                if isinstance(speech, Exception):
+                    raise speech
+                
+                fragment_id, fragments_event = self.announce_fragments(text_chunk, index, job_id)
+                if fragments_event:
+                    yield fragments_event
+                
+                try:
+                    result = await self.render_chunk(
+                        speech,
+                        text_chunk=text_chunk,
+                        chunk_index=index,
+                        job_id=job_id,
+                        language=language,
+                        chunk_start=chunk_start,
+                        tts_wait_time=tts_wait_time,
+                        fragment_id=fragment_id,
+                    )
+                finally:
+                    slots.release()
+                
+                yield {"type": "video_chunk", "data": result}
+        finally:
+            if not producer.done():
+                producer.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await producer
+
+    async def generate_chunks(
+        self,
+        chunks: Union[List[str], AsyncIterator[str]],
+        job_id: str,
+        language: str = "en",
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Generate video chunks in order, with TTS lookahead when enabled.
+        
+        Args:
+            chunks: Text chunks (list or async iterator)
+            job_id: Base job identifier
+            language: Language code
             
-            logger.info(f"[{chunk_id}] Chunk generated in {chunk_time:.2f}s (total with fsync: {time.time() - chunk_start:.2f}s)")
-            return result
+        Yields:
+            "video_fragments" (when fragmented output is on) and "video_chunk" events
+        """
+        if self.tts_lookahead > 0:
+            async for event in self.generate_chunks_with_lookahead(chunks, job_id, language):
+                yield event
+            return
+        
+        i = 0
+        async for text_chunk in _as_async_iter(chunks):
+            # Generate chunk (blocks until complete)
+            if not self.fragmented_video:
+                result = await self.generate_chunk(
+                    text_chunk=text_chunk,
+                    chunk_index=i,
+                    job_id=job_id,
+                    language=language,
+                )
+            else:
+                chunk_start = time.time()
+                speech = await self.synthesize_chunk(text_chunk, i, job_id, language)
+                fragment_id, fragments_event = self.announce_fragments(text_chunk, i, job_id)
+                yield fragments_event
+                result = await self.render_chunk(
+                    speech,
+                    text_chunk=text_chunk,
+                    chunk_index=i,
+                    job_id=job_id,
+                    language=language,
+                    chunk_start=chunk_start,
+                    fragment_id=fragment_id,
+                )
+            yield {"type": "video_chunk", "data": result}
+            i += 1
+
+    async def _stream_llm_fragments(
+        self,
+        user_text: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        language: str,
+    ) -> AsyncIterator[str]:
+        """LLM text fragments as they're generated (via the LLM router)"""
+        async for fragment in self.llm.stream_response(
+            prompt=user_text,
+            conversation_history=conversation_history,
+            max_tokens=150,
+            language=language,
+        ):
+            yield fragment
+
+    async def _generate_llm_response(
+        self,
+        user_text: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        language: str,
+    ) -> str:
+        """Full (non-streamed) LLM reply (via the LLM router)"""
+        return await self.llm.generate_response(
+            prompt=user_text,
+            conversation_history=conversation_history,
+            max_tokens=150,
+            language=language,
+        )
+
+    async def stream_response_chunks(
+        self,
+        user_text: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        job_id: str,
+        language: str,
+        summary: Dict[str, Any],
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream the LLM reply into the chunk pipeline sentence by sentence.
+        
+        Fragments are split into sentences as they arrive; each sentence is
+        handed to chunk generation as soon as it closes, so chunk 0's TTS/avatar starts before
+        the LLM has finished. The llm_response event is emitted once the full
+        reply is known (usually before chunk 0's video is ready).
+        
+        Args:
+            user_text: Transcribed user input
+            conversation_history: Optional conversation context
+            job_id: Base job identifier
+            language: Language code
+            summary: Filled with 'response_text' and 'num_chunks' for the caller
             
-        except Exception as e:
-            logger.error(f"[{chunk_id}] Chunk generation failed: {e}", exc_info=True)
-            raise
+        Yields:
+            "llm_response", "video_fragments" and "video_chunk" events
+        """
+        sentences: asyncio.Queue = asyncio.Queue()
+        events: asyncio.Queue = asyncio.Queue()
+        task_done = object()
+        llm_start = time.time()
+        fragments: List[str] = []
+        timing: Dict[str, float] = {}
+        
+        async def pump_sentences():
+            segmenter = SentenceSegmenter(language=language)
+            
+            async def emit(closed: List[str]):
+                for sentence in closed:
+                    if "first_sentence" not in timing:
+                        timing["first_sentence"] = time.time() - llm_start
+                        logger.info(f"[{job_id}] First sentence after {timing['first_sentence']:.2f}s")
+                    await sentences.put(sentence)
+            
+            async for fragment in self._stream_llm_fragments(user_text, conversation_history, language):
+                fragments.append(fragment)
+                segmenter.push(fragment)
+                await emit(segmenter.pop())
+            await emit(segmenter.flush())
+        
+        async def sentence_source() -> AsyncIterator[str]:
+            while True:
+                sentence = await sentences.get()
+                if sentence is None:
+                    return
+                yield sentence
+        
+        async def run_llm():
+            try:
+                await pump_sentences()
+                response_text = "".join(fragments).strip()
+                summary["response_text"] = response_text
+                await events.put({
+                    "type": "llm_response",
+                    "data": {
+                        "text": response_text,
+                        "time": time.time() - llm_start,
+                        "first_sentence_time": timing.get("first_sentence"),
+                        "fallback": False,
+                        "streamed": True,
+                    }
+                })
+                logger.info(f"[{job_id}] LLM response: '{response_text[:80]}...'")
+            except Exception as e:
+                await events.put(e)
+            finally:
+                await sentences.put(None)
+                await events.put(task_done)
+        
+        async def run_chunks():
+            count = 0
+            try:
+                async for event in self.generate_chunks(sentence_source(), job_id, language):
+                    if event["type"] == "video_chunk":
+                        count += 1
+                    await events.put(event)
+            except Exception as e:
+                await events.put(e)
+            finally:
+                summary["num_chunks"] = count
+                await events.put(task_done)
+        
+        tasks = [asyncio.create_task(run_llm()), asyncio.create_task(run_chunks())]
+        finished = 0
+        try:
+            while finished < len(tasks):
+                event = await events.get()
+                if event is task_done:
+                    finished += 1
+                    continue
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
     async def process_conversation_streaming(
         self,
-        audio_path: str,
+        audio_path: Optional[str] = None,
         conversation_history: Optional[List[Dict[str, str]]] = None,
         job_id: Optional[str] = None,
         language: str = "en",
+        audio_array: Optional[np.ndarray] = None,
+        session_id: Optional[str] = None,
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         Stream conversation processing with progressive chunk generation.
@@ -370,10 +650,13 @@ Be natural, warm, and engaging in your communication style."""
             conversation_history: Optional conversation context
             job_id: Base name for outputs (auto-generated if None)
             language: Language code
+            audio_array: User's audio as 16kHz mono float32 (instead of audio_path)
+            session_id: Use (and extend) this server-side conversation session
+                instead of conversation_history (see utils.session_store)
             
         Yields:
             Dict with chunk results as they're generated:
-            - type: "transcription" | "llm_response" | "video_chunk" | "complete"
+            - type: "transcription" | "llm_response" | "video_fragments" | "video_chunk" | "complete"
             - data: Type-specific data
         """
         if self.asr_model is None:
@@ -386,9 +669,19 @@ Be natural, warm, and engaging in your communication style."""
         logger.info(f"[{job_id}] Starting streaming conversation processing")
 
         try:
-            # Step 1: Transcribe user audio
+            # Step 1: Transcribe user audio (ASR stage, off the event loop)
             transcription_start = time.time()
-            transcribe_result = self.asr_model.transcribe(audio_path, language=language)
+            if audio_array is not None:
+                # Batched with other sessions' concurrent transcriptions
+                transcribe_result = await get_asr_batcher(self.asr_model).transcribe(
+                    audio_array, language=language
+                )
+            elif audio_path is not None:
+                transcribe_result = await get_stage_executor("asr").run(
+                    self.asr_model.transcribe, audio_path, language=language
+                )
+            else:
+                raise ValueError("audio_path or audio_array is required")
             
             if isinstance(transcribe_result, tuple):
                 if len(transcribe_result) == 3:
@@ -417,47 +710,54 @@ Be natural, warm, and engaging in your communication style."""
             # Step 2: Generate LLM response
             llm_start = time.time()
             
-            # Check which LLM to use (Gemini or local)
-            llm_available = self.gemini_client or self.llm_model
+            io_stage = get_stage_executor("io")
+            if session_id:
+                conversation_history = await io_stage.run(session_context, session_id, conversation_history)
+            
+            # Any LLM provider loaded?
+            llm_available = self.llm is not None
+            
+            if llm_available and self.stream_llm:
+                # Steps 2+3 overlapped: sentences go to TTS/avatar as the LLM produces them
+                summary: Dict[str, Any] = {}
+                async for event in self.stream_response_chunks(
+                    user_text, conversation_history, job_id, language, summary
+                ):
+                    if event["type"] == "llm_response" and session_id:
+                        # Record the turn as soon as the reply is known, not after the video
+                        await io_stage.run(
+                            get_session_store().add_exchange, session_id, user_text, event["data"]["text"]
+                        )
+                    yield event
+                
+                total_time = time.time() - pipeline_start
+                yield {
+                    "type": "complete",
+                    "data": {
+                        "total_time": total_time,
+                        "num_chunks": summary.get("num_chunks", 0),
+                        "user_text": user_text,
+                        "response_text": summary.get("response_text", ""),
+                        "session_id": session_id,
+                    }
+                }
+                
+                logger.info(f"[{job_id}] Streaming conversation completed in {total_time:.2f}s")
+                return
             
             if not llm_available:
                 # Fallback: echo user text
                 response_text = user_text
                 fallback = True
             else:
-                # Use Gemini if available, otherwise use local Qwen
-                if self.gemini_client:
-                    if conversation_history:
-                        response_text = self.gemini_client.generate_with_history(
-                            prompt=user_text,
-                            conversation_history=conversation_history,
-                            max_tokens=150,
-                            language=language,
-                        )
-                    else:
-                        response_text = self.gemini_client.generate_response(
-                            prompt=user_text,
-                            max_tokens=150,
-                            language=language,
-                        )
-                    fallback = False
-                else:
-                    # Use local LLM
-                    if conversation_history:
-                        response_text = self.llm_model.generate_with_history(
-                            messages=conversation_history,
-                            system_prompt=self.system_prompt,
-                            max_new_tokens=150,
-                        )
-                    else:
-                        response_text = self.llm_model.generate_response(
-                            prompt=user_text,
-                            system_prompt=self.system_prompt,
-                            max_new_tokens=150,
-                        )
-                    fallback = False
+                response_text = await self._generate_llm_response(
+                    user_text, conversation_history, language
+                )
+                fallback = False
             
             llm_time = time.time() - llm_start
+            if session_id:
+                await io_stage.run(get_session_store().add_exchange, session_id, user_text, response_text)
             
             # Yield LLM response
             yield {
@@ -472,28 +772,17 @@ Be natural, warm, and engaging in your communication style."""
             logger.info(f"[{job_id}] LLM response: '{response_text[:80]}...'")
 
             # Step 3: Split response into chunks and generate video progressively
-            chunks = self.split_into_sentences(response_text)
+            chunks = self.split_into_sentences(response_text, language=language)
             
             if not chunks:
                 # If splitting failed, use full text as single chunk
                 chunks = [response_text]
             
-            # Generate chunks sequentially and yield as each completes
-            # Sequential processing required due to GPU service limitations
-            for i, text_chunk in enumerate(chunks):
-                # Generate chunk (blocks until complete)
-                result = await self.generate_chunk(
-                    text_chunk=text_chunk,
-                    chunk_index=i,
-                    job_id=job_id,
-                    language=language,
-                )
-                
-                # Yield immediately after generation completes
-                yield {
-                    "type": "video_chunk",
-                    "data": result,
-                }
+            # Render chunks in order and yield as each completes.
+            # Rendering stays sequential (single Ditto instance on the GPU service);
+            # with lookahead, the next chunks' TTS overlaps the current render.
+            async for event in self.generate_chunks(chunks, job_id, language):
+                yield event
 
             # Yield completion
             total_time = time.time() - pipeline_start
@@ -504,6 +793,7 @@ Be natural, warm, and engaging in your communication style."""
                     "num_chunks": len(chunks),
                     "user_text": user_text,
                     "response_text": response_text,
+                    "session_id": session_id,
                 }
             }
             
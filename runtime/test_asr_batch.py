@@ -0,0 +1,115 @@
+"""
+Tests for ASRModel.transcribe_batch on a real faster-whisper model (CPU int8).
+
+Batches of 2+ clips are what the ASR batcher sends under concurrent load
+(a lone request goes through transcribe_array instead). ASR_TEST_MODEL picks
+the model, a size or a CTranslate2 model directory (default "tiny"); the
+tests are skipped if it can't be loaded (no checkpoint and no network).
+
+Run: python test_asr_batch.py   (or: pytest test_asr_batch.py)
+"""
+import os
+import sys
+
+import pytest
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from faster_whisper.audio import decode_audio
+from faster_whisper.tokenizer import _LANGUAGE_CODES
+
+from models.asr import ASRModel
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evaluator", "fixtures")
+MODEL_SIZE = os.getenv("ASR_TEST_MODEL", "tiny")
+
+_asr = None
+
+
+def get_asr() -> ASRModel:
+    global _asr
+    if _asr is None:
+        asr = ASRModel(device="cpu", compute_type="int8")
+        try:
+            asr.initialize(model_size=MODEL_SIZE)
+        except Exception as e:
+            pytest.skip(f"faster-whisper {MODEL_SIZE} unavailable: {e}")
+        _asr = asr
+    return _asr
+
+
+def fixture(name: str):
+    return decode_audio(os.path.join(FIXTURES, name), sampling_rate=16000)
+
+
+def test_batch_of_two():
+    asr = get_asr()
+    clips = [fixture("bruce_en_short.wav"), fixture("bruce_en_01.wav")[:16000 * 20]]
+    outputs = asr.transcribe_batch(clips, ["en", "en"])
+    assert len(outputs) == 2
+    for text, metadata in outputs:
+        assert isinstance(text, str)
+        assert metadata["batch_size"] == 2
+        assert metadata["language"] == "en"
+
+
+def test_batch_mixed_languages_and_detection():
+    asr = get_asr()
+    en = fixture("bruce_en_short.wav")
+    es = fixture("bruce_es_01.wav")[:16000 * 20]
+    outputs = asr.transcribe_batch([en, es, en], ["en", None, None])
+    assert [metadata["batch_size"] for _, metadata in outputs] == [3, 3, 3]
+    assert outputs[0][1]["language"] == "en"
+    # Detected from the shared encoder output
+    for _, metadata in outputs[1:]:
+        assert metadata["language"] in _LANGUAGE_CODES
+        assert 0.0 < metadata["language_probability"] <= 1.0
+    # Same clip, same transcript, whatever its neighbours in the batch
+    assert outputs[0][0] == outputs[2][0]
+
+
+def test_batch_matches_single_clip_decode():
+    asr = get_asr()
+    en = fixture("bruce_en_short.wav")
+    single, _ = asr.transcribe_batch([en], ["en"])[0]
+    batched, _ = asr.transcribe_batch([en, fixture("bruce_es_01.wav")[:16000 * 20]], ["en", "es"])[0]
+    assert batched == single
+
+
+def test_batch_agrees_with_transcribe_array():
+    """Under load the batcher sends clips here instead of transcribe_array; transcripts must not change"""
+    asr = get_asr()
+    clips = [
+        fixture("bruce_en_short.wav"),
+        fixture("bruce_en_01.wav")[:16000 * 20],
+        fixture("bruce_es_01.wav")[:16000 * 20],
+        fixture("bruce_es_01.wav")[:16000 * 5],
+    ]
+    languages = ["en", None, "es", None]
+    outputs = asr.transcribe_batch(clips, languages, vad_filter=False)
+    for clip, language, (text, metadata) in zip(clips, languages, outputs):
+        single, single_metadata = asr.transcribe_array(clip, language=language, vad_filter=False)
+        assert text == single
+        assert metadata["language"] == single_metadata["language"]
+        assert [s["text"] for s in metadata["segments"]] == [s["text"] for s in single_metadata["segments"]]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_batch_of_two,
+        test_batch_mixed_languages_and_detection,
+        test_batch_matches_single_clip_decode,
+        test_batch_agrees_with_transcribe_array,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+        except pytest.skip.Exception as e:
+            print(f"⏭️  {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,96 @@
+"""
+Tests for ASRWorkerPool on a real faster-whisper model (CPU int8).
+
+Requests carry one clip (transcribe_array in the worker) or several (one
+transcribe_batch). ASR_TEST_MODEL picks the model, a size or a CTranslate2
+model directory (default "tiny"); the tests are skipped if the workers can't
+load it (no checkpoint and no network).
+
+Run: python test_asr_pool.py   (or: pytest test_asr_pool.py)
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from faster_whisper.audio import decode_audio
+
+from models.asr_pool import ASRWorkerPool
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evaluator", "fixtures")
+MODEL_SIZE = os.getenv("ASR_TEST_MODEL", "tiny")
+
+
+def fixture(name: str):
+    return decode_audio(os.path.join(FIXTURES, name), sampling_rate=16000)
+
+
+def start_pool(processes: int) -> ASRWorkerPool:
+    pool = ASRWorkerPool(processes=processes, cpu_threads=1, model_size=MODEL_SIZE, pin_cores=False)
+    try:
+        pool.start(timeout=300)
+    except (RuntimeError, TimeoutError) as e:
+        pytest.skip(f"faster-whisper {MODEL_SIZE} unavailable in workers: {e}")
+    return pool
+
+
+def test_multi_clip_request():
+    pool = start_pool(1)
+    try:
+        en = fixture("bruce_en_short.wav")
+        clips = [en, fixture("bruce_es_01.wav")[:16000 * 20], en]
+        outputs = pool.submit(clips, ["en", None, "en"]).result(timeout=120)
+        assert len(outputs) == 3
+        for text, metadata in outputs:
+            assert isinstance(text, str)
+            assert metadata["batch_size"] == 3
+        assert outputs[0][0] == outputs[2][0]
+        assert pool.stats()["workers"][0]["failed"] == 0
+    finally:
+        pool.stop()
+
+
+def test_concurrent_single_and_batched_requests():
+    pool = start_pool(2)
+    try:
+        en = fixture("bruce_en_short.wav")
+
+        async def run():
+            return await asyncio.gather(
+                pool.transcribe(en, language="en"),
+                pool.transcribe_batch([en, en], ["en", "en"]),
+                pool.transcribe_batch([en, en, en, en], ["en", None, "en", None]),
+            )
+
+        single, pair, four = asyncio.run(run())
+        assert isinstance(single[0], str)
+        assert [metadata["batch_size"] for _, metadata in pair] == [2, 2]
+        assert [metadata["batch_size"] for _, metadata in four] == [4, 4, 4, 4]
+        stats = pool.stats()
+        assert stats["in_flight"] == 0
+        assert sum(w["completed"] for w in stats["workers"]) == 3
+        assert sum(w["failed"] for w in stats["workers"]) == 0
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_multi_clip_request,
+        test_concurrent_single_and_batched_requests,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+        except pytest.skip.Exception as e:
+            print(f"⏭️  {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
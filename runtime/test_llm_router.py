@@ -0,0 +1,170 @@
+"""
+Tests for LLMRouter hedging, fall-over and circuit breaking.
+
+Uses fake providers with scripted delays and failures (no model, no network).
+
+Run: python test_llm_router.py   (or: pytest test_llm_router.py)
+"""
+import asyncio
+import os
+import sys
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.llm import LLMError
+from models.llm_router import LLMRouter
+
+
+class FakeLLM:
+    """Answers `reply` after `delay` seconds, or raises LLMError if `fail`"""
+
+    def __init__(self, reply: str, delay: float = 0.0, fail: bool = False):
+        self.reply = reply
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.closed = 0
+
+    async def generate_response(self, prompt, conversation_history=None, max_tokens=150,
+                                temperature=0.7, language="en", timeout=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise LLMError(f"{self.reply} failed")
+        return self.reply
+
+    async def stream_response(self, prompt, conversation_history=None, max_tokens=150,
+                              temperature=0.7, language="en", timeout=None, first_token_timeout=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise LLMError(f"{self.reply} failed")
+            for word in self.reply.split():
+                yield word + " "
+                await asyncio.sleep(0)
+        finally:
+            self.closed += 1
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_primary_answers_without_hedge():
+    primary, secondary = FakeLLM("primary"), FakeLLM("secondary")
+    router = LLMRouter([("a", primary), ("b", secondary)], hedge_delay_s=0.2)
+    assert run(router.generate_response("hi")) == "primary"
+    assert secondary.calls == 0, "secondary started without need"
+
+
+def test_slow_primary_is_hedged():
+    primary, secondary = FakeLLM("primary", delay=1.0), FakeLLM("secondary")
+    router = LLMRouter([("a", primary), ("b", secondary)], hedge_delay_s=0.05)
+    assert run(router.generate_response("hi")) == "secondary"
+    stats = router.stats()
+    assert stats["hedges_total"] == 1
+    assert stats["providers"]["a"]["cancelled_total"] == 1
+    assert stats["providers"]["b"]["wins_total"] == 1
+
+
+def test_failed_primary_falls_over_immediately():
+    primary, secondary = FakeLLM("primary", fail=True), FakeLLM("secondary")
+    router = LLMRouter([("a", primary), ("b", secondary)], hedge_delay_s=10.0)
+    assert run(router.generate_response("hi")) == "secondary"
+
+
+def test_all_failing_raises():
+    router = LLMRouter([("a", FakeLLM("a", fail=True)), ("b", FakeLLM("b", fail=True))], hedge_delay_s=0.05)
+    try:
+        run(router.generate_response("hi"))
+    except LLMError:
+        return
+    raise AssertionError("expected LLMError")
+
+
+def test_breaker_opens_and_skips_provider():
+    primary, secondary = FakeLLM("primary", fail=True), FakeLLM("secondary")
+    router = LLMRouter(
+        [("a", primary), ("b", secondary)], hedge_delay_s=10.0, failure_threshold=2, reset_after_s=60.0
+    )
+    for _ in range(4):
+        assert run(router.generate_response("hi")) == "secondary"
+    assert primary.calls == 2, f"open breaker still sent calls ({primary.calls})"
+    assert router.stats()["providers"]["a"]["breaker"] == "open"
+
+
+def test_breaker_half_open_trial_closes_it():
+    primary, secondary = FakeLLM("primary", fail=True), FakeLLM("secondary")
+    router = LLMRouter(
+        [("a", primary), ("b", secondary)], hedge_delay_s=10.0, failure_threshold=1, reset_after_s=0.0
+    )
+    assert run(router.generate_response("hi")) == "secondary"
+    primary.fail = False
+    assert run(router.generate_response("hi")) == "primary"
+    assert router.stats()["providers"]["a"]["breaker"] == "closed"
+
+
+class GatedLLM(FakeLLM):
+    """Answers once `gate` is set (so several providers finish together)"""
+
+    def __init__(self, reply: str, gate: asyncio.Event):
+        super().__init__(reply)
+        self.gate = gate
+
+    async def generate_response(self, prompt, **kwargs):
+        self.calls += 1
+        await self.gate.wait()
+        return self.reply
+
+
+def test_simultaneous_finish_is_not_a_loss():
+    async def race():
+        gate = asyncio.Event()
+        router = LLMRouter([("a", GatedLLM("a", gate)), ("b", GatedLLM("b", gate))], hedge_delay_s=0.01)
+        asyncio.get_running_loop().call_later(0.05, gate.set)
+        return router, await router.generate_response("hi")
+
+    router, reply = run(race())
+    stats = router.stats()["providers"]
+    assert reply == "a" or reply == "b"
+    assert stats["a"]["cancelled_total"] == stats["b"]["cancelled_total"] == 0, "finished call counted as cancelled"
+    assert stats["a"]["breaker"] == stats["b"]["breaker"] == "closed"
+    assert stats["a"]["wins_total"] + stats["b"]["wins_total"] == 1
+
+
+def test_stream_race_cancels_loser():
+    primary, secondary = FakeLLM("slow primary reply", delay=1.0), FakeLLM("fast secondary reply")
+    router = LLMRouter([("a", primary), ("b", secondary)], hedge_delay_s=0.05)
+
+    async def collect():
+        fragments = [f async for f in router.stream_response("hi")]
+        await asyncio.sleep(0.01)  # Let the cancelled loser unwind
+        return "".join(fragments)
+
+    assert run(collect()).strip() == "fast secondary reply"
+    assert primary.closed == 1, "losing stream was not closed"
+    assert router.stats()["providers"]["b"]["first_token_ms"]["count"] == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_primary_answers_without_hedge,
+        test_slow_primary_is_hedged,
+        test_failed_primary_falls_over_immediately,
+        test_all_failing_raises,
+        test_breaker_opens_and_skips_provider,
+        test_breaker_half_open_trial_closes_it,
+        test_simultaneous_finish_is_not_a_loss,
+        test_stream_race_cancels_loser,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
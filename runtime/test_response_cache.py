@@ -0,0 +1,136 @@
+"""
+Tests for the LLM response cache (keys, temperature policy, LRU/TTL, both
+backends) and its use by LLMRouter.
+
+Run: python test_response_cache.py   (or: pytest test_response_cache.py)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.llm_router import LLMRouter
+from utils.response_cache import MemoryBackend, ResponseCache, SqliteBackend, normalize_text
+
+
+class CountingLLM:
+    """Fake provider that counts calls"""
+
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = 0
+
+    async def generate_response(self, prompt, conversation_history=None, max_tokens=150,
+                                temperature=0.7, language="en", timeout=None):
+        self.calls += 1
+        return f"{self.reply} ({self.calls})" if temperature > 0 else self.reply
+
+    async def stream_response(self, prompt, conversation_history=None, max_tokens=150,
+                              temperature=0.7, language="en", timeout=None, first_token_timeout=None):
+        self.calls += 1
+        for word in self.reply.split():
+            yield word + " "
+
+
+def test_normalization_folds_case_punctuation_spacing():
+    assert normalize_text("  Hi!!  Who ARE you? ") == "hi who are you"
+    assert normalize_text("¿Quién eres?") == "quién eres"
+    assert normalize_text("你好！") == "你好"
+
+
+def test_key_varies_with_language_persona_and_history():
+    cache = ResponseCache(MemoryBackend(), persona="Bruce", sampled_variants=1)
+    base = cache.key("Hi!", "en", None, 150, 0.7)
+    assert base == cache.key("hi", "en", [], 150, 0.7)
+    assert base != cache.key("hi", "es", None, 150, 0.7)
+    assert base != cache.key("hi", "en", [{"role": "user", "content": "earlier"}], 150, 0.7)
+    assert base != ResponseCache(MemoryBackend(), persona="Other", sampled_variants=1).key("hi", "en", None, 150, 0.7)
+
+
+def test_sampled_calls_skipped_without_variants():
+    strict = ResponseCache(MemoryBackend(), sampled_variants=0)
+    assert strict.key("hi", "en", None, 150, 0.7) is None
+    assert strict.key("hi", "en", None, 150, 0.0) is not None
+
+
+def test_memory_backend_lru_and_ttl():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", "A", 100.0, 60)
+    backend.set("b", "B", 100.0, 60)
+    backend.get("a")
+    backend.set("c", "C", 100.0, 60)
+    assert backend.get("b") is None, "least recently used entry not evicted"
+    assert backend.get("a") == ("A", 100.0)
+    backend.set("d", "D", 100.0, 0.01)
+    time.sleep(0.02)
+    assert backend.get("d") is None, "expired entry served"
+
+
+def test_sqlite_backend_shared_between_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "responses.sqlite3")
+        SqliteBackend(path).set("k", "Hello!", 800.0, 60)
+        assert SqliteBackend(path).get("k") == ("Hello!", 800.0)
+        assert SqliteBackend(path).get("missing") is None
+
+
+def test_router_serves_repeats_from_cache():
+    llm = CountingLLM("Hi, I'm Bruce.")
+    cache = ResponseCache(MemoryBackend(), sampled_variants=1)
+    router = LLMRouter([("fake", llm)], cache=cache)
+
+    async def turns():
+        first = await router.generate_response("Hi!")
+        second = await router.generate_response("hi")
+        streamed = "".join([f async for f in router.stream_response("HI")])
+        return first, second, streamed
+
+    first, second, streamed = asyncio.run(turns())
+    assert first == second == streamed == "Hi, I'm Bruce. (1)"
+    assert llm.calls == 1, f"provider called {llm.calls} times"
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_sampled_repeats_served_from_variants():
+    """Default settings: the router's sampled calls fill a few variants, then hit"""
+    llm = CountingLLM("Hi, I'm Bruce.")
+    cache = ResponseCache(MemoryBackend())
+    router = LLMRouter([("fake", llm)], cache=cache)
+
+    async def turns():
+        return [await router.generate_response("Hi!") for _ in range(10)]
+
+    replies = asyncio.run(turns())
+    variants = {f"Hi, I'm Bruce. ({i})" for i in (1, 2, 3)}
+    assert replies[:3] == sorted(variants)
+    assert set(replies[3:]) <= variants
+    assert llm.calls == 3, f"provider called {llm.calls} times"
+    stats = cache.stats()
+    assert stats["hits"] == 7 and stats["misses"] == 3
+    assert stats["hit_rate"] > 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_normalization_folds_case_punctuation_spacing,
+        test_key_varies_with_language_persona_and_history,
+        test_sampled_calls_skipped_without_variants,
+        test_memory_backend_lru_and_ttl,
+        test_sqlite_backend_shared_between_instances,
+        test_router_serves_repeats_from_cache,
+        test_sampled_repeats_served_from_variants,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
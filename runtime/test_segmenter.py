@@ -0,0 +1,194 @@
+"""
+Golden tests for SentenceSegmenter (en / zh / es).
+
+Each case is checked twice: segmenting the full text in one call, and pushing
+it in small fragments the way the streaming LLM does. Both must produce the
+golden chunks.
+
+Run: python test_segmenter.py   (or: pytest test_segmenter.py)
+"""
+import os
+import sys
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.text_segmenter import SentenceSegmenter, segment_text, stream_sentences
+
+
+GOLDEN = [
+    # --- English ---
+    (
+        "en",
+        "Hello! I'm Bruce's digital avatar. I can speak English, Chinese, and Spanish.",
+        ["Hello! I'm Bruce's digital avatar.", "I can speak English, Chinese, and Spanish."],
+    ),
+    (
+        "en",
+        "Mr. Smith went to Washington D.C. yesterday. He met Dr. Jones at 3.5 p.m. sharp! Was it fun?",
+        ["Mr. Smith went to Washington D.C. yesterday.", "He met Dr. Jones at 3.5 p.m. sharp!", "Was it fun?"],
+    ),
+    (
+        "en",
+        "Ok. Sure thing, let me explain how this works in a bit more detail for you.",
+        ["Ok. Sure thing, let me explain how this works in a bit more detail for you."],
+    ),
+    (
+        "en",
+        "He said \"wait here.\" Then he left; nobody knew where he had gone.",
+        ["He said \"wait here.\"", "Then he left;", "nobody knew where he had gone."],
+    ),
+    (
+        "en",
+        "This is a very long sentence without any punctuation that keeps going and going and going "
+        "well beyond the limit of one hundred and twenty characters for sure",
+        [
+            "This is a very long sentence without any punctuation that keeps going and going and going "
+            "well beyond the limit of one",
+            "hundred and twenty characters for sure",
+        ],
+    ),
+    (
+        "en",
+        "Neither do I. But we can go there tomorrow. We met John F. Kennedy there. We picked Plan A. Then it rained.",
+        [
+            "Neither do I.", "But we can go there tomorrow.", "We met John F. Kennedy there.",
+            "We picked Plan A.", "Then it rained.",
+        ],
+    ),
+    # --- Chinese ---
+    (
+        "zh",
+        "你好！我是布鲁斯的数字化身。我可以说英语、中文和西班牙语。今天天气很好，我们一起去公园散步吧？",
+        ["你好！我是布鲁斯的数字化身。", "我可以说英语、中文和西班牙语。", "今天天气很好，我们一起去公园散步吧？"],
+    ),
+    (
+        "zh-cn",
+        "道可道，非常道；名可名，非常名。无名天地之始，有名万物之母。",
+        ["道可道，非常道；", "名可名，非常名。", "无名天地之始，有名万物之母。"],
+    ),
+    (
+        "zh",
+        "好的。我们开始吧。",
+        ["好的。我们开始吧。"],
+    ),
+    (
+        "zh",
+        "他说：「我们明天见。」然后就走了。",
+        ["他说：「我们明天见。」", "然后就走了。"],
+    ),
+    (
+        "zh",
+        "我在学习Python编程。It is really fun. 你觉得呢？",
+        ["我在学习Python编程。", "It is really fun.", "你觉得呢？"],
+    ),
+    (
+        "zh",
+        "人工智能技术正在快速发展，它已经被广泛应用于医疗、教育、交通、金融以及娱乐等许多不同的领域之中，并且还在不断扩展。",
+        ["人工智能技术正在快速发展，它已经被广泛应用于医疗、教育、交通、", "金融以及娱乐等许多不同的领域之中，并且还在不断扩展。"],
+    ),
+    # --- Chinese in an English reply (default "en" profile) ---
+    (
+        "en",
+        "你好。我是布鲁斯！今天天气怎么样？我们去公园散步吧，好吗？",
+        ["你好。我是布鲁斯！", "今天天气怎么样？", "我们去公园散步吧，好吗？"],
+    ),
+    (
+        "en",
+        "Sure. 你好。我是布鲁斯！今天天气怎么样？",
+        ["Sure. 你好。", "我是布鲁斯！", "今天天气怎么样？"],
+    ),
+    (
+        "en",
+        "Of course I can speak Chinese. 我可以说中文，也可以说西班牙语。Which one do you prefer?",
+        ["Of course I can speak Chinese.", "我可以说中文，也可以说西班牙语。", "Which one do you prefer?"],
+    ),
+    (
+        "en",
+        "人工智能技术正在快速发展，它已经被广泛应用于医疗、教育、交通、金融以及娱乐等许多不同的领域之中，并且还在不断扩展。",
+        ["人工智能技术正在快速发展，它已经被广泛应用于医疗、教育、交通、", "金融以及娱乐等许多不同的领域之中，并且还在不断扩展。"],
+    ),
+    # --- Spanish ---
+    (
+        "es",
+        "¡Hola! Soy el avatar digital de Bruce. ¿En qué puedo ayudarte hoy? La Sra. García llegó a EE.UU. ayer.",
+        ["¡Hola! Soy el avatar digital de Bruce.", "¿En qué puedo ayudarte hoy?", "La Sra. García llegó a EE.UU. ayer."],
+    ),
+    (
+        "es",
+        "Sí. Claro que sí, con mucho gusto te explico cómo funciona todo esto paso a paso.",
+        ["Sí. Claro que sí, con mucho gusto te explico cómo funciona todo esto paso a paso."],
+    ),
+    (
+        "es",
+        "El Dr. Pérez trabaja aquí desde 2019. Su oficina está en el piso 3.",
+        ["El Dr. Pérez trabaja aquí desde 2019.", "Su oficina está en el piso 3."],
+    ),
+]
+
+
+def _fragments(text: str, size: int = 3):
+    """Split text into small fragments, like an LLM token stream"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_golden_full_text():
+    """Segmenting a complete text matches the golden chunks"""
+    for language, text, expected in GOLDEN:
+        assert segment_text(text, language=language) == expected, (language, text)
+
+
+def test_golden_streamed():
+    """Pushing fragments incrementally gives the same chunks as the full text"""
+    for language, text, expected in GOLDEN:
+        for size in (1, 3, 7):
+            chunks = list(stream_sentences(_fragments(text, size), language=language))
+            assert chunks == expected, (language, size, text)
+
+
+def test_sentence_ready_before_stream_ends():
+    """A closed sentence is available before the rest of the reply arrives"""
+    segmenter = SentenceSegmenter(language="en")
+    segmenter.push("I can help with that. ")
+    assert segmenter.pop() == ["I can help with that."]
+    segmenter.push("Let me think")
+    assert segmenter.pop() == []
+    assert segmenter.flush() == ["Let me think"]
+
+    segmenter = SentenceSegmenter(language="zh")
+    segmenter.push("我可以帮你。然")
+    assert segmenter.pop() == ["我可以帮你。"]
+
+
+def test_chunks_respect_length_limit():
+    """No chunk exceeds the language's character limit"""
+    for language, text, _ in GOLDEN:
+        segmenter = SentenceSegmenter(language=language)
+        for chunk in segmenter.segment(text * 3):
+            assert len(chunk) <= segmenter.max_chars, (language, chunk)
+
+
+def test_custom_abbreviations():
+    """Per-instance abbreviations suppress boundaries"""
+    text = "Talk to Capt. Hook about it. He knows."
+    assert segment_text(text) == ["Talk to Capt.", "Hook about it.", "He knows."]
+    assert segment_text(text, abbreviations=["Capt."]) == ["Talk to Capt. Hook about it.", "He knows."]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_golden_full_text,
+        test_golden_streamed,
+        test_sentence_ready_before_stream_ends,
+        test_chunks_respect_length_limit,
+        test_custom_abbreviations,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,101 @@
+"""
+Tests for utils.vad against the Silero model bundled with faster-whisper.
+
+Runs the real ONNX model (no mocks) on an evaluator fixture, so a model/interface
+mismatch fails here rather than silently disabling VAD in production.
+
+Run: python test_vad.py   (or: pytest test_vad.py)
+"""
+import os
+import sys
+
+import numpy as np
+
+# Add runtime directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from faster_whisper.audio import decode_audio
+
+from models.asr import ASRModel
+from utils.vad import SAMPLE_RATE, WINDOW_SAMPLES, VADIterator, clip_timestamps, get_vad
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evaluator", "fixtures", "bruce_en_short.wav")
+
+
+def load_speech() -> np.ndarray:
+    return decode_audio(FIXTURE, sampling_rate=SAMPLE_RATE)
+
+
+def test_bundled_model_has_v5_inputs():
+    names = {i.name for i in get_vad().session.get_inputs()}
+    assert names == {"input", "state", "sr"}, names
+
+
+def test_speech_timestamps_on_speech():
+    audio = load_speech()
+    timestamps = get_vad().get_speech_timestamps(audio)
+    assert timestamps, "no speech found in a speech fixture"
+    for t in timestamps:
+        assert 0 <= t["start"] < t["end"] <= len(audio)
+    assert len(clip_timestamps(timestamps)) % 2 == 0
+
+
+def test_speech_timestamps_on_silence():
+    assert get_vad().get_speech_timestamps(np.zeros(2 * SAMPLE_RATE, dtype=np.float32)) == []
+
+
+def test_vad_iterator_brackets_speech():
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    audio = np.concatenate([silence, load_speech(), silence])
+    iterator = VADIterator(get_vad())
+    events = []
+    for i in range(0, len(audio) - WINDOW_SAMPLES + 1, WINDOW_SAMPLES):
+        event = iterator(audio[i:i + WINDOW_SAMPLES])
+        if event:
+            events.append(event)
+    assert events, "VADIterator never triggered on speech"
+    assert "start" in events[0] and events[0]["start"] >= len(silence) // 2
+    assert "end" in events[-1]
+    # Starts and ends alternate
+    assert all(("start" in e) == (i % 2 == 0) for i, e in enumerate(events))
+
+
+
+def test_batched_vad_keeps_timeline():
+    """The batched path silences non-speech in place, where the single path passes clip_timestamps"""
+    asr = ASRModel(device="cpu")
+    asr.vad_model = get_vad()
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    audio = np.concatenate([silence, load_speech(), silence, load_speech(), silence])
+
+    masked = asr._mask_non_speech(audio)
+    assert len(masked) == len(audio)
+    clips = asr._speech_clips(audio)
+    assert isinstance(clips, list)
+    starts = [int(s * SAMPLE_RATE) for s in clips[::2]]
+    ends = [int(e * SAMPLE_RATE) for e in clips[1::2]]
+    # Speech is untouched, at its original position; everything else is zero
+    inside = np.zeros(len(audio), dtype=bool)
+    for start, end in zip(starts, ends):
+        inside[start:end] = True
+        assert np.array_equal(masked[start:end], audio[start:end])
+    assert not masked[~inside].any()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_bundled_model_has_v5_inputs,
+        test_speech_timestamps_on_speech,
+        test_speech_timestamps_on_silence,
+        test_vad_iterator_brackets_speech,
+        test_batched_vad_keeps_timeline,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
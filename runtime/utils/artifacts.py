@@ -0,0 +1,374 @@
+"""
+Generated artifact utilities
+Atomic publication of audio/video outputs, push-based readiness checks and
+the registry of published artifacts
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import mimetypes
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Temp files of this service (model scratch output, worker audio). Kept out of
+# the shared /tmp so cleanup only ever touches files the service wrote itself.
+SCRATCH_DIR = os.getenv("SCRATCH_DIR", "/tmp/realtime-avatar-scratch")
+
+
+def scratch_dir() -> str:
+    """The service's scratch directory (created on first use)"""
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    return SCRATCH_DIR
+
+
+def partial_path(final_path: str) -> str:
+    """
+    Temp path to write an artifact to before publishing it.
+
+    Keeps the extension so ffmpeg/soundfile still infer the format
+    (avatar_123.mp4 -> avatar_123.partial.mp4).
+    """
+    stem, ext = os.path.splitext(final_path)
+    return f"{stem}.partial{ext}"
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Compute SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def publish_artifact(tmp_path: str, final_path: str) -> dict:
+    """
+    Atomically publish a fully written artifact under its final name.
+
+    The writer produces tmp_path; a rename makes the complete file appear at
+    final_path in one step, so readers never see a partially written file.
+
+    Args:
+        tmp_path: Path the artifact was written to
+        final_path: Name to publish it under (same filesystem)
+
+    Returns:
+        Dict with path, size_bytes and sha256
+    """
+    if tmp_path != final_path:
+        os.replace(tmp_path, final_path)
+
+    size = os.path.getsize(final_path)
+    checksum = file_sha256(final_path)
+    logger.debug(f"Published {os.path.basename(final_path)} ({size} bytes, sha256={checksum[:12]})")
+    return {
+        "path": final_path,
+        "size_bytes": size,
+        "sha256": checksum,
+    }
+
+
+# ----------------------------------------------------------------------
+# inotify (Linux) - used when the shared volume lags behind the HTTP response
+# ----------------------------------------------------------------------
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct("iIII")
+
+_libc = None
+
+
+def _get_libc():
+    """Load libc for inotify (None if unavailable, e.g. on macOS)"""
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1  # noqa: B018 - raises AttributeError if missing
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc or None
+
+
+class DirectoryWatch:
+    """Minimal non-blocking inotify watch on one directory"""
+
+    def __init__(self, directory: str, mask: int = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE):
+        libc = _get_libc()
+        if libc is None:
+            raise OSError("inotify not available on this platform")
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read_events(self) -> Iterator[Tuple[str, int]]:
+        """Yield (filename, mask) for pending events"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            yield name, mask
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _is_ready(path: str, expected_size: Optional[int]) -> bool:
+    """Check that path exists (with the expected size, if known)"""
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        return False
+    return expected_size is None or size == expected_size
+
+
+async def wait_for_artifact(
+    path: str,
+    expected_size: Optional[int] = None,
+    timeout: float = 3.0,
+    give_up: Optional[Callable[[], bool]] = None
+) -> bool:
+    """
+    Wait until a published artifact is visible, without polling.
+
+    Normally the producer's HTTP response is the readiness signal and the file
+    is already there (one stat). If a shared volume hasn't caught up yet, an
+    inotify watch on the directory wakes us when the file is renamed into place.
+
+    Args:
+        path: Artifact path
+        expected_size: Size reported by the producer (None = existence only)
+        timeout: Maximum time to wait in seconds
+        give_up: Re-checked on every change in the directory; stop waiting
+            (returning False) once it returns True, e.g. when a producer has
+            finished without writing this file
+
+    Returns:
+        True if the artifact is ready, False on timeout or give-up
+    """
+    if _is_ready(path, expected_size):
+        return True
+
+    wait_start = time.time()
+    directory, name = os.path.split(path)
+
+    try:
+        watch = DirectoryWatch(directory or ".")
+    except OSError as e:
+        logger.warning(f"[ARTIFACT] inotify unavailable ({e}); not ready: {path}")
+        return False
+
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def on_events():
+        names = [event_name for event_name, _ in watch.read_events()]
+        if give_up is not None or name in names:
+            changed.set()
+
+    loop.add_reader(watch.fd, on_events)
+    try:
+        async def wait_until_ready() -> bool:
+            # Re-check after the watch is armed to close the race with the rename
+            while not _is_ready(path, expected_size):
+                if give_up is not None and give_up():
+                    return False
+                await changed.wait()
+                changed.clear()
+            return True
+
+        if not await asyncio.wait_for(wait_until_ready(), timeout=timeout):
+            logger.info(f"[ARTIFACT] Gave up waiting for {name} after {time.time() - wait_start:.3f}s")
+            return False
+        logger.info(f"[ARTIFACT] {name} visible after {time.time() - wait_start:.3f}s (inotify)")
+        return True
+
+    except asyncio.TimeoutError:
+        logger.warning(f"[ARTIFACT] Timeout after {timeout}s waiting for {path}")
+        return False
+
+    finally:
+        loop.remove_reader(watch.fd)
+        watch.close()
+
+
+# ----------------------------------------------------------------------
+# Artifact registry - what the runtime has produced and may serve
+# ----------------------------------------------------------------------
+
+# Bound on tracked artifacts (a 5-chunk reply registers 5)
+DEFAULT_MAX_ARTIFACTS = int(os.getenv("ARTIFACT_REGISTRY_SIZE", "512"))
+
+
+@dataclass
+class ArtifactRecord:
+    """A published artifact the runtime can serve"""
+    artifact_id: str
+    path: str
+    size_bytes: int
+    mtime_ns: int
+    content_type: str
+    sha256: Optional[str] = None
+    job_id: Optional[str] = None
+    session_id: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+
+
+class ArtifactRegistry:
+    """
+    Bounded in-memory index of published artifacts.
+
+    Pipelines register an artifact once it's published (size/mtime captured
+    then), so serving it is a dict lookup instead of probing directories and
+    stat-ing per request. Oldest entries are evicted past max_entries; file
+    cleanup calls remove() so the index and the disk stay in step.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ARTIFACTS,
+        on_evict: Optional[Callable[[ArtifactRecord], None]] = None,
+    ):
+        """
+        Initialize registry.
+
+        Args:
+            max_entries: Maximum number of tracked artifacts
+            on_evict: Called with each record dropped for capacity
+        """
+        self.max_entries = max(1, max_entries)
+        self.on_evict = on_evict
+
+        self._records: "OrderedDict[str, ArtifactRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def register(
+        self,
+        path: str,
+        size_bytes: Optional[int] = None,
+        sha256: Optional[str] = None,
+        job_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        content_type: Optional[str] = None,
+    ) -> ArtifactRecord:
+        """
+        Record a published artifact (keyed by file name, as used in URLs).
+
+        Args:
+            path: Artifact path
+            size_bytes: Size reported by the producer (stat'ed if omitted)
+            sha256: Content hash reported by the producer
+            job_id: Job or chunk that produced it
+            session_id: Conversation session it belongs to
+            content_type: MIME type (guessed from the extension if omitted)
+
+        Returns:
+            The registered ArtifactRecord
+        """
+        try:
+            st = os.stat(path)
+            size_bytes, mtime_ns = st.st_size, st.st_mtime_ns
+        except FileNotFoundError:
+            # Shared volume lagging behind the producer: trust its reported size
+            if size_bytes is None:
+                raise
+            mtime_ns = time.time_ns()
+
+        record = ArtifactRecord(
+            artifact_id=os.path.basename(path),
+            path=path,
+            size_bytes=size_bytes,
+            mtime_ns=mtime_ns,
+            content_type=content_type or mimetypes.guess_type(path)[0] or "application/octet-stream",
+            sha256=sha256,
+            job_id=job_id,
+            session_id=session_id,
+        )
+
+        evicted = []
+        with self._lock:
+            self._records[record.artifact_id] = record
+            self._records.move_to_end(record.artifact_id)
+            while len(self._records) > self.max_entries:
+                _, old = self._records.popitem(last=False)
+                self.evictions += 1
+                evicted.append(old)
+
+        for old in evicted:
+            self._evict(old)
+        return record
+
+    def get(self, artifact_id: Optional[str]) -> Optional[ArtifactRecord]:
+        """Look up an artifact by id (file name)"""
+        if not artifact_id:
+            return None
+        return self._records.get(artifact_id)
+
+    def remove(self, artifact_id: str) -> Optional[ArtifactRecord]:
+        """Forget an artifact (its file was deleted)"""
+        with self._lock:
+            return self._records.pop(artifact_id, None)
+
+    def records(self) -> List[ArtifactRecord]:
+        """Snapshot of all records, oldest first"""
+        with self._lock:
+            return list(self._records.values())
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                "entries": len(self._records),
+                "max_entries": self.max_entries,
+                "bytes": sum(r.size_bytes for r in self._records.values()),
+                "evictions": self.evictions,
+            }
+
+    def _evict(self, record: ArtifactRecord):
+        if self.on_evict is None:
+            return
+        try:
+            self.on_evict(record)
+        except Exception as e:
+            logger.warning(f"Artifact registry eviction hook failed for {record.artifact_id}: {e}")
+
+
+# Global registry instance
+_artifact_registry: Optional[ArtifactRegistry] = None
+
+
+def get_artifact_registry() -> ArtifactRegistry:
+    """Get or create global artifact registry"""
+    global _artifact_registry
+    if _artifact_registry is None:
+        _artifact_registry = ArtifactRegistry()
+    return _artifact_registry
@@ -1,6 +1,7 @@
 """
 Audio processing utilities
 """
+import io
 import logging
 import os
 from typing import Tuple
@@ -8,6 +9,9 @@ import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Whisper and Silero VAD both expect 16kHz mono
+ASR_SAMPLE_RATE = 16000
+
 
 def load_audio(file_path: str) -> Tuple[np.ndarray, int]:
     """
@@ -95,6 +99,86 @@ def resample_audio(
         raise
 
 
+def resample_audio_poly(
+    audio: np.ndarray,
+    orig_sr: int,
+    target_sr: int
+) -> np.ndarray:
+    """
+    Resample audio with a polyphase filter (scipy).
+    
+    Much faster than librosa.resample for integer ratios such as
+    24kHz (XTTS) -> 16kHz (HuBERT/Ditto).
+    
+    Args:
+        audio: Audio data (mono)
+        orig_sr: Original sample rate
+        target_sr: Target sample rate
+        
+    Returns:
+        Resampled float32 audio
+    """
+    from math import gcd
+    from scipy.signal import resample_poly
+    
+    audio = np.asarray(audio, dtype=np.float32)
+    if orig_sr == target_sr:
+        return audio
+    
+    g = gcd(orig_sr, target_sr)
+    return resample_poly(audio, target_sr // g, orig_sr // g).astype(np.float32)
+
+
+def decode_audio_bytes(data: bytes, target_sr: int = ASR_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode an uploaded audio file from memory (no temp file).
+    
+    WAV/FLAC/OGG go through soundfile; anything libsndfile can't read (the
+    browser's WebM/Opus from MediaRecorder, MP4/AAC, MP3) through PyAV.
+    
+    Args:
+        data: Encoded audio file contents
+        target_sr: Output sample rate
+        
+    Returns:
+        Mono float32 audio at target_sr
+        
+    Raises:
+        ValueError: If the data can't be decoded as audio
+    """
+    if not data:
+        raise ValueError("Empty audio upload")
+    
+    import soundfile as sf
+    
+    try:
+        audio, sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+        return resample_audio_poly(audio.mean(axis=1), sr, target_sr)
+    except RuntimeError:
+        pass  # Not a libsndfile format (LibsndfileError is a RuntimeError)
+    
+    import av
+    
+    try:
+        with av.open(io.BytesIO(data), mode="r") as container:
+            if not container.streams.audio:
+                raise ValueError("Upload has no audio stream")
+            # Decode, downmix and resample in one pass inside libav
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=target_sr)
+            chunks = []
+            for frame in container.decode(audio=0):
+                for resampled in resampler.resample(frame):
+                    chunks.append(resampled.to_ndarray().reshape(-1))
+            for resampled in resampler.resample(None):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+    except av.AVError as e:
+        raise ValueError(f"Could not decode audio upload: {e}")
+    
+    if not chunks:
+        raise ValueError("Audio upload contains no samples")
+    return np.concatenate(chunks).astype(np.float32, copy=False)
+
+
 def normalize_audio(audio: np.ndarray, target_db: float = -20.0) -> np.ndarray:
     """
     Normalize audio to target dB level.
@@ -0,0 +1,271 @@
+"""
+Streaming FFmpeg video writer
+Encodes frames as they are rendered by piping raw RGB into a single ffmpeg process
+"""
+import logging
+import os
+import subprocess
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FFmpegPipeWriter:
+    """
+    Frame writer that encodes while frames are still being produced.
+
+    Drop-in for the Ditto SDK writer (`writer(frame, fmt="rgb")` per frame,
+    then `writer.close()`). Frames go to ffmpeg's stdin as rawvideo with the
+    audio track as a second input, so encoding and muxing happen in one pass
+    at the final fps/profile, overlapped with rendering - no intermediate
+    video file and no second encode.
+
+    Timing fields (seconds, from time.time()) let callers split render and
+    encode in their [PERF] logs:
+        first_frame_at / last_frame_at: when frames arrived
+        write_blocked_s: time spent blocked on the pipe (encoder behind renderer)
+        closed_at: when ffmpeg finished writing the output
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        audio_path: Optional[str] = None,
+        input_fps: int = 25,
+        output_fps: int = 18,
+        crf: int = 28,
+        preset: str = "veryfast",
+        audio_sample_rate: int = 24000,
+        audio_bitrate: str = "64k",
+    ):
+        """
+        Initialize writer. ffmpeg starts on the first frame (its size sets -s).
+
+        Args:
+            output_path: Output .mp4 path
+            audio_path: Audio track to mux (None = video only)
+            input_fps: Rate frames are produced at (Ditto renders 25fps)
+            output_fps: Output frame rate
+            crf: x264 quality
+            preset: x264 preset
+            audio_sample_rate: Output AAC sample rate
+            audio_bitrate: Output AAC bitrate
+        """
+        self.output_path = output_path
+        self.audio_path = audio_path
+        self.input_fps = input_fps
+        self.output_fps = output_fps
+        self.crf = crf
+        self.preset = preset
+        self.audio_sample_rate = audio_sample_rate
+        self.audio_bitrate = audio_bitrate
+
+        self.process: Optional[subprocess.Popen] = None
+        self.frame_count = 0
+        self.first_frame_at: Optional[float] = None
+        self.last_frame_at: Optional[float] = None
+        self.closed_at: Optional[float] = None
+        self.write_blocked_s = 0.0
+        self._stderr: List[bytes] = []
+        self._stderr_thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def build_command(self, width: int, height: int) -> List[str]:
+        """ffmpeg command line for frames of the given size"""
+        cmd = [
+            "ffmpeg", "-loglevel", "error", "-y",
+            # Input 0: raw RGB frames on stdin
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-s", f"{width}x{height}",
+            "-framerate", str(self.input_fps),
+            "-i", "pipe:0",
+        ]
+        if self.audio_path:
+            # Input 1: synthesized speech
+            cmd += ["-i", self.audio_path, "-map", "0:v", "-map", "1:a"]
+        else:
+            cmd += ["-map", "0:v"]
+
+        cmd += [
+            "-c:v", "libx264",
+            "-preset", self.preset,          # Fast encoding
+            "-profile:v", "baseline",        # Max browser compatibility
+            "-level", "3.0",                 # Lower level for better streaming
+            "-pix_fmt", "yuv420p",
+            "-crf", str(self.crf),           # Balanced quality/size
+            "-r", str(self.output_fps),      # Final fps, dropped from 25 on the fly
+        ]
+        cmd += self.encoder_args()
+
+        if self.audio_path:
+            cmd += [
+                "-c:a", "aac",
+                "-ar", str(self.audio_sample_rate),
+                "-ac", "1",
+                "-b:a", self.audio_bitrate,
+            ]
+
+        cmd += self.output_args()
+        return cmd
+
+    def encoder_args(self) -> List[str]:
+        """Extra encoder options for subclasses"""
+        return []
+
+    def output_args(self) -> List[str]:
+        """Muxer options and output (progressive MP4)"""
+        return ["-movflags", "+faststart", self.output_path]  # Progressive download - CRITICAL!
+
+    def _start(self, width: int, height: int):
+        cmd = self.build_command(width, height)
+        logger.info(f"[PERF] FFmpeg pipe command: {' '.join(cmd)}")
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        # Drain stderr so a chatty ffmpeg can't block on a full pipe
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    def _drain_stderr(self):
+        for line in self.process.stderr:
+            self._stderr.append(line)
+
+    def __call__(self, img: np.ndarray, fmt: str = "rgb"):
+        """Write one frame (HxWx3 uint8)"""
+        if self._closed:
+            raise RuntimeError("FFmpegPipeWriter is closed")
+
+        now = time.time()
+        if self.process is None:
+            height, width = img.shape[:2]
+            self._start(width, height)
+            self.first_frame_at = now
+
+        if fmt == "bgr":
+            img = img[..., ::-1]
+        frame = np.ascontiguousarray(img, dtype=np.uint8)
+
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg exited early: {self._error_output()}")
+
+        self.write_blocked_s += time.time() - now
+        self.last_frame_at = time.time()
+        self.frame_count += 1
+
+    def close(self):
+        """Finish encoding and wait for ffmpeg to write the output"""
+        if self._closed:
+            return
+        self._closed = True
+
+        if self.process is None:
+            logger.warning(f"FFmpegPipeWriter closed without frames: {self.output_path}")
+            self.closed_at = time.time()
+            return
+
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        if self._stderr_thread:
+            self._stderr_thread.join(timeout=1.0)
+        self.closed_at = time.time()
+
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed ({returncode}): {self._error_output()}")
+
+    def _error_output(self) -> str:
+        return b"".join(self._stderr).decode(errors="replace").strip()[-2000:]
+
+    @property
+    def encode_tail_s(self) -> float:
+        """Encode time after the last frame (the part not hidden behind rendering)"""
+        if self.closed_at is None or self.last_frame_at is None:
+            return 0.0
+        return max(0.0, self.closed_at - self.last_frame_at)
+
+    def abort(self):
+        """Kill ffmpeg and remove partial output"""
+        self._closed = True
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+
+class FragmentedMP4Writer(FFmpegPipeWriter):
+    """
+    Pipe writer that also emits fragmented MP4 (CMAF) as it encodes.
+
+    Alongside the usual progressive MP4, the same encode is written as an
+    HLS/fMP4 stream into fragment_dir:
+        init.mp4        - initialization segment (codec config)
+        seg_00000.m4s   - ~segment_seconds media fragments, in order
+        index.m3u8      - playlist; gets #EXT-X-ENDLIST when the chunk is done
+
+    Fragments appear while frames are still being rendered (each is written to
+    a .tmp name and renamed when complete), so a player can start on the first
+    fragment instead of waiting for the whole chunk and its moov rewrite.
+    """
+
+    INIT_NAME = "init.mp4"
+    PLAYLIST_NAME = "index.m3u8"
+    SEGMENT_PATTERN = "seg_%05d.m4s"
+
+    def __init__(self, output_path: str, fragment_dir: str, segment_seconds: float = 1.0, **kwargs):
+        """
+        Initialize writer.
+
+        Args:
+            output_path: Progressive .mp4 output path
+            fragment_dir: Directory for init.mp4 / seg_*.m4s / index.m3u8
+            segment_seconds: Target fragment duration
+            **kwargs: FFmpegPipeWriter options
+        """
+        super().__init__(output_path, **kwargs)
+        self.fragment_dir = fragment_dir
+        self.segment_seconds = segment_seconds
+        os.makedirs(fragment_dir, exist_ok=True)
+
+    def encoder_args(self) -> List[str]:
+        # Keyframe at every fragment boundary so each fragment is independently decodable
+        return [
+            "-force_key_frames", f"expr:gte(t,n_forced*{self.segment_seconds})",
+            "-sc_threshold", "0",
+            "-flags", "+global_header",
+        ]
+
+    def output_args(self) -> List[str]:
+        # One encode, two muxers: progressive MP4 + HLS with fMP4 segments
+        hls_options = ":".join([
+            "f=hls",
+            f"hls_time={self.segment_seconds}",
+            "hls_segment_type=fmp4",
+            "hls_list_size=0",
+            "hls_playlist_type=event",
+            "hls_flags=temp_file+independent_segments",
+            f"hls_fmp4_init_filename={self.INIT_NAME}",
+            f"hls_segment_filename={os.path.join(self.fragment_dir, self.SEGMENT_PATTERN)}",
+        ])
+        tee = (
+            f"[f=mp4:movflags=+faststart]{self.output_path}"
+            f"|[{hls_options}]{os.path.join(self.fragment_dir, self.PLAYLIST_NAME)}"
+        )
+        return ["-f", "tee", tee]
+
+    def abort(self):
+        super().abort()
+        import shutil
+        shutil.rmtree(self.fragment_dir, ignore_errors=True)
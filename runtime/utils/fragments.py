@@ -0,0 +1,92 @@
+"""
+Fragmented MP4 (fMP4/CMAF) chunk output
+Locates and waits for fragments the GPU service writes while a chunk renders
+"""
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from utils.artifacts import wait_for_artifact
+
+logger = logging.getLogger(__name__)
+
+# Written by the GPU service (shared volume, read-only here)
+FRAGMENTS_ROOT = "/tmp/gpu-service-output/fragments"
+
+INIT_NAME = "init.mp4"
+PLAYLIST_NAME = "index.m3u8"
+SEGMENT_TEMPLATE = "seg_{index:05d}.m4s"
+FRAGMENT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+FRAGMENT_NAME_RE = re.compile(r"^(init\.mp4|index\.m3u8|seg_\d{5}\.m4s)$")
+ENDLIST_TAG = "#EXT-X-ENDLIST"
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+    ".m3u8": "application/vnd.apple.mpegurl",
+}
+
+
+def fragment_path(fragment_id: str, name: str, root: str = FRAGMENTS_ROOT) -> str:
+    """
+    Path of one fragment file.
+
+    Raises:
+        ValueError: If the id or file name isn't a valid fragment name
+    """
+    if not FRAGMENT_ID_RE.match(fragment_id) or not FRAGMENT_NAME_RE.match(name):
+        raise ValueError(f"Invalid fragment: {fragment_id}/{name}")
+    return os.path.join(root, fragment_id, name)
+
+
+def segment_name(index: int) -> str:
+    """File name of the index-th media segment"""
+    return SEGMENT_TEMPLATE.format(index=index)
+
+
+def media_type(name: str) -> str:
+    """Content type for a fragment file"""
+    return MEDIA_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+
+
+def stream_ended(fragment_dir: str) -> bool:
+    """True once the chunk's playlist is final (no more segments will be written)"""
+    try:
+        with open(os.path.join(fragment_dir, PLAYLIST_NAME)) as f:
+            return ENDLIST_TAG in f.read()
+    except FileNotFoundError:
+        return False
+
+
+async def wait_for_fragment(fragment_id: str, name: str, timeout: float, root: str = FRAGMENTS_ROOT) -> Optional[str]:
+    """
+    Wait until a fragment is written (push-based, via inotify).
+
+    Segments past the end of the chunk resolve to None as soon as the playlist
+    is final, so a player polling for "the next segment" isn't left hanging.
+
+    Args:
+        fragment_id: Fragment id announced in the video_fragments event
+        name: init.mp4, index.m3u8 or seg_NNNNN.m4s
+        timeout: Maximum time to wait in seconds
+
+    Returns:
+        Path to the fragment, or None if it won't appear (or timed out)
+    """
+    path = fragment_path(fragment_id, name, root)
+    if os.path.exists(path):
+        return path
+
+    deadline = time.time() + timeout
+    fragment_dir = os.path.dirname(path)
+
+    # The GPU service creates the directory when rendering starts, which may be
+    # just after the client was told about it
+    if not await wait_for_artifact(fragment_dir, timeout=timeout):
+        return None
+
+    give_up = (lambda: stream_ended(fragment_dir)) if name.startswith("seg_") else None
+    ready = await wait_for_artifact(path, timeout=max(0.0, deadline - time.time()), give_up=give_up)
+    return path if ready else None
@@ -0,0 +1,328 @@
+"""
+Artifact janitor
+Background garbage collection of generated audio/video files, bounded by
+total size and age
+"""
+import asyncio
+import contextlib
+import fnmatch
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JanitorRoot:
+    """
+    A directory the janitor manages.
+
+    Each top-level entry matching `patterns` is one unit: a file, or a whole
+    directory (e.g. a fragment dir or a sadtalker_tmp_* dir).
+    """
+    directory: str
+    patterns: Tuple[str, ...] = ("*",)
+    exclude: Tuple[str, ...] = ()
+    # Per-root age limit (None = the janitor's max_age_s)
+    max_age_s: Optional[float] = None
+    # False for scratch directories whose files may still be in use: age-based cleanup only
+    count_toward_budget: bool = True
+
+
+@dataclass
+class _Entry:
+    path: str
+    size: int
+    last_used: float
+    is_dir: bool
+    root: JanitorRoot
+
+
+class ArtifactJanitor:
+    """
+    Deletes generated artifacts past an age limit, then least recently used
+    ones until the total is under a byte budget.
+
+    Never deleted:
+    - entries younger than min_age_s (being written, or just handed to a client)
+    - pinned entries: an exact path, or a name prefix such as a job id, pinned
+      for as long as a request that references it is in flight
+    - held entries: a path or name prefix held for a while after its last use
+      (e.g. every output of a job, across the separate requests that make it)
+
+    Usage:
+        janitor = ArtifactJanitor("runtime", [JanitorRoot("/tmp/audio_uploads")])
+        janitor.start()
+        with janitor.pinned(job_id):
+            ...
+    """
+
+    def __init__(
+        self,
+        name: str,
+        roots: List[JanitorRoot],
+        max_bytes: int,
+        max_age_s: float,
+        min_age_s: float = 120.0,
+        interval_s: float = 60.0,
+        on_delete: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Initialize janitor.
+
+        Args:
+            name: Service name (for logs and metrics)
+            roots: Directories to manage
+            max_bytes: Byte budget across roots that count toward it
+            max_age_s: Entries unused for longer are deleted
+            min_age_s: Entries used more recently are never deleted
+            interval_s: Seconds between sweeps
+            on_delete: Called with each deleted path (e.g. to drop registry entries)
+        """
+        self.name = name
+        self.roots = roots
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.min_age_s = min_age_s
+        self.interval_s = interval_s
+        self.on_delete = on_delete
+
+        self._pins: Dict[str, int] = {}
+        self._holds: Dict[str, float] = {}  # key -> time.time() it expires
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.files_held = 0
+        self.bytes_held = 0
+        self.files_deleted_total = 0
+        self.bytes_reclaimed_total = 0
+        self.delete_errors_total = 0
+        self.last_sweep_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Pins and use tracking
+    # ------------------------------------------------------------------
+
+    def pin(self, key: str):
+        """Protect a path, or every entry whose name starts with key"""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key: str):
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    @contextlib.contextmanager
+    def pinned(self, key: str) -> Iterator[None]:
+        """Pin key for the duration of a block"""
+        self.pin(key)
+        try:
+            yield
+        finally:
+            self.unpin(key)
+
+    def hold(self, key: str, ttl_s: float):
+        """Protect a path, or every entry whose name starts with key, for ttl_s from now"""
+        with self._lock:
+            self._holds[key] = max(self._holds.get(key, 0.0), time.time() + ttl_s)
+
+    def touch(self, path: str):
+        """Record a use (e.g. the file was served), for LRU order"""
+        with self._lock:
+            self._touched[path] = time.time()
+
+    def _is_pinned(self, path: str, pins: List[str]) -> bool:
+        name = os.path.basename(path)
+        return any(path == key or name.startswith(key) for key in pins)
+
+    # ------------------------------------------------------------------
+    # Sweeping
+    # ------------------------------------------------------------------
+
+    def _scan(self) -> List[_Entry]:
+        with self._lock:
+            touched = dict(self._touched)
+
+        entries = []
+        for root in self.roots:
+            try:
+                scanner = os.scandir(root.directory)
+            except FileNotFoundError:
+                continue
+            with scanner:
+                for item in scanner:
+                    if not any(fnmatch.fnmatch(item.name, p) for p in root.patterns):
+                        continue
+                    if any(fnmatch.fnmatch(item.name, p) for p in root.exclude):
+                        continue
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            size, mtime = _dir_usage(item.path)
+                            is_dir = True
+                        else:
+                            st = item.stat(follow_symlinks=False)
+                            size, mtime = st.st_size, max(st.st_mtime, st.st_atime)
+                            is_dir = False
+                    except FileNotFoundError:
+                        continue
+                    last_used = max(mtime, touched.get(item.path, 0.0))
+                    entries.append(_Entry(item.path, size, last_used, is_dir, root))
+        return entries
+
+    def sweep(self) -> dict:
+        """
+        Run one collection pass (blocking; run() calls it in a thread).
+
+        Returns:
+            Dict with files_deleted and bytes_reclaimed for this pass
+        """
+        start = time.time()
+        now = start
+        entries = self._scan()
+        with self._lock:
+            self._holds = {key: expiry for key, expiry in self._holds.items() if expiry > now}
+            pins = list(self._pins) + list(self._holds)
+
+        def deletable(entry: _Entry) -> bool:
+            return now - entry.last_used >= self.min_age_s and not self._is_pinned(entry.path, pins)
+
+        deleted: List[_Entry] = []
+        kept: List[_Entry] = []
+
+        # 1. Age limit
+        for entry in entries:
+            max_age = entry.root.max_age_s if entry.root.max_age_s is not None else self.max_age_s
+            if now - entry.last_used > max_age and deletable(entry) and self._delete(entry):
+                deleted.append(entry)
+            else:
+                kept.append(entry)
+
+        # 2. Byte budget, least recently used first
+        budgeted = [e for e in kept if e.root.count_toward_budget]
+        total = sum(e.size for e in budgeted)
+        if total > self.max_bytes:
+            for entry in sorted(budgeted, key=lambda e: e.last_used):
+                if total <= self.max_bytes:
+                    break
+                if deletable(entry) and self._delete(entry):
+                    deleted.append(entry)
+                    kept.remove(entry)
+                    total -= entry.size
+            if total > self.max_bytes:
+                logger.warning(
+                    f"[JANITOR] {self.name}: {total / 1e6:.0f}MB held after sweep "
+                    f"(budget {self.max_bytes / 1e6:.0f}MB); remaining entries are pinned or in use"
+                )
+
+        reclaimed = sum(e.size for e in deleted)
+        with self._lock:
+            self.runs += 1
+            self.files_held = len(kept)
+            self.bytes_held = sum(e.size for e in kept)
+            self.files_deleted_total += len(deleted)
+            self.bytes_reclaimed_total += reclaimed
+            self.last_sweep_ms = (time.time() - start) * 1000
+            # Forget use times for entries that no longer exist
+            live = {e.path for e in kept}
+            self._touched = {p: t for p, t in self._touched.items() if p in live}
+
+        if deleted:
+            logger.info(
+                f"[JANITOR] {self.name}: deleted {len(deleted)} entries ({reclaimed / 1e6:.1f}MB) "
+                f"in {self.last_sweep_ms:.0f}ms; holding {self.files_held} ({self.bytes_held / 1e6:.1f}MB)"
+            )
+        return {"files_deleted": len(deleted), "bytes_reclaimed": reclaimed}
+
+    def _delete(self, entry: _Entry) -> bool:
+        try:
+            if entry.is_dir:
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            with self._lock:
+                self.delete_errors_total += 1
+            logger.warning(f"[JANITOR] {self.name}: failed to delete {entry.path}: {e}")
+            return False
+
+        if self.on_delete is not None:
+            try:
+                self.on_delete(entry.path)
+            except Exception as e:
+                logger.warning(f"[JANITOR] {self.name}: on_delete hook failed for {entry.path}: {e}")
+        return True
+
+    # ------------------------------------------------------------------
+    # Background task
+    # ------------------------------------------------------------------
+
+    async def run(self):
+        """Sweep every interval_s until cancelled"""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"[JANITOR] {self.name}: sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_s)
+
+    def start(self):
+        """Start the background task (call from the event loop, e.g. on startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+            logger.info(
+                f"[JANITOR] {self.name}: managing {', '.join(r.directory for r in self.roots)} "
+                f"(max {self.max_bytes / 1e6:.0f}MB, max age {self.max_age_s:.0f}s, every {self.interval_s:.0f}s)"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict:
+        """Metrics: what's held, what's been reclaimed"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "files_held": self.files_held,
+                "bytes_held": self.bytes_held,
+                "files_deleted_total": self.files_deleted_total,
+                "bytes_reclaimed_total": self.bytes_reclaimed_total,
+                "delete_errors_total": self.delete_errors_total,
+                "pinned": len(self._pins),
+                "held": len(self._holds),
+                "runs": self.runs,
+                "last_sweep_ms": self.last_sweep_ms,
+                "max_bytes": self.max_bytes,
+                "max_age_s": self.max_age_s,
+            }
+
+
+def _dir_usage(path: str) -> Tuple[int, float]:
+    """Total size and newest mtime under a directory"""
+    size = 0
+    newest = os.stat(path).st_mtime
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                st = os.stat(os.path.join(dirpath, filename))
+            except FileNotFoundError:
+                continue
+            size += st.st_size
+            newest = max(newest, st.st_mtime)
+    return size, newest
@@ -0,0 +1,30 @@
+"""
+Binary media frames for the WebSocket conversation endpoint
+Lets video chunks and fMP4 fragments travel on the same socket as JSON events
+"""
+import json
+import struct
+from typing import Tuple
+
+# Frame layout (all integers big-endian):
+#   4 bytes   header length N
+#   N bytes   UTF-8 JSON header, e.g.
+#             {"kind": "video_chunk", "seq": 12, "chunk_index": 0,
+#              "content_type": "video/mp4", "byte_length": 48213}
+#   rest      media payload (byte_length bytes)
+HEADER_LENGTH = struct.Struct(">I")
+
+
+def pack_media_frame(header: dict, payload: bytes) -> bytes:
+    """Build one binary WebSocket frame"""
+    header = dict(header, byte_length=len(payload))
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return HEADER_LENGTH.pack(len(header_bytes)) + header_bytes + payload
+
+
+def unpack_media_frame(frame: bytes) -> Tuple[dict, bytes]:
+    """Split a binary frame into (header, payload) - used by test clients"""
+    (header_length,) = HEADER_LENGTH.unpack_from(frame)
+    start = HEADER_LENGTH.size
+    header = json.loads(frame[start:start + header_length].decode("utf-8"))
+    return header, frame[start + header_length:]
@@ -0,0 +1,194 @@
+"""
+Avatar registration cache
+Reuses prepared source-image state (face detection, crop, source features)
+across requests for the same reference image
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from utils.artifacts import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Reference images in use at once are few (one per avatar), so keep this small
+DEFAULT_MAX_ENTRIES = int(os.getenv("AVATAR_REGISTRATION_CACHE_SIZE", "4"))
+
+# (path, mtime_ns, size) -> sha256, so unchanged images aren't re-hashed per chunk
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def image_content_hash(path: str) -> str:
+    """
+    Content hash of an image file.
+
+    Keyed on content rather than path, so a replaced file is re-registered and
+    the same image under two names shares one entry.
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _hash_lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+
+    digest = file_sha256(path)
+    with _hash_lock:
+        if len(_hash_memo) > 256:
+            _hash_memo.clear()
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+def _freeze(value: Any) -> Hashable:
+    """Make a registration parameter usable in a cache key"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class RegistrationCache:
+    """
+    LRU cache of prepared avatar source state.
+
+    Entries are keyed by (image content hash, registration parameters such as
+    crop_scale / crop_vx_ratio / crop_vy_ratio), so chunks that reuse the same
+    reference image skip face detection and source feature extraction.
+
+    Usage:
+        cache = RegistrationCache("ditto")
+        source_info = cache.get_or_create(
+            image_path, lambda: register(image_path, **crop), **crop
+        )
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        on_evict: Optional[Callable[[Any], None]] = None,
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            name: Backend name (for logs and stats)
+            max_entries: Maximum number of prepared sources to keep
+            on_evict: Called with an evicted value (e.g. to delete files on disk)
+        """
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.on_evict = on_evict
+
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, image_path: str, **params) -> tuple:
+        """Cache key for an image and its registration parameters"""
+        return (image_content_hash(image_path), _freeze(params))
+
+    def get(self, key: tuple) -> Optional[Any]:
+        """Return a cached value (and mark it recently used), or None"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: tuple, value: Any):
+        """Store a value, evicting the least recently used entries"""
+        evicted = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, old = self._entries.popitem(last=False)
+                self.evictions += 1
+                evicted.append(old)
+
+        for old in evicted:
+            self._evict(old)
+
+    def get_or_create(
+        self,
+        image_path: str,
+        factory: Callable[[], Any],
+        validate: Optional[Callable[[Any], bool]] = None,
+        **params
+    ) -> Any:
+        """
+        Return prepared state for an image, computing it on a miss.
+
+        Args:
+            image_path: Reference image path
+            factory: Computes the prepared state (called on a miss)
+            validate: Optional check that a cached value is still usable
+                (e.g. its files still exist); failing entries are recomputed
+            **params: Registration parameters that affect the result
+
+        Returns:
+            Cached or freshly computed value
+        """
+        key = self.key(image_path, **params)
+
+        value = self.get(key)
+        if value is not None and (validate is None or validate(value)):
+            with self._lock:
+                self.hits += 1
+            logger.info(f"[PERF] {self.name} registration cache hit: {os.path.basename(image_path)}")
+            return value
+
+        with self._lock:
+            self.misses += 1
+
+        start = time.time()
+        value = factory()
+        self.put(key, value)
+        logger.info(
+            f"[PERF] {self.name} registration cache miss: {os.path.basename(image_path)} "
+            f"registered in {time.time() - start:.2f}s"
+        )
+        return value
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for value in entries:
+            self._evict(value)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self, value: Any):
+        if self.on_evict is None:
+            return
+        try:
+            self.on_evict(value)
+        except Exception as e:
+            logger.warning(f"{self.name} registration cache eviction hook failed: {e}")
@@ -0,0 +1,306 @@
+"""
+LLM response cache
+Replies to repeated prompts ("hi", "who are you", "what can you do") served
+without an LLM round trip
+
+Keys are the normalized user text (case, punctuation and spacing folded)
+plus language, persona (system prompt), reply length and, optionally, a
+hash of the last few history messages. Sampled (temperature > 0) calls keep
+a few replies per key and serve one of them at random, so a repeat prompt
+doesn't always get the same one. Entries are LRU-bounded with a TTL.
+The backend is pluggable: in-memory (per process) or a local sqlite file
+(shared by every runtime worker on the host).
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.stage_executor import get_stage_executor
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """'  Hi!! Who ARE you? ' -> 'hi who are you'"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+class MemoryBackend:
+    """LRU dict in this process"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(response, generation latency ms), or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, latency_ms, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response, latency_ms
+
+    def set(self, key: str, response: str, latency_ms: float, ttl_s: float):
+        with self._lock:
+            self._entries[key] = (response, latency_ms, time.time() + ttl_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SqliteBackend:
+    """
+    LRU table in a local sqlite file (WAL mode), shared by every process
+    that opens the same path. Blocking: the cache runs it on the IO stage.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 4096):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL, latency_ms REAL NOT NULL,"
+                " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread (sqlite connections aren't shared across threads)
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=1.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT response, latency_ms FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return (row[0], row[1]) if row is not None else None
+
+    def set(self, key: str, response: str, latency_ms: float, ttl_s: float):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, latency_ms, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, response, latency_ms, now + ttl_s, now),
+            )
+            self._writes += 1
+            if self._writes % 64 == 0:
+                # Prune now and then rather than on every write
+                db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses"
+                    " ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def size(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Cache of LLM replies keyed by normalized prompt + language + persona.
+
+    A greedy call (temperature 0) has one reply per key. A sampled call has
+    sampled_variants: the first calls for a key each generate and store one,
+    and once they're all stored a repeat gets one of them at random.
+
+    Usage:
+        cache = get_response_cache()
+        key = cache.key(prompt, language, history, max_tokens, temperature)
+        hit = await cache.lookup(key, temperature) if key else None
+        ...
+        await cache.store(key, response, latency_ms, temperature)
+    """
+
+    def __init__(
+        self,
+        backend,
+        persona: str = "",
+        ttl_s: float = 86400.0,
+        history_messages: int = 2,
+        sampled_variants: int = 3,
+        max_prompt_chars: int = 200,
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            backend: MemoryBackend or SqliteBackend
+            persona: System prompt (part of every key, so a new persona starts fresh)
+            ttl_s: How long a reply is served from the cache
+            history_messages: Last N history messages in the key (0 = ignore history)
+            sampled_variants: Replies kept per key for temperature > 0 calls
+                (0 = only cache greedy calls)
+            max_prompt_chars: Longer prompts aren't cached (unlikely to repeat)
+        """
+        self.backend = backend
+        self.persona_hash = hashlib.sha256(persona.encode()).hexdigest()[:16]
+        self.ttl_s = ttl_s
+        self.history_messages = history_messages
+        self.sampled_variants = sampled_variants
+        self.max_prompt_chars = max_prompt_chars
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+        self.errors = 0
+        self.saved_ms_total = 0.0
+
+    def key(
+        self,
+        prompt: str,
+        language: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        max_tokens: int,
+        temperature: float,
+    ) -> Optional[str]:
+        """Cache key for a call, or None if it shouldn't be cached"""
+        normalized = normalize_text(prompt)
+        if (temperature > 0 and not self.sampled_variants) or not normalized or len(normalized) > self.max_prompt_chars:
+            self.skipped += 1
+            return None
+        history = (conversation_history or [])[-self.history_messages:] if self.history_messages else []
+        history_hash = hashlib.sha256(json.dumps(
+            [[m.get("role"), normalize_text(m.get("content", ""))] for m in history], ensure_ascii=False
+        ).encode()).hexdigest()[:16]
+        raw = f"v1|{self.persona_hash}|{language}|{max_tokens}|{history_hash}|{normalized}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _slots(self, key: str, temperature: float) -> List[str]:
+        """Backend keys holding a call's replies: one if greedy, sampled_variants if sampled"""
+        if temperature > 0:
+            return [f"{key}:{i}" for i in range(self.sampled_variants)]
+        return [key]
+
+    def _get_all(self, slots: List[str]) -> List[Optional[Tuple[str, float]]]:
+        return [self.backend.get(slot) for slot in slots]
+
+    def _set_free(self, slots: List[str], response: str, latency_ms: float):
+        # First empty slot (a random one if concurrent calls filled them all)
+        free = [slot for slot in slots if self.backend.get(slot) is None]
+        self.backend.set(free[0] if free else random.choice(slots), response, latency_ms, self.ttl_s)
+
+    async def lookup(self, key: str, temperature: float = 0.0) -> Optional[str]:
+        """
+        Cached reply for a key (counts the hit and the latency it saved).
+        A sampled call only hits once all its variants are stored.
+        """
+        start = time.perf_counter()
+        try:
+            entries = await self._call(self._get_all, self._slots(key, temperature))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache lookup failed: {e}")
+            return None
+        if any(entry is None for entry in entries):
+            self.misses += 1
+            return None
+        response, latency_ms = random.choice(entries)
+        self.hits += 1
+        self.saved_ms_total += max(0.0, latency_ms - (time.perf_counter() - start) * 1000)
+        return response
+
+    async def store(self, key: str, response: str, latency_ms: float, temperature: float = 0.0):
+        """Cache a reply with the latency it took to generate"""
+        if not response:
+            return
+        try:
+            await self._call(self._set_free, self._slots(key, temperature), response, latency_ms)
+            self.stores += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache store failed: {e}")
+
+    async def _call(self, fn, *args):
+        if self.backend.blocking:
+            return await get_stage_executor("io").run(fn, *args)
+        return fn(*args)
+
+    def stats(self) -> dict:
+        """Metrics: hit rate and latency saved (this process)"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "stores": self.stores,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_ms_total": self.saved_ms_total,
+            "saved_ms_per_hit": self.saved_ms_total / self.hits if self.hits else 0.0,
+        }
+
+
+# Global cache (created on first use from settings; None when disabled)
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get or create the global response cache (RESPONSE_CACHE_BACKEND=off disables it)"""
+    global _response_cache
+    if _response_cache is None:
+        from config import settings
+        from models.llm import DEFAULT_SYSTEM_PROMPT
+        if settings.response_cache_backend == "off":
+            return None
+        if settings.response_cache_backend == "sqlite":
+            backend = SqliteBackend(settings.response_cache_path, settings.response_cache_max_entries)
+        else:
+            backend = MemoryBackend(settings.response_cache_max_entries)
+        _response_cache = ResponseCache(
+            backend,
+            persona=DEFAULT_SYSTEM_PROMPT,
+            ttl_s=settings.response_cache_ttl_s,
+            history_messages=settings.response_cache_history_messages,
+            sampled_variants=settings.response_cache_sampled_variants,
+        )
+    return _response_cache
+
+
+def response_cache_stats() -> Optional[dict]:
+    """Stats for the global cache, if it's enabled"""
+    return _response_cache.stats() if _response_cache is not None else None
@@ -0,0 +1,381 @@
+"""
+Conversation session store
+Server-side conversation state keyed by session id, so clients send a
+session_id instead of their whole history every turn
+
+Each session keeps its recent turns verbatim and folds older ones into a
+short running summary as they fall out of the token budget, so the context
+sent to the LLM stays the same size however long the conversation gets.
+Sessions expire after a TTL; past the memory bound the least recently used
+are spilled to disk (if a spill directory is set) or dropped.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = "[Earlier in this conversation]"
+# Longest summary line per folded turn
+SUMMARY_LINE_CHARS = 160
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_.:-]{1,128}$")
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer: ~4 characters per token for
+    Latin script, ~1 per CJK character. Good enough for budgeting.
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_session_id(session_id: str) -> bool:
+    return bool(_SESSION_ID.match(session_id or ""))
+
+
+def _summary_line(role: str, text: str) -> str:
+    """First sentence of a turn (clipped), e.g. 'User: How far is the moon?'"""
+    text = " ".join(text.split())
+    match = re.search(r"(?<=[.!?。！？])\s", text)
+    if match:
+        text = text[:match.start()]
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    return f"{'User' if role == 'user' else 'Assistant'}: {text}"
+
+
+@dataclass
+class Turn:
+    __slots__ = ("role", "text", "tokens")
+    role: str  # "user" | "assistant"
+    text: str
+    tokens: int
+
+
+@dataclass
+class Session:
+    """One conversation: recent turns plus a summary of the ones before them"""
+    session_id: str
+    turns: List[Turn] = field(default_factory=list)
+    summary: List[str] = field(default_factory=list)
+    turn_tokens: int = 0
+    summary_tokens: int = 0
+    last_access: float = field(default_factory=time.time)
+
+    @property
+    def size_bytes(self) -> int:
+        return (
+            sum(len(t.text) for t in self.turns) + sum(len(line) for line in self.summary)
+            + 64 * (len(self.turns) + len(self.summary)) + 256
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "last_access": self.last_access,
+            "summary": self.summary,
+            "turns": [[t.role, t.text, t.tokens] for t in self.turns],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Session":
+        session = cls(data["session_id"], last_access=data["last_access"], summary=list(data["summary"]))
+        session.turns = [Turn(role, text, tokens) for role, text, tokens in data["turns"]]
+        session.turn_tokens = sum(t.tokens for t in session.turns)
+        session.summary_tokens = sum(estimate_tokens(line) for line in session.summary)
+        return session
+
+
+class SessionStore:
+    """
+    Conversation sessions in memory, LRU-ordered, with TTL expiry, a memory
+    bound and an optional disk spill. Thread-safe.
+
+    Usage:
+        store = get_session_store()
+        history = store.context(session_id)       # messages for the LLM
+        ...
+        store.add_exchange(session_id, user_text, response_text)
+    """
+
+    def __init__(
+        self,
+        ttl_s: float = 1800.0,
+        max_bytes: int = 64 * 1024 ** 2,
+        spill_dir: Optional[str] = None,
+        context_tokens: int = 1024,
+        summary_tokens: int = 256,
+    ):
+        """
+        Initialize store.
+
+        Args:
+            ttl_s: Sessions unused this long are dropped (memory and disk)
+            max_bytes: Memory bound across sessions; least recently used go past it
+            spill_dir: Write sessions evicted for memory here instead of dropping them
+            context_tokens: Token budget for a session's context (summary + recent turns)
+            summary_tokens: Part of the budget the summary of older turns may use
+        """
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir or None
+        self.context_tokens = context_tokens
+        self.summary_tokens = min(summary_tokens, context_tokens // 2)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        self.created_total = 0
+        self.expired_total = 0
+        self.spilled_total = 0
+        self.dropped_total = 0
+        self.restored_total = 0
+        self.folded_turns_total = 0
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def context(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        The session's context as conversation_history messages: the summary
+        of older turns (as one user message) then the recent turns verbatim.
+        Empty for an unknown or expired session.
+        """
+        with self._lock:
+            session = self._get(session_id, create=False)
+            if session is None:
+                return []
+            messages = []
+            if session.summary:
+                messages.append({"role": "user", "content": "\n".join([SUMMARY_HEADER] + session.summary)})
+            messages.extend({"role": t.role, "content": t.text} for t in session.turns)
+            return messages
+
+    def is_empty(self, session_id: str) -> bool:
+        """True if the session doesn't exist (or expired) or has no turns yet"""
+        with self._lock:
+            session = self._get(session_id, create=False)
+            return session is None or not (session.turns or session.summary)
+
+    def add_turn(self, session_id: str, role: str, text: str):
+        """Append a turn, folding the oldest into the summary if over budget"""
+        text = (text or "").strip()
+        if not text:
+            return
+        with self._lock:
+            session = self._get(session_id, create=True)
+            before = session.size_bytes
+            session.turns.append(Turn(role, text, estimate_tokens(text)))
+            session.turn_tokens += session.turns[-1].tokens
+            self._fold(session)
+            self._bytes += session.size_bytes - before
+            self._enforce_memory_bound()
+
+    def add_exchange(self, session_id: str, user_text: str, response_text: str):
+        """Record one user turn and the assistant's reply"""
+        self.add_turn(session_id, "user", user_text)
+        self.add_turn(session_id, "assistant", response_text)
+
+    def seed(self, session_id: str, history: List[Dict[str, str]]):
+        """Load client-sent history into a new session (clients moving to session ids)"""
+        for message in history:
+            if message.get("role") in ("user", "assistant"):
+                self.add_turn(session_id, message["role"], message.get("content", ""))
+
+    def delete(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.size_bytes
+            self._remove_spill(session_id)
+
+    def sweep(self):
+        """Drop expired sessions, in memory and on disk"""
+        with self._lock:
+            self._sweep(time.time())
+
+    def stats(self) -> dict:
+        """Metrics: sessions, memory, expiry/spill counts"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "spill_dir": self.spill_dir,
+                "context_tokens": self.context_tokens,
+                "created_total": self.created_total,
+                "expired_total": self.expired_total,
+                "spilled_total": self.spilled_total,
+                "dropped_total": self.dropped_total,
+                "restored_total": self.restored_total,
+                "folded_turns_total": self.folded_turns_total,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals (called with the lock held)
+    # ------------------------------------------------------------------
+
+    def _get(self, session_id: str, create: bool) -> Optional[Session]:
+        now = time.time()
+        if now - self._last_sweep > min(60.0, self.ttl_s / 2):
+            self._sweep(now)
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._restore(session_id, now)
+        elif now - session.last_access > self.ttl_s:
+            self._sessions.pop(session_id)
+            self._bytes -= session.size_bytes
+            self.expired_total += 1
+            session = None
+
+        if session is None:
+            if not create:
+                return None
+            session = Session(session_id)
+            self._sessions[session_id] = session
+            self._bytes += session.size_bytes
+            self.created_total += 1
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _fold(self, session: Session):
+        """Move the oldest turns into the summary until the context fits the budget"""
+        turn_budget = self.context_tokens - self.summary_tokens
+        # Always keep the latest exchange verbatim
+        while session.turn_tokens > turn_budget and len(session.turns) > 2:
+            turn = session.turns.pop(0)
+            session.turn_tokens -= turn.tokens
+            line = _summary_line(turn.role, turn.text)
+            session.summary.append(line)
+            session.summary_tokens += estimate_tokens(line)
+            self.folded_turns_total += 1
+        # The summary itself is bounded: its oldest lines go first
+        while session.summary_tokens > self.summary_tokens and session.summary:
+            session.summary_tokens -= estimate_tokens(session.summary.pop(0))
+
+    def _sweep(self, now: float):
+        self._last_sweep = now
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.ttl_s:
+                break
+            self._sessions.popitem(last=False)
+            self._bytes -= session.size_bytes
+            self.expired_total += 1
+        if self.spill_dir:
+            for name in os.listdir(self.spill_dir):
+                path = os.path.join(self.spill_dir, name)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl_s:
+                        os.remove(path)
+                        self.expired_total += 1
+                except OSError:
+                    pass
+
+    def _enforce_memory_bound(self):
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            session_id, session = self._sessions.popitem(last=False)
+            self._bytes -= session.size_bytes
+            if self.spill_dir and self._spill(session):
+                self.spilled_total += 1
+            else:
+                self.dropped_total += 1
+
+    def _spill_path(self, session_id: str) -> str:
+        # Hashed: session ids come from clients
+        return os.path.join(self.spill_dir, hashlib.sha1(session_id.encode()).hexdigest() + ".json")
+
+    def _spill(self, session: Session) -> bool:
+        path = self._spill_path(session.session_id)
+        try:
+            tmp_path = f"{path}.partial"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(session.to_json(), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            os.utime(path, (session.last_access, session.last_access))
+            return True
+        except OSError as e:
+            logger.warning(f"Session spill failed ({session.session_id}): {e}")
+            return False
+
+    def _restore(self, session_id: str, now: float) -> Optional[Session]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                session = Session.from_json(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Session restore failed ({session_id}): {e}")
+            self._remove_spill(session_id)
+            return None
+        self._remove_spill(session_id)
+        if now - session.last_access > self.ttl_s:
+            self.expired_total += 1
+            return None
+        self._sessions[session_id] = session
+        self._bytes += session.size_bytes
+        self.restored_total += 1
+        self._enforce_memory_bound()
+        return session
+
+    def _remove_spill(self, session_id: str):
+        if self.spill_dir:
+            try:
+                os.remove(self._spill_path(session_id))
+            except FileNotFoundError:
+                pass
+
+
+# Global store (created on first use from settings)
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Get or create the global session store"""
+    global _session_store
+    if _session_store is None:
+        from config import settings
+        _session_store = SessionStore(
+            ttl_s=settings.session_ttl_s,
+            max_bytes=settings.session_store_max_bytes,
+            spill_dir=settings.session_spill_dir,
+            context_tokens=settings.session_context_tokens,
+            summary_tokens=settings.session_summary_tokens,
+        )
+    return _session_store
+
+
+def session_context(session_id: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    """
+    conversation_history for a session's next turn. History sent by the
+    client seeds a session the store doesn't know yet; after that the
+    server-side context is used and client-sent history is ignored.
+    """
+    store = get_session_store()
+    if conversation_history and store.is_empty(session_id):
+        store.seed(session_id, conversation_history)
+    return store.context(session_id)
@@ -0,0 +1,194 @@
+"""
+Stage executors
+Bounded thread pools for the blocking stages of a conversation turn (ASR,
+LLM, VAD, file I/O), so a Whisper run or an LLM call never blocks the event loop
+and one busy stage can't starve the others
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per stage for the wait/run time percentiles
+TIMING_WINDOW = 512
+
+
+class StageBusy(Exception):
+    """The stage's queue is full; the caller should shed load (503)"""
+
+    def __init__(self, stage: str, max_queue: int):
+        super().__init__(f"{stage} stage is busy ({max_queue} calls already queued)")
+        self.stage = stage
+        self.max_queue = max_queue
+
+
+class StageExecutor:
+    """
+    A fixed number of worker threads for one stage plus a bounded wait queue.
+
+    Calls beyond max_workers wait in the queue; calls beyond max_queue are
+    rejected with StageBusy instead of piling up behind a slow model. Queue
+    depth, time spent waiting for a worker and time spent running are
+    recorded for /metrics.
+
+    Usage:
+        asr = get_stage_executor("asr")
+        result = await asr.run(model.transcribe, audio, language="en")
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        Initialize executor.
+
+        Args:
+            name: Stage name (for thread names, logs and metrics)
+            max_workers: Calls running at once
+            max_queue: Calls allowed to wait for a worker
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"stage-{name}")
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.max_queued_seen = 0
+        self.completed_total = 0
+        self.failed_total = 0
+        self.rejected_total = 0
+        self._wait_ms: Deque[float] = deque(maxlen=TIMING_WINDOW)
+        self._run_ms: Deque[float] = deque(maxlen=TIMING_WINDOW)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on a worker thread and await its result.
+
+        Raises:
+            StageBusy: If max_queue calls are already waiting
+        """
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected_total += 1
+                raise StageBusy(self.name, self.max_queue)
+            self.queued += 1
+            self.max_queued_seen = max(self.max_queued_seen, self.queued)
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self._wait_ms.append((started - submitted) * 1000)
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self._run_ms.append((time.perf_counter() - started) * 1000)
+                    if failed:
+                        self.failed_total += 1
+                    else:
+                        self.completed_total += 1
+
+        future = self._executor.submit(call)
+
+        def on_done(f):
+            # Cancelled before a worker picked it up: call() never ran
+            if f.cancelled():
+                with self._lock:
+                    self.queued -= 1
+
+        future.add_done_callback(on_done)
+        # Cancelling the awaiting task cancels the call if it hasn't started yet
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work; queued calls that haven't started are dropped"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Metrics: queue depth, throughput, wait and run time"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queued,
+                "max_queue_depth": self.max_queued_seen,
+                "in_flight": self.running,
+                "completed_total": self.completed_total,
+                "failed_total": self.failed_total,
+                "rejected_total": self.rejected_total,
+                "wait_ms": _summarize(self._wait_ms),
+                "run_ms": _summarize(self._run_ms),
+            }
+
+
+def _summarize(samples: Deque[float]) -> dict:
+    """avg/p50/p95/max over the recent window"""
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "avg": sum(ordered) / n,
+        "p50": ordered[n // 2],
+        "p95": ordered[min(n - 1, int(n * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+# Global stage executors (created on first use from settings)
+_executors: Dict[str, StageExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_stage_executor(stage: str) -> StageExecutor:
+    """
+    Get the executor for a stage: "asr", "llm", "vad" or "io".
+
+    Concurrency and queue size come from settings (ASR_WORKERS,
+    ASR_QUEUE_SIZE, LLM_WORKERS, ...).
+    """
+    with _executors_lock:
+        executor = _executors.get(stage)
+        if executor is None:
+            from config import settings
+            limits = {
+                "asr": (settings.asr_workers, settings.asr_queue_size),
+                "llm": (settings.llm_workers, settings.llm_queue_size),
+                "vad": (settings.vad_workers, settings.vad_queue_size),
+                "io": (settings.io_workers, settings.io_queue_size),
+            }
+            if stage not in limits:
+                raise ValueError(f"Unknown stage: {stage}")
+            max_workers, max_queue = limits[stage]
+            executor = StageExecutor(stage, max_workers, max_queue)
+            _executors[stage] = executor
+            logger.info(f"[PERF] {stage} stage: {max_workers} worker(s), queue {max_queue}")
+        return executor
+
+
+def stage_stats() -> Dict[str, dict]:
+    """Stats for every stage executor created so far"""
+    with _executors_lock:
+        return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def shutdown_stage_executors():
+    """Shut down all stage executors (on app shutdown)"""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
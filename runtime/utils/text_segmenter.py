@@ -0,0 +1,395 @@
+"""
+Text segmentation utilities
+Turns (streamed) LLM output into speakable sentence chunks
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from utils.language import normalize_language_code
+
+logger = logging.getLogger(__name__)
+
+# CJK sentence terminators close a sentence immediately (no whitespace follows them)
+CJK_TERMINATORS = "。！？；．"
+# Latin terminators only close a sentence when followed by whitespace (or end of text),
+# so "3.5" or "U.S.A" are not split
+LATIN_TERMINATORS = ".!?;"
+# Closing quotes/brackets that belong to the sentence they follow
+CLOSERS = "\"')]}”’」』）】》"
+# Preferred places to break an over-long sentence
+SOFT_BREAKS = ",:，、：—"
+# Characters that open a sentence and should be ignored for abbreviation lookup
+OPENERS = "\"'([{“‘「『（【《¿¡"
+# Capitalized words that usually start a new sentence: after a single capital
+# and a period ("Plan A. Then ..."), these mean the period ended the sentence
+SENTENCE_STARTERS = {
+    "a", "after", "also", "an", "and", "as", "at", "before", "but", "for", "he", "her", "his",
+    "how", "however", "i", "if", "in", "it", "its", "just", "let", "maybe", "my", "no", "not",
+    "now", "oh", "ok", "okay", "on", "our", "please", "she", "so", "still", "that", "the",
+    "their", "then", "there", "these", "they", "this", "those", "to", "today", "tomorrow",
+    "we", "well", "what", "when", "where", "which", "who", "why", "yes", "yet", "you", "your",
+}
+
+# Per-language abbreviations whose trailing period does not end a sentence.
+# Extend with register_abbreviations() or the `abbreviations` argument.
+ABBREVIATIONS: Dict[str, Set[str]] = {
+    "en": {
+        "D.C.", "Mr.", "Mrs.", "Ms.", "Dr.", "Jr.", "Sr.", "St.", "Prof.",
+        "U.S.", "U.K.", "etc.", "vs.", "e.g.", "i.e.", "a.m.", "p.m.", "No.",
+    },
+    "es": {
+        "Sr.", "Sra.", "Srta.", "Dr.", "Dra.", "Ud.", "Uds.", "Lic.", "Ing.",
+        "EE.UU.", "etc.", "p.ej.", "aprox.", "núm.", "pág.", "a.m.", "p.m.",
+    },
+    "zh": set(),
+}
+
+
+@dataclass(frozen=True)
+class LanguageProfile:
+    """Chunk length limits for a language"""
+    max_chars: int  # Hard cap per chunk (characters)
+    min_length: int  # Shorter sentences are merged into the next one
+    count_words: bool  # min_length counts words (True) or characters (False)
+
+
+# ~120 Latin characters or ~40 CJK characters is roughly 8-10s of speech
+LANGUAGE_PROFILES: Dict[str, LanguageProfile] = {
+    "en": LanguageProfile(max_chars=120, min_length=3, count_words=True),
+    "es": LanguageProfile(max_chars=120, min_length=3, count_words=True),
+    "zh": LanguageProfile(max_chars=40, min_length=4, count_words=False),
+    "ja": LanguageProfile(max_chars=40, min_length=4, count_words=False),
+}
+
+
+def register_abbreviations(language: str, abbreviations: Iterable[str]):
+    """
+    Add abbreviations for a language.
+
+    Args:
+        language: Language code (en, zh-cn, es, ...)
+        abbreviations: Abbreviations including their trailing period (e.g. "Dr.")
+    """
+    key = _language_key(language)
+    ABBREVIATIONS.setdefault(key, set()).update(abbreviations)
+
+
+def _language_key(language: str) -> str:
+    """Map en / zh-cn / zh / es-MX to the base language key used by the tables"""
+    return normalize_language_code(language or "en").split("-")[0]
+
+
+def _is_cjk(ch: str) -> bool:
+    """Check if a character belongs to a CJK script (no spaces between words)"""
+    code = ord(ch)
+    return (
+        0x4E00 <= code <= 0x9FFF      # CJK Unified Ideographs
+        or 0x3400 <= code <= 0x4DBF   # Extension A
+        or 0x3000 <= code <= 0x30FF   # CJK punctuation, Hiragana, Katakana
+        or 0xFF00 <= code <= 0xFFEF   # Fullwidth forms
+    )
+
+
+class SentenceSegmenter:
+    """
+    Incremental sentence chunker for TTS.
+
+    Text is pushed as it arrives (e.g. LLM tokens) and complete chunks are
+    popped as soon as their sentence closes. Only the unscanned tail of the
+    buffer is examined on each push, so segmenting a streamed reply is linear
+    in its length.
+
+    Handles:
+    - Latin (.!?;) and CJK (。！？；) terminators, including mixed-language text
+    - Per-language abbreviation tables (Mr., Sra., e.g., ...)
+    - Character-based length limits per language, splitting long sentences at
+      commas first, then word boundaries (Latin) or characters (CJK)
+    - Merging of very short sentences into the following one
+
+    Usage:
+        segmenter = SentenceSegmenter(language="zh")
+        for token in tokens:
+            segmenter.push(token)
+            for chunk in segmenter.pop():
+                ...
+        for chunk in segmenter.flush():
+            ...
+    """
+
+    def __init__(
+        self,
+        language: str = "en",
+        max_chars: Optional[int] = None,
+        min_length: Optional[int] = None,
+        abbreviations: Optional[Iterable[str]] = None,
+        first_chunk_chars: Optional[int] = None,
+    ):
+        """
+        Initialize segmenter.
+
+        Args:
+            language: Language code; selects length limits and abbreviations
+            max_chars: Override the language's maximum chunk length (characters)
+            min_length: Override the language's minimum sentence length
+                (words for space-delimited languages, characters for CJK)
+            abbreviations: Extra abbreviations for this instance
+            first_chunk_chars: If set, keep combining sentences into the first
+                chunk until it reaches this many characters (trades TTFF for a
+                longer initial playback buffer). Off by default.
+        """
+        self.language = _language_key(language)
+        profile = LANGUAGE_PROFILES.get(self.language, LANGUAGE_PROFILES["en"])
+
+        self.max_chars = max_chars or profile.max_chars
+        self.min_length = profile.min_length if min_length is None else min_length
+        self.count_words = profile.count_words
+        self.first_chunk_chars = first_chunk_chars
+
+        # English abbreviations are always recognised (code-switching is common)
+        self.abbreviations: Set[str] = set(ABBREVIATIONS["en"])
+        self.abbreviations |= ABBREVIATIONS.get(self.language, set())
+        if abbreviations:
+            self.abbreviations |= set(abbreviations)
+
+        self._buffer = ""
+        self._scan_pos = 0
+        self._pending = ""
+        self._ready: List[str] = []
+        self._emitted = 0
+
+    def push(self, text: str):
+        """Append text and detect any sentences it closes"""
+        if not text:
+            return
+        self._buffer += text
+        self._scan(final=False)
+
+    def pop(self) -> List[str]:
+        """Return (and clear) chunks that are ready to synthesize"""
+        ready, self._ready = self._ready, []
+        return ready
+
+    def flush(self) -> List[str]:
+        """Mark end of input and return all remaining chunks"""
+        self._scan(final=True)
+
+        remaining = self._buffer.strip()
+        self._buffer = ""
+        self._scan_pos = 0
+        if remaining:
+            self._emit(remaining, final=True)
+
+        if self._pending:
+            pending, self._pending = self._pending, ""
+            self._append_ready(pending)
+
+        return self.pop()
+
+    def segment(self, text: str) -> List[str]:
+        """Segment a complete text in one call"""
+        self.push(text)
+        return self.pop() + self.flush()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _scan(self, final: bool):
+        """Scan the buffer from the last position for sentence boundaries"""
+        i = self._scan_pos
+        while i < len(self._buffer):
+            buf = self._buffer
+            ch = buf[i]
+
+            if ch in CJK_TERMINATORS or ch in LATIN_TERMINATORS:
+                # Consume runs like "?!", "...", "。」"
+                j = i + 1
+                while j < len(buf) and (buf[j] in LATIN_TERMINATORS or buf[j] in CJK_TERMINATORS or buf[j] in CLOSERS):
+                    j += 1
+
+                if j >= len(buf) and not final:
+                    # A closing quote or more punctuation may still arrive
+                    break
+
+                if ch in LATIN_TERMINATORS and j < len(buf) and not (buf[j].isspace() or _is_cjk(buf[j])):
+                    # "3.5", "U.S.A", "file.txt" - not a boundary
+                    i = j
+                    continue
+
+                if ch == "." and self._is_abbreviation(buf[:i + 1]):
+                    i = j
+                    continue
+
+                if ch == "." and self._is_initial(buf[:i + 1]):
+                    # "John F. Kennedy" vs "Plan A. Then ...": decided by the next word
+                    next_word = self._next_word(buf, j, final)
+                    if next_word is None:
+                        break  # Wait for the next word to arrive
+                    if next_word[:1].isupper() and next_word.lower() not in SENTENCE_STARTERS:
+                        i = j
+                        continue
+
+                self._close(j)
+                i = 0
+                continue
+
+            i += 1
+
+        self._scan_pos = i
+
+        if not final:
+            # Run-on text without punctuation: emit at a soft boundary once too long
+            while len(self._buffer.strip()) > self.max_chars:
+                cut = self._find_cut(self._buffer, self.max_chars)
+                piece = self._buffer[:cut]
+                self._buffer = self._buffer[cut:]
+                self._scan_pos = max(0, self._scan_pos - cut)
+                self._emit(piece.strip(), final=False)
+
+    def _close(self, end: int):
+        """Close the sentence ending at buffer index `end`"""
+        sentence = self._buffer[:end].strip()
+        self._buffer = self._buffer[end:]
+        self._scan_pos = 0
+        if sentence:
+            self._emit(sentence, final=False)
+
+    def _is_abbreviation(self, text: str) -> bool:
+        """Check whether text (ending in a period) ends with an abbreviation"""
+        parts = text.rsplit(None, 1)
+        if not parts:
+            return False
+        return parts[-1].lstrip(OPENERS) in self.abbreviations
+
+    def _is_initial(self, text: str) -> bool:
+        """Check whether text (ending in a period) ends with a single capital ("F.", not "I.")"""
+        parts = text.rsplit(None, 1)
+        if not parts:
+            return False
+        token = parts[-1].lstrip(OPENERS)
+        return len(token) == 2 and token[0].isupper() and token[0].isalpha() and token[0] != "I"
+
+    def _next_word(self, buf: str, start: int, final: bool) -> Optional[str]:
+        """The word after buf[start:] (openers/punctuation stripped), or None if not complete yet"""
+        rest = buf[start:].lstrip()
+        end = 0
+        while end < len(rest) and not rest[end].isspace():
+            end += 1
+        if end == len(rest) and not final:
+            return None
+        return rest[:end].lstrip(OPENERS).rstrip(LATIN_TERMINATORS + CLOSERS + SOFT_BREAKS)
+
+    def _length(self, text: str) -> int:
+        """
+        Length used for the minimum-size check. Under a word-counting profile
+        each CJK character counts as a word, so Chinese text inside an
+        English reply is still split into sentences rather than merged whole.
+        """
+        if self.count_words:
+            cjk = sum(1 for c in text if _is_cjk(c) and c.isalnum())
+            words = "".join(" " if _is_cjk(c) else c for c in text).split()
+            return cjk + len(words)
+        return sum(1 for c in text if not c.isspace())
+
+    def _max_chars(self, text: str) -> int:
+        """Length limit for a chunk: mostly-CJK text keeps the CJK limit under any profile"""
+        if self.count_words:
+            letters = [c for c in text if c.isalnum()]
+            if letters and 2 * sum(1 for c in letters if _is_cjk(c)) > len(letters):
+                return min(self.max_chars, LANGUAGE_PROFILES["zh"].max_chars)
+        return self.max_chars
+
+    def _join(self, left: str, right: str) -> str:
+        """Join two pieces, without a space after CJK text"""
+        if not left:
+            return right
+        if _is_cjk(left[-1]):
+            return left + right
+        return left + " " + right
+
+    def _emit(self, sentence: str, final: bool):
+        """Merge short sentences, apply the first-chunk buffer, then length-split"""
+        text = self._join(self._pending, sentence)
+
+        if self._length(text) < self.min_length and not final:
+            self._pending = text
+            return
+
+        if (
+            self.first_chunk_chars
+            and self._emitted == 0
+            and len(text) < self.first_chunk_chars
+            and not final
+        ):
+            self._pending = text
+            return
+
+        self._pending = ""
+        self._append_ready(text)
+
+    def _append_ready(self, text: str):
+        """Split text to the length limit and queue the pieces"""
+        while len(text) > self._max_chars(text):
+            cut = self._find_cut(text, self._max_chars(text))
+            piece = text[:cut].strip()
+            text = text[cut:].strip()
+            if piece:
+                self._ready.append(piece)
+                self._emitted += 1
+        if text:
+            self._ready.append(text)
+            self._emitted += 1
+
+    def _find_cut(self, text: str, limit: int) -> int:
+        """Index to cut text at, no later than limit (soft break > space > hard cut)"""
+        window = text[:limit + 1]
+        floor = limit // 2
+
+        soft = max(window.rfind(c) for c in SOFT_BREAKS)
+        if soft >= floor:
+            return soft + 1
+
+        space = window.rfind(" ")
+        if space > 0:
+            return space + 1
+
+        return limit
+
+
+def segment_text(text: str, language: str = "en", **kwargs) -> List[str]:
+    """
+    Split a complete text into chunks.
+
+    Args:
+        text: Text to split
+        language: Language code
+        **kwargs: SentenceSegmenter options
+
+    Returns:
+        List of chunk strings
+    """
+    return SentenceSegmenter(language=language, **kwargs).segment(text)
+
+
+def stream_sentences(
+    fragments: Iterable[str],
+    language: str = "en",
+    **kwargs
+) -> Iterator[str]:
+    """
+    Yield chunks from a stream of text fragments as soon as their sentence closes.
+
+    Args:
+        fragments: Text fragments (e.g. LLM token stream)
+        language: Language code
+        **kwargs: SentenceSegmenter options
+
+    Yields:
+        Chunk strings
+    """
+    segmenter = SentenceSegmenter(language=language, **kwargs)
+    for fragment in fragments:
+        segmenter.push(fragment)
+        yield from segmenter.pop()
+    yield from segmenter.flush()
@@ -0,0 +1,256 @@
+"""
+Voice activity detection
+Silero VAD on onnxruntime, working on numpy arrays: no torch.hub download,
+no torch import, no temp files
+
+The ONNX model is the one bundled with faster-whisper (its assets directory),
+so it's always present where Whisper is. VAD_MODEL_PATH overrides it. That
+model is Silero v5: a single (2, B, 128) recurrent state, and each window is
+fed with the last 64 samples of the previous one prepended.
+"""
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Silero's window at 16kHz (32ms)
+WINDOW_SAMPLES = 512
+# Samples of the previous window prepended to each one (v5 at 16kHz)
+CONTEXT_SAMPLES = 64
+# Inputs of the Silero v5 graph (v4 took h/c instead of state)
+MODEL_INPUTS = {"input", "state", "sr"}
+# Speech ends when the probability drops this far below the threshold
+NEG_THRESHOLD_OFFSET = 0.15
+
+# (recurrent state, context samples)
+State = Tuple[np.ndarray, np.ndarray]
+
+
+def default_model_path() -> str:
+    """VAD_MODEL_PATH, else the Silero ONNX model shipped with faster-whisper"""
+    path = os.getenv("VAD_MODEL_PATH")
+    if path:
+        return path
+    from faster_whisper.utils import get_assets_path
+    return os.path.join(get_assets_path(), "silero_vad.onnx")
+
+
+class SileroVAD:
+    """
+    Silero VAD (ONNX). The session is shared and thread-safe; the recurrent
+    state is passed in and out, so any number of streams can use one model.
+    """
+
+    def __init__(self, model_path: Optional[str] = None):
+        import onnxruntime
+
+        self.model_path = model_path or default_model_path()
+        options = onnxruntime.SessionOptions()
+        # Tiny model, one window at a time: extra threads only add overhead
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        options.log_severity_level = 4
+        self.session = onnxruntime.InferenceSession(
+            self.model_path, providers=["CPUExecutionProvider"], sess_options=options
+        )
+        inputs = {i.name for i in self.session.get_inputs()}
+        if inputs != MODEL_INPUTS:
+            raise RuntimeError(
+                f"{self.model_path} has inputs {sorted(inputs)}; expected a Silero v5 model "
+                f"with {sorted(MODEL_INPUTS)}"
+            )
+        self._sr = np.array(SAMPLE_RATE, dtype=np.int64)
+
+    @staticmethod
+    def initial_state() -> State:
+        return np.zeros((2, 1, 128), dtype=np.float32), np.zeros((1, CONTEXT_SAMPLES), dtype=np.float32)
+
+    def probability(self, window: np.ndarray, state: State) -> Tuple[float, State]:
+        """Speech probability of one 512-sample window, and the next state"""
+        recurrent, context = state
+        x = np.concatenate([context, window.reshape(1, -1).astype(np.float32, copy=False)], axis=1)
+        output, recurrent = self.session.run(None, {"input": x, "state": recurrent, "sr": self._sr})
+        return float(output[0][0]), (recurrent, x[:, -CONTEXT_SAMPLES:])
+
+    def speech_probs(self, audio: np.ndarray) -> np.ndarray:
+        """Probability per window over a whole clip (last window zero-padded)"""
+        state = self.initial_state()
+        n_windows = (len(audio) + WINDOW_SAMPLES - 1) // WINDOW_SAMPLES
+        padded = np.zeros(n_windows * WINDOW_SAMPLES, dtype=np.float32)
+        padded[:len(audio)] = audio
+        probs = np.empty(n_windows, dtype=np.float32)
+        for i in range(n_windows):
+            probs[i], state = self.probability(padded[i * WINDOW_SAMPLES:(i + 1) * WINDOW_SAMPLES], state)
+        return probs
+
+    def get_speech_timestamps(
+        self,
+        audio: np.ndarray,
+        threshold: float = 0.5,
+        min_speech_ms: int = 250,
+        min_silence_ms: int = 100,
+        speech_pad_ms: int = 30,
+    ) -> List[Dict[str, int]]:
+        """
+        Speech regions of a clip, as Silero's get_speech_timestamps.
+
+        Args:
+            audio: 16kHz mono float32 samples
+            threshold: Speech probability threshold
+            min_speech_ms: Shorter regions are dropped
+            min_silence_ms: Shorter pauses don't split a region
+            speech_pad_ms: Padding added either side of each region
+
+        Returns:
+            [{"start": sample, "end": sample}, ...]
+        """
+        min_speech = SAMPLE_RATE * min_speech_ms // 1000
+        min_silence = SAMPLE_RATE * min_silence_ms // 1000
+        pad = SAMPLE_RATE * speech_pad_ms // 1000
+        neg_threshold = threshold - NEG_THRESHOLD_OFFSET
+        length = len(audio)
+
+        speeches: List[Dict[str, int]] = []
+        current: Dict[str, int] = {}
+        triggered = False
+        temp_end = 0
+        for i, prob in enumerate(self.speech_probs(audio)):
+            position = i * WINDOW_SAMPLES
+            if prob >= threshold and temp_end:
+                temp_end = 0
+            if prob >= threshold and not triggered:
+                triggered = True
+                current["start"] = position
+                continue
+            if prob < neg_threshold and triggered:
+                if not temp_end:
+                    temp_end = position
+                if position - temp_end < min_silence:
+                    continue
+                current["end"] = temp_end
+                if current["end"] - current["start"] > min_speech:
+                    speeches.append(current)
+                current = {}
+                triggered = False
+                temp_end = 0
+        if current and length - current["start"] > min_speech:
+            current["end"] = length
+            speeches.append(current)
+
+        # Pad regions, splitting short gaps between neighbours
+        for i, speech in enumerate(speeches):
+            if i == 0:
+                speech["start"] = max(0, speech["start"] - pad)
+            if i < len(speeches) - 1:
+                gap = speeches[i + 1]["start"] - speech["end"]
+                if gap < 2 * pad:
+                    speech["end"] += gap // 2
+                    speeches[i + 1]["start"] = max(0, speeches[i + 1]["start"] - gap // 2)
+                else:
+                    speech["end"] = min(length, speech["end"] + pad)
+                    speeches[i + 1]["start"] = max(0, speeches[i + 1]["start"] - pad)
+            else:
+                speech["end"] = min(length, speech["end"] + pad)
+        return speeches
+
+
+def collect_chunks(timestamps: List[Dict[str, int]], audio: np.ndarray) -> np.ndarray:
+    """Concatenate the speech regions of a clip"""
+    if not timestamps:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate([audio[t["start"]:t["end"]] for t in timestamps])
+
+
+def clip_timestamps(timestamps: List[Dict[str, int]], merge_gap_s: float = 1.0) -> List[float]:
+    """
+    Speech regions as faster-whisper clip_timestamps ([start, end, start, end, ...]
+    in seconds). Regions closer than merge_gap_s are merged so Whisper decodes
+    one window per stretch of speech rather than one per breath.
+    """
+    merged: List[List[float]] = []
+    for t in timestamps:
+        start, end = t["start"] / SAMPLE_RATE, t["end"] / SAMPLE_RATE
+        if merged and start - merged[-1][1] < merge_gap_s:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [bound for region in merged for bound in region]
+
+
+class VADIterator:
+    """
+    Streaming endpointing over consecutive 512-sample windows, as Silero's
+    VADIterator, with its own state (one per stream).
+    """
+
+    def __init__(
+        self,
+        vad: SileroVAD,
+        threshold: float = 0.5,
+        sampling_rate: int = SAMPLE_RATE,
+        min_silence_duration_ms: int = 100,
+        speech_pad_ms: int = 30,
+    ):
+        if sampling_rate != SAMPLE_RATE:
+            raise ValueError(f"VAD runs at {SAMPLE_RATE}Hz")
+        self.vad = vad
+        self.threshold = threshold
+        self.min_silence_samples = sampling_rate * min_silence_duration_ms // 1000
+        self.speech_pad_samples = sampling_rate * speech_pad_ms // 1000
+        self.reset_states()
+
+    def reset_states(self):
+        self._state = self.vad.initial_state()
+        self.triggered = False
+        self.temp_end = 0
+        self.current_sample = 0
+
+    def __call__(self, window: np.ndarray, return_seconds: bool = False) -> Optional[Dict[str, float]]:
+        """
+        Feed one window.
+
+        Returns:
+            {"start": sample} when speech begins, {"end": sample} when it has
+            been silent for min_silence_duration_ms, else None
+        """
+        size = len(window)
+        self.current_sample += size
+        prob, self._state = self.vad.probability(window, self._state)
+        scale = 1 / SAMPLE_RATE if return_seconds else 1
+
+        if prob >= self.threshold and self.temp_end:
+            self.temp_end = 0
+        if prob >= self.threshold and not self.triggered:
+            self.triggered = True
+            start = max(0, self.current_sample - self.speech_pad_samples - size)
+            return {"start": start * scale}
+        if prob < self.threshold - NEG_THRESHOLD_OFFSET and self.triggered:
+            if not self.temp_end:
+                self.temp_end = self.current_sample
+            if self.current_sample - self.temp_end < self.min_silence_samples:
+                return None
+            end = self.temp_end + self.speech_pad_samples - size
+            self.temp_end = 0
+            self.triggered = False
+            return {"end": end * scale}
+        return None
+
+
+# Global instance (one ONNX session for the process)
+_vad: Optional[SileroVAD] = None
+_vad_lock = threading.Lock()
+
+
+def get_vad() -> SileroVAD:
+    """Get or create the global VAD"""
+    global _vad
+    with _vad_lock:
+        if _vad is None:
+            _vad = SileroVAD()
+            logger.info(f"VAD loaded from {_vad.model_path}")
+        return _vad
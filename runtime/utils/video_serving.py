@@ -0,0 +1,333 @@
+"""
+Video file serving
+HTTP Range (single and multi-range), strong ETags and conditional GET, with
+zero-copy sends when the ASGI server supports them
+"""
+import logging
+import mmap
+import os
+import re
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, List, Mapping, Optional, Tuple
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Body chunk size on the mmap path (one page-cache copy, no thread hop per read)
+SEND_CHUNK_SIZE = 1024 * 1024
+# More ranges than this is a client bug or abuse; serve the whole file instead
+MAX_RANGES = 16
+# ASGI extension for kernel sendfile (https://asgi.readthedocs.io/en/latest/extensions.html)
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+ByteRange = Tuple[int, int]  # inclusive (start, end)
+
+_RANGE_SPEC_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlap the file"""
+
+
+def file_etag(size: int, mtime_ns: int, sha256: Optional[str] = None) -> str:
+    """
+    Strong ETag for an artifact.
+
+    The producer's content hash when known; otherwise size and mtime, which
+    identify the content because artifacts are published by atomic rename and
+    never modified in place.
+    """
+    if sha256:
+        return f'"{sha256}"'
+    return f'"{size:x}-{mtime_ns:x}"'
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a Range header into sorted, coalesced inclusive byte ranges.
+
+    Args:
+        header: Range header value (e.g. "bytes=0-1023, -500")
+        size: File size
+
+    Returns:
+        Ranges to serve, or None to serve the whole file (no header, a unit
+        other than bytes, malformed or too many ranges)
+
+    Raises:
+        RangeNotSatisfiable: If no range overlaps the file (416)
+    """
+    if not header:
+        return None
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+
+    ranges: List[ByteRange] = []
+    for spec in specs.split(","):
+        match = _RANGE_SPEC_RE.match(spec)
+        if not match:
+            return None
+        first, last = match.groups()
+        if first == "" and last == "":
+            return None
+        if first == "":
+            # Suffix range: last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(0, size - length), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue
+        end = int(last) if last else size - 1
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Coalesce overlapping/adjacent ranges
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (RFC 9110 13.2.2 order)"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison for If-None-Match
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _if_range_matches(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    """If-Range: only honour Range if the client's copy is still current"""
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag  # Strong comparison
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_range).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class FileRangeResponse(Response):
+    """
+    File response that serves byte ranges.
+
+    Body bytes go out as ASGI zero-copy sends (kernel sendfile) when the server
+    advertises the extension, otherwise as large slices of an mmap of the file
+    - no per-chunk thread hop and no Python read loop either way.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        status_code: int,
+        headers: dict,
+        media_type: Optional[str] = None,
+        ranges: Optional[List[ByteRange]] = None,
+        part_headers: Optional[List[bytes]] = None,
+        boundary: Optional[str] = None,
+        send_body: bool = True,
+        on_missing: Optional[Callable[[], None]] = None,
+    ):
+        self.path = path
+        self.on_missing = on_missing
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.ranges = ranges or []
+        self.part_headers = part_headers or []
+        self.boundary = boundary
+        self.send_body = send_body
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        start = time.time()
+        try:
+            # Open before committing to a status: the file may have been cleaned up
+            # since its metadata was recorded
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            if self.on_missing is not None:
+                self.on_missing()
+            await Response(status_code=404)(scope, receive, send)
+            return
+
+        with f:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            if not self.send_body or not self.ranges:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+            zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+            if zerocopy:
+                await self._send_zerocopy(f, send)
+            else:
+                await self._send_mmap(f, send)
+
+        logger.debug(
+            f"[VIDEO] Sent {os.path.basename(self.path)} {self.status_code} "
+            f"({len(self.ranges)} range(s), {'sendfile' if zerocopy else 'mmap'}) "
+            f"in {(time.time() - start) * 1000:.1f}ms"
+        )
+
+    def _part_prefix(self, index: int) -> bytes:
+        return self.part_headers[index] if self.boundary else b""
+
+    def _closing(self) -> bytes:
+        return f"\r\n--{self.boundary}--\r\n".encode() if self.boundary else b""
+
+    async def _send_zerocopy(self, f, send: Send):
+        for i, (first, last) in enumerate(self.ranges):
+            prefix = self._part_prefix(i)
+            if prefix:
+                await send({"type": "http.response.body", "body": prefix, "more_body": True})
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": f,
+                "offset": first,
+                "count": last - first + 1,
+                "more_body": True,
+            })
+        await send({"type": "http.response.body", "body": self._closing(), "more_body": False})
+
+    async def _send_mmap(self, f, send: Send):
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i, (first, last) in enumerate(self.ranges):
+                prefix = self._part_prefix(i)
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                for offset in range(first, last + 1, SEND_CHUNK_SIZE):
+                    end = min(offset + SEND_CHUNK_SIZE, last + 1)
+                    await send({"type": "http.response.body", "body": mm[offset:end], "more_body": True})
+        await send({"type": "http.response.body", "body": self._closing(), "more_body": False})
+
+
+def video_file_response(
+    path: str,
+    request_headers: Mapping[str, str],
+    method: str = "GET",
+    media_type: str = "video/mp4",
+    extra_headers: Optional[dict] = None,
+    size: Optional[int] = None,
+    mtime_ns: Optional[int] = None,
+    sha256: Optional[str] = None,
+    on_missing: Optional[Callable[[], None]] = None,
+) -> Response:
+    """
+    Build the response for a GET/HEAD of a file: 200, 206 (single or
+    multipart/byteranges), 304 or 416.
+
+    Args:
+        path: File to serve
+        request_headers: Request headers (case-insensitive mapping)
+        method: GET or HEAD (HEAD sends headers only)
+        media_type: Content type of the file
+        extra_headers: Added to every response (CORS, Cache-Control, ...)
+        size, mtime_ns: Known file metadata (e.g. from the artifact registry);
+            the file is stat'ed if omitted
+        sha256: Known content hash, used as the ETag
+        on_missing: Called if the file is gone by the time the body is sent
+
+    Returns:
+        Response ready to be returned from a FastAPI handler
+    """
+    if size is None or mtime_ns is None:
+        st = os.stat(path)
+        size, mtime_ns = st.st_size, st.st_mtime_ns
+    mtime = mtime_ns / 1e9
+    etag = file_etag(size, mtime_ns, sha256)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        **(extra_headers or {}),
+    }
+    send_body = method.upper() != "HEAD"
+
+    if _not_modified(request_headers, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        ranges = None
+        if _if_range_matches(request_headers, etag, mtime):
+            ranges = parse_range_header(request_headers.get("range"), size)
+    except RangeNotSatisfiable:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        return FileRangeResponse(
+            path, 200, headers, media_type,
+            ranges=[(0, size - 1)] if size else [],
+            send_body=send_body,
+            on_missing=on_missing,
+        )
+
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+        headers["Content-Length"] = str(last - first + 1)
+        return FileRangeResponse(
+            path, 206, headers, media_type,
+            ranges=ranges,
+            send_body=send_body,
+            on_missing=on_missing,
+        )
+
+    # Multiple ranges: multipart/byteranges
+    boundary = uuid.uuid4().hex
+    part_headers = []
+    for i, (first, last) in enumerate(ranges):
+        separator = "" if i == 0 else "\r\n"
+        part_headers.append((
+            f"{separator}--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {first}-{last}/{size}\r\n\r\n"
+        ).encode())
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    content_length = sum(len(h) for h in part_headers) + sum(last - first + 1 for first, last in ranges) + len(closing)
+    headers["Content-Length"] = str(content_length)
+    return FileRangeResponse(
+        path, 206, headers,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        ranges=ranges,
+        part_headers=part_headers,
+        boundary=boundary,
+        send_body=send_body,
+        on_missing=on_missing,
+    )
@@ -26,6 +26,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.tts import XTTSModel
 from models.asr import ASRModel
 from models.ditto_model import DittoModel
+from utils.artifacts import scratch_dir
 
 
 @dataclass
@@ -223,6 +224,7 @@ class ConcurrentVideoGenerator:
         """
         start_time = time.time()
         print(f"🎬 Worker {worker_id+1} processing job {job.job_id}")
+        temp_audio = os.path.join(scratch_dir(), f"audio_{job.job_id}.wav")
         
         try:
             # Step 1: Generate audio with TTS (shared model)
@@ -230,7 +232,6 @@ class ConcurrentVideoGenerator:
             voice_sample = job.voice_sample or self.voice_sample_path
             
             # TTS returns (audio_path, duration_ms, audio_duration_s)
-            temp_audio = f"/tmp/audio_{job.job_id}.wav"
             audio_path, tts_duration, audio_duration_s = self.tts_model.synthesize(
                 text=job.text,
                 language=job.language,
@@ -249,10 +250,6 @@ class ConcurrentVideoGenerator:
                 output_path=job.output_path
             )
             
-            # Clean up temp audio
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-            
             duration = time.time() - start_time
             print(f"  ✅ Job {job.job_id} completed in {duration:.2f}s")
             
@@ -277,6 +274,11 @@ class ConcurrentVideoGenerator:
                 error=error_msg,
                 worker_id=worker_id
             )
+        
+        finally:
+            # Clean up temp audio (also when TTS or Ditto failed)
+            if os.path.exists(temp_audio):
+                os.remove(temp_audio)
     
     def submit_job(self, job: VideoJob) -> bool:
         """
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test the streaming ASR WebSocket endpoint locally or on GCP
+Plays a recording into /ws/asr in real time (like a live microphone) and
+measures how soon the final transcript arrives after the audio ends
+"""
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+import websockets
+
+sys.path.insert(0, "runtime")
+from utils.audio import ASR_SAMPLE_RATE, decode_audio_bytes
+
+# Test configuration
+if len(sys.argv) > 1 and sys.argv[1] == "gcp":
+    WS_URL = "ws://35.243.218.244:8000/ws/asr"
+    print("Testing GCP instance: 35.243.218.244")
+else:
+    WS_URL = "ws://localhost:8000/ws/asr"
+    print("Testing local instance")
+
+AUDIO_FILE = "assets/voice/reference_samples/bruce_en_sample.wav"
+LANGUAGE = "en"
+FRAME_MS = 40  # What an AudioWorklet posting every 40ms produces
+
+
+async def test_ws_asr():
+    """Stream one recording at real-time pace and report transcript events"""
+    with open(AUDIO_FILE, "rb") as f:
+        audio = decode_audio_bytes(f.read())
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    frame_samples = ASR_SAMPLE_RATE * FRAME_MS // 1000
+
+    print(f"\nConnecting to {WS_URL}")
+    print(f"Audio: {AUDIO_FILE} ({len(audio) / ASR_SAMPLE_RATE:.2f}s, {FRAME_MS}ms frames)")
+    print("-" * 60)
+
+    async with websockets.connect(WS_URL) as ws:
+        await ws.send(json.dumps({"type": "start", "language": LANGUAGE, "encoding": "pcm_s16le"}))
+        start_time = time.time()
+        audio_done = {}
+
+        async def send_audio():
+            for i in range(0, len(pcm), frame_samples):
+                await ws.send(pcm[i:i + frame_samples].tobytes())
+                # Real-time pacing
+                await asyncio.sleep(max(0.0, start_time + (i + frame_samples) / ASR_SAMPLE_RATE - time.time()))
+            audio_done["time"] = time.time()
+            await ws.send(json.dumps({"type": "end"}))
+
+        sender = asyncio.create_task(send_audio())
+        last_final_time = None
+        async for message in ws:
+            elapsed = time.time() - start_time
+            event = json.loads(message)
+            data = event["data"]
+            if event["type"] == "partial":
+                print(f"[{elapsed:6.2f}s] partial: {data['text']}")
+            elif event["type"] == "final":
+                last_final_time = time.time()
+                print(f"[{elapsed:6.2f}s] final (segment {data['segment_index']}, "
+                      f"{data['latency_ms']:.0f}ms after end of speech): {data['segment_text']}")
+            elif event["type"] == "error":
+                print(f"Error: {data.get('error')}")
+                break
+            elif event["type"] == "complete":
+                print(f"[{elapsed:6.2f}s] complete: {data['text']}")
+                break
+            else:
+                print(f"[{elapsed:6.2f}s] {event['type']}")
+        await sender
+
+    print("-" * 60)
+    if last_final_time is not None and "time" in audio_done:
+        print(f"Last final {max(0.0, last_final_time - audio_done['time']) * 1000:.0f}ms after the audio ended")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_ws_asr())
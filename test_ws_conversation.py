@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test the WebSocket conversation endpoint locally or on GCP
+Measures TTFF (Time to First Frame) with video delivered over the socket
+"""
+import asyncio
+import json
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, "runtime")
+from utils.media_frames import unpack_media_frame
+
+# Test configuration
+if len(sys.argv) > 1 and sys.argv[1] == "gcp":
+    WS_URL = "ws://35.243.218.244:8000/ws/conversation"
+    print("Testing GCP instance: 35.243.218.244")
+else:
+    WS_URL = "ws://localhost:8000/ws/conversation"
+    print("Testing local instance")
+
+AUDIO_FILE = "assets/voice/reference_samples/bruce_en_sample.wav"
+LANGUAGE = "en"
+FRAME_SIZE = 16384  # Roughly what a MediaRecorder timeslice produces
+
+
+async def test_ws_conversation():
+    """Send one recorded turn and report events and media frames as they arrive"""
+    print(f"\nConnecting to {WS_URL}")
+    print(f"Audio: {AUDIO_FILE}")
+    print("-" * 60)
+
+    async with websockets.connect(WS_URL, max_size=None) as ws:
+        start_time = time.time()
+        await ws.send(json.dumps({"type": "start", "language": LANGUAGE}))
+        with open(AUDIO_FILE, "rb") as f:
+            while True:
+                frame = f.read(FRAME_SIZE)
+                if not frame:
+                    break
+                await ws.send(frame)
+        await ws.send(json.dumps({"type": "end"}))
+
+        first_media_time = None
+        media_bytes = 0
+        async for message in ws:
+            elapsed = time.time() - start_time
+            if isinstance(message, bytes):
+                header, payload = unpack_media_frame(message)
+                media_bytes += len(payload)
+                if first_media_time is None:
+                    first_media_time = elapsed
+                    print(f"⚡ TTFF: {elapsed:.2f}s")
+                print(f"[{elapsed:6.2f}s] media seq={header['seq']} {header['kind']} "
+                      f"chunk={header.get('chunk_index')} {header.get('name')} ({len(payload)} bytes)")
+                continue
+
+            event = json.loads(message)
+            data = event["data"]
+            print(f"[{elapsed:6.2f}s] event seq={data.get('seq')} {event['type']}")
+            if event["type"] in ("complete", "error"):
+                if event["type"] == "error":
+                    print(f"Error: {data.get('error')}")
+                break
+
+    print("-" * 60)
+    print(f"Total time: {time.time() - start_time:.2f}s, media received: {media_bytes} bytes")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_ws_conversation())
@@ -11,6 +11,8 @@ const USE_STREAMING = true; // Toggle streaming mode
 let mediaRecorder = null;
 let audioChunks = [];
 let conversationHistory = [];
+// Server keeps the conversation context for this id (reset with Clear)
+let sessionId = crypto.randomUUID();
 let isRecording = false;
 let isProcessing = false;
 let currentEventSource = null;
@@ -205,6 +207,7 @@ async function processStreamingConversation(audioBlob) {
     const formData = new FormData();
     formData.append('audio', audioBlob, 'recording.webm');
     formData.append('language', selectedLanguage);
+    formData.append('session_id', sessionId);
     
     console.log(`[DEBUG] Sending request with language: ${selectedLanguage}`);
     
@@ -355,6 +358,7 @@ async function processBlockingConversation(audioBlob) {
     const formData = new FormData();
     formData.append('audio', audioBlob, 'recording.webm');
     formData.append('language', selectedLanguage);
+    formData.append('session_id', sessionId);
     
     // Send to conversation endpoint
     const response = await fetch(`${API_BASE_URL}/api/v1/conversation`, {
@@ -664,6 +668,7 @@ function clearConversation() {
     transcript.innerHTML = '<p class="empty-state">Your conversation will appear here...</p>';
     conversationHistory = [];
     localStorage.removeItem('conversationHistory');
+    sessionId = crypto.randomUUID();
     
     // Reset video
     avatarVideo.pause();